@@ -5,9 +5,14 @@ from sqlalchemy import pool
 from alembic import context
 from src.core.database import Base
 from src.auth.models import User, UserSession
-from src.rooms.models import Room, RoomMember, JoinLink
-from src.chat.models import Message, Attachment, PinnedMessage
+from src.rooms.models import Room, RoomMember, JoinLink, RoomShard, DirectMessage
+from src.chat.models import Message, Attachment, PinnedMessage, Mention, MessageRevision
 from src.moderation.models import Ban
+from src.jobs.models import Job
+from src.outbox.models import OutboxEvent
+from src.notifications.models import PendingNotification, NotificationCursor
+from src.retention.models import RetentionCheckpoint
+from src.activity.models import RoomActivityHourly, RoomActivityDaily, SiteActivityDaily, UserActivityDaily, ActivityWatermark
 from src.core.settings import settings
 
 config = context.config
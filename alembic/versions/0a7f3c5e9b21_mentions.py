@@ -0,0 +1,38 @@
+"""Mention index
+
+Revision ID: 0a7f3c5e9b21
+Revises: f1c6a8d29e47
+Create Date: 2026-10-19 21:26:05.413892
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a7f3c5e9b21'
+down_revision: Union[str, Sequence[str], None] = 'f1c6a8d29e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('mentions',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('message_id', sa.BigInteger(), nullable=False),
+    sa.Column('room_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['message_id'], ['messages.message_id'], ),
+    sa.ForeignKeyConstraint(['room_id'], ['rooms.room_id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'message_id')
+    )
+    op.create_index(op.f('ix_mentions_message_id'), 'mentions', ['message_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_mentions_message_id'), table_name='mentions')
+    op.drop_table('mentions')
@@ -0,0 +1,28 @@
+"""Room shard freeze flag
+
+Revision ID: 3f7b1d9c5e24
+Revises: 8a4c6e1d9f52
+Create Date: 2026-10-21 16:40:12.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f7b1d9c5e24'
+down_revision: Union[str, Sequence[str], None] = '8a4c6e1d9f52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('room_shards', sa.Column('frozen', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('room_shards', 'frozen')
@@ -0,0 +1,38 @@
+"""Unique room membership per user
+
+Revision ID: 3f9c1a7d2b84
+Revises: 6562e9fe4ed3
+Create Date: 2026-10-19 10:12:41.208314
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c1a7d2b84'
+down_revision: Union[str, Sequence[str], None] = '6562e9fe4ed3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Concurrent redemptions may already have produced duplicates; keep the oldest row.
+    op.execute(
+        """
+        DELETE FROM room_members rm
+        USING room_members older
+        WHERE rm.room_id = older.room_id
+          AND rm.user_id = older.user_id
+          AND rm.member_id > older.member_id
+        """
+    )
+    op.create_unique_constraint('uq_room_members_room_id_user_id', 'room_members', ['room_id', 'user_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_room_members_room_id_user_id', 'room_members', type_='unique')
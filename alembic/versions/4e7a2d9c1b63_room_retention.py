@@ -0,0 +1,37 @@
+"""Room retention policies and purge checkpoints
+
+Revision ID: 4e7a2d9c1b63
+Revises: 9c3b6e2d7f14
+Create Date: 2026-10-19 22:48:17.530264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e7a2d9c1b63'
+down_revision: Union[str, Sequence[str], None] = '9c3b6e2d7f14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('rooms', sa.Column('retention_days', sa.Integer(), nullable=True))
+    op.create_table('retention_checkpoints',
+    sa.Column('room_id', sa.Integer(), nullable=False),
+    sa.Column('purged_through', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('messages', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['room_id'], ['rooms.room_id'], ),
+    sa.PrimaryKeyConstraint('room_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('retention_checkpoints')
+    op.drop_column('rooms', 'retention_days')
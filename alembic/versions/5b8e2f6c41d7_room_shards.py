@@ -0,0 +1,34 @@
+"""Room shard placements
+
+Revision ID: 5b8e2f6c41d7
+Revises: c27d5b1e8a90
+Create Date: 2026-10-19 13:20:52.641370
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e2f6c41d7'
+down_revision: Union[str, Sequence[str], None] = 'c27d5b1e8a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('room_shards',
+    sa.Column('room_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.String(length=50), nullable=False),
+    sa.Column('moved_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['room_id'], ['rooms.room_id'], ),
+    sa.PrimaryKeyConstraint('room_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('room_shards')
@@ -0,0 +1,38 @@
+"""Message revisions
+
+Revision ID: 5d2f9e7b3a18
+Revises: c3e8a5f17d42
+Create Date: 2026-10-20 02:41:53.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2f9e7b3a18'
+down_revision: Union[str, Sequence[str], None] = 'c3e8a5f17d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('messages', sa.Column('revision', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('message_revisions',
+    sa.Column('message_id', sa.BigInteger(), nullable=False),
+    sa.Column('revision', sa.Integer(), nullable=False),
+    sa.Column('content', sa.LargeBinary(), nullable=False),
+    sa.Column('is_snapshot', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['message_id'], ['messages.message_id'], ),
+    sa.PrimaryKeyConstraint('message_id', 'revision')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('message_revisions')
+    op.drop_column('messages', 'revision')
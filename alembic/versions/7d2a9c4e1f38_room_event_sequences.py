@@ -0,0 +1,40 @@
+"""Per-room event sequences
+
+Revision ID: 7d2a9c4e1f38
+Revises: e913a4c7f062
+Create Date: 2026-10-19 16:42:10.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2a9c4e1f38'
+down_revision: Union[str, Sequence[str], None] = 'e913a4c7f062'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('rooms', sa.Column('last_seq', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('messages', sa.Column('seq', sa.BigInteger(), nullable=True))
+    op.execute(
+        'UPDATE messages SET seq = numbered.seq FROM ('
+        ' SELECT message_id, row_number() OVER (PARTITION BY room_id ORDER BY message_id) AS seq FROM messages'
+        ') AS numbered WHERE messages.message_id = numbered.message_id'
+    )
+    op.execute(
+        'UPDATE rooms SET last_seq = COALESCE((SELECT MAX(seq) FROM messages WHERE messages.room_id = rooms.room_id), 0)'
+    )
+    op.create_index('uq_messages_room_id_seq', 'messages', ['room_id', 'seq'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_messages_room_id_seq', table_name='messages')
+    op.drop_column('messages', 'seq')
+    op.drop_column('rooms', 'last_seq')
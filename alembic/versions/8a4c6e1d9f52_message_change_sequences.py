@@ -0,0 +1,30 @@
+"""Message change sequences
+
+Revision ID: 8a4c6e1d9f52
+Revises: 5d2f9e7b3a18
+Create Date: 2026-10-21 10:12:37.504913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4c6e1d9f52'
+down_revision: Union[str, Sequence[str], None] = '5d2f9e7b3a18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('messages', sa.Column('changed_seq', sa.BigInteger(), nullable=True))
+    op.create_index('ix_messages_room_id_changed_seq', 'messages', ['room_id', 'changed_seq'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_messages_room_id_changed_seq', table_name='messages')
+    op.drop_column('messages', 'changed_seq')
@@ -0,0 +1,41 @@
+"""Direct messages
+
+Revision ID: 9c3b6e2d7f14
+Revises: 0a7f3c5e9b21
+Create Date: 2026-10-19 22:04:51.286130
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3b6e2d7f14'
+down_revision: Union[str, Sequence[str], None] = '0a7f3c5e9b21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('direct_messages',
+    sa.Column('user_low', sa.Integer(), nullable=False),
+    sa.Column('user_high', sa.Integer(), nullable=False),
+    sa.Column('room_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.CheckConstraint('user_low < user_high', name='ck_direct_messages_ordered_pair'),
+    sa.ForeignKeyConstraint(['room_id'], ['rooms.room_id'], ),
+    sa.ForeignKeyConstraint(['user_high'], ['users.user_id'], ),
+    sa.ForeignKeyConstraint(['user_low'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_low', 'user_high'),
+    sa.UniqueConstraint('room_id')
+    )
+    op.create_index(op.f('ix_direct_messages_user_high'), 'direct_messages', ['user_high'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_direct_messages_user_high'), table_name='direct_messages')
+    op.drop_table('direct_messages')
@@ -0,0 +1,30 @@
+"""Content address for attachments
+
+Revision ID: a41e7c09d5f2
+Revises: 3f9c1a7d2b84
+Create Date: 2026-10-19 11:02:17.530942
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41e7c09d5f2'
+down_revision: Union[str, Sequence[str], None] = '3f9c1a7d2b84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('attachments', sa.Column('sha256', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_attachments_sha256'), 'attachments', ['sha256'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_attachments_sha256'), table_name='attachments')
+    op.drop_column('attachments', 'sha256')
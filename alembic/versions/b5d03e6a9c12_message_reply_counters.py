@@ -0,0 +1,38 @@
+"""Reply counters and reply_to index
+
+Revision ID: b5d03e6a9c12
+Revises: 7d2a9c4e1f38
+Create Date: 2026-10-19 18:05:37.412093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d03e6a9c12'
+down_revision: Union[str, Sequence[str], None] = '7d2a9c4e1f38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('messages', sa.Column('reply_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('messages', sa.Column('last_reply_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_messages_reply_to'), 'messages', ['reply_to'], unique=False)
+    op.execute(
+        'UPDATE messages SET reply_count = replies.count, last_reply_at = replies.last_reply_at FROM ('
+        ' SELECT reply_to, COUNT(*) AS count, MAX(created_at) AS last_reply_at FROM messages'
+        ' WHERE reply_to IS NOT NULL GROUP BY reply_to'
+        ') AS replies WHERE messages.message_id = replies.reply_to'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_messages_reply_to'), table_name='messages')
+    op.drop_column('messages', 'last_reply_at')
+    op.drop_column('messages', 'reply_count')
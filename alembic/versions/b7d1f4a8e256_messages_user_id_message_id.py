@@ -0,0 +1,30 @@
+"""Index messages by author and id
+
+Revision ID: b7d1f4a8e256
+Revises: 4e7a2d9c1b63
+Create Date: 2026-10-19 23:31:42.118905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d1f4a8e256'
+down_revision: Union[str, Sequence[str], None] = '4e7a2d9c1b63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_messages_user_id_message_id', 'messages', ['user_id', 'message_id'], unique=False)
+    op.drop_index(op.f('ix_messages_user_id'), table_name='messages')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_messages_user_id'), 'messages', ['user_id'], unique=False)
+    op.drop_index('ix_messages_user_id_message_id', table_name='messages')
@@ -0,0 +1,70 @@
+"""Activity rollups
+
+Revision ID: c3e8a5f17d42
+Revises: b7d1f4a8e256
+Create Date: 2026-10-20 00:12:09.647213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8a5f17d42'
+down_revision: Union[str, Sequence[str], None] = 'b7d1f4a8e256'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('room_activity_hourly',
+    sa.Column('room_id', sa.Integer(), nullable=False),
+    sa.Column('hour', sa.DateTime(), nullable=False),
+    sa.Column('messages', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['room_id'], ['rooms.room_id'], ),
+    sa.PrimaryKeyConstraint('room_id', 'hour')
+    )
+    op.create_table('room_activity_daily',
+    sa.Column('room_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('messages', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('joins', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('active_users', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('users', sa.LargeBinary(), nullable=True),
+    sa.ForeignKeyConstraint(['room_id'], ['rooms.room_id'], ),
+    sa.PrimaryKeyConstraint('room_id', 'day')
+    )
+    op.create_index('ix_room_activity_daily_day_messages', 'room_activity_daily', ['day', 'messages'], unique=False)
+    op.create_table('site_activity_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('messages', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('joins', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('active_users', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('users', sa.LargeBinary(), nullable=True),
+    sa.PrimaryKeyConstraint('day')
+    )
+    op.create_table('user_activity_daily',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('messages', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+    op.create_table('activity_watermarks',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('last_id', sa.BigInteger(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('activity_watermarks')
+    op.drop_table('user_activity_daily')
+    op.drop_table('site_activity_daily')
+    op.drop_index('ix_room_activity_daily_day_messages', table_name='room_activity_daily')
+    op.drop_table('room_activity_daily')
+    op.drop_table('room_activity_hourly')
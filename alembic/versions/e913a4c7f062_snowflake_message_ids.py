@@ -0,0 +1,55 @@
+"""Snowflake ids for messages and attachments
+
+Revision ID: e913a4c7f062
+Revises: 5b8e2f6c41d7
+Create Date: 2026-10-19 14:05:33.902518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e913a4c7f062'
+down_revision: Union[str, Sequence[str], None] = '5b8e2f6c41d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema.
+
+    Existing serial ids are kept; they are far below any generated id, so
+    ordering is preserved and they decode to the id epoch.
+    """
+    op.alter_column('messages', 'message_id', existing_type=sa.Integer(), type_=sa.BigInteger(), server_default=None)
+    op.alter_column('messages', 'reply_to', existing_type=sa.Integer(), type_=sa.BigInteger())
+    op.alter_column('attachments', 'attachment_id', existing_type=sa.Integer(), type_=sa.BigInteger(), server_default=None)
+    op.alter_column('attachments', 'message_id', existing_type=sa.Integer(), type_=sa.BigInteger())
+    op.alter_column('pinned_messages', 'message_id', existing_type=sa.Integer(), type_=sa.BigInteger())
+    op.execute('DROP SEQUENCE IF EXISTS messages_message_id_seq')
+    op.execute('DROP SEQUENCE IF EXISTS attachments_attachment_id_seq')
+    op.drop_index(op.f('ix_messages_room_id'), table_name='messages')
+    op.create_index('ix_messages_room_id_message_id', 'messages', ['room_id', 'message_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema.
+
+    Generated ids do not fit into INTEGER; this only works while the tables
+    still hold serial ids.
+    """
+    op.drop_index('ix_messages_room_id_message_id', table_name='messages')
+    op.create_index(op.f('ix_messages_room_id'), 'messages', ['room_id'], unique=False)
+    op.alter_column('pinned_messages', 'message_id', existing_type=sa.BigInteger(), type_=sa.Integer())
+    op.alter_column('attachments', 'message_id', existing_type=sa.BigInteger(), type_=sa.Integer())
+    op.alter_column('attachments', 'attachment_id', existing_type=sa.BigInteger(), type_=sa.Integer())
+    op.alter_column('messages', 'reply_to', existing_type=sa.BigInteger(), type_=sa.Integer())
+    op.alter_column('messages', 'message_id', existing_type=sa.BigInteger(), type_=sa.Integer())
+    for table, column in (('messages', 'message_id'), ('attachments', 'attachment_id')):
+        sequence = f'{table}_{column}_seq'
+        op.execute(f'CREATE SEQUENCE {sequence} OWNED BY {table}.{column}')
+        op.execute(f"SELECT setval('{sequence}', COALESCE((SELECT MAX({column}) FROM {table}), 0) + 1, false)")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET DEFAULT nextval('{sequence}')")
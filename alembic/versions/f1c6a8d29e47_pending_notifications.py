@@ -0,0 +1,48 @@
+"""Pending notifications and the fan-out cursor
+
+Revision ID: f1c6a8d29e47
+Revises: d8e41b7a3f05
+Create Date: 2026-10-19 20:41:37.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c6a8d29e47'
+down_revision: Union[str, Sequence[str], None] = 'd8e41b7a3f05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('pending_notifications',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('room_id', sa.Integer(), nullable=False),
+    sa.Column('messages', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('mentions', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('replies', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('first_message_id', sa.BigInteger(), nullable=False),
+    sa.Column('last_message_id', sa.BigInteger(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['room_id'], ['rooms.room_id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'room_id')
+    )
+    op.create_index(op.f('ix_pending_notifications_created_at'), 'pending_notifications', ['created_at'], unique=False)
+    op.create_table('notification_cursors',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('message_id', sa.BigInteger(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('notification_cursors')
+    op.drop_index(op.f('ix_pending_notifications_created_at'), table_name='pending_notifications')
+    op.drop_table('pending_notifications')
@@ -0,0 +1,4 @@
+import os
+
+# Snowflake ids need a worker id; benchmarks write from one process at a time.
+os.environ.setdefault("WORKER_ID", "0")
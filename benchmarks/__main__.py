@@ -0,0 +1,57 @@
+"""The benchmark suite: dataset, repository micro-benchmarks, notification fan-out and load scenarios.
+
+Writes one JSON result file per run; compare two runs with
+``python -m benchmarks.compare``. Uses ``BENCH_DATABASE_URL`` when it is
+set and reachable (see ``benchmarks.datagen``), otherwise SQLite.
+
+Run with ``python -m benchmarks [--scale small] [--only repository,notifications,load]
+[--duration 10] [--output FILE]``.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from . import bench_notifications, bench_repository, load
+from .datagen import SCALES, connect, generate
+from .results import Results
+
+SUITES = ("repository", "notifications", "load")
+
+
+async def main(args: argparse.Namespace) -> None:
+    suites = args.only.split(",") if args.only else SUITES
+    with tempfile.TemporaryDirectory() as directory:
+        engine, url = await connect(directory)
+        print(f"generating the {args.scale} dataset on {engine.dialect.name}")
+        dataset = await generate(engine, url, args.scale, args.seed)
+        results = Results(**dataset.environment())
+        maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+        if "repository" in suites:
+            await bench_repository.run(maker, dataset, results, args.rounds)
+        if "notifications" in suites:
+            await bench_notifications.run(maker, dataset, results, args.rounds)
+        await engine.dispose()
+        if "load" in suites:
+            await load.run(dataset, results, args.duration, args.users, args.clients, args.rate)
+
+    output = args.output or os.path.join("var", "bench", f"{results.environment['commit'][:12]}-{args.scale}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    results.write(output)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the benchmark suite.")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", help=f"comma-separated subset of {', '.join(SUITES)}")
+    parser.add_argument("--rounds", type=int, default=200, help="rounds per repository benchmark")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per load scenario")
+    parser.add_argument("--users", type=int, default=50, help="concurrent HTTP virtual users")
+    parser.add_argument("--clients", type=int, default=200, help="WebSocket clients")
+    parser.add_argument("--rate", type=float, default=100.0, help="messages sent per second")
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
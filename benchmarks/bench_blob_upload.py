@@ -0,0 +1,54 @@
+"""Blob store upload/download throughput for large files.
+
+Run with ``python -m benchmarks.bench_blob_upload [size_mib]``.
+"""
+import asyncio
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from src.chat.storage import LocalBlobStore
+
+CHUNK = 64 * 1024
+
+
+async def _stream(total: int):
+    # Distinct content per run so the upload is never deduplicated.
+    chunk = bytearray(time.time_ns().to_bytes(8, "little") * (CHUNK // 8))
+    sent = 0
+    while sent < total:
+        chunk[:8] = sent.to_bytes(8, "little")
+        yield bytes(chunk)
+        sent += CHUNK
+
+
+async def main(size_mib: int) -> None:
+    total = size_mib * 1024 * 1024
+    with tempfile.TemporaryDirectory() as root:
+        store = LocalBlobStore(root, chunk_size=CHUNK)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        blob = await store.write_stream(_stream(total))
+        upload = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        read = 0
+        async for chunk in store.read_range(blob.digest):
+            read += len(chunk)
+        download = time.perf_counter() - start
+
+        start = time.perf_counter()
+        duplicate = await store.write_stream(store.read_range(blob.digest))
+        dedup = time.perf_counter() - start
+
+    print(f"upload   {size_mib} MiB: {size_mib / upload:8.1f} MiB/s, peak traced memory {peak / 1024:.0f} KiB")
+    print(f"download {size_mib} MiB: {size_mib / download:8.1f} MiB/s")
+    print(f"re-upload of identical content: {size_mib / dedup:8.1f} MiB/s, created={duplicate.created}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 256))
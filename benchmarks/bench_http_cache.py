@@ -0,0 +1,67 @@
+"""Repeat fetches of a history page: full render vs. cached body vs. 304.
+
+Run with ``python -m benchmarks.bench_http_cache [page_size]``.
+"""
+import asyncio
+import sys
+import tempfile
+import time
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.core.database import Base, get_db
+from src.core.http_cache import ResponseCache, get_response_cache
+from src.main import app
+from src.models import Message, Room, RoomMember, User, UserSession
+
+
+async def _fetch(client, url, rounds, headers=None):
+    sent = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        response = await client.get(url, headers=headers)
+        sent += len(response.content)
+    return (time.perf_counter() - start) / rounds * 1000, sent / rounds
+
+
+async def main(page_size: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/bench.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+        async with maker() as session:
+            session.add_all([User(user_id=1, username="u", first_name="U", hashed_password="x"), Room(room_id=1, name="r")])
+            await session.flush()
+            session.add_all([UserSession(user_id=1, refresh_token="token"), RoomMember(user_id=1, room_id=1)])
+            session.add_all(Message(user_id=1, room_id=1, message="lorem ipsum dolor sit amet " * 4) for _ in range(page_size))
+            await session.commit()
+
+        async def override_db():
+            async with maker() as session:
+                yield session
+
+        cold, warm = ResponseCache(max_bytes=0), ResponseCache()
+        app.dependency_overrides[get_db] = override_db
+        transport = httpx.ASGITransport(app=app)
+        url = f"/rooms/1/messages?limit={page_size}"
+        async with httpx.AsyncClient(transport=transport, base_url="http://test",
+                                     headers={"Authorization": "Bearer token"}) as client:
+            app.dependency_overrides[get_response_cache] = lambda: cold
+            render_ms, render_bytes = await _fetch(client, url, 20)
+            app.dependency_overrides[get_response_cache] = lambda: warm
+            etag = (await client.get(url)).headers["etag"]
+            cached_ms, cached_bytes = await _fetch(client, url, 20)
+            revalidate_ms, revalidate_bytes = await _fetch(client, url, 20, {"If-None-Match": etag})
+        app.dependency_overrides.clear()
+        await engine.dispose()
+
+    print(f"history page of {page_size} messages:")
+    print(f"  render       {render_ms:7.2f} ms  {render_bytes:9,.0f} B")
+    print(f"  cached body  {cached_ms:7.2f} ms  {cached_bytes:9,.0f} B")
+    print(f"  304          {revalidate_ms:7.2f} ms  {revalidate_bytes:9,.0f} B")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
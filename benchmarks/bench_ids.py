@@ -0,0 +1,48 @@
+"""Snowflake id generation throughput.
+
+Run with ``python -m benchmarks.bench_ids [count]``.
+"""
+import sys
+import threading
+import time
+
+from src.core.ids import SnowflakeGenerator
+
+
+def main(count: int) -> None:
+    generator = SnowflakeGenerator(1)
+
+    start = time.perf_counter()
+    for _ in range(count):
+        generator.next_id()
+    elapsed = time.perf_counter() - start
+    print(f"next_id: {count / elapsed:,.0f} ids/s")
+
+    start = time.perf_counter()
+    for _ in range(count // 1000):
+        generator.next_ids(1000)
+    elapsed = time.perf_counter() - start
+    print(f"next_ids(1000): {count / elapsed:,.0f} ids/s")
+
+    threads = 8
+    seen: list[list[int]] = [[] for _ in range(threads)]
+
+    def worker(out: list[int]) -> None:
+        for _ in range(count // threads):
+            out.append(generator.next_id())
+
+    workers = [threading.Thread(target=worker, args=(out,)) for out in seen]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    ids = [i for out in seen for i in out]
+    assert len(set(ids)) == len(ids)
+    assert all(out == sorted(out) for out in seen)
+    print(f"{threads} threads: {len(ids) / elapsed:,.0f} ids/s, all unique")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,112 @@
+"""Notification fan-out to one room with every generated user as a member.
+
+At the ``large`` scale the room has 100k members. Each round posts one
+message to it and times the fan-out pass that turns it into pending
+notifications, with everybody offline and then with half of the members
+online; a final benchmark times digest delivery in batches.
+
+Run with ``python -m benchmarks.bench_notifications [scale] [rounds] [--output FILE]``.
+"""
+from datetime import timedelta
+import argparse
+import asyncio
+import tempfile
+import time
+
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.chat.repository import MessageRepository
+from src.core.broker import InMemoryBroker
+from src.core.clock import utcnow
+from src.models import Mention, Message, OutboxEvent, PendingNotification, Room, RoomMember
+from src.notifications.service import NotificationService
+from src.notifications.sinks import InMemorySink
+from src.presence.service import PresenceService
+
+from .datagen import BATCH_SIZE, Dataset, connect, generate
+from .results import Measurement, Results
+
+
+async def _broadcast_room(maker: async_sessionmaker[AsyncSession], dataset: Dataset) -> int:
+    room_id = dataset.scale.rooms + 1
+    async with maker() as session:
+        session.add(Room(room_id=room_id, name="everyone", is_private=False, last_seq=0))
+        await session.flush()
+        user_ids = range(1, dataset.scale.users + 1)
+        for start in range(0, len(user_ids), BATCH_SIZE):
+            await session.execute(insert(RoomMember), [
+                {"user_id": user_id, "room_id": room_id} for user_id in user_ids[start:start + BATCH_SIZE]
+            ])
+        await session.commit()
+    return room_id
+
+
+async def run(maker: async_sessionmaker[AsyncSession], dataset: Dataset, results: Results, rounds: int = 200) -> None:
+    rounds = max(rounds // 20, 3)
+    room_id = await _broadcast_room(maker, dataset)
+    members = dataset.scale.users
+    presence = PresenceService(InMemoryBroker())
+    now = utcnow()
+    sink = InMemorySink()
+    # Every pass sees the message it times as settled, and only that one.
+    service = NotificationService(maker, [sink], presence=presence, batch_size=1000, digest_window=0,
+                                  clock=lambda: now)
+    await service.fan_out_once()
+    print(f"notifications ({members} members):")
+
+    async def fan_out(name: str) -> None:
+        nonlocal now
+        samples = []
+        for i in range(rounds):
+            async with maker() as session:
+                await MessageRepository(session).append(user_id=1, room_id=room_id, message=f"@user2 broadcast {i}")
+            now = utcnow() + timedelta(seconds=service.settle + 1)
+            start = time.perf_counter()
+            await service.fan_out_once()
+            samples.append(time.perf_counter() - start)
+        results.add(name, Measurement.from_samples(samples, members=members, online=len(presence)))
+
+    await fan_out("notifications.fan_out")
+    for user_id in range(2, members + 1, 2):
+        presence.heartbeat(user_id)
+    await fan_out("notifications.fan_out_half_online")
+
+    presence = service.presence = PresenceService(InMemoryBroker())
+    samples = []
+    while True:
+        start = time.perf_counter()
+        if not await service.deliver_due():
+            break
+        samples.append(time.perf_counter() - start)
+    results.add("notifications.deliver_due", Measurement.from_samples(samples, digests=len(sink.digests),
+                                                                      batch_size=service.batch_size))
+
+    async with maker() as session:
+        await session.execute(delete(PendingNotification))
+        await session.execute(delete(Mention).where(Mention.room_id == room_id))
+        await session.execute(delete(Message).where(Message.room_id == room_id))
+        await session.execute(delete(RoomMember).where(RoomMember.room_id == room_id))
+        await session.execute(delete(Room).where(Room.room_id == room_id))
+        await session.execute(delete(OutboxEvent))
+        await session.commit()
+
+
+async def main(scale: str, rounds: int, output: str | None) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine, url = await connect(directory)
+        dataset = await generate(engine, url, scale)
+        results = Results(**dataset.environment())
+        await run(async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession), dataset, results, rounds)
+        await engine.dispose()
+    if output:
+        results.write(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Notification fan-out benchmarks.")
+    parser.add_argument("scale", nargs="?", default="small")
+    parser.add_argument("rounds", nargs="?", type=int, default=200)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    asyncio.run(main(args.scale, args.rounds, args.output))
@@ -0,0 +1,55 @@
+"""Presence service throughput and memory.
+
+Run with ``python -m benchmarks.bench_presence [users]``.
+"""
+import sys
+import time
+import tracemalloc
+
+from src.core.broker import InMemoryBroker
+from src.presence.service import PresenceService
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def main(users: int) -> None:
+    clock = Clock()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    presence = PresenceService(InMemoryBroker(), ttl=60.0, clock=clock)
+    for user_id in range(users):
+        presence.heartbeat(user_id)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"memory: {(after - before) / 2**20:.1f} MiB for {users} online users "
+          f"({(after - before) / users:.0f} B/user)")
+
+    rounds = 10
+    start = time.perf_counter()
+    for _ in range(rounds):
+        clock.now += 1.0
+        for user_id in range(users):
+            presence.heartbeat(user_id)
+    elapsed = time.perf_counter() - start
+    print(f"heartbeats: {users * rounds / elapsed:,.0f} updates/s")
+
+    start = time.perf_counter()
+    for user_id in range(users):
+        presence.typing(user_id % 1000, user_id)
+    elapsed = time.perf_counter() - start
+    print(f"typing: {users / elapsed:,.0f} events/s into 1000 rooms")
+
+    clock.now += 61.0
+    start = time.perf_counter()
+    expired = presence.expire()
+    print(f"expiry: {len(expired)} users in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,58 @@
+"""Rate limiter micro-benchmark.
+
+Run with ``python -m benchmarks.bench_ratelimit``.
+"""
+import asyncio
+import time
+import tracemalloc
+
+from src.core.ratelimit import InMemorySharedBackend, LocalRateLimitBackend, RateLimit
+
+POLICY = RateLimit("bench", limit=1_000_000, period=1.0)
+N = 1_000_000
+
+
+def bench_local_hot_key() -> float:
+    backend = LocalRateLimitBackend()
+    key = (POLICY.name, 42)
+    start = time.perf_counter()
+    for _ in range(N):
+        backend.check(key, POLICY)
+    return (time.perf_counter() - start) / N
+
+
+def bench_local_many_keys() -> tuple[float, int, int]:
+    backend = LocalRateLimitBackend(max_keys_per_shard=4096)
+    keys = [(POLICY.name, i) for i in range(N)]
+    start = time.perf_counter()
+    for key in keys:
+        backend.check(key, POLICY)
+    elapsed = (time.perf_counter() - start) / N
+
+    # Second pass under tracemalloc: memory must not grow with the key count.
+    tracemalloc.start()
+    for key in keys:
+        backend.check(key, POLICY)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, len(backend), peak
+
+
+async def bench_shared() -> float:
+    backend = InMemorySharedBackend()
+    n = N // 10
+    start = time.perf_counter()
+    for i in range(n):
+        await backend.hit((POLICY.name, i & 1023), POLICY)
+    return (time.perf_counter() - start) / n
+
+
+def main() -> None:
+    print(f"local, hot key:      {bench_local_hot_key() * 1e9:8.0f} ns/check")
+    per_check, keys, peak = bench_local_many_keys()
+    print(f"local, {N} keys: {per_check * 1e9:8.0f} ns/check, {keys} keys retained, peak {peak / 2**20:.1f} MiB")
+    print(f"shared stand-in:     {asyncio.run(bench_shared()) * 1e9:8.0f} ns/check")
+
+
+if __name__ == "__main__":
+    main()
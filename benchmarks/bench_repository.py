@@ -0,0 +1,177 @@
+"""Micro-benchmarks of every BaseRepository method, plus the message hot paths.
+
+Each operation runs in its own session, as a request handler would. Reads
+pick ids uniformly from the generated dataset; writes create, update and
+then delete their own rows, so the dataset is unchanged afterwards.
+
+Run with ``python -m benchmarks.bench_repository [scale] [rounds] [--output FILE]``.
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.chat.mentions import parse_mentions
+from src.chat.repository import MessageRepository
+from src.core.broker import InMemoryBroker
+from src.core.repository import BaseRepository
+from src.models import Mention, Message, RoomMember, User
+from src.outbox.relay import OutboxRelay
+
+from .datagen import Dataset, connect, generate
+from .results import Results
+
+
+async def run(maker: async_sessionmaker[AsyncSession], dataset: Dataset, results: Results, rounds: int = 200) -> None:
+    rng = random.Random(3)
+    users = dataset.scale.users
+    busiest = dataset.hot_rooms[:20]
+    async with maker() as session:
+        message_ids = list((await session.execute(
+            select(Message.message_id).order_by(Message.message_id).limit(100_000)
+        )).scalars())
+        replied = list((await session.execute(
+            select(Message.message_id).where(Message.reply_count > 0).order_by(Message.reply_count.desc()).limit(1000)
+        )).scalars())
+        replies = list((await session.execute(
+            select(Message.message_id).where(Message.reply_to.is_not(None)).limit(1000)
+        )).scalars())
+        mentioned = list((await session.execute(select(Mention.user_id).distinct().limit(1000))).scalars())
+
+    async def with_repository(model, call):
+        async with maker() as session:
+            return await call(BaseRepository(session, model))
+
+    print("repository:")
+    await results.measure("repository.get_by_id", lambda i: with_repository(
+        Message, lambda repo: repo.get_by_id(rng.choice(message_ids))), rounds)
+    await results.measure("repository.exists", lambda i: with_repository(
+        Message, lambda repo: repo.exists(rng.choice(message_ids))), rounds)
+    await results.measure("repository.get_by_field", lambda i: with_repository(
+        User, lambda repo: repo.get_by_field("username", f"user{rng.randint(1, users)}")), rounds)
+    await results.measure("repository.get_by_fields", lambda i: with_repository(
+        RoomMember, lambda repo: repo.get_by_fields(room_id=rng.choice(busiest))), rounds)
+    await results.measure("repository.get_all", lambda i: with_repository(
+        Message, lambda repo: repo.get_all(limit=100, offset=rng.randrange(len(message_ids)))), rounds)
+    await results.measure("repository.count", lambda i: with_repository(
+        Message, lambda repo: repo.count(room_id=rng.choice(busiest))), max(rounds // 10, 5))
+
+    async def stream_users(repo):
+        return sum([1 async for _ in repo.stream_all(batch_size=1000)])
+    await results.measure("repository.stream_all", lambda i: with_repository(User, stream_users), max(rounds // 50, 3))
+
+    # Writes: rows created here are updated and deleted again by the following benchmarks.
+    room_id, user_id = busiest[0], dataset.members[busiest[0]][0]
+    created: list[int] = []
+    models: list[Message] = []
+
+    async def create(repo):
+        created.append((await repo.create(user_id=user_id, room_id=room_id, message="benchmark")).message_id)
+
+    async def create_from_model(repo):
+        models.append(await repo.create_from_model(Message(user_id=user_id, room_id=room_id, message="benchmark")))
+
+    await results.measure("repository.create", lambda i: with_repository(Message, create), rounds, warmup=0)
+    await results.measure("repository.create_from_model", lambda i: with_repository(Message, create_from_model),
+                          rounds, warmup=0)
+    await results.measure("repository.update", lambda i: with_repository(
+        Message, lambda repo: repo.update(created[i], message="edited")), rounds, warmup=0)
+    await results.measure("repository.delete", lambda i: with_repository(
+        Message, lambda repo: repo.delete(created[i])), rounds, warmup=0)
+
+    async def delete_by_model(i):
+        async with maker() as session:
+            await BaseRepository(session, Message).delete_by_model(await session.merge(models[i], load=False))
+    await results.measure("repository.delete_by_model", delete_by_model, rounds, warmup=0)
+
+    print("messages:")
+
+    async def history(i):
+        async with maker() as session:
+            room = busiest[i % len(busiest)]
+            return await MessageRepository(session).get_history_rows(room, limit=50)
+    await results.measure("messages.get_history_rows", history, rounds)
+
+    async def after_seq(i):
+        async with maker() as session:
+            room = busiest[i % len(busiest)]
+            return await MessageRepository(session).get_after_seq(room, max(dataset.last_seq[room] - 50, 0), limit=100)
+    await results.measure("messages.get_after_seq", after_seq, rounds)
+
+    async def history_parents(i):
+        async with maker() as session:
+            repo = MessageRepository(session)
+            rows = await repo.get_history_rows(busiest[i % len(busiest)], limit=50)
+            return await repo.get_previews([row.reply_to for row in rows if row.reply_to is not None])
+    await results.measure("messages.get_history_rows+previews", history_parents, rounds)
+
+    if replied:
+        async def thread(i):
+            async with maker() as session:
+                return await MessageRepository(session).get_thread(replied[i % len(replied)])
+        await results.measure("messages.get_thread", thread, rounds)
+
+        async def ancestors(i):
+            async with maker() as session:
+                return await MessageRepository(session).get_ancestors(replies[i % len(replies)])
+        await results.measure("messages.get_ancestors", ancestors, rounds)
+
+    if mentioned:
+        async def mentions(i):
+            async with maker() as session:
+                return await MessageRepository(session).get_mentions(mentioned[i % len(mentioned)])
+        await results.measure("messages.get_mentions", mentions, rounds)
+
+    appended: list[int] = []
+    members = dataset.members[room_id]
+
+    async def append(i):
+        async with maker() as session:
+            appended.append((await MessageRepository(session).append(
+                user_id=user_id, room_id=room_id, message="benchmark")).message_id)
+    await results.measure("messages.append", append, rounds, warmup=0)
+
+    async def append_mentions(i):
+        text = f"@user{members[i % len(members)]} @user{members[(i + 1) % len(members)]} benchmark"
+        async with maker() as session:
+            appended.append((await MessageRepository(session).append(
+                user_id=user_id, room_id=room_id, message=text)).message_id)
+    await results.measure("messages.append_mentions", append_mentions, rounds, warmup=0)
+
+    # Parsing and resolution alone, with the username cache warmed up by the appends above.
+    async def resolve_mentions(i):
+        async with maker() as session:
+            text = f"@user{members[i % len(members)]} @user{members[(i + 1) % len(members)]} benchmark"
+            return await MessageRepository(session).resolve_usernames(parse_mentions(text))
+    await results.measure("messages.resolve_mentions", resolve_mentions, rounds)
+
+    # Relays the events written by the appends above, 10 per batch.
+    relay = OutboxRelay(maker, InMemoryBroker(), batch_size=10)
+    await results.measure("outbox.relay_once", lambda i: relay.relay_once(), max(rounds // 10, 1), warmup=0)
+    async with maker() as session:
+        await session.execute(delete(Mention).where(Mention.message_id.in_(appended)))
+        for message_id in appended:
+            await BaseRepository(session, Message).delete(message_id)
+
+
+async def main(scale: str, rounds: int, output: str | None) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine, url = await connect(directory)
+        dataset = await generate(engine, url, scale)
+        results = Results(**dataset.environment())
+        await run(async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession), dataset, results, rounds)
+        await engine.dispose()
+    if output:
+        results.write(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Repository micro-benchmarks.")
+    parser.add_argument("scale", nargs="?", default="small")
+    parser.add_argument("rounds", nargs="?", type=int, default=200)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    asyncio.run(main(args.scale, args.rounds, args.output))
@@ -0,0 +1,95 @@
+"""Edit history: storage per edit and reconstruction latency.
+
+Edits a 4096-character message many times with typical edits (typo
+fixes, appended sentences, a reworded phrase), then compares the stored
+revision rows with full copies and times rebuilding the oldest versions,
+the worst case, through ``MessageRepository.get_revisions``.
+
+Run with ``python -m benchmarks.bench_revisions [edits]``.
+"""
+import asyncio
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.chat.repository import MessageRepository
+from src.chat.revisions import SNAPSHOT_EVERY
+from src.core.database import Base
+from src.models import Message, MessageRevision, Room, User
+
+# A vocabulary of made-up words, about as varied as prose.
+WORDS = ["".join(random.Random(i).choices(string.ascii_lowercase, k=2 + i % 8)) for i in range(800)]
+LENGTH = 4096
+
+
+def _edit(text: str, rng: random.Random) -> str:
+    kind = rng.random()
+    if kind < 0.5:
+        # Typo fix: one word replaced.
+        at = rng.randrange(len(text) - 10)
+        return text[:at] + rng.choice(WORDS) + text[at + 5:]
+    if kind < 0.8:
+        # A sentence appended, the oldest one dropped to stay within the limit.
+        sentence = " ".join(rng.choices(WORDS, k=8)) + ". "
+        return (text + sentence)[-LENGTH:]
+    # A phrase reworded.
+    at = rng.randrange(len(text) - 200)
+    return text[:at] + " ".join(rng.choices(WORDS, k=20)) + text[at + 120:]
+
+
+async def main(edits: int) -> None:
+    rng = random.Random(1)
+    text = " ".join(rng.choices(WORDS, k=1000))[:LENGTH]
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/bench.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(User), [{"user_id": 1, "username": "u", "first_name": "U", "hashed_password": "x"}])
+            await conn.execute(insert(Room), [{"room_id": 1, "name": "r", "last_seq": 1}])
+            await conn.execute(insert(Message), [{"message_id": 1, "user_id": 1, "room_id": 1, "seq": 1,
+                                                  "message": text, "is_deleted": False}])
+        maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+        full = 0
+        start = time.perf_counter()
+        async with maker() as session:
+            repo = MessageRepository(session)
+            for _ in range(edits):
+                full += len(text.encode())
+                text = _edit(text, rng)
+                await repo.edit(1, 1, 1, text)
+        elapsed = time.perf_counter() - start
+        print(f"{edits} edits: {elapsed / edits * 1000:.2f} ms per edit")
+
+        async with maker() as session:
+            stored, snapshots = (await session.execute(
+                select(func.sum(func.length(MessageRevision.content)),
+                       func.count().filter(MessageRevision.is_snapshot))
+            )).one()
+        print(f"storage: {stored / edits:,.0f} bytes per edit against {full / edits:,.0f} for full copies "
+              f"({full / stored:.1f}x smaller), {snapshots} snapshots every {SNAPSHOT_EVERY} revisions")
+
+        async with maker() as session:
+            repo = MessageRepository(session)
+            message = await repo.get_by_id(1)
+            for label, before, limit in (("oldest version", 1, 1), ("page of 20 oldest", 20, 20),
+                                         ("page of 20 newest", edits, 20)):
+                timings = []
+                for _ in range(200):
+                    start = time.perf_counter()
+                    await repo.get_revisions(message, before, limit)
+                    timings.append(time.perf_counter() - start)
+                timings.sort()
+                print(f"{label}: median {statistics.median(timings) * 1000:.2f} ms, "
+                      f"p99 {timings[int(len(timings) * 0.99)] * 1000:.2f} ms")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,52 @@
+"""Cost of encoding message history to JSON.
+
+Compares FastAPI's default path (response model validation followed by
+``jsonable_encoder`` and ``json.dumps``) with the precompiled encoders.
+
+Run with ``python -m benchmarks.bench_serialization``.
+"""
+from datetime import datetime
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from src.chat.repository import MESSAGE_COLUMNS
+from src.chat.schemas import MESSAGE_LIST, MessageOut
+from src.core.serialization import RowEncoder
+from src.models import Message
+
+
+def _time(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main() -> None:
+    fields = [column.key for column in MESSAGE_COLUMNS]
+    row_encoder = RowEncoder(fields)
+    now = datetime(2025, 6, 1, 12, 0)
+    for count in (1_000, 10_000):
+        rows = [(i, 1, 1, None, i, "lorem ipsum dolor sit amet " * 4, False, now, now, 0, None) for i in range(count)]
+        messages = [Message(**dict(zip(fields, row))) for row in rows]
+        rounds = 20 if count == 1_000 else 5
+
+        def default():
+            models = [MessageOut.model_validate(m) for m in messages]
+            return json.dumps(jsonable_encoder(models)).encode()
+
+        results = {
+            "jsonable_encoder (ORM)": _time(default, rounds),
+            "Encoder (ORM)": _time(lambda: MESSAGE_LIST.encode(messages), rounds),
+            "RowEncoder.encode": _time(lambda: row_encoder.encode(rows), rounds),
+            "RowEncoder.encode_compact": _time(lambda: row_encoder.encode_compact(rows), rounds),
+        }
+        print(f"{count} messages:")
+        for name, ms in results.items():
+            print(f"  {name:<28} {ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Reconnect storm: many clients resync against a freshly started worker.
+
+Each client is in a few rooms and missed a handful of events; a few are far
+behind. The worker's sync logs start empty, as right after a deploy.
+
+Run with ``python -m benchmarks.bench_sync [clients]``.
+"""
+import asyncio
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.chat.framing import JSON
+from src.core.database import Base
+from src.chat.sync import SyncService
+from src.models import Message, Room, User
+
+ROOMS = 1000
+MESSAGES_PER_ROOM = 100
+ROOMS_PER_CLIENT = 5
+
+
+async def main(clients: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/bench.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(User), [{"user_id": 1, "username": "u", "first_name": "U", "hashed_password": "x"}])
+            await conn.execute(insert(Room), [{"room_id": r, "name": f"r{r}", "last_seq": MESSAGES_PER_ROOM}
+                                              for r in range(ROOMS)])
+            await conn.execute(insert(Message), [
+                {"message_id": r * MESSAGES_PER_ROOM + s, "user_id": 1, "room_id": r, "seq": s,
+                 "message": "lorem ipsum dolor sit amet", "is_deleted": False}
+                for r in range(ROOMS) for s in range(1, MESSAGES_PER_ROOM + 1)
+            ])
+        maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+        rng = random.Random(1)
+        requests = []
+        for _ in range(clients):
+            for room_id in rng.sample(range(ROOMS), ROOMS_PER_CLIENT):
+                far_behind = rng.random() < 0.02
+                missed = rng.randrange(40, 90) if far_behind else rng.randrange(0, 30)
+                requests.append((room_id, MESSAGES_PER_ROOM - missed))
+
+        for label in ("cold worker", "warm worker"):
+            if label == "cold worker":
+                sync = SyncService(maker, capacity=64, max_rooms=ROOMS, max_replay=500)
+            sync.metrics.__init__()
+            frames = 0
+            start = time.perf_counter()
+            for batch in range(0, len(requests), 1000):
+                replays = await asyncio.gather(*(sync.replay(room_id, after)
+                                                 for room_id, after in requests[batch:batch + 1000]))
+                for replay in replays:
+                    for encoded in replay.events:
+                        encoded.frame(JSON)
+                        frames += 1
+            elapsed = time.perf_counter() - start
+            metrics = sync.metrics
+            resyncs = len(requests)
+            print(f"{label}: {clients} clients, {resyncs} room resyncs, {frames} replayed events in {elapsed:.2f} s "
+                  f"({elapsed / clients * 1e6:.0f} us/client)")
+            print(f"  memory {metrics.memory / resyncs:.1%}, database {metrics.database / resyncs:.1%}, "
+                  f"resets {metrics.resets}, seed queries {metrics.seeds}")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000))
@@ -0,0 +1,83 @@
+"""Bytes on the wire and CPU per delivered chat event, by wire format.
+
+Broadcasts ``events`` messages to a room of ``recipients`` connections.
+Baselines encode per recipient: plain JSON, and JSON under protocol-level
+permessage-deflate (a compressor with context takeover per connection).
+The hub encodes every event once per codec.
+
+Run with ``python -m benchmarks.bench_ws_framing [recipients] [events]``.
+"""
+import asyncio
+import random
+import sys
+import time
+import zlib
+
+from pydantic_core import to_json
+
+from src.chat.framing import CODECS, SAMPLE_EVENT
+from src.chat.hub import Connection, ConnectionHub
+from src.core.broker import InMemoryBroker
+
+WORDS = "the a to you i it and that is of in we on for this can see lunch meeting later ok thanks".split()
+
+
+def _events(count: int) -> list[dict]:
+    rng = random.Random(1)
+    return [
+        {**SAMPLE_EVENT, "message_id": 1_000_000_000_000 + i, "user_id": rng.randrange(1, 500), "room_id": 42,
+         "message": " ".join(rng.choice(WORDS) for _ in range(rng.randrange(2, 15))),
+         "created_at": f"2025-06-01T12:{i // 60 % 60:02}:{i % 60:02}", "updated_at": f"2025-06-01T12:{i // 60 % 60:02}:{i % 60:02}"}
+        for i in range(count)
+    ]
+
+
+def _per_recipient(events, recipients: int, deflate: bool) -> tuple[float, float]:
+    compressors = [zlib.compressobj(6, zlib.DEFLATED, -15) for _ in range(recipients)] if deflate else None
+    sent = 0
+    start = time.perf_counter()
+    for event in events:
+        for i in range(recipients):
+            data = to_json(event)
+            if deflate:
+                data = compressors[i].compress(data) + compressors[i].flush(zlib.Z_SYNC_FLUSH)[:-4]
+            sent += len(data)
+    elapsed = time.perf_counter() - start
+    return elapsed, sent
+
+
+class _Sink:
+    async def send(self, frame):
+        pass
+
+
+async def _hub(events, recipients: int, subprotocol: str) -> tuple[float, float]:
+    hub = ConnectionHub(InMemoryBroker())
+    connections = [Connection(_Sink(), i, CODECS[subprotocol], max_queue=len(events) + 1) for i in range(recipients)]
+    for connection in connections:
+        hub.register(connection, [42])
+    start = time.perf_counter()
+    for event in events:
+        await hub.deliver(42, event)
+    elapsed = time.perf_counter() - start
+    return elapsed, hub.metrics.bytes
+
+
+async def main(recipients: int, count: int) -> None:
+    events = _events(count)
+    delivered = recipients * count
+    results = {
+        "json per recipient": _per_recipient(events, recipients, deflate=False),
+        "permessage-deflate per recipient": _per_recipient(events, recipients, deflate=True),
+    }
+    for subprotocol in CODECS:
+        results[f"hub {subprotocol}"] = await _hub(events, recipients, subprotocol)
+    print(f"{count} events to {recipients} recipients:")
+    for name, (elapsed, sent) in results.items():
+        print(f"  {name:<36} {elapsed / delivered * 1e6:6.2f} us/delivery  {sent / delivered:6.1f} B/frame")
+
+
+if __name__ == "__main__":
+    recipients = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    asyncio.run(main(recipients, count))
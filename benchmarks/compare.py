@@ -0,0 +1,84 @@
+"""Compare two benchmark result files and flag regressions.
+
+A benchmark regresses when its median latency grows, or its throughput
+drops, by more than the threshold. Results from different databases or
+dataset scales are not comparable and are reported as such.
+
+Run with ``python -m benchmarks.compare BASE.json HEAD.json [--threshold 0.1]``;
+exits with status 1 if anything regressed.
+"""
+from dataclasses import dataclass
+from typing import Any, Optional
+import argparse
+import sys
+
+from .results import load
+
+# Environment keys that must match for numbers to be comparable.
+COMPARABLE = ("database", "scale")
+
+
+@dataclass(frozen=True)
+class Change:
+    name: str
+    base_p50_ms: float
+    head_p50_ms: float
+    base_ops: float
+    head_ops: float
+    regressed: bool
+
+    @property
+    def latency_ratio(self) -> float:
+        return self.head_p50_ms / self.base_p50_ms if self.base_p50_ms else 1.0
+
+    @property
+    def throughput_ratio(self) -> float:
+        return self.head_ops / self.base_ops if self.base_ops else 1.0
+
+
+def mismatch(base: dict[str, Any], head: dict[str, Any]) -> Optional[str]:
+    for key in COMPARABLE:
+        if base["environment"].get(key) != head["environment"].get(key):
+            return f"{key} differs: {base['environment'].get(key)} vs {head['environment'].get(key)}"
+    return None
+
+
+def compare(base: dict[str, Any], head: dict[str, Any], threshold: float = 0.1) -> list[Change]:
+    """Changes of the benchmarks present in both result sets, in the order of ``head``."""
+    changes = []
+    for name, after in head["results"].items():
+        before = base["results"].get(name)
+        if before is None or not before["count"] or not after["count"]:
+            continue
+        slower = before["p50_ms"] and after["p50_ms"] / before["p50_ms"] > 1 + threshold
+        fewer = before["ops_per_sec"] and after["ops_per_sec"] / before["ops_per_sec"] < 1 - threshold
+        changes.append(Change(name, before["p50_ms"], after["p50_ms"], before["ops_per_sec"], after["ops_per_sec"],
+                              regressed=bool(slower or fewer)))
+    return changes
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed relative change (default 0.1)")
+    args = parser.parse_args(argv)
+
+    base, head = load(args.base), load(args.head)
+    print(f"base {base['environment']['commit'][:12]}  head {head['environment']['commit'][:12]}")
+    problem = mismatch(base, head)
+    if problem is not None:
+        print(f"results are not comparable: {problem}")
+        return 2
+    changes = compare(base, head, args.threshold)
+    for change in changes:
+        flag = "REGRESSED" if change.regressed else ""
+        print(f"  {change.name:<40} p50 {change.base_p50_ms:9.3f} -> {change.head_p50_ms:9.3f} ms "
+              f"({change.latency_ratio - 1:+6.1%})  ops/s {change.throughput_ratio - 1:+6.1%}  {flag}")
+    regressions = [change for change in changes if change.regressed]
+    print(f"{len(regressions)} of {len(changes)} benchmarks regressed by more than {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""Repeatable benchmark datasets: users, rooms, memberships and messages.
+
+The same scale and seed always produce the same rows, so runs on different
+commits measure the same data. Room traffic is skewed like real chats: a
+few rooms hold most of the messages. Message ids are snowflakes consistent
+with ``created_at``, spread over ``HISTORY_DAYS``. About one message in
+ten mentions a member of its room.
+
+Rows go to ``BENCH_DATABASE_URL`` (e.g. a throwaway Postgres database; its
+tables are dropped and recreated) when it is set and reachable, otherwise
+to a SQLite file.
+
+Run with ``python -m benchmarks.datagen [scale] [directory]`` to keep a
+dataset on disk, e.g. for ``benchmarks.load --database``.
+"""
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Any, Optional
+import asyncio
+import os
+import random
+import sys
+import time
+
+from sqlalchemy import bindparam, func, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.core.database import Base
+from src.core.ids import EPOCH_MS, MAX_WORKER_ID, SnowflakeGenerator
+from src.models import Mention, Message, Room, RoomMember, User, UserSession
+
+BATCH_SIZE = 10_000
+HISTORY_DAYS = 90
+MENTION_RATE = 0.1
+HISTORY_START = datetime(2025, 3, 1)
+WORDS = ("hello", "ok", "thanks", "see", "you", "tomorrow", "meeting", "lunch", "the", "a", "deploy", "bug",
+         "fixed", "review", "please", "lol", "yes", "no", "maybe", "coffee", "link", "doc", "later", "great")
+
+
+@dataclass(frozen=True)
+class Scale:
+    users: int
+    rooms: int
+    messages: int
+    members_per_room: int
+
+
+SCALES = {
+    "tiny": Scale(users=100, rooms=10, messages=2_000, members_per_room=20),
+    "small": Scale(users=2_000, rooms=200, messages=100_000, members_per_room=50),
+    "medium": Scale(users=20_000, rooms=2_000, messages=1_000_000, members_per_room=100),
+    "large": Scale(users=100_000, rooms=10_000, messages=5_000_000, members_per_room=200),
+}
+
+
+@dataclass
+class Dataset:
+    """What was generated; enough for benchmarks to pick valid ids and tokens."""
+    name: str
+    scale: Scale
+    seed: int
+    database: str
+    url: str
+    members: dict[int, list[int]]
+    last_seq: dict[int, int]
+    max_message_id: int
+
+    @property
+    def hot_rooms(self) -> list[int]:
+        """Rooms by number of messages, busiest first."""
+        return sorted(self.last_seq, key=self.last_seq.get, reverse=True)
+
+    def environment(self) -> dict[str, Any]:
+        return {"database": self.database, "scale": self.name, "seed": self.seed, **asdict(self.scale)}
+
+
+def token_for(user_id: int) -> str:
+    """Session token of a generated user, usable as a bearer token."""
+    return f"bench-{user_id}"
+
+
+def sqlite_url(directory: str) -> str:
+    return f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.db')}"
+
+
+async def connect(directory: str) -> tuple[AsyncEngine, str]:
+    """Engine on ``BENCH_DATABASE_URL`` if it answers, else on a SQLite file in ``directory``."""
+    url = os.environ.get("BENCH_DATABASE_URL")
+    if url:
+        engine = create_async_engine(url)
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            return engine, url
+        except Exception as e:
+            print(f"BENCH_DATABASE_URL is not reachable ({type(e).__name__}: {e}); using SQLite")
+            await engine.dispose()
+    url = sqlite_url(directory)
+    return create_async_engine(url), url
+
+
+async def _insert(engine: AsyncEngine, table: Any, rows: list[dict[str, Any]]) -> None:
+    for start in range(0, len(rows), BATCH_SIZE):
+        async with engine.begin() as conn:
+            await conn.execute(insert(table), rows[start:start + BATCH_SIZE])
+
+
+async def generate(engine: AsyncEngine, url: str, name: str = "small", seed: int = 1) -> Dataset:
+    """Recreate the schema and fill it with the ``name`` scale."""
+    scale = SCALES[name]
+    rng = random.Random(seed)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    user_ids = range(1, scale.users + 1)
+    await _insert(engine, User, [
+        {"user_id": user_id, "username": f"user{user_id}", "first_name": f"User {user_id}",
+         "email": f"user{user_id}@bench.local", "hashed_password": "x"}
+        for user_id in user_ids
+    ])
+    await _insert(engine, UserSession, [
+        {"user_id": user_id, "refresh_token": token_for(user_id), "is_active": True} for user_id in user_ids
+    ])
+    room_ids = list(range(1, scale.rooms + 1))
+    await _insert(engine, Room, [
+        {"room_id": room_id, "name": f"room {room_id}", "is_private": rng.random() < 0.2, "last_seq": 0}
+        for room_id in room_ids
+    ])
+    members = {room_id: rng.sample(user_ids, min(scale.members_per_room, scale.users)) for room_id in room_ids}
+    await _insert(engine, RoomMember, [
+        {"user_id": user_id, "room_id": room_id} for room_id, users in members.items() for user_id in users
+    ])
+
+    # Zipf-like popularity: the busiest room gets about as much traffic as the next few combined.
+    weights = list(accumulate(1 / (rank + 1) ** 0.8 for rank in range(scale.rooms)))
+    step = timedelta(days=HISTORY_DAYS) / max(scale.messages, 1)
+    now_ms = 0
+    ids = SnowflakeGenerator(MAX_WORKER_ID, clock=lambda: now_ms)
+    last_seq = dict.fromkeys(room_ids, 0)
+    last_message: dict[int, int] = {}
+    replies: dict[int, tuple[int, datetime]] = {}
+    # Separate stream, so that adding mentions did not change the rest of the data.
+    mention_rng = random.Random(seed + 1)
+    mentions: list[dict[str, Any]] = []
+    message_id = 0
+    for start in range(0, scale.messages, BATCH_SIZE):
+        count = min(BATCH_SIZE, scale.messages - start)
+        rows = []
+        for offset, room_id in enumerate(rng.choices(room_ids, cum_weights=weights, k=count)):
+            created_at = HISTORY_START + step * (start + offset)
+            now_ms = EPOCH_MS + int((created_at - datetime(2025, 1, 1)).total_seconds() * 1000)
+            message_id = ids.next_id()
+            last_seq[room_id] += 1
+            reply_to = last_message.get(room_id) if rng.random() < 0.05 else None
+            if reply_to is not None:
+                replies[reply_to] = (replies.get(reply_to, (0, created_at))[0] + 1, created_at)
+            author = rng.choice(members[room_id])
+            body = " ".join(rng.choices(WORDS, k=rng.randint(2, 30)))
+            if mention_rng.random() < MENTION_RATE:
+                mentioned = mention_rng.choice(members[room_id])
+                body = f"@user{mentioned} {body}"
+                if mentioned != author:
+                    mentions.append({"user_id": mentioned, "message_id": message_id, "room_id": room_id})
+            rows.append({
+                "message_id": message_id, "user_id": author, "room_id": room_id,
+                "reply_to": reply_to, "seq": last_seq[room_id], "is_deleted": False,
+                "message": body, "created_at": created_at, "updated_at": created_at,
+            })
+            last_message[room_id] = message_id
+        async with engine.begin() as conn:
+            await conn.execute(insert(Message), rows)
+
+    await _insert(engine, Mention, mentions)
+    async with engine.begin() as conn:
+        await conn.execute(
+            update(Room).where(Room.room_id == bindparam("id")).values(last_seq=bindparam("seq")),
+            [{"id": room_id, "seq": seq} for room_id, seq in last_seq.items()],
+        )
+        if replies:
+            await conn.execute(
+                update(Message).where(Message.message_id == bindparam("id"))
+                .values(reply_count=bindparam("count"), last_reply_at=bindparam("at")),
+                [{"id": message_id, "count": count, "at": at} for message_id, (count, at) in replies.items()],
+            )
+        await conn.execute(text("ANALYZE"))
+    return Dataset(name, scale, seed, engine.dialect.name, url, members, last_seq, message_id)
+
+
+async def describe(engine: AsyncEngine, url: str, name: str, seed: int = 1) -> Dataset:
+    """Dataset of an existing database generated with ``name`` and ``seed``."""
+    async with engine.connect() as conn:
+        last_seq = dict((await conn.execute(select(Room.room_id, Room.last_seq))).all())
+        members: dict[int, list[int]] = {}
+        for user_id, room_id in await conn.execute(select(RoomMember.user_id, RoomMember.room_id)):
+            members.setdefault(room_id, []).append(user_id)
+        max_message_id = (await conn.execute(select(func.max(Message.message_id)))).scalar() or 0
+    return Dataset(name, SCALES[name], seed, engine.dialect.name, url, members, last_seq, max_message_id)
+
+
+async def main(name: str, directory: Optional[str]) -> None:
+    directory = directory or "var/bench"
+    os.makedirs(directory, exist_ok=True)
+    engine, url = await connect(directory)
+    start = time.perf_counter()
+    dataset = await generate(engine, url, name)
+    await engine.dispose()
+    print(f"{name} dataset on {dataset.database} in {time.perf_counter() - start:.1f} s: {url}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else "small", sys.argv[2] if len(sys.argv) > 2 else None))
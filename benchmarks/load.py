@@ -0,0 +1,235 @@
+"""HTTP and WebSocket load scenarios against a local server.
+
+Starts ``src.server`` in a subprocess on the generated dataset (or targets
+an already running server with ``--url``) and drives it with concurrent
+virtual users for a fixed duration per scenario:
+
+- ``http.history``: first pages of room history from members.
+- ``http.history_304``: the same pages revalidated with ``If-None-Match``.
+- ``http.room``: room metadata.
+- ``ws.connect``: WebSocket handshake and authentication.
+- ``ws.fanout``: senders post to the busiest rooms while every member
+  listens; latency is from send to delivery on each receiver.
+
+Send rate limits are lifted on the spawned server so that they do not cap
+the load. Run with ``python -m benchmarks.load [--scale small] [--duration 10]
+[--users 50] [--clients 200] [--output FILE]``.
+"""
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import websockets
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from .datagen import Dataset, connect, describe, generate, token_for
+from .results import Measurement, Results
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def local_server(database_url: str, startup_timeout: float = 30.0) -> AsyncIterator[str]:
+    """Run the app in a subprocess on ``database_url``; yields its base URL."""
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "RATE_LIMIT_SEND_PER_USER": "1000000000",
+        "RATE_LIMIT_SEND_PER_ROOM": "1000000000",
+        "DRAIN_RECONNECT_WINDOW": "0",
+        "DRAIN_TIMEOUT": "5",
+    }
+    log = tempfile.TemporaryFile()
+    process = subprocess.Popen([sys.executable, "-m", "src.server", "--host", "127.0.0.1", "--port", str(port)],
+                               env=env, stdout=subprocess.DEVNULL, stderr=log)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + startup_timeout
+        async with httpx.AsyncClient() as client:
+            while True:
+                if process.poll() is not None:
+                    log.seek(0)
+                    raise RuntimeError(f"server exited: {log.read().decode()[-2000:]}")
+                try:
+                    if (await client.get(f"{url}/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError("server did not become healthy")
+                await asyncio.sleep(0.1)
+        yield url
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+
+
+async def _virtual_users(users: int, duration: float, request) -> tuple[list[float], float, int]:
+    """Run ``request(rng)`` in ``users`` concurrent loops; returns latencies, elapsed time and errors."""
+    samples: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def user(n: int) -> None:
+        nonlocal errors
+        rng = random.Random(n)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                ok = await request(rng)
+            except (httpx.HTTPError, OSError):
+                ok = False
+            if ok:
+                samples.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(n) for n in range(users)))
+    return samples, time.perf_counter() - start, errors
+
+
+def _memberships(dataset: Dataset, rooms: int = 50) -> list[tuple[int, int]]:
+    return [(room_id, user_id) for room_id in dataset.hot_rooms[:rooms] for user_id in dataset.members[room_id]]
+
+
+async def http_scenarios(url: str, dataset: Dataset, results: Results, users: int, duration: float) -> None:
+    pairs = _memberships(dataset)
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        async def history(rng):
+            room_id, user_id = rng.choice(pairs)
+            response = await client.get(f"/rooms/{room_id}/messages", params={"limit": 50},
+                                        headers={"Authorization": f"Bearer {token_for(user_id)}"})
+            return response.status_code == 200
+
+        etags: dict[int, str] = {}
+        for room_id, user_id in pairs:
+            if room_id not in etags:
+                response = await client.get(f"/rooms/{room_id}/messages", params={"limit": 50},
+                                            headers={"Authorization": f"Bearer {token_for(user_id)}"})
+                etags[room_id] = response.headers["etag"]
+
+        async def revalidate(rng):
+            room_id, user_id = rng.choice(pairs)
+            response = await client.get(f"/rooms/{room_id}/messages", params={"limit": 50},
+                                        headers={"Authorization": f"Bearer {token_for(user_id)}",
+                                                 "If-None-Match": etags[room_id]})
+            return response.status_code == 304
+
+        async def room(rng):
+            room_id, user_id = rng.choice(pairs)
+            response = await client.get(f"/rooms/{room_id}", headers={"Authorization": f"Bearer {token_for(user_id)}"})
+            return response.status_code == 200
+
+        print(f"http ({users} virtual users, {duration:.0f} s each):")
+        for name, request in (("http.history", history), ("http.history_304", revalidate), ("http.room", room)):
+            samples, elapsed, errors = await _virtual_users(users, duration, request)
+            results.add(name, Measurement.from_samples(samples, elapsed, errors=errors, users=users))
+
+
+def _ws_url(url: str, user_id: int) -> str:
+    return f"{url.replace('http', 'ws', 1)}/ws?token={token_for(user_id)}"
+
+
+async def ws_scenarios(url: str, dataset: Dataset, results: Results, clients: int, rate: float,
+                       duration: float) -> None:
+    listeners = list(dict.fromkeys(user_id for _, user_id in _memberships(dataset, rooms=5)))[:clients]
+    print(f"websocket ({len(listeners)} clients, {rate:.0f} messages/s for {duration:.0f} s):")
+
+    connect_samples: list[float] = []
+    sockets = []
+    for user_id in listeners:
+        start = time.perf_counter()
+        sockets.append(await websockets.connect(_ws_url(url, user_id), max_queue=None))
+        connect_samples.append(time.perf_counter() - start)
+    results.add("ws.connect", Measurement.from_samples(connect_samples))
+
+    latencies: list[float] = []
+    errors = 0
+
+    async def listen(sock) -> None:
+        nonlocal errors
+        async for frame in sock:
+            event = json.loads(frame)
+            if event.get("type") == "message" and event["message"].startswith("bench:"):
+                latencies.append(time.perf_counter() - float(event["message"][6:]))
+            elif event.get("type") == "error":
+                errors += 1
+
+    readers = [asyncio.create_task(listen(sock)) for sock in sockets]
+    senders = [(sock, [room_id for room_id in dataset.hot_rooms[:5] if user_id in dataset.members[room_id]])
+               for sock, user_id in zip(sockets, listeners)]
+    rng = random.Random(4)
+    sent = 0
+    start = time.perf_counter()
+    while (now := time.perf_counter()) - start < duration:
+        sock, rooms = rng.choice(senders)
+        await sock.send(json.dumps({"type": "send", "room_id": rng.choice(rooms), "message": f"bench:{now!r}"}))
+        sent += 1
+        await asyncio.sleep(max(0.0, start + sent / rate - time.perf_counter()))
+    await asyncio.sleep(1.0)
+    elapsed = time.perf_counter() - start
+    for sock in sockets:
+        await sock.close()
+    await asyncio.gather(*readers, return_exceptions=True)
+    results.add("ws.fanout", Measurement.from_samples(latencies, elapsed, sent=sent, errors=errors,
+                                                      clients=len(sockets)))
+
+
+async def run(dataset: Dataset, results: Results, duration: float = 10.0, users: int = 50, clients: int = 200,
+              rate: float = 100.0, url: Optional[str] = None) -> None:
+    if url is None:
+        async with local_server(dataset.url) as url:
+            await run(dataset, results, duration, users, clients, rate, url)
+        return
+    await http_scenarios(url, dataset, results, users, duration)
+    await ws_scenarios(url, dataset, results, clients, rate, duration)
+
+
+async def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        if args.database:
+            engine, url = create_async_engine(args.database), args.database
+            dataset = await describe(engine, url, args.scale)
+        else:
+            engine, url = await connect(directory)
+            dataset = await generate(engine, url, args.scale)
+        await engine.dispose()
+        results = Results(**dataset.environment())
+        await run(dataset, results, args.duration, args.users, args.clients, args.rate, args.url)
+    if args.output:
+        results.write(args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP and WebSocket load scenarios.")
+    parser.add_argument("--scale", default="small")
+    parser.add_argument("--database", help="existing dataset generated with --scale, instead of a fresh one")
+    parser.add_argument("--url", help="running server on --database, instead of a spawned one")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--users", type=int, default=50, help="concurrent HTTP virtual users")
+    parser.add_argument("--clients", type=int, default=200, help="WebSocket clients")
+    parser.add_argument("--rate", type=float, default=100.0, help="messages sent per second")
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
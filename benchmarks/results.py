@@ -0,0 +1,104 @@
+"""Benchmark results as JSON, comparable across commits.
+
+Every measurement keeps its latency distribution and throughput; the file
+also records the commit, interpreter, database and dataset it came from,
+so ``benchmarks.compare`` only compares like with like.
+"""
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Optional
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+@dataclass
+class Measurement:
+    """Latencies in milliseconds and throughput of one benchmark."""
+    count: int
+    ops_per_sec: float
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    extra: dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_samples(cls, samples: list[float], elapsed: Optional[float] = None, **extra: Any) -> "Measurement":
+        """Summarize per-operation durations in seconds; ``elapsed`` is the wall time when they overlapped."""
+        if not samples:
+            return cls(0, 0.0, 0.0, 0.0, 0.0, 0.0, extra)
+        ordered = sorted(sample * 1000 for sample in samples)
+        elapsed = elapsed if elapsed is not None else sum(samples)
+        return cls(
+            count=len(ordered),
+            ops_per_sec=len(ordered) / elapsed if elapsed > 0 else 0.0,
+            mean_ms=statistics.fmean(ordered),
+            p50_ms=_percentile(ordered, 0.50),
+            p95_ms=_percentile(ordered, 0.95),
+            p99_ms=_percentile(ordered, 0.99),
+            extra=extra,
+        )
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+class Results:
+    def __init__(self, **environment: Any):
+        self.environment = {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            **environment,
+        }
+        self.measurements: dict[str, Measurement] = {}
+
+    def add(self, name: str, measurement: Measurement) -> Measurement:
+        self.measurements[name] = measurement
+        print(f"  {name:<40} {measurement.p50_ms:9.3f} ms p50 {measurement.p99_ms:9.3f} ms p99 "
+              f"{measurement.ops_per_sec:10,.0f} ops/s")
+        return measurement
+
+    async def measure(self, name: str, operation: Callable[[int], Awaitable[Any]], rounds: int,
+                      warmup: int = 3) -> Measurement:
+        """Run ``operation(i)`` sequentially and record each call's duration."""
+        for i in range(min(warmup, rounds)):
+            await operation(i)
+        samples = []
+        for i in range(rounds):
+            start = time.perf_counter()
+            await operation(i)
+            samples.append(time.perf_counter() - start)
+        return self.add(name, Measurement.from_samples(samples))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "environment": self.environment,
+            "results": {name: asdict(measurement) for name, measurement in self.measurements.items()},
+        }
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2, sort_keys=True)
+            file.write("\n")
+
+
+def load(path: str) -> dict[str, Any]:
+    with open(path) as file:
+        return json.load(file)
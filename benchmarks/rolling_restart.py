@@ -0,0 +1,286 @@
+"""Rolling restart of two gateway workers under load.
+
+Two app instances share one broker and one SQLite database, as two uvicorn
+workers share the broker and Postgres in production. Clients hold a socket
+to either worker, reconnect through a "load balancer" that skips draining
+workers, and resync with the last ``seq`` of each room. While messages keep
+flowing, each worker in turn is drained, stopped and started again.
+
+For a graceful drain (reconnect hints spread over the window) and for an
+abrupt restart (window 0, what plain uvicorn does), it reports messages
+that never reached a client either live or by resync, peak reconnects per
+100 ms, and how many resyncs needed the database.
+
+Run with ``python -m benchmarks.rolling_restart [clients] [window]``.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+_directory = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_directory}/restart.db"
+os.environ["RATE_LIMIT_SEND_PER_USER"] = "1000000"
+os.environ["RATE_LIMIT_SEND_PER_ROOM"] = "1000000"
+
+import asyncio
+import random
+import time
+from collections import Counter
+from contextlib import AsyncExitStack
+
+from sqlalchemy import insert, select
+
+from src.chat.framing import JSON
+from src.core.database import Base, get_async_engine, get_async_session_maker
+from src.core.settings import settings
+from src.main import create_app
+from src.models import Room, RoomMember, User, UserSession
+
+ROOMS = 20
+ROOMS_PER_CLIENT = 3
+SEND_RATE = 200  # messages per second
+
+
+class Worker:
+    """One app instance with its lifespan running."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.app = None
+        self.hubs = []
+        self._stack = None
+
+    @property
+    def available(self) -> bool:
+        return self.app is not None and not self.app.state.draining
+
+    async def start(self) -> None:
+        self.app = create_app()
+        self._stack = AsyncExitStack()
+        await self._stack.enter_async_context(self.app.router.lifespan_context(self.app))
+        self.hubs.append(self.app.state.chat_hub)
+
+    async def stop(self) -> None:
+        # Lifespan shutdown drains first; the app stays reachable until it is done.
+        await self._stack.aclose()
+        self.app = None
+
+
+class Socket:
+    """A WebSocket to an app instance, driven in this event loop."""
+
+    def __init__(self, app, token: str):
+        path = "/ws"
+        scope = {
+            "type": "websocket", "path": path, "raw_path": path.encode(), "query_string": f"token={token}".encode(),
+            "headers": [], "subprotocols": [], "scheme": "ws", "server": ("bench", 80), "client": ("127.0.0.1", 1),
+        }
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        self.outgoing: asyncio.Queue = asyncio.Queue()
+        self.task = asyncio.create_task(app(scope, self.incoming.get, self.outgoing.put))
+
+    async def connect(self) -> bool:
+        await self.incoming.put({"type": "websocket.connect"})
+        return (await self.outgoing.get())["type"] == "websocket.accept"
+
+    def send(self, event: dict) -> None:
+        self.incoming.put_nowait({"type": "websocket.receive", "text": JSON.encode(event).decode()})
+
+    async def close(self) -> None:
+        await self.incoming.put({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.gather(self.task, return_exceptions=True)
+
+
+class Stats:
+    def __init__(self):
+        self.connects: list[float] = []
+        self.refused = 0
+        self.resets = 0
+        self.duplicates = 0
+
+
+class Client:
+    def __init__(self, user_id: int, rooms: list[int], last_seqs: dict[int, int]):
+        self.user_id = user_id
+        self.token = f"token-{user_id}"
+        self.rooms = rooms
+        self.last = {room_id: last_seqs[room_id] for room_id in rooms}
+        self.seen: dict[int, set[int]] = {room_id: set() for room_id in rooms}
+        self.socket = None
+        self.synced = asyncio.Event()
+
+    async def run(self, balancer, stats: Stats) -> None:
+        while True:
+            worker = balancer()
+            if worker is None:
+                await asyncio.sleep(0.05)
+                continue
+            socket = Socket(worker.app, self.token)
+            if not await socket.connect():
+                stats.refused += 1
+                await socket.close()
+                await asyncio.sleep(0.05)
+                continue
+            stats.connects.append(time.monotonic())
+            self.socket = socket
+            socket.send({"type": "sync", "rooms": self.last})
+            pending_sync = len(self.rooms)
+            after = 0.0
+            while True:
+                frame = await socket.outgoing.get()
+                if frame["type"] == "websocket.close":
+                    break
+                event = JSON.decode(frame["text"].encode())
+                if event["type"] == "message":
+                    room_seen = self.seen[event["room_id"]]
+                    if event["seq"] in room_seen:
+                        stats.duplicates += 1
+                    room_seen.add(event["seq"])
+                    # Resume after the last seq with no gap before it: live events
+                    # may arrive out of order.
+                    last = self.last[event["room_id"]]
+                    while last + 1 in room_seen:
+                        last += 1
+                    self.last[event["room_id"]] = last
+                elif event["type"] in ("synced", "sync_reset"):
+                    stats.resets += event["type"] == "sync_reset"
+                    pending_sync -= 1
+                    if not pending_sync:
+                        self.synced.set()
+                elif event["type"] == "reconnect":
+                    after = event["after"]
+            self.socket = None
+            self.synced.clear()
+            await socket.close()
+            await asyncio.sleep(after)
+
+
+async def setup(clients: int) -> None:
+    engine = get_async_engine()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [
+            {"user_id": user_id, "username": f"user{user_id}", "first_name": "U", "hashed_password": "x"}
+            for user_id in range(1, clients + 1)
+        ])
+        await conn.execute(insert(UserSession), [
+            {"user_id": user_id, "refresh_token": f"token-{user_id}"} for user_id in range(1, clients + 1)
+        ])
+        await conn.execute(insert(Room), [
+            {"room_id": room_id, "name": f"room{room_id}"} for room_id in range(1, ROOMS + 1)
+        ])
+        rng = random.Random(1)
+        await conn.execute(insert(RoomMember), [
+            {"user_id": user_id, "room_id": room_id}
+            for user_id in range(1, clients + 1) for room_id in rng.sample(range(1, ROOMS + 1), ROOMS_PER_CLIENT)
+        ])
+
+
+async def room_seqs() -> dict[int, int]:
+    async with get_async_session_maker()() as db:
+        return dict((await db.execute(select(Room.room_id, Room.last_seq))).all())
+
+
+async def memberships() -> dict[int, list[int]]:
+    async with get_async_session_maker()() as db:
+        rows = (await db.execute(select(RoomMember.user_id, RoomMember.room_id))).all()
+    rooms: dict[int, list[int]] = {}
+    for user_id, room_id in rows:
+        rooms.setdefault(user_id, []).append(room_id)
+    return rooms
+
+
+async def produce(clients: list[Client], stop: asyncio.Event, sent: Counter) -> None:
+    rng = random.Random(2)
+    while not stop.is_set():
+        client = rng.choice(clients)
+        if client.socket is None:
+            sent["skipped"] += 1
+        else:
+            client.socket.send({"type": "send", "room_id": rng.choice(client.rooms), "message": "hello"})
+            sent["sent"] += 1
+        await asyncio.sleep(1 / SEND_RATE)
+
+
+async def rolling_restart(label: str, window: float, rooms_of: dict[int, list[int]]) -> None:
+    settings.DRAIN_RECONNECT_WINDOW = window
+    workers = [Worker("a"), Worker("b")]
+    for worker in workers:
+        await worker.start()
+    turn = iter(range(sys.maxsize))
+
+    def balancer():
+        available = [worker for worker in workers if worker.available]
+        return available[next(turn) % len(available)] if available else None
+
+    baseline = await room_seqs()
+    clients = [Client(user_id, rooms, baseline) for user_id, rooms in rooms_of.items()]
+    stats, sent = Stats(), Counter()
+    stop_producer = asyncio.Event()
+    tasks = [asyncio.create_task(client.run(balancer, stats)) for client in clients]
+    await asyncio.wait_for(asyncio.gather(*(client.synced.wait() for client in clients)), 60)
+    producer = asyncio.create_task(produce(clients, stop_producer, sent))
+
+    restart_started = time.monotonic()
+    for worker in workers:
+        await asyncio.sleep(1.0)
+        await worker.stop()
+        await worker.start()
+    await asyncio.sleep(window + 1.0)
+    stop_producer.set()
+    await producer
+    await asyncio.wait_for(asyncio.gather(*(client.synced.wait() for client in clients)), 60)
+
+    # Sends still in flight may commit a little later; then give delivery time to catch up.
+    final = await room_seqs()
+    while (settled := await room_seqs()) != final:
+        final = settled
+        await asyncio.sleep(0.5)
+    deadline = time.monotonic() + 5.0
+    while time.monotonic() < deadline and any(
+        client.last[room_id] < final[room_id] for client in clients for room_id in client.rooms
+    ):
+        await asyncio.sleep(0.1)
+    expected = sum(final[room_id] - baseline[room_id] for client in clients for room_id in client.rooms)
+    missing = sum(
+        len(set(range(baseline[room_id] + 1, final[room_id] + 1)) - client.seen[room_id])
+        for client in clients for room_id in client.rooms
+    )
+    reconnects = [moment for moment in stats.connects if moment >= restart_started]
+    buckets = Counter(int(moment * 10) for moment in reconnects)
+    syncs = [hub.sync.metrics for worker in workers for hub in worker.hubs]
+
+    print(f"{label}: window {window:.1f} s")
+    print(f"  messages stored {sum(final[r] - baseline[r] for r in final)}, "
+          f"sends skipped while reconnecting {sent['skipped']}")
+    print(f"  deliveries expected {expected}, missing {missing}, duplicates {stats.duplicates}")
+    print(f"  reconnects {len(reconnects)}, peak {max(buckets.values(), default=0)} per 100 ms, "
+          f"refused {stats.refused}")
+    print(f"  resyncs from memory {sum(m.memory for m in syncs)}, from database {sum(m.database for m in syncs)}, "
+          f"seed queries {sum(m.seeds for m in syncs)}, resets {stats.resets}")
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for client in clients:
+        if client.socket is not None:
+            await client.socket.close()
+    for worker in workers:
+        await worker.stop()
+
+
+async def main(clients: int, window: float) -> None:
+    await setup(clients)
+    rooms_of = await memberships()
+    await rolling_restart("graceful drain", window, rooms_of)
+    await rolling_restart("abrupt restart", 0.0, rooms_of)
+    await get_async_engine().dispose()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+                         float(sys.argv[2]) if len(sys.argv) > 2 else 2.0))
+    finally:
+        shutil.rmtree(_directory, ignore_errors=True)
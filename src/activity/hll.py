@@ -0,0 +1,78 @@
+from typing import Iterable, Optional
+import math
+import zlib
+
+MASK64 = (1 << 64) - 1
+
+
+def mix64(value: int) -> int:
+    """SplitMix64 finalizer: a well-spread 64-bit hash of an integer, the same in every process."""
+    value = (value + 0x9E3779B97F4A7C15) & MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return value ^ (value >> 31)
+
+
+class HyperLogLog:
+    """Approximate distinct count of integers in ``2 ** precision`` one-byte registers.
+
+    The standard error is about ``1.04 / sqrt(2 ** precision)``, 3.3% at
+    the default precision, whatever the number of values. Sketches of the
+    same precision merge by taking the maximum of each register, so the
+    distinct users of a week are the merge of seven daily sketches.
+    Serialized sketches are deflated: a sketch of a few values is mostly
+    empty registers and takes a few dozen bytes.
+    """
+
+    def __init__(self, precision: int = 10, registers: Optional[bytearray] = None):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.registers = registers if registers is not None else bytearray(1 << precision)
+
+    def add(self, value: int) -> None:
+        hashed = mix64(value)
+        index = hashed >> (64 - self.precision)
+        rest = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable[int]) -> None:
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are empty.
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def to_bytes(self) -> bytes:
+        return bytes([self.precision]) + zlib.compress(bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        precision = data[0]
+        registers = bytearray(zlib.decompress(data[1:]))
+        if len(registers) != 1 << precision:
+            raise ValueError("Corrupt HyperLogLog sketch")
+        return cls(precision, registers)
+
+    @classmethod
+    def union(cls, sketches: Iterable[Optional[bytes]], precision: int = 10) -> "HyperLogLog":
+        """Merge serialized sketches; ``None`` entries are skipped."""
+        merged = cls(precision)
+        for data in sketches:
+            if data is not None:
+                merged.merge(cls.from_bytes(data))
+        return merged
@@ -0,0 +1,63 @@
+from datetime import date, datetime
+from typing import Optional
+from sqlalchemy import BigInteger, Date, DateTime, ForeignKey, Index, Integer, LargeBinary, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.core.database import Base
+
+
+class RoomActivityHourly(Base):
+    """Messages posted in a room per hour."""
+    __tablename__ = "room_activity_hourly"
+
+    room_id: Mapped[int] = mapped_column(ForeignKey("rooms.room_id"), primary_key=True)
+    hour: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    messages: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+
+
+class RoomActivityDaily(Base):
+    """Messages, joins and active users of a room per day.
+
+    ``users`` is a HyperLogLog sketch of the authors (see
+    src.activity.hll), so that active users over several days can be
+    counted without double-counting; ``active_users`` is its estimate.
+    """
+    __tablename__ = "room_activity_daily"
+    __table_args__ = (
+        Index("ix_room_activity_daily_day_messages", "day", "messages"),
+    )
+
+    room_id: Mapped[int] = mapped_column(ForeignKey("rooms.room_id"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    messages: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    joins: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    active_users: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    users: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+
+
+class SiteActivityDaily(Base):
+    """Messages, joins and active users across all rooms per day; see RoomActivityDaily."""
+    __tablename__ = "site_activity_daily"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    messages: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0", nullable=False)
+    joins: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0", nullable=False)
+    active_users: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    users: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+
+
+class UserActivityDaily(Base):
+    """Messages posted by a user per day."""
+    __tablename__ = "user_activity_daily"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.user_id"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    messages: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+
+
+class ActivityWatermark(Base):
+    """The last id of a source table that the aggregator has counted; one row per ``name``."""
+    __tablename__ = "activity_watermarks"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    last_id: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0", nullable=False)
@@ -0,0 +1,198 @@
+from datetime import date, datetime
+from typing import Any, Iterable, Optional, Sequence, Type
+import logging
+
+from sqlalchemy import Row, select, tuple_, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.chat.models import Message
+from src.core.repository import BaseRepository
+from src.rooms.models import RoomMember
+
+from .models import (
+    ActivityWatermark, RoomActivityDaily, RoomActivityHourly, SiteActivityDaily, UserActivityDaily,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityRepository(BaseRepository[RoomActivityDaily]):
+    """Repository for the activity rollups and the watermarks of their aggregator."""
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, RoomActivityDaily, primary_key_field="room_id")
+
+    async def lock_watermark(self, name: str) -> int:
+        """Return the watermark's last id, creating it at 0, and keep its row locked until the commit."""
+        try:
+            stmt = self._insert(ActivityWatermark).values(name=name, last_id=0)
+            result = await self.session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[ActivityWatermark.name],
+                    set_={"last_id": ActivityWatermark.last_id},
+                ).returning(ActivityWatermark.last_id)
+            )
+            return result.scalar_one()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error locking activity watermark {name}: {e}")
+            raise
+
+    async def move_watermark(self, name: str, last_id: int) -> None:
+        await self.session.execute(
+            update(ActivityWatermark).where(ActivityWatermark.name == name).values(last_id=last_id)
+        )
+
+    async def get_new_messages(self, after_id: int, before_id: int, limit: int) -> Sequence[Row]:
+        """``(message_id, room_id, user_id, created_at)`` of messages in ``(after_id, before_id)``, by id."""
+        try:
+            result = await self.session.execute(
+                select(Message.message_id, Message.room_id, Message.user_id, Message.created_at)
+                .where(Message.message_id > after_id, Message.message_id < before_id)
+                .order_by(Message.message_id)
+                .limit(limit)
+            )
+            return result.all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching messages after {after_id}: {e}")
+            raise
+
+    async def get_new_joins(self, after_id: int, before: datetime, limit: int) -> Sequence[Row]:
+        """``(member_id, room_id, joined_at)`` of memberships after ``after_id`` that joined before ``before``, by id."""
+        try:
+            result = await self.session.execute(
+                select(RoomMember.member_id, RoomMember.room_id, RoomMember.joined_at)
+                .where(RoomMember.member_id > after_id, RoomMember.joined_at < before)
+                .order_by(RoomMember.member_id)
+                .limit(limit)
+            )
+            return result.all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching memberships after {after_id}: {e}")
+            raise
+
+    async def get_room_sketches(self, keys: Iterable[tuple[int, date]]) -> dict[tuple[int, date], Optional[bytes]]:
+        """Active user sketches of ``(room_id, day)`` rows that exist, in one query."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            result = await self.session.execute(
+                select(RoomActivityDaily.room_id, RoomActivityDaily.day, RoomActivityDaily.users)
+                .where(tuple_(RoomActivityDaily.room_id, RoomActivityDaily.day).in_(keys))
+            )
+            return {(room_id, day): users for room_id, day, users in result.all()}
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching {len(keys)} room activity sketches: {e}")
+            raise
+
+    async def get_site_sketches(self, days: Iterable[date]) -> dict[date, Optional[bytes]]:
+        days = list(days)
+        if not days:
+            return {}
+        try:
+            result = await self.session.execute(
+                select(SiteActivityDaily.day, SiteActivityDaily.users).where(SiteActivityDaily.day.in_(days))
+            )
+            return dict(result.all())
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching {len(days)} site activity sketches: {e}")
+            raise
+
+    async def add(self, model: Type[Any], rows: list[dict[str, Any]]) -> None:
+        """Add to the counters of rollup rows in one statement, without committing.
+
+        ``messages`` and ``joins`` accumulate; the ``users`` sketch and
+        ``active_users`` replace the stored ones, so callers pass sketches
+        already merged with those from ``get_*_sketches``.
+        """
+        if not rows:
+            return
+        try:
+            stmt = self._insert(model)
+            set_ = {"messages": model.messages + stmt.excluded.messages}
+            if hasattr(model, "joins"):
+                set_["joins"] = model.joins + stmt.excluded.joins
+            if hasattr(model, "users"):
+                set_["users"] = stmt.excluded.users
+                set_["active_users"] = stmt.excluded.active_users
+            await self.session.execute(
+                stmt.on_conflict_do_update(index_elements=list(model.__table__.primary_key.columns), set_=set_),
+                rows,
+            )
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error adding {len(rows)} rows to {model.__tablename__}: {e}")
+            raise
+
+    async def get_room_hourly(self, room_id: int, start: datetime, end: datetime) -> Sequence[Row]:
+        """``(hour, messages)`` of a room's hours in ``[start, end)``; hours without messages are absent."""
+        try:
+            result = await self.session.execute(
+                select(RoomActivityHourly.hour, RoomActivityHourly.messages)
+                .where(RoomActivityHourly.room_id == room_id, RoomActivityHourly.hour >= start,
+                       RoomActivityHourly.hour < end)
+                .order_by(RoomActivityHourly.hour)
+            )
+            return result.all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching hourly activity of room {room_id}: {e}")
+            raise
+
+    async def get_room_daily(self, room_id: int, start: date, end: date) -> Sequence[Row]:
+        """``(day, messages, joins, active_users, users)`` of a room's days in ``[start, end)``."""
+        try:
+            result = await self.session.execute(
+                select(RoomActivityDaily.day, RoomActivityDaily.messages, RoomActivityDaily.joins,
+                       RoomActivityDaily.active_users, RoomActivityDaily.users)
+                .where(RoomActivityDaily.room_id == room_id, RoomActivityDaily.day >= start,
+                       RoomActivityDaily.day < end)
+                .order_by(RoomActivityDaily.day)
+            )
+            return result.all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching daily activity of room {room_id}: {e}")
+            raise
+
+    async def get_site_daily(self, start: date, end: date) -> Sequence[Row]:
+        """``(day, messages, joins, active_users, users)`` of the days in ``[start, end)``."""
+        try:
+            result = await self.session.execute(
+                select(SiteActivityDaily.day, SiteActivityDaily.messages, SiteActivityDaily.joins,
+                       SiteActivityDaily.active_users, SiteActivityDaily.users)
+                .where(SiteActivityDaily.day >= start, SiteActivityDaily.day < end)
+                .order_by(SiteActivityDaily.day)
+            )
+            return result.all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching site activity: {e}")
+            raise
+
+    async def get_user_daily(self, user_id: int, start: date, end: date) -> Sequence[Row]:
+        """``(day, messages)`` of a user's days in ``[start, end)``."""
+        try:
+            result = await self.session.execute(
+                select(UserActivityDaily.day, UserActivityDaily.messages)
+                .where(UserActivityDaily.user_id == user_id, UserActivityDaily.day >= start,
+                       UserActivityDaily.day < end)
+                .order_by(UserActivityDaily.day)
+            )
+            return result.all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching daily activity of user {user_id}: {e}")
+            raise
+
+    async def get_top_rooms(self, day: date, limit: int) -> Sequence[Row]:
+        """``(room_id, messages, joins, active_users)`` of a day's busiest rooms, from the ``(day, messages)`` index."""
+        try:
+            result = await self.session.execute(
+                select(RoomActivityDaily.room_id, RoomActivityDaily.messages, RoomActivityDaily.joins,
+                       RoomActivityDaily.active_users)
+                .where(RoomActivityDaily.day == day)
+                .order_by(RoomActivityDaily.messages.desc(), RoomActivityDaily.room_id)
+                .limit(limit)
+            )
+            return result.all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching the top rooms of {day}: {e}")
+            raise
@@ -0,0 +1,110 @@
+from datetime import date, datetime, timedelta
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.auth.dependencies import get_admin_user_id, get_current_user_id
+from src.core.admission import Priority, admit
+from src.core.clock import utcnow
+from src.core.database import get_db, get_room_db
+from src.core.serialization import FastJSONResponse
+from src.rooms.repository import RoomMemberRepository, RoomRepository
+
+from .hll import HyperLogLog
+from .repository import ActivityRepository
+from .schemas import (
+    DAILY_ACTIVITY, HOURLY_ACTIVITY, ROOM_RANKS, USER_ACTIVITY,
+    DailyActivityOut, HourlyActivityOut, RoomRankOut, UserActivityOut,
+)
+
+# Dashboards are the first thing to shed under load.
+router = APIRouter(tags=["activity"], dependencies=[Depends(admit(Priority.LOW))])
+
+# Longest ranges served, so that a dashboard query reads at most a few thousand rollup rows.
+MAX_HOURS = 24 * 14
+MAX_DAYS = 366
+
+
+def _days(start: Optional[date], end: Optional[date], default: int = 30) -> tuple[date, date]:
+    """``[start, end)``, ending tomorrow and spanning ``default`` days unless given."""
+    end = end or utcnow().date() + timedelta(days=1)
+    start = start or end - timedelta(days=default)
+    if not start < end <= start + timedelta(days=MAX_DAYS):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"The range must span 1 to {MAX_DAYS} days")
+    return start, end
+
+
+def _daily(rows) -> bytes:
+    return DAILY_ACTIVITY.encode({
+        "points": rows,
+        "active_users": HyperLogLog.union(row.users for row in rows).count(),
+    })
+
+
+@router.get("/rooms/{room_id}/activity", response_model=HourlyActivityOut | DailyActivityOut)
+async def get_room_activity(
+    room_id: int,
+    bucket: Literal["hour", "day"] = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: int = Depends(get_current_user_id),
+    room_db: AsyncSession = Depends(get_room_db),
+    db: AsyncSession = Depends(get_db),
+):
+    """Messages per hour, or messages, joins and active users per day, from the rollups.
+
+    Hourly ranges default to the last 48 hours, daily ones to the last 30 days.
+    """
+    room = await RoomRepository(room_db).get_by_id(room_id)
+    if room is None or (
+        room.is_private and await RoomMemberRepository(room_db).get_membership(room_id, user_id) is None
+    ):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Room not found")
+    repo = ActivityRepository(db)
+    if bucket == "day":
+        first, last = _days(start and start.date(), end and end.date())
+        return FastJSONResponse(_daily(await repo.get_room_daily(room_id, first, last)))
+    end = end or utcnow()
+    start = start or end - timedelta(hours=48)
+    if not start < end <= start + timedelta(hours=MAX_HOURS):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"The range must span at most {MAX_HOURS} hours")
+    rows = await repo.get_room_hourly(room_id, start, end)
+    return FastJSONResponse(HOURLY_ACTIVITY.encode({"points": rows}))
+
+
+@router.get("/activity/daily", response_model=DailyActivityOut, dependencies=[Depends(get_admin_user_id)])
+async def get_site_activity(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Messages, joins and active users per day across all rooms; admins only."""
+    start, end = _days(start, end)
+    return FastJSONResponse(_daily(await ActivityRepository(db).get_site_daily(start, end)))
+
+
+@router.get("/activity/rooms", response_model=list[RoomRankOut], dependencies=[Depends(get_admin_user_id)])
+async def get_top_rooms(
+    day: Optional[date] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+):
+    """The busiest rooms of a day, today by default; admins only."""
+    rows = await ActivityRepository(db).get_top_rooms(day or utcnow().date(), limit)
+    return FastJSONResponse(ROOM_RANKS.encode(rows))
+
+
+@router.get("/activity/users/{user_id}", response_model=UserActivityOut, dependencies=[Depends(get_admin_user_id)])
+async def get_user_activity(
+    user_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Messages a user posted per day; admins only."""
+    start, end = _days(start, end)
+    rows = await ActivityRepository(db).get_user_daily(user_id, start, end)
+    return FastJSONResponse(USER_ACTIVITY.encode({"points": rows}))
@@ -0,0 +1,50 @@
+from datetime import date, datetime
+
+from pydantic import BaseModel, ConfigDict
+
+from src.core.serialization import Encoder
+
+
+class HourlyPoint(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    hour: datetime
+    messages: int
+
+
+class DailyPoint(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    day: date
+    messages: int
+    joins: int = 0
+    active_users: int = 0
+
+
+class HourlyActivityOut(BaseModel):
+    points: list[HourlyPoint]
+
+
+class DailyActivityOut(BaseModel):
+    points: list[DailyPoint]
+    # Distinct active users over the whole range, estimated; not the sum of the days.
+    active_users: int
+
+
+class UserActivityOut(BaseModel):
+    points: list[DailyPoint]
+
+
+class RoomRankOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    room_id: int
+    messages: int
+    joins: int
+    active_users: int
+
+
+HOURLY_ACTIVITY = Encoder(HourlyActivityOut)
+DAILY_ACTIVITY = Encoder(DailyActivityOut)
+USER_ACTIVITY = Encoder(UserActivityOut)
+ROOM_RANKS = Encoder(list[RoomRankOut])
@@ -0,0 +1,216 @@
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Callable, Optional
+import asyncio
+import logging
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.clock import utcnow
+from src.core.ids import min_id_at
+from src.core.sharding import ShardMap
+
+from .hll import HyperLogLog
+from .models import RoomActivityDaily, RoomActivityHourly, SiteActivityDaily, UserActivityDaily
+from .repository import ActivityRepository
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Day:
+    messages: int = 0
+    joins: int = 0
+    users: HyperLogLog = field(default_factory=HyperLogLog)
+
+    def row(self, existing: Optional[bytes]) -> dict:
+        if existing is not None:
+            self.users.merge(HyperLogLog.from_bytes(existing))
+        active_users = self.users.count()
+        return {
+            "messages": self.messages,
+            "joins": self.joins,
+            "active_users": active_users,
+            "users": self.users.to_bytes() if active_users else None,
+        }
+
+
+@dataclass
+class ActivityMetrics:
+    batches: int = 0
+    messages: int = 0
+    joins: int = 0
+    failures: int = 0
+    aggregate_seconds: float = 0.0
+    # Creation time of the last message counted.
+    watermark: Optional[datetime] = None
+
+    def snapshot(self) -> dict[str, float]:
+        return {
+            "batches": self.batches,
+            "messages": self.messages,
+            "joins": self.joins,
+            "failures": self.failures,
+            "aggregate_seconds": round(self.aggregate_seconds, 3),
+            "lag_seconds": round((utcnow() - self.watermark).total_seconds(), 3) if self.watermark else None,
+        }
+
+
+class ActivityAggregator:
+    """Keeps the activity rollups up to date from new messages and memberships.
+
+    Each pass reads up to ``batch_size`` rows of each source after its id
+    watermark, adds them up in memory and writes one upsert per rollup
+    table, so a pass costs a handful of statements however many rows it
+    counts. The watermark rows stay locked for the whole transaction and
+    move in the same commit as the counts, so every row is counted exactly
+    once however many workers run the aggregator. Rows younger than
+    ``settle`` seconds are left for the next pass, so that one still
+    committing with a smaller id is not skipped.
+
+    Active users are HyperLogLog sketches merged into the stored ones,
+    which is what makes them incremental: an exact distinct count would
+    have to remember every user of the day. A new deployment counts the
+    whole history, a batch at a time.
+
+    With a ``shard_map``, rooms live on the shards: each pass reads every
+    shard after watermarks of its own, and counts into the rollups of
+    ``session_maker``, in one transaction per shard. Rows a move copied
+    onto a shard are skipped there, as the shard they came from counts
+    them (ShardMap.owns).
+    """
+
+    MESSAGES = "messages"
+    JOINS = "room_members"
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        batch_size: int = 5000,
+        settle: float = 5.0,
+        interval: float = 10.0,
+        clock: Callable[[], datetime] = utcnow,
+        shard_map: Optional[ShardMap] = None,
+    ):
+        self.session_maker = session_maker
+        self.shard_map = shard_map
+        self.batch_size = batch_size
+        self.settle = settle
+        self.interval = interval
+        self.clock = clock
+        self.metrics = ActivityMetrics()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def aggregate_once(self) -> int:
+        """Count the next batch of settled messages and joins; returns how many rows were read.
+
+        With a shard map, the next batch of each shard; returns the most read from one shard.
+        """
+        if self.shard_map is None:
+            return await self._aggregate(None)
+        return max([await self._aggregate(shard) for shard in self.shard_map.names])
+
+    async def _aggregate(self, shard: Optional[str]) -> int:
+        started = time.perf_counter()
+        settled = self.clock() - timedelta(seconds=self.settle)
+        suffix = "" if shard is None else f":{shard}"
+        async with AsyncExitStack() as stack:
+            session = await stack.enter_async_context(self.session_maker())
+            source = session if shard is None else await stack.enter_async_context(self.shard_map.session(shard))
+            repo = ActivityRepository(session)
+            after_message = await repo.lock_watermark(self.MESSAGES + suffix)
+            new_messages = await ActivityRepository(source).get_new_messages(
+                after_message, min_id_at(settled), self.batch_size
+            )
+            after_join = await repo.lock_watermark(self.JOINS + suffix)
+            new_joins = await ActivityRepository(source).get_new_joins(after_join, settled, self.batch_size)
+            if not new_messages and not new_joins:
+                await session.commit()
+                return 0
+            messages, joins = new_messages, new_joins
+            if shard is not None:
+                messages = [row for row in messages if self.shard_map.owns(shard, row.room_id, row.created_at)]
+                joins = [row for row in joins if self.shard_map.owns(shard, row.room_id, row.joined_at)]
+
+            hours: dict[tuple[int, datetime], int] = {}
+            users: dict[tuple[int, date], int] = {}
+            rooms: dict[tuple[int, date], _Day] = {}
+            site: dict[date, _Day] = {}
+            # By creation time: serial ids from before snowflakes carry no time.
+            for _, room_id, user_id, created_at in messages:
+                hour, day = created_at.replace(minute=0, second=0, microsecond=0), created_at.date()
+                hours[room_id, hour] = hours.get((room_id, hour), 0) + 1
+                users[user_id, day] = users.get((user_id, day), 0) + 1
+                for bucket in (rooms.setdefault((room_id, day), _Day()), site.setdefault(day, _Day())):
+                    bucket.messages += 1
+                    bucket.users.add(user_id)
+            for _, room_id, joined_at in joins:
+                day = joined_at.date()
+                rooms.setdefault((room_id, day), _Day()).joins += 1
+                site.setdefault(day, _Day()).joins += 1
+
+            room_sketches = await repo.get_room_sketches(rooms)
+            site_sketches = await repo.get_site_sketches(site)
+            await repo.add(RoomActivityHourly, [
+                {"room_id": room_id, "hour": hour, "messages": count} for (room_id, hour), count in hours.items()
+            ])
+            await repo.add(UserActivityDaily, [
+                {"user_id": user_id, "day": day, "messages": count} for (user_id, day), count in users.items()
+            ])
+            await repo.add(RoomActivityDaily, [
+                {"room_id": room_id, "day": day, **bucket.row(room_sketches.get((room_id, day)))}
+                for (room_id, day), bucket in rooms.items()
+            ])
+            await repo.add(SiteActivityDaily, [
+                {"day": day, **bucket.row(site_sketches.get(day))} for day, bucket in site.items()
+            ])
+            if new_messages:
+                await repo.move_watermark(self.MESSAGES + suffix, new_messages[-1].message_id)
+            if new_joins:
+                await repo.move_watermark(self.JOINS + suffix, new_joins[-1].member_id)
+            await session.commit()
+        metrics = self.metrics
+        metrics.batches += 1
+        metrics.messages += len(messages)
+        metrics.joins += len(joins)
+        metrics.aggregate_seconds += time.perf_counter() - started
+        if new_messages:
+            metrics.watermark = new_messages[-1].created_at
+        return len(new_messages) + len(new_joins)
+
+    async def run(self) -> None:
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                while await self.aggregate_once() >= self.batch_size and not self._stopping:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics.failures += 1
+                logger.error(f"Activity aggregation error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        self._stopping = False
+        self._task = asyncio.create_task(self.run(), name="activity")
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Finish the pass in hand, then stop; a pass cancelled after ``timeout`` is rolled back and redone."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Activity aggregator did not stop within {timeout} s")
+                self._task.cancel()
+                await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,68 @@
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.clock import utcnow
+from src.core.database import get_db
+from src.core.ratelimit import auth_blocked, auth_failed, client_ip, too_many_requests
+
+from .models import UserSession
+from .repository import UserRepository, UserSessionRepository
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+async def resolve_session(db: AsyncSession, token: str) -> UserSession | None:
+    """Return the active, unexpired session for a token, if any."""
+    session = await UserSessionRepository(db).get_by_refresh_token(token)
+    if session is None or not session.is_active:
+        return None
+    if session.expired_at is not None and session.expired_at <= utcnow():
+        return None
+    return session
+
+
+async def get_current_session(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme),
+    db: AsyncSession = Depends(get_db),
+) -> UserSession:
+    """Resolve the bearer session token to an active UserSession.
+
+    The user id is also stored on ``request.state`` so that per-user rate
+    limits and logging do not need the session object. Rejected tokens
+    count against the caller's IP (``AUTH_PER_IP``); past the limit it gets
+    429 until the limit refills.
+    """
+    unauthorized = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Not authenticated",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    if credentials is None:
+        raise unauthorized
+    ip = client_ip(request)
+    retry_after = await auth_blocked(ip)
+    if retry_after:
+        raise too_many_requests(retry_after)
+    session = await resolve_session(db, credentials.credentials)
+    if session is None:
+        retry_after = await auth_failed(ip)
+        raise too_many_requests(retry_after) if retry_after else unauthorized
+    request.state.user_id = session.user_id
+    return session
+
+
+async def get_current_user_id(session: UserSession = Depends(get_current_session)) -> int:
+    return session.user_id
+
+
+async def get_admin_user_id(
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+) -> int:
+    """The current user's id, for admins only; anybody else gets 403."""
+    user = await UserRepository(db).get_by_id(user_id)
+    if user is None or not user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admins only")
+    return user_id
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.admission import Priority, admit
+from src.core.database import get_db
+from src.core.http_cache import ResponseCache, Validators, conditional_response, get_response_cache, make_etag
+
+from .dependencies import get_current_session
+from .repository import UserRepository
+from .schemas import USER, UserOut
+
+router = APIRouter(tags=["users"])
+
+
+@router.get("/users/{user_id}", response_model=UserOut,
+            dependencies=[Depends(admit(Priority.LOW)), Depends(get_current_session)])
+async def get_user(
+    request: Request,
+    user_id: int,
+    db: AsyncSession = Depends(get_db),
+    cache: ResponseCache = Depends(get_response_cache),
+):
+    """Public profile of a user."""
+    user = await UserRepository(db).get_by_id(user_id)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    async def render() -> bytes:
+        return USER.encode(user)
+
+    validators = Validators(make_etag("user", user_id, user.updated_at), user.updated_at)
+    return await conditional_response(request, cache, ("user", user_id), validators, render)
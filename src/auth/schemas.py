@@ -0,0 +1,20 @@
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+
+from src.core.serialization import Encoder
+
+
+class UserOut(BaseModel):
+    """Public profile of a user; never includes credentials or contact details."""
+    model_config = ConfigDict(from_attributes=True)
+
+    user_id: int
+    username: str
+    first_name: str
+    family_name: Optional[str] = None
+    avatar_url: Optional[str] = None
+
+
+USER = Encoder(UserOut)
+USER_LIST = Encoder(list[UserOut])
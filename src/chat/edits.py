@@ -0,0 +1,121 @@
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from typing import Optional
+import asyncio
+import logging
+
+from fastapi.requests import HTTPConnection
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.database import get_shard_map
+
+from .models import Message
+from .repository import MessageRepository
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EditMetrics:
+    batches: int = 0
+    edits: int = 0
+    failures: int = 0
+
+    def snapshot(self) -> dict[str, float]:
+        return {
+            "batches": self.batches,
+            "edits": self.edits,
+            "failures": self.failures,
+            "edits_per_batch": round(self.edits / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+class EditBatcher:
+    """Writes message edits that arrive close together in one transaction.
+
+    An edit waits up to ``delay`` seconds for others to join its batch, and
+    a full batch of ``max_batch`` is written at once, with
+    MessageRepository.edit_many: a batch costs one commit and a handful of
+    statements however many edits it holds. A failed batch fails every
+    edit in it. With sharded rooms a batch is written as one transaction
+    per shard, under the write guard of every room it touches.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        max_batch: int = 64,
+        delay: float = 0.005,
+    ):
+        self.session_maker = session_maker
+        self.max_batch = max_batch
+        self.delay = delay
+        self.metrics = EditMetrics()
+        self._pending: list[tuple[tuple[int, int, int, str], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._writes: set[asyncio.Task] = set()
+
+    async def edit(self, room_id: int, message_id: int, user_id: int, text: str) -> Optional[Message]:
+        """Edit a message as MessageRepository.edit does, once the batch is written."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(((room_id, message_id, user_id, text), future))
+        if len(self._pending) >= self.max_batch:
+            self._write_pending()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.delay, self._write_pending)
+        return await future
+
+    def _write_pending(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._write(batch), name="edit-batch")
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+    async def _write(self, batch: list[tuple[tuple[int, int, int, str], asyncio.Future]]) -> None:
+        try:
+            messages = await self._edit_many([edit for edit, _ in batch])
+        except Exception as e:
+            self.metrics.failures += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.metrics.batches += 1
+        self.metrics.edits += len(batch)
+        for (_, future), message in zip(batch, messages):
+            if not future.done():
+                future.set_result(message)
+
+    async def _edit_many(self, edits: list[tuple[int, int, int, str]]) -> list[Optional[Message]]:
+        shard_map = get_shard_map()
+        if shard_map is None:
+            async with self.session_maker() as db:
+                return await MessageRepository(db).edit_many(edits)
+        async with AsyncExitStack() as guards:
+            for room_id in sorted({edit[0] for edit in edits}):
+                await guards.enter_async_context(shard_map.write_guard(room_id))
+            by_shard: dict[str, list[int]] = {}
+            for i, edit in enumerate(edits):
+                by_shard.setdefault(shard_map.shard_for(edit[0]), []).append(i)
+            messages: list[Optional[Message]] = [None] * len(edits)
+            for shard, indexes in by_shard.items():
+                async with shard_map.session(shard) as db:
+                    written = await MessageRepository(db).edit_many([edits[i] for i in indexes])
+                for i, message in zip(indexes, written):
+                    messages[i] = message
+            return messages
+
+    async def stop(self) -> None:
+        """Write what is pending and wait for the batches in flight."""
+        self._write_pending()
+        await asyncio.gather(*self._writes, return_exceptions=True)
+
+
+def get_edit_batcher(connection: HTTPConnection) -> EditBatcher:
+    """FastAPI dependency returning the batcher created in the app lifespan."""
+    return connection.app.state.edit_batcher
@@ -0,0 +1,143 @@
+from abc import ABC, abstractmethod
+from typing import Any, Iterable, Optional
+import zlib
+
+from pydantic_core import from_json, to_json
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is an optional dependency
+    msgpack = None
+
+Event = dict[str, Any]
+# An ASGI "websocket.send" message; built once per codec and shared by every recipient.
+Frame = dict[str, Any]
+
+# A representative event; its encoding is the preset dictionary of the deflate codecs.
+# Changing it changes the wire format, so bump the subprotocol version with it.
+SAMPLE_EVENT: Event = {
+    "type": "message",
+    "message_id": 0,
+    "user_id": 0,
+    "room_id": 0,
+    "reply_to": None,
+    "message": "",
+    "is_deleted": False,
+    "created_at": "2025-01-01T00:00:00",
+    "updated_at": "2025-01-01T00:00:00",
+}
+
+
+class Codec(ABC):
+    """Wire format of chat events, selected through the WebSocket subprotocol."""
+    subprotocol: str
+    binary: bool
+
+    @abstractmethod
+    def encode(self, event: Event) -> bytes:
+        """Encode a JSON-compatible event."""
+
+    @abstractmethod
+    def decode(self, data: bytes) -> Event:
+        """Decode a client frame; raises ValueError if it is malformed."""
+
+    def frame(self, event: Event) -> Frame:
+        data = self.encode(event)
+        if self.binary:
+            return {"type": "websocket.send", "bytes": data}
+        return {"type": "websocket.send", "text": data.decode()}
+
+
+class JsonCodec(Codec):
+    subprotocol = "murmur.v1.json"
+    binary = False
+
+    def encode(self, event: Event) -> bytes:
+        return to_json(event)
+
+    def decode(self, data: bytes) -> Event:
+        return from_json(data)
+
+
+class MsgpackCodec(Codec):
+    subprotocol = "murmur.v1.msgpack"
+    binary = True
+
+    def encode(self, event: Event) -> bytes:
+        return msgpack.packb(event, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Event:
+        return msgpack.unpackb(data, raw=False)
+
+
+class DeflateCodec(Codec):
+    """Raw deflate over another codec, primed with a preset dictionary.
+
+    Every frame is compressed on its own, so one compressed frame can be
+    sent to any number of recipients. Protocol-level permessage-deflate
+    keeps a compressor per connection and compresses each broadcast once per
+    recipient; the shared dictionary recovers most of the ratio that context
+    takeover would give for short, repetitive chat events.
+    """
+    binary = True
+
+    def __init__(self, inner: Codec, level: int = 6):
+        self.inner = inner
+        self.level = level
+        self.subprotocol = f"{inner.subprotocol}.deflate"
+        self.dictionary = inner.encode(SAMPLE_EVENT)
+
+    def encode(self, event: Event) -> bytes:
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15, zdict=self.dictionary)
+        return compressor.compress(self.inner.encode(event)) + compressor.flush()
+
+    def decode(self, data: bytes) -> Event:
+        decompressor = zlib.decompressobj(-15, zdict=self.dictionary)
+        try:
+            data = decompressor.decompress(data) + decompressor.flush()
+        except zlib.error as e:
+            raise ValueError(f"Invalid deflate frame: {e}") from e
+        return self.inner.decode(data)
+
+
+JSON = JsonCodec()
+CODECS: dict[str, Codec] = {JSON.subprotocol: JSON}
+_deflate_json = DeflateCodec(JSON)
+CODECS[_deflate_json.subprotocol] = _deflate_json
+if msgpack is not None:
+    _msgpack = MsgpackCodec()
+    CODECS[_msgpack.subprotocol] = _msgpack
+    _deflate_msgpack = DeflateCodec(_msgpack)
+    CODECS[_deflate_msgpack.subprotocol] = _deflate_msgpack
+
+
+def negotiate(requested: Iterable[str]) -> tuple[Codec, Optional[str]]:
+    """Pick the first supported subprotocol the client offered.
+
+    Returns the codec and the subprotocol to accept; clients that offer
+    none of ours get plain JSON without a subprotocol.
+    """
+    for subprotocol in requested:
+        codec = CODECS.get(subprotocol.strip())
+        if codec is not None:
+            return codec, codec.subprotocol
+    return JSON, None
+
+
+class EncodedEvent:
+    """An event together with its frames, encoded at most once per codec."""
+    __slots__ = ("event", "_frames")
+
+    def __init__(self, event: Event):
+        self.event = event
+        self._frames: dict[Codec, Frame] = {}
+
+    @property
+    def encodings(self) -> int:
+        return len(self._frames)
+
+    def frame(self, codec: Codec) -> Frame:
+        frame = self._frames.get(codec)
+        if frame is None:
+            frame = self._frames[codec] = codec.frame(self.event)
+        return frame
@@ -0,0 +1,269 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable, Optional
+import asyncio
+import logging
+import random
+
+from fastapi import status
+from fastapi.requests import HTTPConnection
+
+from src.core.broker import Broker, Subscription
+from src.rooms.repository import MEMBERS_CHANNEL
+
+from .framing import JSON, Codec, EncodedEvent, Event, Frame
+from .repository import EVENTS_CHANNEL
+from .sync import SyncService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HubMetrics:
+    broadcasts: int = 0
+    encodings: int = 0
+    frames: int = 0
+    bytes: int = 0
+    dropped: int = 0
+
+
+class Connection:
+    """One WebSocket with a bounded outbound queue drained by its own writer task."""
+
+    def __init__(self, websocket: Any, user_id: int, codec: Codec = JSON, max_queue: int = 256):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.codec = codec
+        self.rooms: set[int] = set()
+        self.queue: asyncio.Queue[Optional[Frame]] = asyncio.Queue(max_queue)
+        self.closed = False
+        self.close_code: Optional[int] = None
+        self._writable = asyncio.Event()
+        self._writable.set()
+
+    def push(self, frame: Frame) -> bool:
+        """Queue a frame; returns False if the connection is closed or too slow to keep up."""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            self.close_code = status.WS_1013_TRY_AGAIN_LATER
+            return False
+
+    def send_event(self, event: Event) -> bool:
+        return self.push(self.codec.frame(event))
+
+    async def put(self, frame: Frame) -> bool:
+        """Queue a frame, waiting while the queue is half full.
+
+        Used for bulk sends such as sync replays, so that live fan-out always
+        has room left and does not mistake the connection for a slow one.
+        """
+        while not self.closed and self.queue.qsize() >= self.queue.maxsize // 2:
+            self._writable.clear()
+            await self._writable.wait()
+        return self.push(frame)
+
+    def close(self, code: Optional[int] = None) -> None:
+        """Stop the writer once it has sent what is queued, then close the socket with ``code`` if given.
+
+        Queued frames are discarded only if there is no room for the sentinel.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if code is not None:
+            self.close_code = code
+        self._writable.set()
+        while True:
+            try:
+                self.queue.put_nowait(None)
+                return
+            except asyncio.QueueFull:
+                self.queue.get_nowait()
+
+    async def writer(self) -> None:
+        while True:
+            frame = await self.queue.get()
+            if frame is None:
+                break
+            if self.queue.qsize() < self.queue.maxsize // 2:
+                self._writable.set()
+            await self.websocket.send(frame)
+        if self.close_code is not None:
+            await self.websocket.close(code=self.close_code)
+
+
+class ConnectionHub:
+    """Fan-out of chat events to the WebSocket connections of this worker.
+
+    Events are published on the broker so that every worker delivers them
+    to its own connections. Each event is encoded once per codec in use,
+    never once per recipient. Events with a ``seq`` are also recorded in
+    the sync log, whether or not this worker has connections in the room.
+    Open connections of a user who joins a room start receiving its
+    events, and those of a user who leaves it stop.
+    """
+
+    CHANNEL = EVENTS_CHANNEL
+
+    def __init__(self, broker: Broker, max_queue: int = 256, sync: Optional[SyncService] = None):
+        self.broker = broker
+        self.max_queue = max_queue
+        self.sync = sync
+        self.metrics = HubMetrics()
+        self.draining = False
+        self.reconnect_window = 0.0
+        self._connections: set[Connection] = set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._rooms: dict[int, set[Connection]] = {}
+        self._subscriptions: list[Subscription] = []
+        self._tasks: list[asyncio.Task] = []
+
+    def connection_count(self, room_id: Optional[int] = None) -> int:
+        if room_id is not None:
+            return len(self._rooms.get(room_id, ()))
+        return len(self._connections)
+
+    def register(self, connection: Connection, room_ids: Iterable[int]) -> None:
+        self._connections.add(connection)
+        self._idle.clear()
+        for room_id in room_ids:
+            connection.rooms.add(room_id)
+            self._rooms.setdefault(room_id, set()).add(connection)
+        if self.draining:
+            # Accepted while the drain was starting.
+            self._hand_off(connection, self.reconnect_window)
+
+    def unregister(self, connection: Connection) -> None:
+        for room_id in connection.rooms:
+            members = self._rooms.get(room_id)
+            if members is not None:
+                members.discard(connection)
+                if not members:
+                    del self._rooms[room_id]
+        connection.rooms.clear()
+        self._connections.discard(connection)
+        if not self._connections:
+            self._idle.set()
+
+    async def drain(self, window: float = 10.0, timeout: float = 30.0) -> bool:
+        """Refuse new connections and move the current ones to other workers.
+
+        Every client gets a "reconnect" event with a random delay within
+        ``window`` seconds, so reconnects reach the other workers and the
+        database spread out rather than all at once, and is then closed with
+        1012 (service restart). Returns whether every connection was gone
+        before ``timeout``.
+        """
+        self.draining = True
+        self.reconnect_window = window
+        for connection in tuple(self._connections):
+            self._hand_off(connection, window)
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"{len(self._connections)} connections still open after draining for {timeout} s")
+            return False
+
+    def _hand_off(self, connection: Connection, window: float) -> None:
+        connection.send_event({"type": "reconnect", "after": round(random.uniform(0, window), 3)})
+        connection.close(status.WS_1012_SERVICE_RESTART)
+
+    async def publish(self, room_id: int, event: Event) -> None:
+        """Send an event to the room's connections on every worker."""
+        await self.broker.publish(self.CHANNEL, {"room_id": room_id, "event": event})
+
+    async def deliver(self, room_id: int, event: Event) -> int:
+        """Queue an event for this worker's connections in a room; returns the number of recipients."""
+        return self._fan_out(room_id, EncodedEvent(event))
+
+    def _fan_out(self, room_id: int, encoded: EncodedEvent) -> int:
+        members = self._rooms.get(room_id)
+        if not members:
+            return 0
+        metrics = self.metrics
+        metrics.broadcasts += 1
+        delivered = 0
+        for connection in tuple(members):
+            frame = encoded.frame(connection.codec)
+            if connection.push(frame):
+                delivered += 1
+                metrics.bytes += len(frame.get("bytes") or frame["text"])
+            elif connection.closed:
+                # Handed off or disconnecting; the endpoint unregisters it.
+                continue
+            else:
+                metrics.dropped += 1
+                logger.warning(f"Closing slow connection of user {connection.user_id}")
+                self.unregister(connection)
+                connection.close()
+        metrics.frames += delivered
+        metrics.encodings += encoded.encodings
+        return delivered
+
+    async def handle_message(self, message: dict[str, Any]) -> None:
+        room_id, event = message["room_id"], message["event"]
+        encoded = EncodedEvent(event)
+        seq = event.get("seq")
+        if self.sync is not None and seq is not None:
+            self.sync.record(room_id, seq, encoded)
+        self._fan_out(room_id, encoded)
+
+    def join(self, user_id: int, room_id: int) -> None:
+        """Add a room to the open connections of a user who just joined it."""
+        for connection in tuple(self._connections):
+            if connection.user_id == user_id and not connection.closed:
+                connection.rooms.add(room_id)
+                self._rooms.setdefault(room_id, set()).add(connection)
+
+    def leave(self, user_id: int, room_id: int) -> None:
+        """Stop delivering a room's events to the open connections of a user who left it."""
+        members = self._rooms.get(room_id)
+        if not members:
+            return
+        for connection in tuple(members):
+            if connection.user_id == user_id:
+                connection.rooms.discard(room_id)
+                members.discard(connection)
+        if not members:
+            del self._rooms[room_id]
+
+    async def handle_membership(self, message: dict[str, Any]) -> None:
+        if message["event"] == "joined":
+            self.join(message["user_id"], message["room_id"])
+        elif message["event"] == "left":
+            self.leave(message["user_id"], message["room_id"])
+
+    async def start(self) -> None:
+        events, members = self.broker.subscribe(self.CHANNEL), self.broker.subscribe(MEMBERS_CHANNEL)
+        self._subscriptions = [events, members]
+        self._tasks = [
+            asyncio.create_task(self._listen(events, self.handle_message), name="chat-hub-listener"),
+            asyncio.create_task(self._listen(members, self.handle_membership), name="chat-hub-members"),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for subscription in self._subscriptions:
+            subscription.close()
+        self._subscriptions = []
+
+    async def _listen(self, subscription: Subscription,
+                      handle: Callable[[dict[str, Any]], Awaitable[None]]) -> None:
+        async for message in subscription:
+            try:
+                await handle(message)
+            except Exception as e:
+                logger.error(f"Error handling {subscription.channel} message: {e}")
+
+
+def get_chat_hub(connection: HTTPConnection) -> ConnectionHub:
+    """FastAPI dependency returning the hub started in the app lifespan."""
+    return connection.app.state.chat_hub
@@ -0,0 +1,64 @@
+from collections import OrderedDict
+from typing import Iterable, Optional
+import re
+import time
+
+MENTION = re.compile(r"(?<![\w@])@(\w{1,50})")
+
+# Distinct usernames resolved per message; the rest of a mention flood is ignored.
+MAX_MENTIONS = 50
+
+
+def parse_mentions(text: Optional[str]) -> list[str]:
+    """Distinct usernames mentioned as ``@username`` in a message, in order of appearance."""
+    if not text or "@" not in text:
+        return []
+    return list(dict.fromkeys(MENTION.findall(text)))[:MAX_MENTIONS]
+
+
+class UsernameCache:
+    """Bounded LRU map of usernames to user ids, for resolving mentions on the write path.
+
+    Unknown usernames are cached as ``None`` for a shorter time, so that
+    mentions of people who do not exist reach the database at most once
+    per ``negative_ttl``.
+    """
+
+    def __init__(self, maxsize: int = 100_000, ttl: float = 300.0, negative_ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: OrderedDict[str, tuple[float, Optional[int]]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, usernames: Iterable[str]) -> tuple[dict[str, Optional[int]], list[str]]:
+        """``(cached, missing)``: cached ids (``None`` for known-unknown names) and the names to query."""
+        now = time.monotonic()
+        cached: dict[str, Optional[int]] = {}
+        missing = []
+        for username in usernames:
+            entry = self._entries.get(username)
+            if entry is None or entry[0] < now:
+                missing.append(username)
+                continue
+            self._entries.move_to_end(username)
+            cached[username] = entry[1]
+        return cached, missing
+
+    def put(self, username: str, user_id: Optional[int]) -> None:
+        ttl = self.ttl if user_id is not None else self.negative_ttl
+        self._entries[username] = (time.monotonic() + ttl, user_id)
+        self._entries.move_to_end(username)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, username: str) -> None:
+        self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+username_cache = UsernameCache()
@@ -1,23 +1,38 @@
 from typing import Optional, List
 from datetime import datetime
-from sqlalchemy import String, DateTime, Boolean, Integer, ForeignKey
+from sqlalchemy import String, DateTime, Boolean, Integer, BigInteger, ForeignKey, Index, LargeBinary
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
 from src.core.database import Base
+from src.core.ids import next_id
 
 # from src.auth.models import User
 # from src.rooms.models import Room
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_room_id_message_id", "room_id", "message_id"),
+        Index("ix_messages_user_id_message_id", "user_id", "message_id"),
+        Index("uq_messages_room_id_seq", "room_id", "seq", unique=True),
+        Index("ix_messages_room_id_changed_seq", "room_id", "changed_seq"),
+    )
 
-    message_id: Mapped[int] = mapped_column(primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.user_id"), nullable=False, index=True)
-    room_id: Mapped[int] = mapped_column(ForeignKey("rooms.room_id"), nullable=False, index=True)
-    reply_to: Mapped[Optional[int]] = mapped_column(ForeignKey("messages.message_id"), nullable=True)
+    message_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False, default=next_id)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.user_id"), nullable=False)
+    room_id: Mapped[int] = mapped_column(ForeignKey("rooms.room_id"), nullable=False)
+    reply_to: Mapped[Optional[int]] = mapped_column(BigInteger, ForeignKey("messages.message_id"), nullable=True, index=True)
+    seq: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    # Sequence of the room event of the last edit or deletion; see src.chat.sync.room_events.
+    changed_seq: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
     message: Mapped[str] = mapped_column(String(4096), nullable=True)
     is_deleted: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Direct replies; maintained by MessageRepository.append.
+    reply_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    last_reply_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    # Edits so far; earlier versions are MessageRevision rows 0 to revision - 1.
+    revision: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
 
@@ -27,16 +42,20 @@ class Message(Base):
     replies: Mapped[List["Message"]] = relationship("Message", back_populates="parent")
     attachments: Mapped[List["Attachment"]] = relationship("Attachment", back_populates="message", cascade="all, delete-orphan")
     pinned_messages: Mapped[List["PinnedMessage"]] = relationship("PinnedMessage", back_populates="message", cascade="all, delete-orphan")
+    mentions: Mapped[List["Mention"]] = relationship("Mention", back_populates="message", cascade="all, delete-orphan")
+    revisions: Mapped[List["MessageRevision"]] = relationship("MessageRevision", back_populates="message", cascade="all, delete-orphan")
 
 class Attachment(Base):
     __tablename__ = "attachments"
 
-    attachment_id: Mapped[int] = mapped_column(primary_key=True)
-    message_id: Mapped[int] = mapped_column(ForeignKey("messages.message_id"), nullable=False, index=True)
+    attachment_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False, default=next_id)
+    message_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("messages.message_id"), nullable=False, index=True)
     url: Mapped[str] = mapped_column(String(255), nullable=False)
     file_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     file_size: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     mime_type: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    sha256: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, index=True)
+    thumbnail_sha256: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
 
@@ -47,9 +66,35 @@ class PinnedMessage(Base):
     __tablename__ = "pinned_messages"
 
     pin_id: Mapped[int] = mapped_column(primary_key=True)
-    message_id: Mapped[int] = mapped_column(ForeignKey("messages.message_id"), nullable=False, index=True)
+    message_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("messages.message_id"), nullable=False, index=True)
     room_id: Mapped[int] = mapped_column(ForeignKey("rooms.room_id"), nullable=False, index=True)
     pinned_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
 
     message: Mapped["Message"] = relationship("Message", back_populates="pinned_messages")
-    room: Mapped["Room"] = relationship("Room", back_populates="pinned_messages")
\ No newline at end of file
+    room: Mapped["Room"] = relationship("Room", back_populates="pinned_messages")
+
+
+class Mention(Base):
+    """A user named as ``@username`` in a message; the primary key is the mentioned user's inbox, newest last."""
+    __tablename__ = "mentions"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.user_id"), primary_key=True)
+    message_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("messages.message_id"), primary_key=True, index=True)
+    room_id: Mapped[int] = mapped_column(ForeignKey("rooms.room_id"), nullable=False)
+
+    message: Mapped["Message"] = relationship("Message", back_populates="mentions")
+
+
+class MessageRevision(Base):
+    """A replaced version of a message's text, stored as a delta from the version after it; see src.chat.revisions."""
+    __tablename__ = "message_revisions"
+
+    message_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("messages.message_id"), primary_key=True)
+    revision: Mapped[int] = mapped_column(Integer, primary_key=True)
+    content: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    # Full text rather than a delta, which bounds how many deltas a rebuild applies.
+    is_snapshot: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    # When this version was posted; it was replaced when the next one was.
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    message: Mapped["Message"] = relationship("Message", back_populates="revisions")
@@ -0,0 +1,98 @@
+from typing import Any, Optional
+import io
+import logging
+import os
+
+from sqlalchemy import func, literal, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.sharding import ShardMap
+from src.jobs.worker import Handler, RunInPool
+
+from .models import Attachment
+from .storage import BlobStore, LocalBlobStore
+
+try:
+    from PIL import Image
+except ImportError:  # thumbnails are optional
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+ATTACHMENT_METADATA = "attachment.metadata"
+THUMBNAIL_SIZE = (320, 320)
+
+SIGNATURES: list[tuple[int, bytes, str]] = [
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (0, b"%PDF-", "application/pdf"),
+    (0, b"PK\x03\x04", "application/zip"),
+    (0, b"ID3", "audio/mpeg"),
+    (0, b"OggS", "audio/ogg"),
+    (0, b"\x1a\x45\xdf\xa3", "video/webm"),
+    (4, b"ftyp", "video/mp4"),
+]
+
+
+def sniff_mime(head: bytes) -> Optional[str]:
+    """Guess a MIME type from the first bytes of a file."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for offset, signature, mime_type in SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return mime_type
+    return None
+
+
+def extract_metadata(path: str) -> dict[str, Any]:
+    """Read size, MIME type and a JPEG thumbnail of a blob.
+
+    Runs in a worker process, so it only takes and returns picklable values.
+    """
+    with open(path, "rb") as blob:
+        head = blob.read(64)
+    mime_type = sniff_mime(head)
+    thumbnail = None
+    if Image is not None and mime_type is not None and mime_type.startswith("image/"):
+        with Image.open(path) as image:
+            image.thumbnail(THUMBNAIL_SIZE)
+            buffer = io.BytesIO()
+            image.convert("RGB").save(buffer, "JPEG", quality=80)
+            thumbnail = buffer.getvalue()
+    return {"mime_type": mime_type, "file_size": os.path.getsize(path), "thumbnail": thumbnail}
+
+
+async def _single_chunk(data: bytes):
+    yield data
+
+
+def make_attachment_handler(session_maker: async_sessionmaker[AsyncSession], store: BlobStore,
+                            shard_map: Optional[ShardMap] = None) -> Handler:
+    """Build the job handler that fills in metadata for every attachment of a blob, on every shard with a shard map."""
+    if not isinstance(store, LocalBlobStore):
+        raise TypeError("Attachment processing needs a LocalBlobStore")
+
+    async def handle(payload: dict[str, Any], run_in_pool: RunInPool) -> None:
+        digest = payload["sha256"]
+        metadata = await run_in_pool(extract_metadata, str(store.path_for(digest)))
+        values: dict[str, Any] = {
+            "mime_type": func.coalesce(literal(metadata["mime_type"]), Attachment.mime_type),
+            "file_size": metadata["file_size"],
+        }
+        if metadata["thumbnail"]:
+            thumbnail = await store.write_stream(_single_chunk(metadata["thumbnail"]))
+            values["thumbnail_sha256"] = thumbnail.digest
+        # Deduplicated content: one job updates every attachment sharing the blob.
+        async def apply(session: AsyncSession) -> None:
+            await session.execute(update(Attachment).where(Attachment.sha256 == digest).values(**values))
+            await session.commit()
+
+        if shard_map is None:
+            async with session_maker() as session:
+                await apply(session)
+        else:
+            await shard_map.scatter(apply)
+
+    return handle
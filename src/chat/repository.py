@@ -0,0 +1,563 @@
+from datetime import datetime
+from typing import Any, Optional, Sequence
+import logging
+
+from sqlalchemy import Row, Select, case, delete, func, insert, literal, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from src.auth.models import User
+from src.core.clock import utcnow
+from src.core.ids import min_id_at, next_id
+from src.core.repository import BaseRepository
+from src.outbox.repository import OutboxRepository
+from src.rooms.models import Room, RoomMember
+
+from . import revisions
+from .mentions import UsernameCache, parse_mentions, username_cache
+from .models import Attachment, Mention, Message, MessageRevision
+from .schemas import edited_event, message_event
+from .storage import StoredBlob
+
+logger = logging.getLogger(__name__)
+
+# Broker channel of chat events, as ``{"room_id": ..., "event": {...}}``; see ConnectionHub.
+EVENTS_CHANNEL = "chat.events"
+
+
+def _message_columns(message: Any) -> tuple:
+    """Columns of MessageOut, in order, of ``message``, Message or an alias of it; deleted messages have no text."""
+    return (
+        message.message_id,
+        message.user_id,
+        message.room_id,
+        message.reply_to,
+        message.seq,
+        case((message.is_deleted, None), else_=message.message).label("message"),
+        message.is_deleted,
+        message.created_at,
+        message.updated_at,
+        message.reply_count,
+        message.last_reply_at,
+    )
+
+
+# Columns of MessageOut, in order; see get_history_rows.
+MESSAGE_COLUMNS = _message_columns(Message)
+
+# Characters of a parent message quoted in reply previews.
+PREVIEW_LENGTH = 100
+
+
+class MessageRepository(BaseRepository[Message]):
+    """Repository for Message model operations."""
+    def __init__(self, session: AsyncSession, usernames: UsernameCache = username_cache):
+        super().__init__(session, Message)
+        self.usernames = usernames
+
+    async def append(self, **message_data) -> Message:
+        """Create a message with the next sequence number of its room.
+
+        The room row stays locked until the commit, which serializes sends
+        within a room but not across rooms. A reply bumps the counters of its
+        parent in the same transaction; raises ValueError if the parent is
+        not a message of the same room. Users mentioned as ``@username`` are
+        added to the mention index, and the "message" event is written to
+        the outbox, both in the same transaction.
+        """
+        room_id = message_data["room_id"]
+        reply_to = message_data.get("reply_to")
+        try:
+            seq = await self.next_seq(room_id)
+            if reply_to is not None:
+                parent = await self.session.execute(
+                    update(Message)
+                    .where(Message.message_id == reply_to, Message.room_id == room_id)
+                    # Keep updated_at: it marks edits; last_reply_at versions the counters.
+                    .values(reply_count=Message.reply_count + 1, last_reply_at=func.now(),
+                            updated_at=Message.updated_at)
+                )
+                if parent.rowcount == 0:
+                    await self.session.rollback()
+                    raise ValueError(f"Message {reply_to} is not in room {room_id}")
+            message = Message(seq=seq, **message_data)
+            self.session.add(message)
+            await self.session.flush()
+            await self.session.refresh(message)
+            mentioned = await self.resolve_usernames(parse_mentions(message.message))
+            rows = [{"user_id": user_id, "message_id": message.message_id, "room_id": room_id}
+                    for user_id in set(mentioned.values()) if user_id != message.user_id]
+            if rows:
+                await self.session.execute(insert(Mention), rows)
+            OutboxRepository(self.session).add(EVENTS_CHANNEL, {"room_id": room_id, "event": message_event(message)})
+            await self.session.commit()
+            return message
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error appending message to room {room_id}: {e}")
+            raise
+
+    async def next_seq(self, room_id: int) -> int:
+        """Take the next sequence number of a room; the room row stays locked until the commit."""
+        result = await self.session.execute(
+            update(Room)
+            .where(Room.room_id == room_id)
+            # Keep updated_at: it versions the room metadata, not its messages.
+            .values(last_seq=Room.last_seq + 1, updated_at=Room.updated_at)
+            .returning(Room.last_seq)
+        )
+        return result.scalar_one()
+
+    async def edit(self, room_id: int, message_id: int, user_id: int, text: str) -> Optional[Message]:
+        """Replace the text of one's own live message, keeping the old text as a revision; see edit_many."""
+        [message] = await self.edit_many([(room_id, message_id, user_id, text)])
+        return message
+
+    async def edit_many(self, edits: Sequence[tuple[int, int, int, str]]) -> list[Optional[Message]]:
+        """Apply ``(room_id, message_id, user_id, text)`` edits, in order, in one transaction.
+
+        The rooms and then the messages are locked, in the order sends lock
+        them, so concurrent edits apply one after the other. Each edit stores
+        the old text as a revision (a delta from the new text, see
+        src.chat.revisions), updates the mention index and writes a
+        "message_edited" event with the next sequence number of the room,
+        kept as the message's ``changed_seq``. Returns, per edit, the
+        message, or None if ``room_id`` has no such live message by
+        ``user_id``; an unchanged text is not a new revision.
+        """
+        if not edits:
+            return []
+        room_ids = sorted({room_id for room_id, _, _, _ in edits})
+        try:
+            result = await self.session.execute(
+                select(Room.room_id, Room.last_seq).where(Room.room_id.in_(room_ids))
+                .order_by(Room.room_id).with_for_update()
+            )
+            last_seqs = dict(result.all())
+            result = await self.session.execute(
+                select(Message).where(Message.message_id.in_({message_id for _, message_id, _, _ in edits}))
+                .with_for_update()
+            )
+            messages = {message.message_id: message for message in result.scalars()}
+            mentioned = await self.resolve_usernames(
+                list({username for _, _, _, text in edits for username in parse_mentions(text)})
+            )
+            now = utcnow()
+            results: list[Optional[Message]] = []
+            edited: dict[int, Message] = {}
+            # Messages whose old text mentioned someone, whose mentions may be stale.
+            mentioning: set[int] = set()
+            events = []
+            for room_id, message_id, user_id, text in edits:
+                message = messages.get(message_id)
+                if message is None or message.room_id != room_id or message.user_id != user_id or message.is_deleted:
+                    results.append(None)
+                    continue
+                results.append(message)
+                if message.message == text:
+                    continue
+                revision = message.revision
+                content, snapshot = revisions.encode(text, message.message or "", revisions.is_snapshot(revision))
+                self.session.add(MessageRevision(message_id=message_id, revision=revision, content=content,
+                                                 is_snapshot=snapshot, created_at=message.updated_at))
+                if parse_mentions(message.message or ""):
+                    mentioning.add(message_id)
+                last_seqs[room_id] += 1
+                message.message = text
+                message.revision = revision + 1
+                message.changed_seq = last_seqs[room_id]
+                message.updated_at = now
+                edited[message_id] = message
+                events.append({"room_id": room_id, "event": edited_event(message)})
+            if not edited:
+                # Releases the locks; sessions do not expire objects on commit.
+                await self.session.commit()
+                return results
+
+            for room_id in {message.room_id for message in edited.values()}:
+                await self.session.execute(
+                    update(Room).where(Room.room_id == room_id)
+                    .values(last_seq=last_seqs[room_id], updated_at=Room.updated_at)
+                )
+            await self.session.flush()
+            rows = []
+            for message in edited.values():
+                users = {mentioned[username] for username in parse_mentions(message.message) if username in mentioned}
+                users.discard(message.user_id)
+                if message.message_id in mentioning:
+                    # Mentions the new text no longer has.
+                    await self.session.execute(
+                        delete(Mention).where(Mention.message_id == message.message_id, Mention.user_id.not_in(users))
+                    )
+                rows.extend({"user_id": mentioned_id, "message_id": message.message_id, "room_id": message.room_id}
+                            for mentioned_id in users)
+            if rows:
+                await self.session.execute(self._insert(Mention).on_conflict_do_nothing(), rows)
+            outbox = OutboxRepository(self.session)
+            for payload in events:
+                outbox.add(EVENTS_CHANNEL, payload)
+            await self.session.commit()
+            return results
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error applying {len(edits)} message edits: {e}")
+            raise
+
+    async def get_revisions(self, message: Message, before: int, limit: int) -> list[dict[str, Any]]:
+        """Versions of a message below revision ``before``, newest first, as ``{revision, message, created_at}``.
+
+        Reads the page's revision rows plus those up to the next snapshot,
+        so fewer than ``SNAPSHOT_EVERY`` rows beyond ``limit`` however many
+        times the message was edited.
+        """
+        before = min(before, message.revision)
+        first = max(before - limit, 0)
+        if before <= first:
+            return []
+        last = before - 1
+        top = min(message.revision, last + revisions.SNAPSHOT_EVERY - 1 - last % revisions.SNAPSHOT_EVERY + 1)
+        try:
+            result = await self.session.execute(
+                select(MessageRevision.revision, MessageRevision.content, MessageRevision.is_snapshot,
+                       MessageRevision.created_at)
+                .where(MessageRevision.message_id == message.message_id, MessageRevision.revision >= first,
+                       MessageRevision.revision < top)
+                .order_by(MessageRevision.revision.desc())
+            )
+            rows = result.all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching revisions of message {message.message_id}: {e}")
+            raise
+        texts = revisions.rebuild(message.message or "", [(row.content, row.is_snapshot) for row in rows])
+        return [
+            {"revision": row.revision, "message": text, "created_at": row.created_at}
+            for row, text in zip(rows, texts) if row.revision < before
+        ]
+
+    async def resolve_usernames(self, usernames: Sequence[str]) -> dict[str, int]:
+        """``{username: user_id}`` of the existing users among ``usernames``; cache misses cost one query."""
+        if not usernames:
+            return {}
+        cached, missing = self.usernames.lookup(usernames)
+        if missing:
+            try:
+                result = await self.session.execute(
+                    select(User.username, User.user_id).where(User.username.in_(missing))
+                )
+            except SQLAlchemyError as e:
+                logger.error(f"Error resolving {len(missing)} usernames: {e}")
+                raise
+            found = dict(result.all())
+            for username in missing:
+                cached[username] = found.get(username)
+                self.usernames.put(username, cached[username])
+        return {username: user_id for username, user_id in cached.items() if user_id is not None}
+
+    async def get_after_seq(self, room_id: int, after_seq: int, limit: int = 100,
+                            before_seq: Optional[int] = None) -> list[Message]:
+        """Messages of a room with a sequence above ``after_seq`` (and below ``before_seq``), in sequence order."""
+        try:
+            query = select(Message).where(Message.room_id == room_id, Message.seq > after_seq)
+            if before_seq is not None:
+                query = query.where(Message.seq < before_seq)
+            result = await self.session.execute(query.order_by(Message.seq).limit(limit))
+            return list(result.scalars().all())
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching messages of room {room_id} after seq {after_seq}: {e}")
+            raise
+
+    async def get_changed_after_seq(self, room_id: int, after_seq: int, limit: int = 100,
+                                    before_seq: Optional[int] = None) -> list[Message]:
+        """Messages of a room posted, or last edited or deleted, after ``after_seq`` (and before ``before_seq``).
+
+        These are the sources of the room's events in that range; see
+        src.chat.sync.room_events. In no particular order.
+        """
+        def in_range(column):
+            condition = column > after_seq
+            return condition & (column < before_seq) if before_seq is not None else condition
+
+        try:
+            result = await self.session.execute(
+                select(Message)
+                .where(Message.room_id == room_id, or_(in_range(Message.seq), in_range(Message.changed_seq)))
+                .limit(limit)
+            )
+            return list(result.scalars().all())
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching messages of room {room_id} changed after seq {after_seq}: {e}")
+            raise
+
+    async def get_latest_changed(self, room_id: int, limit: int = 100) -> list[Message]:
+        """The ``limit`` messages of a room edited or deleted last, by ``changed_seq``, newest first."""
+        try:
+            result = await self.session.execute(
+                select(Message)
+                .where(Message.room_id == room_id, Message.changed_seq.is_not(None))
+                .order_by(Message.changed_seq.desc())
+                .limit(limit)
+            )
+            return list(result.scalars().all())
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching latest changed messages of room {room_id}: {e}")
+            raise
+
+    async def get_latest_by_seq(self, room_id: int, limit: int = 100) -> list[Message]:
+        """The last ``limit`` sequenced messages of a room, in sequence order."""
+        try:
+            result = await self.session.execute(
+                select(Message)
+                .where(Message.room_id == room_id, Message.seq.is_not(None))
+                .order_by(Message.seq.desc())
+                .limit(limit)
+            )
+            return list(reversed(result.scalars().all()))
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching latest messages of room {room_id}: {e}")
+            raise
+
+    @staticmethod
+    def _history_query(query: Select, room_id: int, before_id: Optional[int], limit: int) -> Select:
+        query = query.where(Message.room_id == room_id)
+        if before_id is not None:
+            query = query.where(Message.message_id < before_id)
+        return query.order_by(Message.message_id.desc()).limit(limit)
+
+    async def get_history(self, room_id: int, before_id: Optional[int] = None, limit: int = 50) -> list[Message]:
+        """Fetch a page of room history, newest first, older than the ``before_id`` cursor."""
+        try:
+            result = await self.session.execute(self._history_query(select(Message), room_id, before_id, limit))
+            return list(result.scalars().all())
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching history of room {room_id} before {before_id}: {e}")
+            raise
+
+    async def get_history_rows(self, room_id: int, before_id: Optional[int] = None, limit: int = 50) -> Sequence[Row]:
+        """Same page as ``get_history`` as plain ``MESSAGE_COLUMNS`` rows, skipping ORM identity-map work."""
+        try:
+            result = await self.session.execute(
+                self._history_query(select(*MESSAGE_COLUMNS), room_id, before_id, limit)
+            )
+            return result.all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching history rows of room {room_id} before {before_id}: {e}")
+            raise
+
+    async def get_history_version(self, room_id: int, before_id: Optional[int] = None, limit: int = 50,
+                                  parents: bool = False) -> tuple[int, Optional[int], Optional[int], int, Optional[datetime]]:
+        """``(count, min_id, max_id, replies, last_modified)`` of a history page, for cache validation.
+
+        A page below ``before_id`` only changes when one of its messages is
+        edited, deleted or replied to, since new ids are always larger.
+        ``replies`` is the sum of the page's reply counters, and
+        ``last_modified`` the latest edit or reply; with ``parents`` it also
+        covers edits of the messages the page replies to (see ``get_previews``).
+        """
+        try:
+            page = self._history_query(
+                select(Message.message_id, Message.reply_to, Message.updated_at, Message.reply_count,
+                       Message.last_reply_at),
+                room_id, before_id, limit,
+            ).subquery()
+            query = select(
+                func.count(), func.min(page.c.message_id), func.max(page.c.message_id),
+                func.coalesce(func.sum(page.c.reply_count), 0), func.max(page.c.updated_at),
+                func.max(page.c.last_reply_at),
+            ).select_from(page)
+            if parents:
+                parent = aliased(Message)
+                query = query.outerjoin(parent, parent.message_id == page.c.reply_to).add_columns(
+                    func.max(parent.updated_at)
+                )
+            count, min_id, max_id, replies, *moments = (await self.session.execute(query)).one()
+            return count, min_id, max_id, replies, max(filter(None, moments), default=None)
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching history version of room {room_id} before {before_id}: {e}")
+            raise
+
+    async def get_thread(self, root_id: int, max_depth: int = 10, limit: int = 200) -> Sequence[Row]:
+        """A message and the replies under it, as ``MESSAGE_COLUMNS`` rows plus ``depth``, oldest first.
+
+        One recursive query walks ``reply_to`` down from the root, at most
+        ``max_depth`` levels deep, a level at a time. The walk stops once it
+        has produced ``limit`` rows, so a thread beyond ``limit`` keeps its
+        shallowest replies and the rest of the subtree is never read; the
+        rows are put in order here, since an ORDER BY would need them all.
+        Replies always have larger ids than their parents, which the walk
+        relies on to end even on inconsistent data. Empty if the root does
+        not exist.
+        """
+        try:
+            tree = (
+                select(*MESSAGE_COLUMNS, literal(0).label("depth"))
+                .where(Message.message_id == root_id)
+                .cte("thread", recursive=True)
+            )
+            reply = aliased(Message)
+            tree = tree.union_all(
+                select(*_message_columns(reply), tree.c.depth + 1)
+                .where(
+                    reply.reply_to == tree.c.message_id,
+                    reply.room_id == tree.c.room_id,
+                    reply.message_id > tree.c.message_id,
+                    tree.c.depth < max_depth,
+                )
+            )
+            result = await self.session.execute(select(tree).limit(limit))
+            return sorted(result.all(), key=lambda row: row.message_id)
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching thread of message {root_id}: {e}")
+            raise
+
+    async def get_ancestors(self, message_id: int, max_depth: int = 10) -> Sequence[Row]:
+        """A message and up to ``max_depth`` messages it replies to, as rows with ``depth``, root first.
+
+        ``depth`` counts the hops up from ``message_id``; the first row still
+        has a ``reply_to`` when the chain was cut at ``max_depth``.
+        """
+        try:
+            chain = (
+                select(*MESSAGE_COLUMNS, literal(0).label("depth"))
+                .where(Message.message_id == message_id)
+                .cte("ancestors", recursive=True)
+            )
+            parent = aliased(Message)
+            chain = chain.union_all(
+                select(*_message_columns(parent), chain.c.depth + 1)
+                .where(
+                    parent.message_id == chain.c.reply_to,
+                    parent.room_id == chain.c.room_id,
+                    parent.message_id < chain.c.message_id,
+                    chain.c.depth < max_depth,
+                )
+            )
+            result = await self.session.execute(select(chain).order_by(chain.c.depth.desc()))
+            return result.all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching ancestors of message {message_id}: {e}")
+            raise
+
+    async def get_previews(self, message_ids: Sequence[int]) -> dict[int, dict[str, Any]]:
+        """Previews of the given messages by id, in one query; deleted messages have no text.
+
+        Used to quote the parents of every reply on a history page without a
+        query per reply.
+        """
+        ids = set(message_ids)
+        if not ids:
+            return {}
+        try:
+            result = await self.session.execute(
+                select(
+                    Message.message_id,
+                    Message.user_id,
+                    case((Message.is_deleted, None), else_=func.substr(Message.message, 1, PREVIEW_LENGTH))
+                    .label("message"),
+                    Message.is_deleted,
+                ).where(Message.message_id.in_(ids))
+            )
+            return {row.message_id: row._asdict() for row in result}
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching previews of {len(ids)} messages: {e}")
+            raise
+
+    async def get_mentions(self, user_id: int, before_id: Optional[int] = None, limit: int = 50) -> Sequence[Row]:
+        """Live messages mentioning a user in rooms they are still a member of, newest first, as ``MESSAGE_COLUMNS`` rows.
+
+        Pages are keyset-paginated on the mention index: pass the last
+        ``message_id`` of a page as ``before_id`` for the next one.
+        """
+        query = (
+            select(*MESSAGE_COLUMNS)
+            .select_from(Mention)
+            .join(Message, Message.message_id == Mention.message_id)
+            .join(RoomMember, (RoomMember.room_id == Mention.room_id) & (RoomMember.user_id == Mention.user_id))
+            .where(Mention.user_id == user_id, Message.is_deleted.is_(False))
+        )
+        if before_id is not None:
+            query = query.where(Mention.message_id < before_id)
+        try:
+            result = await self.session.execute(query.order_by(Mention.message_id.desc()).limit(limit))
+            return result.all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching mentions of user {user_id} before {before_id}: {e}")
+            raise
+
+    async def get_since(self, room_id: int, since: datetime, limit: int = 500) -> list[Message]:
+        """Fetch messages created at or after ``since``, oldest first.
+
+        Message ids encode their creation time, so this is a primary key
+        range scan on (room_id, message_id) rather than a created_at filter.
+        """
+        try:
+            result = await self.session.execute(
+                select(Message)
+                .where(Message.room_id == room_id, Message.message_id >= min_id_at(since))
+                .order_by(Message.message_id)
+                .limit(limit)
+            )
+            return list(result.scalars().all())
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching messages of room {room_id} since {since}: {e}")
+            raise
+
+
+class AttachmentRepository(BaseRepository[Attachment]):
+    """Repository for Attachment model operations."""
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, Attachment)
+
+    async def create_for_blob(
+        self,
+        message_id: int,
+        blob: StoredBlob,
+        file_name: Optional[str] = None,
+        mime_type: Optional[str] = None,
+    ) -> Attachment:
+        """Attach a stored blob to a message.
+
+        When the blob already existed, metadata extracted for an earlier
+        attachment of the same content is reused.
+        """
+        try:
+            thumbnail_sha256 = None
+            if not blob.created:
+                result = await self.session.execute(
+                    select(Attachment.thumbnail_sha256)
+                    .where(Attachment.sha256 == blob.digest, Attachment.thumbnail_sha256.is_not(None))
+                    .limit(1)
+                )
+                thumbnail_sha256 = result.scalar_one_or_none()
+            attachment_id = next_id()
+            attachment = Attachment(
+                attachment_id=attachment_id,
+                message_id=message_id,
+                url=f"/attachments/{attachment_id}/content",
+                sha256=blob.digest,
+                file_size=blob.size,
+                file_name=file_name,
+                mime_type=mime_type,
+                thumbnail_sha256=thumbnail_sha256,
+            )
+            self.session.add(attachment)
+            await self.session.commit()
+            return attachment
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error creating attachment for message {message_id}: {e}")
+            raise
+
+    async def get_with_room(self, attachment_id: int) -> tuple[Attachment, int] | None:
+        """Fetch an attachment together with the room of its message."""
+        try:
+            result = await self.session.execute(
+                select(Attachment, Message.room_id)
+                .join(Message, Message.message_id == Attachment.message_id)
+                .where(Attachment.attachment_id == attachment_id)
+            )
+            row = result.one_or_none()
+            return (row[0], row[1]) if row is not None else None
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching attachment {attachment_id}: {e}")
+            raise
@@ -0,0 +1,337 @@
+from typing import Optional
+import re
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.auth.dependencies import get_current_session, get_current_user_id
+from src.core.admission import Priority, admit
+from src.core.database import get_db, get_room_db, get_shard_map, request_room_session
+from src.core.ratelimit import UPLOAD_PER_USER, rate_limit
+from src.core.http_cache import ResponseCache, Validators, conditional_response, get_response_cache, make_etag
+from src.core.serialization import FastJSONResponse, RowEncoder, json_id
+from src.core.settings import settings
+from src.jobs.queue import JobQueue, get_job_queue
+from src.rooms.repository import RoomMemberRepository
+
+from .models import Attachment, Message
+from .processing import ATTACHMENT_METADATA
+from .repository import MESSAGE_COLUMNS, AttachmentRepository, MessageRepository
+from .schemas import MESSAGE_REVISIONS, THREAD, AttachmentOut, MessageOut, MessageRevisionsOut, ThreadOut
+from .storage import BlobStore, BlobTooLarge, get_blob_store
+
+router = APIRouter(tags=["chat"])
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+MESSAGE_ROWS = RowEncoder([column.key for column in MESSAGE_COLUMNS], ids=("message_id", "reply_to"))
+
+
+def parse_range(header: str, size: int) -> tuple[int, int]:
+    """Parse a single-range ``Range`` header into inclusive byte offsets."""
+    match = RANGE_RE.match(header.strip())
+    if match is None or size == 0:
+        raise ValueError(header)
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    elif last:
+        start = max(size - int(last), 0)
+        end = size - 1
+    else:
+        raise ValueError(header)
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+async def get_message_db(message_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """Like get_room_db, for endpoints scoped to the ``message_id`` path parameter; sharded rooms are looked up."""
+    shard_map = get_shard_map()
+    room_id = None
+    if shard_map is not None:
+        room_id = await shard_map.locate_room(select(Message.room_id).where(Message.message_id == message_id))
+    async with request_room_session(request, db, room_id) as session:
+        yield session
+
+
+async def get_attachment_db(attachment_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """Like get_message_db, for endpoints scoped to the ``attachment_id`` path parameter."""
+    shard_map = get_shard_map()
+    room_id = None
+    if shard_map is not None:
+        room_id = await shard_map.locate_room(
+            select(Message.room_id)
+            .join(Attachment, Attachment.message_id == Message.message_id)
+            .where(Attachment.attachment_id == attachment_id)
+        )
+    async with request_room_session(request, db, room_id) as session:
+        yield session
+
+
+@router.post(
+    "/messages/{message_id}/attachments",
+    response_model=AttachmentOut,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(admit(Priority.NORMAL)), Depends(get_current_session),
+                  Depends(rate_limit(UPLOAD_PER_USER, key="user"))],
+)
+async def upload_attachment(
+    message_id: int,
+    request: Request,
+    file_name: Optional[str] = None,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_message_db),
+    store: BlobStore = Depends(get_blob_store),
+    job_queue: JobQueue = Depends(get_job_queue),
+):
+    """Upload the raw request body as an attachment of one's own message.
+
+    MIME sniffing and thumbnails are left to the job worker, so the response
+    does not wait for them.
+    """
+    message = await MessageRepository(db).get_by_id(message_id)
+    if message is None or message.is_deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
+    if message.user_id != user_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not the author of the message")
+
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        if not content_length.isdigit():
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Content-Length")
+        if int(content_length) > settings.MAX_UPLOAD_SIZE:
+            raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail="File too large")
+    try:
+        blob = await store.write_stream(request.stream(), max_size=settings.MAX_UPLOAD_SIZE)
+    except BlobTooLarge:
+        raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail="File too large")
+
+    attachment = await AttachmentRepository(db).create_for_blob(
+        message_id,
+        blob,
+        file_name=file_name,
+        mime_type=request.headers.get("content-type"),
+    )
+    await job_queue.enqueue(ATTACHMENT_METADATA, {"sha256": blob.digest}, dedup_key=f"{ATTACHMENT_METADATA}:{blob.digest}")
+    return attachment
+
+
+async def _get_readable_attachment(db: AsyncSession, attachment_id: int, user_id: int) -> Attachment:
+    found = await AttachmentRepository(db).get_with_room(attachment_id)
+    if found is None or found[0].sha256 is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Attachment not found")
+    attachment, room_id = found
+    if await RoomMemberRepository(db).get_membership(room_id, user_id) is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not a member of the room")
+    return attachment
+
+
+async def _stream_blob(
+    store: BlobStore,
+    digest: str,
+    media_type: str,
+    range_header: Optional[str],
+) -> StreamingResponse:
+    size = await store.size(digest)
+    if size is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Attachment content missing")
+
+    headers = {"Accept-Ranges": "bytes", "ETag": f'"{digest}"'}
+    if range_header is None:
+        start, end, status_code = 0, size - 1, status.HTTP_200_OK
+    else:
+        try:
+            start, end = parse_range(range_header, size)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_416_RANGE_NOT_SATISFIABLE,
+                detail="Invalid range",
+                headers={"Content-Range": f"bytes */{size}"},
+            )
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        store.read_range(digest, start, end),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers,
+    )
+
+
+@router.get("/attachments/{attachment_id}/content", dependencies=[Depends(admit(Priority.NORMAL))])
+async def download_attachment(
+    attachment_id: int,
+    range_header: Optional[str] = Header(None, alias="range"),
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_attachment_db),
+    store: BlobStore = Depends(get_blob_store),
+):
+    """Stream an attachment, honouring single ``Range`` requests."""
+    attachment = await _get_readable_attachment(db, attachment_id, user_id)
+    media_type = attachment.mime_type or "application/octet-stream"
+    return await _stream_blob(store, attachment.sha256, media_type, range_header)
+
+
+@router.get("/attachments/{attachment_id}/thumbnail", dependencies=[Depends(admit(Priority.NORMAL))])
+async def download_thumbnail(
+    attachment_id: int,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_attachment_db),
+    store: BlobStore = Depends(get_blob_store),
+):
+    """Stream the JPEG thumbnail generated by the attachment worker."""
+    attachment = await _get_readable_attachment(db, attachment_id, user_id)
+    if attachment.thumbnail_sha256 is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No thumbnail")
+    return await _stream_blob(store, attachment.thumbnail_sha256, "image/jpeg", None)
+
+
+@router.get("/rooms/{room_id}/messages", response_model=list[MessageOut], dependencies=[Depends(admit(Priority.LOW))])
+async def get_room_history(
+    request: Request,
+    room_id: int,
+    before: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    compact: bool = False,
+    parents: bool = False,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_room_db),
+    cache: ResponseCache = Depends(get_response_cache),
+):
+    """Page through room history, newest first; pass the last ``message_id`` as ``before``.
+
+    Rows are encoded straight to JSON. With ``compact`` the field names are
+    sent once as ``{"fields": [...], "rows": [[...], ...]}``. With
+    ``parents`` every message carries a ``parent`` preview of the message it
+    replies to (in compact form, a ``parents`` object keyed by id), loaded
+    for the whole page in one query. Pages carry an ETag built from their id
+    range, reply counters and latest change, so unchanged pages are
+    revalidated without fetching or encoding the messages.
+    """
+    if await RoomMemberRepository(db).get_membership(room_id, user_id) is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not a member of the room")
+    repo = MessageRepository(db)
+    count, min_id, max_id, replies, last_modified = await repo.get_history_version(
+        room_id, before_id=before, limit=limit, parents=parents
+    )
+    validators = Validators(
+        make_etag("history", room_id, before, limit, compact, parents, count, min_id, max_id, replies, last_modified),
+        last_modified,
+    )
+
+    async def render() -> bytes:
+        rows = await repo.get_history_rows(room_id, before_id=before, limit=limit)
+        if not parents:
+            return MESSAGE_ROWS.encode_compact(rows) if compact else MESSAGE_ROWS.encode(rows)
+        previews = {
+            message_id: {**preview, "message_id": json_id(message_id)}
+            for message_id, preview in (await repo.get_previews([row.reply_to for row in rows if row.reply_to is not None])).items()
+        }
+        if compact:
+            return MESSAGE_ROWS.encode_compact(rows, parents=previews)
+        return MESSAGE_ROWS.encode(rows, parent=[previews.get(row.reply_to) for row in rows])
+
+    key = ("history", room_id, before, limit, compact, parents)
+    return await conditional_response(request, cache, key, validators, render)
+
+
+@router.get("/messages/{message_id}/thread", response_model=ThreadOut, dependencies=[Depends(admit(Priority.LOW))])
+async def get_thread(
+    message_id: int,
+    depth: int = Query(10, ge=1, le=50),
+    limit: int = Query(200, ge=1, le=1000),
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_message_db),
+):
+    """A message and the replies under it, oldest first, each with its ``depth`` below the root.
+
+    ``truncated`` is set when more than ``limit`` messages or replies deeper
+    than ``depth`` were left out.
+    """
+    rows = await MessageRepository(db).get_thread(message_id, max_depth=depth, limit=limit + 1)
+    if not rows:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
+    if await RoomMemberRepository(db).get_membership(rows[0].room_id, user_id) is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not a member of the room")
+    truncated = len(rows) > limit or any(row.depth == depth and row.reply_count for row in rows)
+    return FastJSONResponse(THREAD.encode({"messages": rows[:limit], "truncated": truncated}))
+
+
+@router.get("/messages/{message_id}/ancestors", response_model=ThreadOut, dependencies=[Depends(admit(Priority.LOW))])
+async def get_ancestors(
+    message_id: int,
+    depth: int = Query(10, ge=1, le=50),
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_message_db),
+):
+    """The chain of messages a reply answers, root first and ending with the reply itself.
+
+    ``depth`` counts hops up from the reply; ``truncated`` is set when the
+    chain goes further up than that.
+    """
+    rows = await MessageRepository(db).get_ancestors(message_id, max_depth=depth)
+    if not rows:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
+    if await RoomMemberRepository(db).get_membership(rows[0].room_id, user_id) is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not a member of the room")
+    return FastJSONResponse(THREAD.encode({"messages": rows, "truncated": rows[0].reply_to is not None}))
+
+
+@router.get("/messages/{message_id}/revisions", response_model=MessageRevisionsOut,
+            dependencies=[Depends(admit(Priority.LOW))])
+async def get_revisions(
+    message_id: int,
+    before: Optional[int] = Query(None, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_message_db),
+):
+    """Earlier versions of a message, newest first; pass the last ``revision`` as ``before``.
+
+    Each version is rebuilt from the compact deltas of the edit history,
+    never from more than a few rows per version.
+    """
+    repo = MessageRepository(db)
+    message = await repo.get_by_id(message_id)
+    if message is None or message.is_deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
+    if await RoomMemberRepository(db).get_membership(message.room_id, user_id) is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not a member of the room")
+    versions = await repo.get_revisions(message, message.revision if before is None else before, limit)
+    return FastJSONResponse(MESSAGE_REVISIONS.encode(
+        {"message_id": message_id, "revision": message.revision, "revisions": versions}
+    ))
+
+
+@router.get("/mentions", response_model=list[MessageOut], dependencies=[Depends(admit(Priority.LOW))])
+async def get_mentions(
+    before: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    compact: bool = False,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """Messages that mention the current user, newest first; pass the last ``message_id`` as ``before``.
+
+    Only rooms the user is still a member of are included. ``compact`` works
+    as for room history. With sharded rooms every shard is asked for a page.
+    """
+    shard_map = get_shard_map()
+    if shard_map is None:
+        rows = await MessageRepository(db).get_mentions(user_id, before_id=before, limit=limit)
+    else:
+        async def mentions(session: AsyncSession):
+            return await MessageRepository(session).get_mentions(user_id, before_id=before, limit=limit)
+
+        per_shard = await shard_map.scatter(mentions)
+        rows = sorted(
+            (row for shard, found in per_shard.items() for row in found if shard_map.shard_for(row.room_id) == shard),
+            key=lambda row: row.message_id,
+            reverse=True,
+        )[:limit]
+    return FastJSONResponse(MESSAGE_ROWS.encode_compact(rows) if compact else MESSAGE_ROWS.encode(rows))
@@ -0,0 +1,137 @@
+from datetime import datetime
+from typing import Annotated, Any, Literal, Optional, Union
+
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, model_validator
+
+from src.core.serialization import Encoder, JsonId, json_id
+
+from .models import Message
+
+
+class AttachmentOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    attachment_id: JsonId
+    message_id: JsonId
+    url: str
+    file_name: Optional[str] = None
+    file_size: Optional[int] = None
+    mime_type: Optional[str] = None
+    sha256: Optional[str] = None
+    thumbnail_sha256: Optional[str] = None
+
+
+class MessageOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    message_id: JsonId
+    user_id: int
+    room_id: int
+    reply_to: Optional[JsonId] = None
+    seq: Optional[int] = None
+    message: Optional[str] = None
+    is_deleted: bool
+    created_at: datetime
+    updated_at: datetime
+    reply_count: int = 0
+    last_reply_at: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def _hide_deleted_text(self) -> "MessageOut":
+        # Deleted messages keep their row, but not their text, as in MESSAGE_COLUMNS reads.
+        if self.is_deleted:
+            self.message = None
+        return self
+
+
+MESSAGE_LIST = Encoder(list[MessageOut])
+
+
+def message_event(message: Message) -> dict[str, Any]:
+    """The "message" event broadcast for a stored message."""
+    return {"type": "message", **MessageOut.model_validate(message).model_dump(mode="json")}
+
+
+def edited_event(message: Message) -> dict[str, Any]:
+    """The "message_edited" event; its ``seq`` is the one the edit took, ``changed_seq``."""
+    return {
+        "type": "message_edited",
+        "seq": message.changed_seq,
+        "message_id": json_id(message.message_id),
+        "room_id": message.room_id,
+        "message": message.message,
+        "revision": message.revision,
+        "updated_at": message.updated_at.isoformat(),
+    }
+
+
+def deleted_event(room_id: int, seq: int, message_ids: list[int]) -> dict[str, Any]:
+    """The "messages_deleted" event of messages of one room deleted together."""
+    return {"type": "messages_deleted", "seq": seq, "room_id": room_id,
+            "message_ids": [json_id(message_id) for message_id in message_ids]}
+
+
+class MessageRevisionOut(BaseModel):
+    revision: int
+    message: str
+    created_at: datetime
+
+
+class MessageRevisionsOut(BaseModel):
+    """Earlier versions of a message, newest first; ``revision`` is the number of the current one."""
+    message_id: JsonId
+    revision: int
+    revisions: list[MessageRevisionOut]
+
+
+MESSAGE_REVISIONS = Encoder(MessageRevisionsOut)
+
+
+class MessagePreview(BaseModel):
+    """The start of a message quoted by its replies; ``message`` is None once deleted."""
+    message_id: JsonId
+    user_id: int
+    message: Optional[str] = None
+    is_deleted: bool
+
+
+class ThreadMessageOut(MessageOut):
+    depth: int
+
+
+class ThreadOut(BaseModel):
+    """Messages of a thread or reply chain; ``truncated`` when depth or size limits cut it short."""
+    messages: list[ThreadMessageOut]
+    truncated: bool
+
+
+THREAD = Encoder(ThreadOut)
+
+
+class SendMessageIn(BaseModel):
+    type: Literal["send"]
+    room_id: int
+    message: str = Field(min_length=1, max_length=4096)
+    reply_to: Optional[int] = None
+
+
+class EditMessageIn(BaseModel):
+    type: Literal["edit"]
+    room_id: int
+    message_id: int
+    message: str = Field(min_length=1, max_length=4096)
+
+
+class TypingIn(BaseModel):
+    type: Literal["typing"]
+    room_id: int
+
+
+class SyncIn(BaseModel):
+    """Last seen sequence per room, sent after reconnecting."""
+    type: Literal["sync"]
+    rooms: dict[int, int]
+
+
+ClientEvent = Annotated[Union[SendMessageIn, EditMessageIn, TypingIn, SyncIn], Field(discriminator="type")]
+CLIENT_EVENT = TypeAdapter(ClientEvent)
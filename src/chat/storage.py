@@ -0,0 +1,120 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Optional
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+
+from src.core.settings import settings
+
+DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobTooLarge(Exception):
+    """Raised when a stream exceeds the allowed upload size."""
+
+
+@dataclass(frozen=True, slots=True)
+class StoredBlob:
+    digest: str
+    size: int
+    created: bool
+
+
+class BlobStore(ABC):
+    """Content-addressed storage for attachment bodies, keyed by SHA-256."""
+
+    @abstractmethod
+    async def write_stream(self, chunks: AsyncIterable[bytes], max_size: Optional[int] = None) -> StoredBlob:
+        """Store a stream, hashing it on the fly; identical content is stored once."""
+
+    @abstractmethod
+    async def size(self, digest: str) -> Optional[int]:
+        """Size of a stored blob, or ``None`` if it does not exist."""
+
+    @abstractmethod
+    def read_range(self, digest: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Stream bytes ``start..end`` (inclusive) of a blob."""
+
+
+class LocalBlobStore(BlobStore):
+    """Blob store on the local filesystem.
+
+    Uploads are written chunk by chunk to a temporary file in the same
+    directory tree and atomically renamed to ``<root>/<aa>/<bb>/<digest>``, so
+    memory per upload is one chunk regardless of the file size.
+    """
+
+    def __init__(self, root: str | os.PathLike, chunk_size: int = 64 * 1024):
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+        self._tmp = self.root / "tmp"
+        self._tmp.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, digest: str) -> Path:
+        if not DIGEST_RE.match(digest):
+            raise ValueError(f"Invalid blob digest {digest!r}")
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    async def write_stream(self, chunks: AsyncIterable[bytes], max_size: Optional[int] = None) -> StoredBlob:
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_name = tempfile.mkstemp(dir=self._tmp)
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise BlobTooLarge(f"Upload exceeds {max_size} bytes")
+                    hasher.update(chunk)
+                    await asyncio.to_thread(tmp_file.write, chunk)
+            digest = hasher.hexdigest()
+            created = await asyncio.to_thread(self._commit, tmp_name, digest)
+            return StoredBlob(digest, size, created)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def _commit(self, tmp_name: str, digest: str) -> bool:
+        path = self.path_for(digest)
+        if path.exists():
+            os.unlink(tmp_name)
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_name, path)
+        return True
+
+    async def size(self, digest: str) -> Optional[int]:
+        try:
+            return (await asyncio.to_thread(os.stat, self.path_for(digest))).st_size
+        except FileNotFoundError:
+            return None
+
+    async def read_range(self, digest: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        with open(self.path_for(digest), "rb") as blob:
+            await asyncio.to_thread(blob.seek, start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                size = self.chunk_size if remaining is None else min(self.chunk_size, remaining)
+                chunk = await asyncio.to_thread(blob.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+
+_blob_store: BlobStore | None = None
+
+
+def get_blob_store() -> BlobStore:
+    """Return the configured blob store."""
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = LocalBlobStore(settings.BLOB_STORAGE_PATH, settings.UPLOAD_CHUNK_SIZE)
+    return _blob_store
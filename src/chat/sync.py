@@ -0,0 +1,236 @@
+from bisect import bisect_right, insort
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.database import room_session
+from src.core.serialization import json_id
+
+from .framing import EncodedEvent
+from .models import Message
+from .repository import MessageRepository
+from .schemas import deleted_event, edited_event, message_event
+
+logger = logging.getLogger(__name__)
+
+
+def room_events(
+    messages: Iterable[Message], after: int, before: Optional[int] = None
+) -> list[tuple[int, dict[str, Any]]]:
+    """``(seq, event)`` of the room events of ``messages`` in the range ``(after, before)``, in order.
+
+    A message is the source of its "message" event at ``seq`` and of the
+    event of its last edit or deletion at ``changed_seq``, where messages
+    deleted together share one "messages_deleted" event. The sequences of
+    earlier edits are gone: the last event of a message supersedes them.
+    """
+    def in_range(seq: Optional[int]) -> bool:
+        return seq is not None and seq > after and (before is None or seq < before)
+
+    events: dict[int, dict[str, Any]] = {}
+    for message in messages:
+        if in_range(message.seq):
+            events[message.seq] = message_event(message)
+        if in_range(message.changed_seq):
+            if not message.is_deleted:
+                events[message.changed_seq] = edited_event(message)
+            elif message.changed_seq in events:
+                events[message.changed_seq]["message_ids"].append(json_id(message.message_id))
+            else:
+                events[message.changed_seq] = deleted_event(message.room_id, message.changed_seq, [message.message_id])
+    for event in events.values():
+        if event["type"] == "messages_deleted":
+            event["message_ids"].sort(key=int)
+    return sorted(events.items(), key=lambda item: item[0])
+
+
+class RoomLog:
+    """The most recent sequenced events of one room.
+
+    ``start`` is the lowest sequence the log can answer for: every event
+    from ``start`` on that reached this worker is kept, up to ``capacity``.
+    Events may arrive slightly out of order from different workers, so
+    ``since`` refuses to answer across a hole instead of skipping it,
+    unless the hole is at or below ``loaded_through``: the database had
+    nothing there when the log was seeded, as for edits superseded by a
+    later edit of the same message.
+    """
+    __slots__ = ("capacity", "start", "seeded", "loaded_through", "_seqs", "_events")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.start: Optional[int] = None
+        self.seeded = False
+        self.loaded_through = 0
+        self._seqs: list[int] = []
+        self._events: dict[int, EncodedEvent] = {}
+
+    def __len__(self) -> int:
+        return len(self._seqs)
+
+    def add(self, seq: int, event: EncodedEvent) -> None:
+        if seq in self._events or (self.start is not None and seq < self.start):
+            return
+        if self.start is None:
+            self.start = seq
+        if not self._seqs or seq > self._seqs[-1]:
+            self._seqs.append(seq)
+        else:
+            insort(self._seqs, seq)
+        self._events[seq] = event
+        self._trim()
+
+    def seed(self, start: int, events: Iterable[tuple[int, EncodedEvent]]) -> None:
+        """Merge events loaded from the database that cover every sequence from ``start`` on."""
+        self.start = start if self.start is None else min(self.start, start)
+        for seq, event in events:
+            if seq not in self._events:
+                insort(self._seqs, seq)
+                self._events[seq] = event
+            self.loaded_through = max(self.loaded_through, seq)
+        self.seeded = True
+        self._trim()
+
+    def _trim(self) -> None:
+        excess = len(self._seqs) - self.capacity
+        if excess > 0:
+            for seq in self._seqs[:excess]:
+                del self._events[seq]
+            self.start = self._seqs[excess - 1] + 1
+            del self._seqs[:excess]
+
+    def since(self, after: int) -> Optional[list[EncodedEvent]]:
+        """Every event after ``after``, or None if the log cannot vouch for the whole range."""
+        if self.start is None or after + 1 < self.start:
+            return None
+        events = []
+        expected = after + 1
+        for seq in self._seqs[bisect_right(self._seqs, after):]:
+            if seq != expected and seq - 1 > self.loaded_through:
+                return None
+            events.append(self._events[seq])
+            expected += 1
+        return events
+
+
+@dataclass(frozen=True, slots=True)
+class Replay:
+    """Events a client missed in one room.
+
+    ``source`` is "memory", "database", or "reset" when the gap is larger
+    than the replay limit and the client should refetch history instead.
+    """
+    events: list[EncodedEvent]
+    source: str
+
+
+@dataclass
+class SyncMetrics:
+    memory: int = 0
+    database: int = 0
+    resets: int = 0
+    seeds: int = 0
+
+
+class SyncService:
+    """Replays missed room events to reconnecting clients.
+
+    Every worker records every sequenced event it receives from the broker
+    (new messages, edits and deletions) in a bounded per-room log, with LRU
+    eviction of whole rooms. A miss
+    seeds the room's log from the database once, shared by all concurrent
+    reconnects to that room, so a reconnect storm costs about one query per
+    room instead of one per client.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        capacity: int = 64,
+        max_rooms: int = 2000,
+        max_replay: int = 500,
+    ):
+        self.session_maker = session_maker
+        self.capacity = capacity
+        self.max_rooms = max_rooms
+        self.max_replay = max_replay
+        self.metrics = SyncMetrics()
+        self._logs: OrderedDict[int, RoomLog] = OrderedDict()
+        self._seeding: dict[int, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._logs)
+
+    def _log(self, room_id: int) -> RoomLog:
+        log = self._logs.get(room_id)
+        if log is None:
+            log = self._logs[room_id] = RoomLog(self.capacity)
+            while len(self._logs) > self.max_rooms:
+                self._logs.popitem(last=False)
+        else:
+            self._logs.move_to_end(room_id)
+        return log
+
+    def record(self, room_id: int, seq: int, event: EncodedEvent) -> None:
+        self._log(room_id).add(seq, event)
+
+    async def replay(self, room_id: int, after: int) -> Replay:
+        log = self._log(room_id)
+        events = log.since(after)
+        if events is None and not log.seeded:
+            await self._seed(room_id, log)
+            events = log.since(after)
+        if events is not None:
+            if len(events) > self.max_replay:
+                self.metrics.resets += 1
+                return Replay([], "reset")
+            self.metrics.memory += 1
+            return Replay(events, "memory")
+
+        # Only the part older than the log comes from the database.
+        tail = log.since(log.start - 1) if log.start is not None else None
+        before = log.start if tail is not None else None
+        async with room_session(self.session_maker, room_id) as db:
+            messages = await MessageRepository(db).get_changed_after_seq(
+                room_id, after, limit=self.max_replay + 1, before_seq=before
+            )
+        # Every message is the source of at least one event in the range.
+        if len(messages) > self.max_replay:
+            self.metrics.resets += 1
+            return Replay([], "reset")
+        events = [EncodedEvent(event) for _, event in room_events(messages, after, before)] + (tail or [])
+        if len(events) > self.max_replay:
+            self.metrics.resets += 1
+            return Replay([], "reset")
+        self.metrics.database += 1
+        return Replay(events, "database")
+
+    async def _seed(self, room_id: int, log: RoomLog) -> None:
+        seeding = self._seeding.get(room_id)
+        if seeding is None:
+            seeding = asyncio.ensure_future(self._load(room_id, log))
+            self._seeding[room_id] = seeding
+            seeding.add_done_callback(lambda _: self._seeding.pop(room_id, None))
+        try:
+            await asyncio.shield(seeding)
+        except Exception as e:
+            logger.error(f"Error seeding sync log of room {room_id}: {e}")
+
+    async def _load(self, room_id: int, log: RoomLog) -> None:
+        async with room_session(self.session_maker, room_id) as db:
+            repo = MessageRepository(db)
+            messages = await repo.get_latest_by_seq(room_id, limit=self.capacity)
+            changed = await repo.get_latest_changed(room_id, limit=self.capacity)
+        # Below the oldest row of a full page there may be events that were not loaded; a
+        # "messages_deleted" event at the oldest changed_seq may be missing some of its messages.
+        start = max(
+            messages[0].seq if len(messages) == self.capacity else 1,
+            changed[-1].changed_seq + 1 if len(changed) == self.capacity else 1,
+        )
+        sources = {message.message_id: message for message in messages + changed}.values()
+        log.seed(start, [(seq, EncodedEvent(event)) for seq, event in room_events(sources, start - 1)])
+        self.metrics.seeds += 1
@@ -0,0 +1,219 @@
+from typing import Optional
+import asyncio
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Response, WebSocket, status
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.auth.dependencies import resolve_session
+from src.core.admission import Overloaded, Priority, get_admission
+from src.core.database import get_session_maker, get_shard_map, room_session
+from src.core.ratelimit import allow_message_send, auth_blocked, auth_failed, client_ip
+from src.moderation.engine import BanEngine, get_ban_engine
+from src.presence.service import PresenceService, get_presence
+from src.rooms.repository import RoomMemberRepository
+from src.rooms.sharding import ShardedRoomStore
+
+from .edits import EditBatcher, get_edit_batcher
+from .framing import CODECS, DeflateCodec, negotiate
+from .hub import Connection, ConnectionHub, get_chat_hub
+from .repository import MessageRepository
+from .schemas import CLIENT_EVENT, EditMessageIn, SendMessageIn, SyncIn, TypingIn
+from .sync import Replay
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["chat"])
+
+
+def _token(websocket: WebSocket, token: Optional[str]) -> Optional[str]:
+    if token:
+        return token
+    scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+    return credentials if scheme.lower() == "bearer" and credentials else None
+
+
+async def _room_ids(db: AsyncSession, user_id: int) -> list[int]:
+    """Rooms of a user; with sharded rooms, gathered from every shard."""
+    shard_map = get_shard_map()
+    if shard_map is None:
+        return await RoomMemberRepository(db).get_room_ids(user_id)
+    return [member.room_id for member in await ShardedRoomStore(shard_map).user_rooms(user_id)]
+
+
+async def _send_message(
+    connection: Connection,
+    event: SendMessageIn,
+    session_maker: async_sessionmaker[AsyncSession],
+    ban_engine: BanEngine,
+) -> None:
+    user_id = connection.user_id
+    if event.room_id not in connection.rooms or not ban_engine.can_send(user_id, event.room_id):
+        connection.send_event({"type": "error", "detail": "Cannot send to this room", "room_id": event.room_id})
+        return
+    retry_after = await allow_message_send(user_id, event.room_id)
+    if retry_after:
+        connection.send_event({"type": "error", "detail": "Rate limited", "retry_after": retry_after})
+        return
+    try:
+        async with get_admission().slot(Priority.HIGH), room_session(session_maker, event.room_id, write=True) as db:
+            # Published through the outbox once committed.
+            await MessageRepository(db).append(
+                user_id=user_id, room_id=event.room_id, message=event.message, reply_to=event.reply_to
+            )
+    except Overloaded as e:
+        connection.send_event({"type": "error", "detail": "Overloaded", "retry_after": e.retry_after})
+    except ValueError:
+        connection.send_event({"type": "error", "detail": "Reply target not found", "room_id": event.room_id})
+    except SQLAlchemyError:
+        connection.send_event({"type": "error", "detail": "Message not sent", "room_id": event.room_id})
+
+
+async def _edit_message(
+    connection: Connection,
+    event: EditMessageIn,
+    edits: EditBatcher,
+    ban_engine: BanEngine,
+) -> None:
+    user_id = connection.user_id
+    if event.room_id not in connection.rooms or not ban_engine.can_send(user_id, event.room_id):
+        connection.send_event({"type": "error", "detail": "Cannot send to this room", "room_id": event.room_id})
+        return
+    retry_after = await allow_message_send(user_id, event.room_id)
+    if retry_after:
+        connection.send_event({"type": "error", "detail": "Rate limited", "retry_after": retry_after})
+        return
+    try:
+        async with get_admission().slot(Priority.HIGH):
+            # Written with other edits in flight, and published through the outbox once committed.
+            message = await edits.edit(event.room_id, event.message_id, user_id, event.message)
+    except Overloaded as e:
+        connection.send_event({"type": "error", "detail": "Overloaded", "retry_after": e.retry_after})
+        return
+    except SQLAlchemyError:
+        connection.send_event({"type": "error", "detail": "Message not edited", "room_id": event.room_id})
+        return
+    if message is None:
+        connection.send_event({"type": "error", "detail": "Message not found", "room_id": event.room_id,
+                               "message_id": event.message_id})
+
+
+async def _sync(connection: Connection, event: SyncIn, hub: ConnectionHub) -> None:
+    """Replay what the client missed in each room, then confirm with "synced" or "sync_reset".
+
+    Live events may overlap the replay; clients drop events with a ``seq``
+    they have already seen.
+    """
+    for room_id, after in event.rooms.items():
+        if room_id not in connection.rooms:
+            continue
+        replay = await hub.sync.replay(room_id, after) if hub.sync is not None else Replay([], "reset")
+        if replay.source == "reset":
+            connection.send_event({"type": "sync_reset", "room_id": room_id})
+            continue
+        for encoded in replay.events:
+            if not await connection.put(encoded.frame(connection.codec)):
+                return
+        seq = replay.events[-1].event["seq"] if replay.events else after
+        connection.send_event({"type": "synced", "room_id": room_id, "seq": seq})
+
+
+@router.websocket("/ws")
+async def chat_socket(
+    websocket: WebSocket,
+    token: Optional[str] = None,
+    session_maker: async_sessionmaker[AsyncSession] = Depends(get_session_maker),
+    hub: ConnectionHub = Depends(get_chat_hub),
+    ban_engine: BanEngine = Depends(get_ban_engine),
+    presence: PresenceService = Depends(get_presence),
+    edits: EditBatcher = Depends(get_edit_batcher),
+):
+    """Chat events for every room of the user.
+
+    Message events carry a per-room ``seq``; a reconnecting client sends
+    ``{"type": "sync", "rooms": {room_id: last_seq}}`` to receive what it
+    missed, where ``last_seq`` is the highest seq it has received with no
+    gap before it (live events of a room may arrive slightly out of order).
+    ``{"type": "edit", "room_id": ..., "message_id": ..., "message": ...}``
+    replaces the text of one's own message; the room then receives a
+    "message_edited" event. Edits and "messages_deleted" events take the
+    room's next seq like new messages, so a sync replays them as well.
+    Message ids are sent as strings (see ``JsonId``); clients may send them
+    back as strings or numbers. The wire format is negotiated through the
+    subprotocol (see ``framing.CODECS``); without one, events are JSON text
+    frames. Browsers cannot set headers on WebSockets, so the session token
+    may be passed as the ``token`` query parameter. Rejected tokens count
+    against the client's IP as over HTTP; past ``AUTH_PER_IP`` the
+    handshake is closed with 1008 before the token is looked up.
+
+    An overloaded worker refuses connections with 1013 and answers sends
+    with an "Overloaded" error carrying ``retry_after``; both are high
+    priority, refused only at the full concurrency limit, long after
+    history and directory requests (see src.core.admission).
+
+    A draining worker refuses connections with 1012 and sends its clients
+    ``{"type": "reconnect", "after": seconds}`` before closing them with
+    1012; clients should wait that long, reconnect, and sync.
+    """
+    if hub.draining:
+        await websocket.close(code=status.WS_1012_SERVICE_RESTART)
+        return
+    token = _token(websocket, token)
+    if token and await auth_blocked(client_ip(websocket)):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Too many requests")
+        return
+    try:
+        async with get_admission().slot(Priority.HIGH), session_maker() as db:
+            session = await resolve_session(db, token) if token else None
+            room_ids = await _room_ids(db, session.user_id) if session else []
+    except Overloaded:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+    if session is None:
+        if token:
+            await auth_failed(client_ip(websocket))
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    codec, subprotocol = negotiate(websocket.scope.get("subprotocols", ()))
+    await websocket.accept(subprotocol=subprotocol)
+    connection = Connection(websocket, session.user_id, codec, hub.max_queue)
+    hub.register(connection, room_ids)
+    presence.connect(session.user_id)
+    writer = asyncio.create_task(connection.writer())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            data = message.get("bytes") or (message.get("text") or "").encode()
+            try:
+                event = CLIENT_EVENT.validate_python(codec.decode(data))
+            except ValueError:
+                connection.send_event({"type": "error", "detail": "Invalid event"})
+                continue
+            presence.heartbeat(connection.user_id)
+            if isinstance(event, SendMessageIn):
+                await _send_message(connection, event, session_maker, ban_engine)
+            elif isinstance(event, EditMessageIn):
+                await _edit_message(connection, event, edits, ban_engine)
+            elif isinstance(event, TypingIn) and event.room_id in connection.rooms:
+                presence.typing(event.room_id, connection.user_id)
+            elif isinstance(event, SyncIn):
+                await _sync(connection, event, hub)
+    finally:
+        hub.unregister(connection)
+        connection.close()
+        await asyncio.gather(writer, return_exceptions=True)
+        presence.disconnect(connection.user_id)
+
+
+@router.get("/ws/dictionaries/{subprotocol}")
+async def get_deflate_dictionary(subprotocol: str):
+    """Preset dictionary of a ``*.deflate`` subprotocol, for clients that do not bundle it."""
+    codec = CODECS.get(subprotocol)
+    if not isinstance(codec, DeflateCodec):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown subprotocol")
+    return Response(content=codec.dictionary, media_type="application/octet-stream",
+                    headers={"Cache-Control": "public, max-age=86400, immutable"})
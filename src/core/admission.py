@@ -0,0 +1,263 @@
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import AsyncIterator, Callable, Optional
+import asyncio
+import logging
+import math
+import time
+
+from fastapi import HTTPException, status
+
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """What to keep serving longest under load; LOW is shed first."""
+    LOW = 0     # history, directory and dashboards
+    NORMAL = 1
+    HIGH = 2    # sessions and sending messages
+
+
+# Per priority: the share of the concurrency limit it may fill, and the
+# pressure (see AdmissionController.pressure) above which it is shed.
+ADMISSION_RULES: dict[Priority, tuple[float, float]] = {
+    Priority.LOW: (0.5, 1.0),
+    Priority.NORMAL: (0.75, 2.0),
+    Priority.HIGH: (1.0, math.inf),
+}
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Overloaded, retry after {retry_after} s")
+        self.retry_after = retry_after
+
+
+class CheckoutTimer:
+    """How long connection pool checkouts wait; fed by src.core.database.TimedQueuePool.
+
+    Checkouts still waiting count too, so a pool where nothing comes back
+    reads as slow rather than idle.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._waiting: dict[int, float] = {}
+        self._next = 0
+        self._total = 0.0
+        self._count = 0
+
+    def begin(self) -> int:
+        token = self._next
+        self._next += 1
+        self._waiting[token] = self.clock()
+        return token
+
+    def end(self, token: int) -> None:
+        started = self._waiting.pop(token, None)
+        if started is not None:
+            self._total += self.clock() - started
+            self._count += 1
+
+    def sample(self) -> float:
+        """Mean wait since the last sample, or the age of the oldest checkout still waiting if longer."""
+        mean = self._total / self._count if self._count else 0.0
+        oldest = self.clock() - min(self._waiting.values()) if self._waiting else 0.0
+        self._total, self._count = 0.0, 0
+        return max(mean, oldest)
+
+
+@dataclass
+class AdmissionMetrics:
+    admitted: int = 0
+    shed: dict[str, int] = field(default_factory=lambda: {priority.name.lower(): 0 for priority in Priority})
+    decreases: int = 0
+    increases: int = 0
+
+    def snapshot(self) -> dict[str, float]:
+        return {
+            "admitted": self.admitted,
+            **{f"shed_{name}": count for name, count in self.shed.items()},
+            "decreases": self.decreases,
+            "increases": self.increases,
+        }
+
+
+class AdmissionController:
+    """Adaptive concurrency limit that sheds low-priority requests first when the worker is overloaded.
+
+    Two signals measure overload: event-loop lag, how late a timer fires
+    every ``interval``, and how long database pool checkouts wait.
+    ``pressure`` is the worse of the two relative to its target, so above
+    1 one of them is over target. Low-priority work is refused as soon as
+    pressure passes 1, normal work past 2, and high-priority work only at
+    the concurrency limit; each may also fill only its share of the limit
+    (``ADMISSION_RULES``). Refused requests get 503 with ``Retry-After``
+    right away, instead of queueing on the pool until its timeout.
+
+    The limit adapts every ``interval``: under pressure it shrinks by the
+    pressure, at most halving (a gradient step); otherwise it grows by
+    ``increase`` whenever traffic reached it (additive increase).
+
+    ``overloaded``, which takes the worker out of rotation, has hysteresis:
+    it is set once normal work has been shed for ``overload_after`` seconds
+    in a row, and cleared only when pressure is back under 1, so a single
+    slow sample does not flap readiness.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 64,
+        min_limit: int = 8,
+        max_limit: int = 512,
+        loop_lag_target: float = 0.05,
+        pool_wait_target: float = 0.1,
+        interval: float = 0.5,
+        increase: float = 2.0,
+        overload_after: float = 3.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.loop_lag_target = loop_lag_target
+        self.pool_wait_target = pool_wait_target
+        self.interval = interval
+        self.increase = increase
+        self.overload_after = overload_after
+        self.clock = clock
+        self.checkouts = CheckoutTimer(clock)
+        self.metrics = AdmissionMetrics()
+        self.in_flight = 0
+        self.loop_lag = 0.0
+        self.pool_wait = 0.0
+        self.overloaded = False
+        self._overloaded_ticks = 0
+        self._peak = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pressure(self) -> float:
+        return max(self.loop_lag / self.loop_lag_target, self.pool_wait / self.pool_wait_target)
+
+    def try_acquire(self, priority: Priority) -> int:
+        """Take a slot; returns 0 when admitted, otherwise seconds to wait before retrying."""
+        share, max_pressure = ADMISSION_RULES[priority]
+        pressure = self.pressure
+        if self.in_flight >= max(1.0, self.limit * share) or pressure > max_pressure:
+            self.metrics.shed[priority.name.lower()] += 1
+            return min(30, max(1, math.ceil(pressure * self.interval)))
+        self.in_flight += 1
+        self._peak = max(self._peak, self.in_flight)
+        self.metrics.admitted += 1
+        return 0
+
+    def release(self) -> None:
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority) -> AsyncIterator[None]:
+        """Hold a slot for the block; raises Overloaded if refused."""
+        retry_after = self.try_acquire(priority)
+        if retry_after:
+            raise Overloaded(retry_after)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def tick(self, loop_lag: float) -> None:
+        """Record the signals of the last interval and adapt the limit."""
+        self.loop_lag = loop_lag
+        self.pool_wait = self.checkouts.sample()
+        pressure = self.pressure
+        if pressure > ADMISSION_RULES[Priority.NORMAL][1]:
+            self._overloaded_ticks += 1
+            if self._overloaded_ticks * self.interval >= self.overload_after:
+                self.overloaded = True
+        else:
+            self._overloaded_ticks = 0
+            if pressure <= 1:
+                self.overloaded = False
+        if pressure > 1:
+            self.limit = max(float(self.min_limit), self.limit / min(pressure, 2.0))
+            self.metrics.decreases += 1
+        elif self._peak >= self.limit * ADMISSION_RULES[Priority.LOW][0] and self.limit < self.max_limit:
+            self.limit = min(float(self.max_limit), self.limit + self.increase)
+            self.metrics.increases += 1
+        self._peak = self.in_flight
+
+    def snapshot(self) -> dict[str, float]:
+        return {
+            "limit": round(self.limit, 1),
+            "in_flight": self.in_flight,
+            "loop_lag_seconds": round(self.loop_lag, 4),
+            "pool_wait_seconds": round(self.pool_wait, 4),
+            "pressure": round(self.pressure, 2),
+            "overloaded": self.overloaded,
+            **self.metrics.snapshot(),
+        }
+
+    async def run(self) -> None:
+        while True:
+            started = self.clock()
+            await asyncio.sleep(self.interval)
+            try:
+                self.tick(max(0.0, self.clock() - started - self.interval))
+            except Exception as e:
+                logger.error(f"Admission controller error: {e}")
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run(), name="admission")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+_admission: AdmissionController | None = None
+
+
+def get_admission() -> AdmissionController:
+    """Return the process-wide admission controller."""
+    global _admission
+    if _admission is None:
+        _admission = AdmissionController(
+            initial_limit=settings.ADMISSION_INITIAL_LIMIT,
+            min_limit=settings.ADMISSION_MIN_LIMIT,
+            max_limit=settings.ADMISSION_MAX_LIMIT,
+            loop_lag_target=settings.ADMISSION_LOOP_LAG_TARGET,
+            pool_wait_target=settings.ADMISSION_POOL_WAIT_TARGET,
+            interval=settings.ADMISSION_INTERVAL,
+            overload_after=settings.ADMISSION_OVERLOAD_AFTER,
+        )
+    return _admission
+
+
+def set_admission(controller: AdmissionController | None) -> None:
+    """Replace the process-wide controller, e.g. in tests; ``None`` resets it."""
+    global _admission
+    _admission = controller
+
+
+def admit(priority: Priority):
+    """Build a FastAPI dependency that holds an admission slot of ``priority`` for the request."""
+    async def dependency():
+        controller = get_admission()
+        retry_after = controller.try_acquire(priority)
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Overloaded",
+                headers={"Retry-After": str(retry_after)},
+            )
+        try:
+            yield
+        finally:
+            controller.release()
+    return dependency
@@ -0,0 +1,88 @@
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+Message = dict[str, Any]
+
+
+class Subscription:
+    """A registered subscription that can be iterated asynchronously."""
+
+    def __init__(self, broker: "Broker", channel: str, maxsize: int = 0):
+        self.broker = broker
+        self.channel = channel
+        self.queue: asyncio.Queue[Message] = asyncio.Queue(maxsize)
+        self.closed = False
+
+    def __aiter__(self) -> AsyncIterator[Message]:
+        return self
+
+    async def __anext__(self) -> Message:
+        if self.closed:
+            raise StopAsyncIteration
+        return await self.queue.get()
+
+    async def get(self) -> Message:
+        return await self.queue.get()
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.broker._unsubscribe(self)
+
+
+class Broker(ABC):
+    """Pub/sub channel between workers (Redis in production, in-memory in tests)."""
+
+    @abstractmethod
+    async def publish(self, channel: str, message: Message) -> None:
+        """Publish a JSON-serializable message to every subscriber of a channel."""
+
+    @abstractmethod
+    def subscribe(self, channel: str) -> Subscription:
+        """Register a subscription; messages published afterwards are delivered to it."""
+
+    @abstractmethod
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        """Forget a closed subscription."""
+
+
+class InMemoryBroker(Broker):
+    """Single-process broker; every "worker" shares the same instance."""
+
+    def __init__(self, max_queue_size: int = 10_000):
+        self.max_queue_size = max_queue_size
+        self._subscriptions: dict[str, set[Subscription]] = {}
+
+    async def publish(self, channel: str, message: Message) -> None:
+        for subscription in tuple(self._subscriptions.get(channel, ())):
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                logger.warning(f"Dropping message on channel {channel}: subscriber queue is full")
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(self, channel, self.max_queue_size)
+        self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscriptions.get(subscription.channel)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscriptions[subscription.channel]
+
+
+_broker: Broker | None = None
+
+
+def get_broker() -> Broker:
+    """Return the process-wide broker."""
+    global _broker
+    if _broker is None:
+        _broker = InMemoryBroker()
+    return _broker
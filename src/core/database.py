@@ -1,32 +1,142 @@
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Hashable, Optional
+
+from fastapi import Depends, Request
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from src.core.admission import get_admission
+from src.core.broker import get_broker
+from src.core.replicas import ReplicaRouter, RoutingSession
+from src.core.sharding import ShardMap
 from src.core.settings import settings
 
 class Base(DeclarativeBase):
     """Base class for all models."""
     pass
 
-def get_async_engine():
-    if not settings.DATABASE_URL:
-        raise ValueError("DATABASE_URL environment variable is not set.")
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Connection pool that reports how long each checkout waits to the admission controller."""
+
+    def _do_get(self):
+        checkouts = get_admission().checkouts
+        token = checkouts.begin()
+        try:
+            return super()._do_get()
+        finally:
+            checkouts.end(token)
+
+def _create_engine(url: str) -> AsyncEngine:
     return create_async_engine(
-        settings.DATABASE_URL,
+        url,
         echo=settings.DEBUG,
+        poolclass=TimedQueuePool,
         pool_size=5,
         max_overflow=10,
-        pool_timeout=30
+        # Short: the admission controller sheds load long before a checkout waits this long.
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT
     )
 
-def get_async_session_maker():
-    engine = get_async_engine()
-    return sessionmaker(
-        bind=engine,
+@lru_cache
+def get_async_engine() -> AsyncEngine:
+    if not settings.DATABASE_URL:
+        raise ValueError("DATABASE_URL environment variable is not set.")
+    return _create_engine(settings.DATABASE_URL)
+
+@lru_cache
+def get_replica_router() -> Optional[ReplicaRouter]:
+    """Router over DATABASE_REPLICA_URLS, or ``None`` when no replicas are configured."""
+    if not settings.DATABASE_REPLICA_URLS:
+        return None
+    return ReplicaRouter(
+        get_async_engine(),
+        [_create_engine(url) for url in settings.DATABASE_REPLICA_URLS],
+        sticky_window=settings.READ_YOUR_WRITES_WINDOW,
+    )
+
+@lru_cache
+def get_shard_map() -> Optional[ShardMap]:
+    """Shard map over DATABASE_SHARD_URLS, or ``None`` when rooms are not sharded."""
+    if not settings.DATABASE_SHARD_URLS:
+        return None
+    return ShardMap(
+        {name: _create_engine(url) for name, url in settings.DATABASE_SHARD_URLS.items()},
+        broker=get_broker(),
+    )
+
+def make_routing_session_maker(router: ReplicaRouter) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(
         class_=AsyncSession,
+        sync_session_class=RoutingSession,
         expire_on_commit=False,
+        router=router,
     )
 
-async def get_db():
+@lru_cache
+def get_async_session_maker() -> async_sessionmaker[AsyncSession]:
+    router = get_replica_router()
+    if router is not None:
+        return make_routing_session_maker(router)
+    return async_sessionmaker(
+        bind=get_async_engine(),
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+
+def _sticky_key(request: Request):
+    def key() -> Hashable:
+        # Resolved lazily: authentication runs after the session is opened.
+        user_id = getattr(request.state, "user_id", None)
+        if user_id is not None:
+            return user_id
+        return request.client.host if request.client else None
+    return key
+
+def get_session_maker() -> async_sessionmaker[AsyncSession]:
+    """Dependency for long-lived handlers, such as WebSockets, that open a session per unit of work."""
+    return get_async_session_maker()
+
+async def get_db(request: Request):
     AsyncSessionLocal = get_async_session_maker()
-    async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+    if get_replica_router() is not None:
+        session = AsyncSessionLocal(sticky_key=_sticky_key(request))
+    else:
+        session = AsyncSessionLocal()
+    async with session:
+        yield session
+
+
+@asynccontextmanager
+async def room_session(session_maker: async_sessionmaker[AsyncSession], room_id: int,
+                       write: bool = False) -> AsyncIterator[AsyncSession]:
+    """Session for a room's messages, members, join links and pins.
+
+    On the room's shard when rooms are sharded (``write=True`` also waits
+    while the room is frozen for a move), otherwise from ``session_maker``.
+    """
+    shard_map = get_shard_map()
+    if shard_map is None:
+        async with session_maker() as session:
+            yield session
+        return
+    async with shard_map.room_session(room_id, write=write) as session:
+        yield session
+
+
+@asynccontextmanager
+async def request_room_session(request: Request, db: AsyncSession,
+                               room_id: Optional[int]) -> AsyncIterator[AsyncSession]:
+    """``db``, or a session on the shard of ``room_id`` when rooms are sharded; writes wait while it is frozen."""
+    shard_map = get_shard_map()
+    if shard_map is None or room_id is None:
+        yield db
+        return
+    async with shard_map.room_session(room_id, write=request.method not in ("GET", "HEAD")) as session:
+        yield session
+
+
+async def get_room_db(room_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """Like get_db, for endpoints scoped to the ``room_id`` path parameter: on the room's shard when rooms are sharded."""
+    async with request_room_session(request, db, room_id) as session:
+        yield session
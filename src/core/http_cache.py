@@ -0,0 +1,137 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Hashable, Optional
+import hashlib
+
+from fastapi import Request, Response, status
+
+from .serialization import FastJSONResponse
+from .settings import settings
+
+# Clients may keep responses but must revalidate them; a revalidation that
+# ends in 304 costs one version lookup and no serialization.
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """Weak ETag derived from the parts that identify a version of a resource."""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def http_date(moment: datetime) -> str:
+    """Format a naive UTC datetime as an HTTP date."""
+    return format_datetime(moment.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+@dataclass(frozen=True, slots=True)
+class Validators:
+    """ETag and Last-Modified of one version of a resource."""
+    etag: str
+    last_modified: Optional[datetime] = None
+
+    def headers(self) -> dict[str, str]:
+        headers = {"ETag": self.etag, "Cache-Control": CACHE_CONTROL}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = http_date(self.last_modified)
+        return headers
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, validators: Validators) -> bool:
+    """Evaluate If-None-Match, or If-Modified-Since when no ETags are sent (RFC 9110, 13.2.2)."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        etag = _opaque(validators.etag)
+        return any(_opaque(tag) == etag for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or validators.last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return validators.last_modified.replace(microsecond=0) <= since
+
+
+class ResponseCache:
+    """LRU cache of encoded response bodies, bounded by their total size.
+
+    Each key holds only its latest version: a lookup with a different ETag
+    is a miss, and storing a new version replaces the old body.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_entry_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else max_bytes // 16
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[str, bytes]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, etag: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != etag:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, etag: str, body: bytes) -> None:
+        self.invalidate(key)
+        if len(body) > self.max_entry_bytes:
+            return
+        self._entries[key] = (etag, body)
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def invalidate(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+
+response_cache = ResponseCache(settings.HTTP_CACHE_MAX_BYTES)
+
+
+def get_response_cache() -> ResponseCache:
+    return response_cache
+
+
+async def conditional_response(
+    request: Request,
+    cache: ResponseCache,
+    key: Hashable,
+    validators: Validators,
+    render: Callable[[], Awaitable[bytes]],
+) -> Response:
+    """Answer 304, a cached body, or a freshly rendered one, in that order of preference."""
+    headers = validators.headers()
+    if is_not_modified(request, validators):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    body = cache.get(key, validators.etag)
+    if body is None:
+        body = await render()
+        cache.put(key, validators.etag, body)
+    return FastJSONResponse(body, headers=headers)
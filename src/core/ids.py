@@ -0,0 +1,123 @@
+from datetime import datetime, timezone
+from typing import Callable, Optional
+import logging
+import threading
+import time
+
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+# 2025-01-01T00:00:00Z; 41 bits of milliseconds last until 2094.
+EPOCH_MS = 1_735_689_600_000
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+TIMESTAMP_SHIFT = WORKER_BITS + SEQUENCE_BITS
+
+
+def _wall_clock_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
+class SnowflakeGenerator:
+    """64-bit, time-ordered ids: 41 bits of milliseconds, 10 bits of worker id, 12 bits of sequence.
+
+    Ids are strictly increasing per generator. If the wall clock goes
+    backwards the generator keeps counting from the last timestamp it used,
+    and when a millisecond's 4096 sequence numbers are exhausted it borrows
+    the next millisecond; either way it catches up with real time later.
+    """
+
+    def __init__(self, worker_id: int, epoch_ms: int = EPOCH_MS, clock: Callable[[], int] = _wall_clock_ms,
+                 skew_warning_ms: int = 1000):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER_ID}")
+        self.worker_id = worker_id
+        self.epoch_ms = epoch_ms
+        self.clock = clock
+        self.skew_warning_ms = skew_warning_ms
+        self._worker_bits = worker_id << SEQUENCE_BITS
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self._lock:
+            now = self.clock() - self.epoch_ms
+            last = self._last_ms
+            if now > last:
+                self._sequence = 0
+            else:
+                if last - now > self.skew_warning_ms:
+                    logger.warning(f"Clock is {last - now} ms behind the last issued id")
+                now = last
+                self._sequence = (self._sequence + 1) & SEQUENCE_MASK
+                if self._sequence == 0:
+                    now = last + 1
+            self._last_ms = now
+            return (now << TIMESTAMP_SHIFT) | self._worker_bits | self._sequence
+
+    def next_ids(self, count: int) -> list[int]:
+        """Reserve ``count`` consecutive ids under a single lock acquisition."""
+        ids = []
+        with self._lock:
+            now = max(self.clock() - self.epoch_ms, self._last_ms)
+            sequence = self._sequence + 1 if now == self._last_ms else 0
+            for _ in range(count):
+                if sequence > SEQUENCE_MASK:
+                    now += 1
+                    sequence = 0
+                ids.append((now << TIMESTAMP_SHIFT) | self._worker_bits | sequence)
+                sequence += 1
+            self._last_ms = now
+            self._sequence = sequence - 1
+        return ids
+
+
+def timestamp_of(snowflake: int, epoch_ms: int = EPOCH_MS) -> datetime:
+    """Creation time encoded in an id, as a naive UTC datetime."""
+    ms = (snowflake >> TIMESTAMP_SHIFT) + epoch_ms
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).replace(tzinfo=None)
+
+
+def min_id_at(moment: datetime, epoch_ms: int = EPOCH_MS) -> int:
+    """Smallest id that can be generated at or after ``moment`` (naive UTC).
+
+    ``message_id >= min_id_at(t)`` selects everything created since ``t``
+    with a primary key range scan.
+    """
+    ms = int(moment.replace(tzinfo=timezone.utc).timestamp() * 1000) - epoch_ms
+    return max(ms, 0) << TIMESTAMP_SHIFT
+
+
+_generator: Optional[SnowflakeGenerator] = None
+_generator_lock = threading.Lock()
+
+
+def get_id_generator() -> SnowflakeGenerator:
+    """Process-wide generator.
+
+    WORKER_ID must be set, and unique among every process that writes to
+    the same database: two processes with the same worker id can issue the
+    same id in the same millisecond. Raises RuntimeError when it is missing
+    or out of range, rather than guess one.
+    """
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                worker_id = settings.WORKER_ID
+                if worker_id is None or not 0 <= worker_id <= MAX_WORKER_ID:
+                    raise RuntimeError(
+                        f"WORKER_ID must be set to a number between 0 and {MAX_WORKER_ID}, unique per process, "
+                        f"got {worker_id}"
+                    )
+                _generator = SnowflakeGenerator(worker_id)
+    return _generator
+
+
+def next_id() -> int:
+    """Column default for snowflake primary keys."""
+    return get_id_generator().next_id()
@@ -0,0 +1,254 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable
+import asyncio
+import math
+import time
+
+from fastapi import HTTPException, Request, status
+from fastapi.requests import HTTPConnection
+
+from .settings import settings
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimit:
+    """``limit`` requests per ``period`` seconds, allowing bursts of ``burst``."""
+    name: str
+    limit: int
+    period: float
+    burst: int | None = None
+    emission_interval: float = field(init=False)
+    tolerance: float = field(init=False)
+
+    def __post_init__(self):
+        emission_interval = self.period / self.limit
+        object.__setattr__(self, "emission_interval", emission_interval)
+        object.__setattr__(self, "tolerance", emission_interval * (self.burst or self.limit))
+
+
+def gcra(tat: float | None, now: float, policy: RateLimit) -> tuple[float, float]:
+    """Generic cell rate algorithm step.
+
+    Returns ``(new_tat, retry_after)``; the request is allowed when
+    ``retry_after`` is 0, in which case ``new_tat`` must be stored.
+    """
+    if tat is None or tat < now:
+        tat = now
+    new_tat = tat + policy.emission_interval
+    overshoot = new_tat - now - policy.tolerance
+    if overshoot > 0:
+        return tat, overshoot
+    return new_tat, 0.0
+
+
+def _wait(tat: float | None, now: float, policy: RateLimit) -> float:
+    """What :func:`gcra` would return as ``retry_after``, without taking a cell."""
+    if tat is None or tat < now:
+        return 0.0
+    return max(0.0, tat + policy.emission_interval - now - policy.tolerance)
+
+
+class RateLimitBackend(ABC):
+    """Storage of theoretical arrival times (TAT) per key."""
+
+    @abstractmethod
+    async def hit(self, key: Hashable, policy: RateLimit) -> float:
+        """Register a request; returns 0 if allowed, otherwise seconds to wait."""
+
+    @abstractmethod
+    async def peek(self, key: Hashable, policy: RateLimit) -> float:
+        """Seconds to wait before a request would be allowed, without registering one."""
+
+
+class LocalRateLimitBackend(RateLimitBackend):
+    """Per-process GCRA state split over shards.
+
+    A key whose TAT is in the past behaves exactly like an unknown key, so idle
+    keys are dropped by sweeping one shard every ``sweep_every`` hits. A shard
+    that still exceeds ``max_keys_per_shard`` drops its oldest keys, which can
+    only make the limiter more lenient, never stricter.
+    """
+
+    def __init__(
+        self,
+        shards: int = 64,
+        max_keys_per_shard: int = 16_384,
+        sweep_every: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if shards & (shards - 1):
+            raise ValueError("shards must be a power of two")
+        self._mask = shards - 1
+        self._shards: list[dict[Hashable, float]] = [{} for _ in range(shards)]
+        self.max_keys_per_shard = max_keys_per_shard
+        self.sweep_every = sweep_every
+        self.clock = clock
+        self._hits = 0
+        self._next_sweep = 0
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def check(self, key: Hashable, policy: RateLimit) -> float:
+        """Synchronous fast path used by :meth:`hit`."""
+        now = self.clock()
+        shard = self._shards[hash(key) & self._mask]
+        tat = shard.get(key)
+        if tat is None or tat < now:
+            tat = now
+        new_tat = tat + policy.emission_interval
+        overshoot = new_tat - now - policy.tolerance
+        if overshoot > 0:
+            return overshoot
+        shard[key] = new_tat
+
+        self._hits += 1
+        if self._hits >= self.sweep_every:
+            self._hits = 0
+            self._sweep(self._shards[self._next_sweep], now)
+            self._next_sweep = (self._next_sweep + 1) & self._mask
+        if len(shard) > self.max_keys_per_shard:
+            self._sweep(shard, now)
+            while len(shard) > self.max_keys_per_shard:
+                del shard[next(iter(shard))]
+        return 0.0
+
+    async def hit(self, key: Hashable, policy: RateLimit) -> float:
+        return self.check(key, policy)
+
+    async def peek(self, key: Hashable, policy: RateLimit) -> float:
+        tat = self._shards[hash(key) & self._mask].get(key)
+        return _wait(tat, self.clock(), policy)
+
+    @staticmethod
+    def _sweep(shard: dict[Hashable, float], now: float) -> None:
+        idle = [key for key, tat in shard.items() if tat <= now]
+        for key in idle:
+            del shard[key]
+
+
+class InMemorySharedBackend(RateLimitBackend):
+    """Stand-in for a shared store (e.g. a Redis GCRA script) in tests.
+
+    It mimics a remote backend: one atomic read-modify-write per hit, keys
+    expire once their TAT has passed, and every worker sharing the instance
+    sees the same counters.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._tats: dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+    async def hit(self, key: Hashable, policy: RateLimit) -> float:
+        async with self._lock:
+            now = self.clock()
+            storage_key = str(key)
+            tat = self._tats.get(storage_key)
+            if tat is not None and tat <= now:
+                del self._tats[storage_key]
+                tat = None
+            new_tat, retry_after = gcra(tat, now, policy)
+            if not retry_after:
+                self._tats[storage_key] = new_tat
+            return retry_after
+
+    async def peek(self, key: Hashable, policy: RateLimit) -> float:
+        return _wait(self._tats.get(str(key)), self.clock(), policy)
+
+
+class RateLimiter:
+    """Entry point used by HTTP dependencies and WebSocket hooks."""
+
+    def __init__(self, backend: RateLimitBackend):
+        self.backend = backend
+
+    async def hit(self, policy: RateLimit, identity: Any) -> float:
+        return await self.backend.hit((policy.name, identity), policy)
+
+    async def peek(self, policy: RateLimit, identity: Any) -> float:
+        return await self.backend.peek((policy.name, identity), policy)
+
+
+MESSAGE_SEND_PER_USER = RateLimit("send:user", settings.RATE_LIMIT_SEND_PER_USER, settings.RATE_LIMIT_SEND_PERIOD)
+MESSAGE_SEND_PER_ROOM = RateLimit("send:room", settings.RATE_LIMIT_SEND_PER_ROOM, settings.RATE_LIMIT_SEND_PERIOD)
+AUTH_PER_IP = RateLimit("auth:ip", settings.RATE_LIMIT_AUTH_PER_IP, settings.RATE_LIMIT_AUTH_PERIOD)
+UPLOAD_PER_USER = RateLimit("upload:user", settings.RATE_LIMIT_UPLOAD_PER_USER, settings.RATE_LIMIT_UPLOAD_PERIOD)
+
+_rate_limiter: RateLimiter | None = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(LocalRateLimitBackend())
+    return _rate_limiter
+
+
+def set_rate_limiter(limiter: RateLimiter | None) -> None:
+    """Replace the process-wide limiter, e.g. with a shared backend; ``None`` resets it."""
+    global _rate_limiter
+    _rate_limiter = limiter
+
+
+def client_ip(connection: HTTPConnection) -> str:
+    return connection.client.host if connection.client else "unknown"
+
+
+def _identity(request: Request, key: str) -> Any:
+    if key == "ip":
+        return client_ip(request)
+    if key == "user":
+        # Set by src.auth.dependencies.get_current_session; anonymous callers
+        # share the limit of their IP address.
+        user_id = getattr(request.state, "user_id", None)
+        return user_id if user_id is not None else f"ip:{client_ip(request)}"
+    if key == "room":
+        return request.path_params["room_id"]
+    raise ValueError(f"Unknown rate limit key {key}")
+
+
+def too_many_requests(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests",
+        headers={"Retry-After": str(math.ceil(retry_after))},
+    )
+
+
+def rate_limit(policy: RateLimit, key: str = "ip"):
+    """Build a FastAPI dependency enforcing ``policy`` per ``ip``, ``user`` or ``room``."""
+    async def dependency(request: Request) -> None:
+        retry_after = await get_rate_limiter().hit(policy, _identity(request, key))
+        if retry_after:
+            raise too_many_requests(retry_after)
+    return dependency
+
+
+async def allow_message_send(user_id: int, room_id: int) -> float:
+    """WebSocket hook for incoming chat messages; returns seconds to wait or 0."""
+    limiter = get_rate_limiter()
+    retry_after = await limiter.hit(MESSAGE_SEND_PER_USER, user_id)
+    if retry_after:
+        return retry_after
+    return await limiter.hit(MESSAGE_SEND_PER_ROOM, room_id)
+
+
+async def auth_blocked(ip: str) -> float:
+    """Seconds an IP must wait before presenting a token again, or 0.
+
+    Only failed attempts are counted (see :func:`auth_failed`), so clients
+    sharing an address with valid tokens are never limited; an address that
+    guessed too often is refused before its token is even looked up.
+    """
+    return await get_rate_limiter().peek(AUTH_PER_IP, ip)
+
+
+async def auth_failed(ip: str) -> float:
+    """Count a rejected token against its IP; returns seconds to wait or 0."""
+    return await get_rate_limiter().hit(AUTH_PER_IP, ip)
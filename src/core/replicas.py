@@ -0,0 +1,136 @@
+from typing import Any, Callable, Hashable, Optional
+import asyncio
+import itertools
+import logging
+import time
+
+from sqlalchemy import Select, event, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaRouter:
+    """Chooses the engine for each statement.
+
+    Reads are spread round-robin over healthy replicas. A client that wrote
+    recently (identified by a sticky key, usually the user id) reads from
+    the primary for ``sticky_window`` seconds so it sees its own writes.
+    Replicas are health-checked periodically and dropped immediately when a
+    query on them hits a disconnect error.
+    """
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: list[AsyncEngine],
+        sticky_window: float = 5.0,
+        max_sticky_keys: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.sticky_window = sticky_window
+        self.max_sticky_keys = max_sticky_keys
+        self.clock = clock
+        self.healthy: list[AsyncEngine] = list(replicas)
+        self._round_robin = itertools.count()
+        self._last_write: dict[Hashable, float] = {}
+        self._health_task: Optional[asyncio.Task] = None
+        for replica in replicas:
+            event.listen(replica.sync_engine, "handle_error", self._on_error(replica))
+
+    def _on_error(self, replica: AsyncEngine):
+        def handle_error(context):
+            if context.is_disconnect and replica in self.healthy:
+                logger.warning(f"Replica {replica.url!r} disconnected, failing over")
+                self.healthy.remove(replica)
+        return handle_error
+
+    def pick_replica(self) -> Optional[AsyncEngine]:
+        healthy = self.healthy
+        if not healthy:
+            return None
+        return healthy[next(self._round_robin) % len(healthy)]
+
+    def mark_write(self, key: Optional[Hashable]) -> None:
+        if key is None:
+            return
+        now = self.clock()
+        self._last_write.pop(key, None)
+        self._last_write[key] = now
+        if len(self._last_write) > self.max_sticky_keys:
+            # Entries are in write order; the oldest ones are outside the window anyway.
+            for old_key in list(itertools.islice(self._last_write, len(self._last_write) // 2)):
+                del self._last_write[old_key]
+
+    def is_sticky(self, key: Optional[Hashable]) -> bool:
+        if key is None:
+            return False
+        last_write = self._last_write.get(key)
+        return last_write is not None and self.clock() - last_write < self.sticky_window
+
+    async def check_health(self, timeout: float = 2.0) -> list[AsyncEngine]:
+        """Ping every replica with ``SELECT 1`` and refresh the healthy list."""
+        async def ping(replica: AsyncEngine) -> bool:
+            try:
+                async with asyncio.timeout(timeout):
+                    async with replica.connect() as connection:
+                        await connection.execute(text("SELECT 1"))
+                return True
+            except Exception as e:
+                logger.warning(f"Replica {replica.url!r} failed health check: {e}")
+                return False
+
+        results = await asyncio.gather(*(ping(replica) for replica in self.replicas))
+        self.healthy = [replica for replica, ok in zip(self.replicas, results) if ok]
+        return self.healthy
+
+    async def _health_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.check_health()
+
+    def start(self, interval: float) -> None:
+        self._health_task = asyncio.create_task(self._health_loop(interval), name="replica-health")
+
+    async def stop(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+
+    async def dispose(self) -> None:
+        await self.stop()
+        for engine in (self.primary, *self.replicas):
+            await engine.dispose()
+
+
+class RoutingSession(Session):
+    """Session that sends plain SELECTs to replicas and everything else to the primary.
+
+    Once a session has written (or flushed), all its later statements go to
+    the primary as well, so a request never reads older data than it wrote.
+    """
+
+    def __init__(self, router: ReplicaRouter, sticky_key: Callable[[], Optional[Hashable]] = lambda: None, **kw: Any):
+        super().__init__(**kw)
+        self.router = router
+        self.sticky_key = sticky_key
+        self._wrote = False
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if not self._wrote:
+            if self._flushing or not isinstance(clause, Select) or clause._for_update_arg is not None:
+                self._wrote = True
+            elif not self.router.is_sticky(self.sticky_key()):
+                replica = self.router.pick_replica()
+                if replica is not None:
+                    return replica.sync_engine
+        return self.router.primary.sync_engine
+
+    def commit(self) -> None:
+        super().commit()
+        if self._wrote:
+            self.router.mark_write(self.sticky_key())
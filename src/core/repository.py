@@ -1,4 +1,4 @@
-from typing import TypeVar, Generic, Type, Optional, Any, List
+from typing import TypeVar, Generic, Type, Optional, Any, List, AsyncIterator
 from sqlalchemy.ext.asyncio import AsyncSession
 from .database import Base as DeclarativeBase
 from sqlalchemy import inspect, select, delete, update
@@ -10,6 +10,17 @@ ModelType = TypeVar('ModelType', bound=DeclarativeBase)
 
 logger = logging.getLogger(__name__)
 
+def insert_for(session: AsyncSession, model: Any) -> Any:
+    """Build a dialect-specific INSERT that supports ON CONFLICT clauses."""
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"ON CONFLICT inserts are not supported for dialect {dialect_name}")
+    return insert(model)
+
 class BaseRepository(Generic[ModelType]):
     """Base repository class for common CRUD operations."""
     
@@ -40,6 +51,10 @@ class BaseRepository(Generic[ModelType]):
         """Get the primary key column of the model."""
         return getattr(self.model, self.primary_key_field)
 
+    def _insert(self, model: Optional[Type[DeclarativeBase]] = None) -> Any:
+        """Build a dialect-specific INSERT that supports ON CONFLICT clauses."""
+        return insert_for(self.session, model or self.model)
+
     async def get_by_id(self, id_value: Any) -> Optional[ModelType]:
         """Fetch a model instance by its primary key."""
         primary_key_column = self._get_primary_key_column()
@@ -66,6 +81,17 @@ class BaseRepository(Generic[ModelType]):
             logger.error(f"Error fetching all {self.model.__name__} instances: {e}")
             raise
     
+    async def stream_all(self, batch_size: int = 1000) -> AsyncIterator[ModelType]:
+        """Iterate over all model instances in primary key order without loading them at once."""
+        try:
+            query = select(self.model).order_by(self._get_primary_key_column()).execution_options(yield_per=batch_size)
+            result = await self.session.stream_scalars(query)
+            async for obj in result:
+                yield obj
+        except SQLAlchemyError as e:
+            logger.error(f"Error streaming {self.model.__name__} instances: {e}")
+            raise
+
     async def get_by_field(self, field_name: str, value: Any) -> Optional[ModelType]:
         """Fetch a model instance by a specific field."""
         try:
@@ -0,0 +1,97 @@
+from typing import Annotated, Any, Generic, Iterable, Optional, Sequence, TypeVar
+
+from fastapi.responses import Response
+from pydantic import PlainSerializer, TypeAdapter
+from pydantic_core import to_json
+
+T = TypeVar("T")
+
+# Snowflake ids (see src.core.ids) are above 2**53, where JavaScript numbers
+# lose precision: they are ints in Python and strings in JSON.
+JsonId = Annotated[int, PlainSerializer(str, return_type=str, when_used="json")]
+
+
+def json_id(value: Optional[int]) -> Optional[str]:
+    """A snowflake id as sent in JSON, for events built as plain dicts."""
+    return None if value is None else str(value)
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered by pydantic-core straight to bytes.
+
+    Content that is already encoded (``bytes``) is sent as is, so handlers
+    can hand over the output of an ``Encoder`` or ``RowEncoder`` without it
+    being parsed and dumped a second time.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return to_json(content)
+
+
+class Encoder(Generic[T]):
+    """Serializer for ``type_`` compiled once, at import time.
+
+    ``TypeAdapter`` builds the pydantic-core validator and serializer up
+    front; FastAPI's default path re-validates the response model and then
+    walks the result again with ``jsonable_encoder``.
+    """
+
+    def __init__(self, type_: type[T]):
+        self.adapter = TypeAdapter(type_)
+
+    def encode(self, value: Any) -> bytes:
+        """Encode ORM objects (or anything with matching attributes) to JSON."""
+        return self.adapter.dump_json(self.adapter.validate_python(value, from_attributes=True))
+
+
+class RowEncoder:
+    """Encodes result rows of a column select without ORM or pydantic models.
+
+    The rows must come from a select of exactly ``fields``, in order, and the
+    values must already be JSON-compatible (ints, strings, bools, datetimes).
+    The fields named in ``ids`` are snowflake ids, sent as strings (see
+    ``JsonId``).
+    """
+
+    def __init__(self, fields: Sequence[str], ids: Iterable[str] = ()):
+        self.fields = tuple(fields)
+        self._ids = tuple(i for i, name in enumerate(self.fields) if name in set(ids))
+        self._header = b'{"fields":' + to_json(self.fields) + b',"rows":'
+
+    def _rows(self, rows: Iterable[Sequence[Any]]) -> Iterable[Sequence[Any]]:
+        if not self._ids:
+            return rows
+        ids = self._ids
+
+        def convert(row: Sequence[Any]) -> list[Any]:
+            values = list(row)
+            for i in ids:
+                values[i] = json_id(values[i])
+            return values
+
+        return map(convert, rows)
+
+    def encode(self, rows: Iterable[Sequence[Any]], **columns: Sequence[Any]) -> bytes:
+        """A JSON array of objects keyed by ``fields``.
+
+        Each keyword adds a key to every object, taking one value per row.
+        """
+        fields = self.fields
+        rows = self._rows(rows)
+        if not columns:
+            return to_json([dict(zip(fields, row)) for row in rows])
+        names = fields + tuple(columns)
+        return to_json([dict(zip(names, (*row, *extra))) for row, *extra in zip(rows, *columns.values())])
+
+    def encode_compact(self, rows: Iterable[Sequence[Any]], **members: Any) -> bytes:
+        """``{"fields": [...], "rows": [[...], ...]}``; rows go to pydantic-core as tuples, no dicts.
+
+        Keywords are added as further members of the object.
+        """
+        body = self._header + to_json([tuple(row) for row in self._rows(rows)])
+        if members:
+            body += b"," + to_json(members)[1:-1]
+        return body + b"}"
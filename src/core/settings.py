@@ -5,11 +5,78 @@ class Settings(BaseSettings):
     POSTGRES_USER: str = "altmur_user"
     POSTGRES_PASSWORD: str = "altmur_pass"
     DATABASE_URL: str | None = None
+    DATABASE_REPLICA_URLS: list[str] = []
+    READ_YOUR_WRITES_WINDOW: float = 5.0
+    REPLICA_HEALTH_CHECK_INTERVAL: float = 10.0
+    DATABASE_SHARD_URLS: dict[str, str] = {}
+    DATABASE_POOL_TIMEOUT: float = 10.0
 
     PGADMIN_DEFAULT_EMAIL: str = "admin@local.dev"
     PGADMIN_DEFAULT_PASSWORD: str = "admin"
 
     DEBUG: bool = False
+    WORKER_ID: int | None = None
+
+    BLOB_STORAGE_PATH: str = "var/blobs"
+    MAX_UPLOAD_SIZE: int = 100 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 64 * 1024
+
+    JOB_WORKER_CONCURRENCY: int = 2
+
+    OUTBOX_BATCH_SIZE: int = 500
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    OUTBOX_LAG_WARNING: float = 5.0
+
+    NOTIFICATION_BATCH_SIZE: int = 1000
+    NOTIFICATION_DIGEST_WINDOW: float = 300.0
+    NOTIFICATION_SETTLE: float = 5.0
+    NOTIFICATION_INTERVAL: float = 1.0
+
+    RETENTION_BATCH_SIZE: int = 500
+    RETENTION_MAX_ROWS_PER_TICK: int = 20_000
+    RETENTION_MAX_SECONDS_PER_TICK: float = 2.0
+    RETENTION_PAUSE: float = 0.05
+    RETENTION_INTERVAL: float = 60.0
+
+    MODERATION_PURGE_BATCH_SIZE: int = 1000
+    MODERATION_PURGE_PAUSE: float = 0.01
+
+    ACTIVITY_BATCH_SIZE: int = 5000
+    ACTIVITY_SETTLE: float = 5.0
+    ACTIVITY_INTERVAL: float = 10.0
+
+    HTTP_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+
+    SYNC_LOG_SIZE: int = 64
+    SYNC_MAX_ROOMS: int = 2000
+    SYNC_MAX_REPLAY: int = 500
+
+    EDIT_BATCH_SIZE: int = 64
+    EDIT_BATCH_DELAY: float = 0.005
+
+    ADMISSION_INITIAL_LIMIT: int = 64
+    ADMISSION_MIN_LIMIT: int = 8
+    ADMISSION_MAX_LIMIT: int = 512
+    ADMISSION_LOOP_LAG_TARGET: float = 0.05
+    ADMISSION_POOL_WAIT_TARGET: float = 0.1
+    ADMISSION_INTERVAL: float = 0.5
+    ADMISSION_OVERLOAD_AFTER: float = 3.0
+    LIVENESS_MAX_LOOP_LAG: float = 10.0
+
+    DRAIN_RECONNECT_WINDOW: float = 10.0
+    DRAIN_TIMEOUT: float = 30.0
+
+    PRESENCE_TTL: float = 60.0
+    PRESENCE_TYPING_TTL: float = 5.0
+    PRESENCE_FLUSH_INTERVAL: float = 1.0
+
+    RATE_LIMIT_SEND_PER_USER: int = 20
+    RATE_LIMIT_SEND_PER_ROOM: int = 200
+    RATE_LIMIT_SEND_PERIOD: float = 10.0
+    RATE_LIMIT_AUTH_PER_IP: int = 10
+    RATE_LIMIT_AUTH_PERIOD: float = 60.0
+    RATE_LIMIT_UPLOAD_PER_USER: int = 10
+    RATE_LIMIT_UPLOAD_PERIOD: float = 60.0
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -0,0 +1,218 @@
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, TypeVar
+import asyncio
+import logging
+
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from .broker import Broker
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Jump consistent hash: adding a bucket moves only ~1/n of the keys."""
+    b, j = -1, 0
+    key &= 0xFFFFFFFFFFFFFFFF
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+
+class ShardMap:
+    """Maps a room to the shard holding its messages, pins, members and links.
+
+    Rooms are placed by consistent hashing unless an explicit placement
+    exists (rooms moved by the rebalancer). Writers to a room go through
+    :meth:`write_guard`, which lets the rebalancer freeze a room for the
+    short final phase of a move. Placement changes and freezes are
+    published on the broker so that every worker holds back writers of a
+    frozen room and then routes the room to its new shard.
+
+    A move leaves copies of the room's rows on the new shard, and the
+    originals on the old one until they are purged; :meth:`owns` tells
+    background services which of the two to process.
+    """
+
+    CHANNEL = "sharding.placements"
+
+    def __init__(self, engines: dict[str, AsyncEngine], placements: Optional[dict[int, str]] = None,
+                 broker: Optional[Broker] = None):
+        if not engines:
+            raise ValueError("At least one shard is required")
+        self.engines = engines
+        self.names = sorted(engines)
+        self.placements = dict(placements or {})
+        # When moved rooms arrived on their shard.
+        self.moved_at: dict[int, datetime] = {}
+        self.broker = broker
+        self.session_makers = {
+            name: async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+            for name, engine in engines.items()
+        }
+        self._listener: Optional[asyncio.Task] = None
+        self._frozen: dict[int, asyncio.Event] = {}
+        self._in_flight: dict[int, int] = {}
+        self._drained: dict[int, asyncio.Event] = {}
+
+    def shard_for(self, room_id: int) -> str:
+        shard = self.placements.get(room_id)
+        if shard is not None:
+            return shard
+        return self.names[jump_hash(room_id, len(self.names))]
+
+    def owns(self, shard: str, room_id: int, at: datetime) -> bool:
+        """Whether a row of a room written at ``at`` belongs to ``shard``, rather than being a copy made by a move.
+
+        A row belongs to the shard the room was on when it was written:
+        rows from before the room's last move to the shard it left, later
+        ones to the shard it is on. The rebalancer copies rows with their
+        timestamps, so the original and its copy never both belong.
+        """
+        placed = self.shard_for(room_id) == shard
+        moved_at = self.moved_at.get(room_id)
+        if moved_at is None:
+            return placed
+        return placed == (at >= moved_at)
+
+    def engine_for(self, room_id: int) -> AsyncEngine:
+        return self.engines[self.shard_for(room_id)]
+
+    def session(self, shard: str) -> AsyncSession:
+        return self.session_makers[shard]()
+
+    @asynccontextmanager
+    async def room_session(self, room_id: int, write: bool = False) -> AsyncIterator[AsyncSession]:
+        """Open a session on the room's shard; ``write=True`` also takes the write guard."""
+        if not write:
+            async with self.session(self.shard_for(room_id)) as session:
+                yield session
+            return
+        async with self.write_guard(room_id):
+            async with self.session(self.shard_for(room_id)) as session:
+                yield session
+
+    @asynccontextmanager
+    async def write_guard(self, room_id: int) -> AsyncIterator[None]:
+        while (frozen := self._frozen.get(room_id)) is not None:
+            await frozen.wait()
+        self._in_flight[room_id] = self._in_flight.get(room_id, 0) + 1
+        try:
+            yield
+        finally:
+            remaining = self._in_flight[room_id] - 1
+            if remaining:
+                self._in_flight[room_id] = remaining
+            else:
+                del self._in_flight[room_id]
+                drained = self._drained.pop(room_id, None)
+                if drained is not None:
+                    drained.set()
+
+    async def freeze(self, room_id: int, grace: float = 0.0) -> None:
+        """Block new writers to a room on every worker and wait for in-flight ones to finish.
+
+        Writers of this process are waited for; those of other workers are
+        given ``grace`` seconds after the freeze is published, which must
+        cover the broker's delivery and the longest write transaction.
+        """
+        if room_id in self._frozen:
+            raise RuntimeError(f"Room {room_id} is already frozen")
+        self._frozen[room_id] = asyncio.Event()
+        await self._publish({"room_id": room_id, "frozen": True})
+        if self._in_flight.get(room_id):
+            drained = self._drained.setdefault(room_id, asyncio.Event())
+            await drained.wait()
+        if grace > 0:
+            await asyncio.sleep(grace)
+
+    async def unfreeze(self, room_id: int) -> None:
+        self._release(room_id)
+        await self._publish({"room_id": room_id, "frozen": False})
+
+    def _release(self, room_id: int) -> None:
+        frozen = self._frozen.pop(room_id, None)
+        if frozen is not None:
+            frozen.set()
+
+    async def assign(self, room_id: int, shard: str, moved_at: Optional[datetime] = None) -> None:
+        if shard not in self.engines:
+            raise KeyError(f"Unknown shard {shard}")
+        message: dict[str, Any] = {"room_id": room_id, "shard": shard}
+        if moved_at is not None:
+            message["moved_at"] = moved_at.isoformat()
+        self.handle_message(message)
+        await self._publish(message)
+
+    async def _publish(self, message: dict[str, Any]) -> None:
+        if self.broker is not None:
+            await self.broker.publish(self.CHANNEL, message)
+
+    def handle_message(self, message: dict[str, Any]) -> None:
+        """Apply a placement or freeze published by another worker, or recorded in the directory."""
+        room_id = message["room_id"]
+        if "shard" in message:
+            self.placements[room_id] = message["shard"]
+        if message.get("moved_at"):
+            self.moved_at[room_id] = datetime.fromisoformat(message["moved_at"])
+        if message.get("frozen"):
+            self._frozen.setdefault(room_id, asyncio.Event())
+        elif "frozen" in message:
+            self._release(room_id)
+
+    async def start(self) -> None:
+        if self.broker is None:
+            return
+        subscription = self.broker.subscribe(self.CHANNEL)
+
+        async def listen() -> None:
+            try:
+                async for message in subscription:
+                    self.handle_message(message)
+            finally:
+                subscription.close()
+
+        self._listener = asyncio.create_task(listen(), name="shard-placements")
+
+    async def scatter(
+        self,
+        fn: Callable[[AsyncSession], Awaitable[T]],
+        max_concurrency: int = 8,
+    ) -> dict[str, T]:
+        """Run ``fn`` against every shard, at most ``max_concurrency`` at a time."""
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(shard: str) -> T:
+            async with semaphore:
+                async with self.session(shard) as session:
+                    return await fn(session)
+
+        results = await asyncio.gather(*(run(shard) for shard in self.names))
+        return dict(zip(self.names, results))
+
+    async def locate_room(self, query: Select, max_concurrency: int = 8) -> Optional[int]:
+        """The room id ``query`` returns on the shard that owns that room, e.g. the room of a message id.
+
+        A room being moved may briefly exist on two shards; the placement decides.
+        """
+        async def room_id(session: AsyncSession) -> Optional[int]:
+            return (await session.execute(query)).scalar_one_or_none()
+
+        for shard, found in (await self.scatter(room_id, max_concurrency)).items():
+            if found is not None and self.shard_for(found) == shard:
+                return found
+        return None
+
+    async def dispose(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        for engine in self.engines.values():
+            await engine.dispose()
@@ -0,0 +1,51 @@
+from typing import Hashable
+
+
+class TimingWheel:
+    """Hashed timing wheel for many short, frequently renewed timeouts.
+
+    Keys are bucketed by deadline into ``slots`` buckets of ``tick`` seconds.
+    Scheduling and advancing are O(1) per key; deadlines further away than
+    one revolution are kept in their bucket until their round comes up.
+    """
+
+    def __init__(self, tick: float, slots: int, start: float = 0.0):
+        self.tick = tick
+        self.slots = slots
+        self._buckets: list[dict[Hashable, float]] = [{} for _ in range(slots)]
+        self._current = int(start / tick)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def schedule(self, key: Hashable, deadline: float) -> None:
+        """Add ``key`` to expire at ``deadline``; a key must be scheduled at most once."""
+        tick = max(int(deadline / self.tick), self._current)
+        bucket = self._buckets[tick % self.slots]
+        if key not in bucket:
+            self._size += 1
+        bucket[key] = deadline
+
+    def cancel(self, key: Hashable, deadline: float) -> None:
+        tick = max(int(deadline / self.tick), self._current)
+        if self._buckets[tick % self.slots].pop(key, None) is not None:
+            self._size -= 1
+
+    def advance(self, now: float) -> list[Hashable]:
+        """Pop every key whose deadline is at or before ``now``."""
+        expired = []
+        target = int(now / self.tick)
+        # Never walk more than one revolution: every bucket is visited once.
+        first = max(self._current, target - self.slots + 1)
+        for tick in range(first, target + 1):
+            bucket = self._buckets[tick % self.slots]
+            if not bucket:
+                continue
+            due = [key for key, deadline in bucket.items() if deadline <= now]
+            for key in due:
+                del bucket[key]
+            expired.extend(due)
+        self._current = target
+        self._size -= len(expired)
+        return expired
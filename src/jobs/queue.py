@@ -0,0 +1,247 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+import heapq
+import itertools
+import logging
+
+from fastapi import Request
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.clock import utcnow
+from src.core.repository import BaseRepository
+
+from .models import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class ClaimedJob:
+    job_id: int
+    kind: str
+    payload: dict[str, Any]
+    attempts: int
+    max_attempts: int
+
+
+class JobQueue(ABC):
+    """Durable work queue consumed by :class:`src.jobs.worker.JobWorker`."""
+
+    @abstractmethod
+    async def enqueue(self, kind: str, payload: dict[str, Any], dedup_key: Optional[str] = None,
+                      run_after: Optional[datetime] = None) -> bool:
+        """Add a job; returns ``False`` if a pending or running job has the same ``dedup_key``."""
+
+    @abstractmethod
+    async def claim(self, limit: int) -> list[ClaimedJob]:
+        """Lock up to ``limit`` due jobs for this worker."""
+
+    @abstractmethod
+    async def complete(self, job_id: int) -> None:
+        """Mark a claimed job as done, releasing its ``dedup_key``."""
+
+    @abstractmethod
+    async def fail(self, job_id: int, error: str, retry_in: Optional[float]) -> None:
+        """Reschedule a claimed job after ``retry_in`` seconds, or fail it for good if ``None``.
+
+        A job that failed for good releases its ``dedup_key``, so the same
+        work can be queued again.
+        """
+
+
+class JobRepository(BaseRepository[Job]):
+    """Repository for Job model operations."""
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, Job)
+
+    async def enqueue(self, kind: str, payload: dict[str, Any], dedup_key: Optional[str] = None,
+                      run_after: Optional[datetime] = None, commit: bool = True) -> bool:
+        """Insert a job unless a pending or running one has the same ``dedup_key``."""
+        try:
+            stmt = self._insert().values(
+                kind=kind, payload=payload, dedup_key=dedup_key, run_after=run_after or utcnow()
+            )
+            if dedup_key is not None:
+                stmt = stmt.on_conflict_do_nothing(index_elements=["dedup_key"])
+            result = await self.session.execute(stmt)
+            if commit:
+                await self.session.commit()
+            return result.rowcount > 0
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error enqueueing {kind} job: {e}")
+            raise
+
+    async def claim(self, limit: int, visibility_timeout: float) -> list[ClaimedJob]:
+        """Atomically lock due jobs.
+
+        On PostgreSQL the candidate rows are selected FOR UPDATE SKIP LOCKED so
+        concurrent workers never wait on each other; SQLite serializes writers
+        and ignores the locking clause. Jobs left ``running`` for longer than
+        ``visibility_timeout`` (crashed worker) are claimed again.
+        """
+        now = utcnow()
+        due = or_(
+            and_(Job.status == JobStatus.pending, Job.run_after <= now),
+            and_(Job.status == JobStatus.running, Job.locked_at < now - timedelta(seconds=visibility_timeout)),
+        )
+        candidates = (
+            select(Job.job_id)
+            .where(due)
+            .order_by(Job.run_after, Job.job_id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        try:
+            result = await self.session.execute(
+                update(Job)
+                .where(Job.job_id.in_(candidates))
+                .values(status=JobStatus.running, locked_at=now, attempts=Job.attempts + 1)
+                .returning(Job.job_id, Job.kind, Job.payload, Job.attempts, Job.max_attempts)
+            )
+            claimed = [ClaimedJob(*row) for row in result.all()]
+            await self.session.commit()
+            return claimed
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error claiming jobs: {e}")
+            raise
+
+    async def finish(self, job_id: int, status: JobStatus, error: Optional[str] = None,
+                     run_after: Optional[datetime] = None) -> None:
+        """Record the outcome of a claimed job; a finished job releases its ``dedup_key``.
+
+        Content uploaded again after its job finished gets a job of its own,
+        which sees every attachment of the blob, the new ones included.
+        """
+        values: dict[str, Any] = {"status": status, "locked_at": None, "last_error": error}
+        if status in (JobStatus.done, JobStatus.failed):
+            values["dedup_key"] = None
+        if run_after is not None:
+            values["run_after"] = run_after
+        try:
+            await self.session.execute(update(Job).where(Job.job_id == job_id).values(**values))
+            await self.session.commit()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error finishing job {job_id}: {e}")
+            raise
+
+
+class DatabaseJobQueue(JobQueue):
+    """Job queue stored in the ``jobs`` table."""
+
+    def __init__(self, session_maker: async_sessionmaker[AsyncSession], visibility_timeout: float = 300.0):
+        self.session_maker = session_maker
+        self.visibility_timeout = visibility_timeout
+
+    async def enqueue(self, kind, payload, dedup_key=None, run_after=None) -> bool:
+        async with self.session_maker() as session:
+            return await JobRepository(session).enqueue(kind, payload, dedup_key, run_after)
+
+    async def claim(self, limit: int) -> list[ClaimedJob]:
+        async with self.session_maker() as session:
+            return await JobRepository(session).claim(limit, self.visibility_timeout)
+
+    async def complete(self, job_id: int) -> None:
+        async with self.session_maker() as session:
+            await JobRepository(session).finish(job_id, JobStatus.done)
+
+    async def fail(self, job_id: int, error: str, retry_in: Optional[float]) -> None:
+        error = error[:1024]
+        async with self.session_maker() as session:
+            if retry_in is None:
+                await JobRepository(session).finish(job_id, JobStatus.failed, error)
+            else:
+                run_after = utcnow() + timedelta(seconds=retry_in)
+                await JobRepository(session).finish(job_id, JobStatus.pending, error, run_after)
+
+
+@dataclass
+class _MemoryJob:
+    job: ClaimedJob
+    status: JobStatus = JobStatus.pending
+    run_after: datetime = field(default_factory=utcnow)
+    last_error: Optional[str] = None
+    dedup_key: Optional[str] = None
+    locked_at: Optional[datetime] = None
+
+
+class InMemoryJobQueue(JobQueue):
+    """Process-local queue with the same semantics as :class:`DatabaseJobQueue`."""
+
+    def __init__(self, max_attempts: int = 5, visibility_timeout: float = 300.0,
+                 clock: Callable[[], datetime] = utcnow):
+        self.max_attempts = max_attempts
+        self.visibility_timeout = visibility_timeout
+        self.clock = clock
+        self.jobs: dict[int, _MemoryJob] = {}
+        self._dedup: dict[str, int] = {}
+        self._due: list[tuple[datetime, int]] = []
+        self._running: set[int] = set()
+        self._ids = itertools.count(1)
+
+    async def enqueue(self, kind, payload, dedup_key=None, run_after=None) -> bool:
+        if dedup_key is not None and dedup_key in self._dedup:
+            return False
+        job_id = next(self._ids)
+        run_after = run_after or self.clock()
+        self.jobs[job_id] = _MemoryJob(ClaimedJob(job_id, kind, payload, 0, self.max_attempts), run_after=run_after,
+                                       dedup_key=dedup_key)
+        if dedup_key is not None:
+            self._dedup[dedup_key] = job_id
+        heapq.heappush(self._due, (run_after, job_id))
+        return True
+
+    async def claim(self, limit: int) -> list[ClaimedJob]:
+        now = self.clock()
+        # Jobs left running past the visibility timeout (crashed handler) are due again.
+        stale = now - timedelta(seconds=self.visibility_timeout)
+        for job_id in [job_id for job_id in self._running if self.jobs[job_id].locked_at < stale]:
+            self._running.discard(job_id)
+            self.jobs[job_id].status = JobStatus.pending
+            heapq.heappush(self._due, (now, job_id))
+        claimed = []
+        while self._due and len(claimed) < limit and self._due[0][0] <= now:
+            _, job_id = heapq.heappop(self._due)
+            entry = self.jobs[job_id]
+            if entry.status != JobStatus.pending:
+                continue
+            job = entry.job
+            entry.job = ClaimedJob(job.job_id, job.kind, job.payload, job.attempts + 1, job.max_attempts)
+            entry.status = JobStatus.running
+            entry.locked_at = now
+            self._running.add(job_id)
+            claimed.append(entry.job)
+        return claimed
+
+    async def complete(self, job_id: int) -> None:
+        self._running.discard(job_id)
+        self.jobs[job_id].status = JobStatus.done
+        self._release(self.jobs[job_id])
+
+    async def fail(self, job_id: int, error: str, retry_in: Optional[float]) -> None:
+        self._running.discard(job_id)
+        entry = self.jobs[job_id]
+        entry.last_error = error
+        if retry_in is None:
+            entry.status = JobStatus.failed
+            self._release(entry)
+            return
+        entry.status = JobStatus.pending
+        entry.run_after = self.clock() + timedelta(seconds=retry_in)
+        heapq.heappush(self._due, (entry.run_after, job_id))
+
+    def _release(self, entry: _MemoryJob) -> None:
+        if entry.dedup_key is not None:
+            self._dedup.pop(entry.dedup_key, None)
+            entry.dedup_key = None
+
+
+def get_job_queue(request: Request) -> JobQueue:
+    """FastAPI dependency returning the queue created in the app lifespan."""
+    return request.app.state.job_queue
@@ -0,0 +1,157 @@
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+import asyncio
+import logging
+import multiprocessing
+import time
+
+from .queue import ClaimedJob, JobQueue
+
+logger = logging.getLogger(__name__)
+
+RunInPool = Callable[..., Awaitable[Any]]
+Handler = Callable[[dict[str, Any], RunInPool], Awaitable[None]]
+
+
+@dataclass
+class JobMetrics:
+    claimed: int = 0
+    completed: int = 0
+    retried: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def throughput(self) -> float:
+        """Completed jobs per second since the worker started."""
+        elapsed = time.monotonic() - self.started_at
+        return self.completed / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self) -> dict[str, float]:
+        return {
+            "claimed": self.claimed,
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "throughput": round(self.throughput, 3),
+        }
+
+
+class JobWorker:
+    """Pulls jobs from a :class:`JobQueue` and runs their handlers.
+
+    Handlers run on the event loop and offload CPU-bound work through the
+    ``run_in_pool`` callable they receive, which submits to a process pool so
+    parsing files never blocks request handling.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handlers: dict[str, Handler],
+        concurrency: int = 4,
+        batch_size: int = 16,
+        poll_interval: float = 0.5,
+        retry_base: float = 2.0,
+        retry_max: float = 300.0,
+        executor: Optional[Executor] = None,
+    ):
+        self.queue = queue
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.metrics = JobMetrics()
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._task: Optional[asyncio.Task] = None
+        self._draining = False
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            # Spawned rather than forked: the server process runs threads.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.concurrency,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def run_in_pool(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def backoff(self, attempts: int) -> float:
+        return min(self.retry_base * 2 ** (attempts - 1), self.retry_max)
+
+    async def run_once(self) -> int:
+        """Claim and process one batch; returns the number of jobs claimed."""
+        jobs = await self.queue.claim(self.batch_size)
+        self.metrics.claimed += len(jobs)
+        await asyncio.gather(*(self._process(job) for job in jobs))
+        return len(jobs)
+
+    async def _process(self, job: ClaimedJob) -> None:
+        async with self._semaphore:
+            handler = self.handlers.get(job.kind)
+            started = time.perf_counter()
+            try:
+                if handler is None:
+                    raise LookupError(f"No handler for job kind {job.kind}")
+                await handler(job.payload, self.run_in_pool)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                if job.attempts < job.max_attempts and handler is not None:
+                    self.metrics.retried += 1
+                    await self.queue.fail(job.job_id, error, self.backoff(job.attempts))
+                else:
+                    self.metrics.failed += 1
+                    await self.queue.fail(job.job_id, error, None)
+                logger.warning(f"Job {job.job_id} ({job.kind}) failed on attempt {job.attempts}: {error}")
+            else:
+                self.metrics.completed += 1
+                await self.queue.complete(job.job_id)
+            finally:
+                self.metrics.busy_seconds += time.perf_counter() - started
+
+    async def run(self) -> None:
+        while not self._draining:
+            try:
+                if await self.run_once() == 0:
+                    await asyncio.sleep(self.poll_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker loop error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run(), name="job-worker")
+
+    async def drain(self, timeout: float = 30.0) -> None:
+        """Finish the batch in hand without claiming another, then stop.
+
+        Jobs still running after ``timeout`` are cancelled; their claims
+        expire and another worker picks them up.
+        """
+        self._draining = True
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Job worker did not drain within {timeout} s")
+        await self.stop()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -1,12 +1,277 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import asyncio
+
+from fastapi import Depends, FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from src.activity.router import router as activity_router
+from src.activity.service import ActivityAggregator
+from src.auth.dependencies import get_admin_user_id
+from src.auth.router import router as auth_router
+from src.chat.edits import EditBatcher
+from src.chat.hub import ConnectionHub
+from src.chat.processing import ATTACHMENT_METADATA, make_attachment_handler
+from src.chat.router import router as chat_router
+from src.chat.storage import get_blob_store
+from src.chat.sync import SyncService
+from src.chat.websocket import router as chat_ws_router
+from src.core.admission import get_admission
+from src.core.broker import get_broker
+from src.core.database import get_async_engine, get_async_session_maker, get_replica_router, get_shard_map
+from src.core.ids import get_id_generator
 from src.core.settings import settings
+from src.jobs.queue import DatabaseJobQueue
+from src.jobs.worker import JobWorker
+from src.moderation.engine import BanEngine
+from src.moderation.router import router as moderation_router
+from src.moderation.service import PURGE_USER, ModerationService, make_purge_handler
+from src.notifications.service import NotificationService
+from src.notifications.sinks import BrokerSink
+from src.outbox.relay import OutboxRelay
+from src.presence.service import PresenceService
+from src.retention.service import RetentionScheduler
+from src.rooms.router import router as rooms_router
+from src.rooms.sharding import load_placements
+
+
+async def drain(app: FastAPI) -> None:
+    """Hand this worker's clients and jobs over to the other workers before it stops.
+
+    The health check fails from the first call so that load balancers stop
+    routing here. Only the first call does the work; later ones wait for it.
+    """
+    task = getattr(app.state, "drain_task", None)
+    if task is None:
+        task = app.state.drain_task = asyncio.create_task(_drain(app), name="drain")
+    await asyncio.shield(task)
+
+
+async def _drain(app: FastAPI) -> None:
+    app.state.draining = True
+    await app.state.chat_hub.drain(settings.DRAIN_RECONNECT_WINDOW, settings.DRAIN_TIMEOUT)
+    await app.state.job_worker.drain(settings.DRAIN_TIMEOUT)
+    await app.state.presence.flush_typing()
+    await app.state.presence.flush_presence()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.draining = False
+    app.state.drain_task = None
+    # Fails at startup, not on the first insert, without a valid WORKER_ID.
+    get_id_generator()
+    get_admission().start()
+    session_maker = get_async_session_maker()
+    replica_router = get_replica_router()
+    if replica_router is not None:
+        await replica_router.check_health()
+        replica_router.start(settings.REPLICA_HEALTH_CHECK_INTERVAL)
+    shard_map = get_shard_map()
+    if shard_map is not None:
+        # Listen first: the directory row is updated before each broker message.
+        await shard_map.start()
+        await load_placements(session_maker, shard_map)
+    app.state.ban_engine = BanEngine(session_maker, get_broker())
+    await app.state.ban_engine.start()
+    app.state.job_queue = DatabaseJobQueue(session_maker)
+    app.state.moderation = ModerationService(
+        session_maker,
+        batch_size=settings.MODERATION_PURGE_BATCH_SIZE,
+        pause=settings.MODERATION_PURGE_PAUSE,
+        shard_map=shard_map,
+    )
+    app.state.job_worker = JobWorker(
+        app.state.job_queue,
+        {
+            ATTACHMENT_METADATA: make_attachment_handler(session_maker, get_blob_store(), shard_map),
+            PURGE_USER: make_purge_handler(app.state.moderation),
+        },
+        concurrency=settings.JOB_WORKER_CONCURRENCY,
+    )
+    app.state.job_worker.start()
+    app.state.chat_hub = ConnectionHub(
+        get_broker(),
+        sync=SyncService(
+            session_maker,
+            capacity=settings.SYNC_LOG_SIZE,
+            max_rooms=settings.SYNC_MAX_ROOMS,
+            max_replay=settings.SYNC_MAX_REPLAY,
+        ),
+    )
+    await app.state.chat_hub.start()
+    app.state.edit_batcher = EditBatcher(
+        session_maker,
+        max_batch=settings.EDIT_BATCH_SIZE,
+        delay=settings.EDIT_BATCH_DELAY,
+    )
+    app.state.presence = PresenceService(
+        get_broker(),
+        broadcast=app.state.chat_hub.deliver,
+        ttl=settings.PRESENCE_TTL,
+        typing_ttl=settings.PRESENCE_TYPING_TTL,
+        typing_interval=settings.PRESENCE_FLUSH_INTERVAL,
+    )
+    await app.state.presence.start()
+    app.state.outbox_relay = OutboxRelay(
+        session_maker,
+        get_broker(),
+        engine=get_async_engine(),
+        batch_size=settings.OUTBOX_BATCH_SIZE,
+        poll_interval=settings.OUTBOX_POLL_INTERVAL,
+        lag_warning=settings.OUTBOX_LAG_WARNING,
+    )
+    app.state.outbox_relay.start()
+    # Events written on a room shard are committed to that shard's outbox.
+    app.state.shard_relays = {
+        name: OutboxRelay(
+            shard_map.session_makers[name],
+            get_broker(),
+            engine=shard_map.engines[name],
+            batch_size=settings.OUTBOX_BATCH_SIZE,
+            poll_interval=settings.OUTBOX_POLL_INTERVAL,
+            lag_warning=settings.OUTBOX_LAG_WARNING,
+        )
+        for name in (shard_map.names if shard_map is not None else ())
+    }
+    for relay in app.state.shard_relays.values():
+        relay.start()
+    app.state.notifications = NotificationService(
+        session_maker,
+        [BrokerSink(get_broker())],
+        presence=app.state.presence,
+        batch_size=settings.NOTIFICATION_BATCH_SIZE,
+        digest_window=settings.NOTIFICATION_DIGEST_WINDOW,
+        settle=settings.NOTIFICATION_SETTLE,
+        interval=settings.NOTIFICATION_INTERVAL,
+        shard_map=shard_map,
+    )
+    app.state.notifications.start()
+    app.state.retention = RetentionScheduler(
+        session_maker,
+        batch_size=settings.RETENTION_BATCH_SIZE,
+        max_rows=settings.RETENTION_MAX_ROWS_PER_TICK,
+        max_seconds=settings.RETENTION_MAX_SECONDS_PER_TICK,
+        pause=settings.RETENTION_PAUSE,
+        interval=settings.RETENTION_INTERVAL,
+    )
+    app.state.retention.start()
+    # Each shard purges its own rooms, within a budget of its own.
+    app.state.shard_retention = {
+        name: RetentionScheduler(
+            shard_map.session_makers[name],
+            batch_size=settings.RETENTION_BATCH_SIZE,
+            max_rows=settings.RETENTION_MAX_ROWS_PER_TICK,
+            max_seconds=settings.RETENTION_MAX_SECONDS_PER_TICK,
+            pause=settings.RETENTION_PAUSE,
+            interval=settings.RETENTION_INTERVAL,
+        )
+        for name in (shard_map.names if shard_map is not None else ())
+    }
+    for retention in app.state.shard_retention.values():
+        retention.start()
+    app.state.activity = ActivityAggregator(
+        session_maker,
+        batch_size=settings.ACTIVITY_BATCH_SIZE,
+        settle=settings.ACTIVITY_SETTLE,
+        interval=settings.ACTIVITY_INTERVAL,
+        shard_map=shard_map,
+    )
+    app.state.activity.start()
+    yield
+    await drain(app)
+    await app.state.activity.stop()
+    for retention in app.state.shard_retention.values():
+        await retention.stop()
+    await app.state.retention.stop()
+    await app.state.notifications.stop()
+    for relay in app.state.shard_relays.values():
+        await relay.stop()
+    await app.state.outbox_relay.stop()
+    await app.state.presence.stop()
+    await app.state.edit_batcher.stop()
+    await app.state.chat_hub.stop()
+    await app.state.job_worker.stop()
+    await app.state.ban_engine.stop()
+    if shard_map is not None:
+        await shard_map.dispose()
+    if replica_router is not None:
+        await replica_router.dispose()
+    else:
+        await get_async_engine().dispose()
+    await get_admission().stop()
+
+
+async def liveness_check():
+    """Whether the process should be restarted: only when its event loop is stuck."""
+    loop_lag = get_admission().loop_lag
+    if loop_lag > settings.LIVENESS_MAX_LOOP_LAG:
+        return JSONResponse({"status": "stuck", "loop_lag_seconds": round(loop_lag, 4)},
+                            status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return {"status": "ok", "loop_lag_seconds": round(loop_lag, 4)}
+
+
+async def health_check(request: Request):
+    """Whether to route traffic here: not while draining, nor while normal requests have been shed for a while."""
+    if getattr(request.app.state, "draining", False):
+        return JSONResponse({"status": "draining"}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    admission = get_admission().snapshot()
+    if admission["overloaded"]:
+        return JSONResponse({"status": "overloaded", **admission}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return {"status": "ok", **admission}
+
+
+# Background services on app.state whose ``metrics`` the metrics endpoint reports.
+METRICS_SOURCES = ("job_worker", "edit_batcher", "outbox_relay", "notifications", "retention", "activity")
+
+
+async def metrics(request: Request):
+    """Counters of this worker's admission controller and background services, for admins."""
+    state = request.app.state
+    snapshot = {"admission": get_admission().snapshot()}
+    for name in METRICS_SOURCES:
+        service = getattr(state, name, None)
+        if service is not None:
+            snapshot[name] = service.metrics.snapshot()
+    relay = getattr(state, "outbox_relay", None)
+    if relay is not None:
+        snapshot["outbox_backlog"] = await relay.backlog()
+    # The outbox relay and retention scheduler of each room shard.
+    shards: dict[str, dict] = {}
+    for name, relay in getattr(state, "shard_relays", {}).items():
+        shards[name] = {"outbox_relay": relay.metrics.snapshot(), "outbox_backlog": await relay.backlog()}
+    for name, retention in getattr(state, "shard_retention", {}).items():
+        shards.setdefault(name, {})["retention"] = retention.metrics.snapshot()
+    if shards:
+        snapshot["shards"] = shards
+    return snapshot
+
+
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    return JSONResponse({"detail": "Database unavailable"}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        headers={"Retry-After": "5"})
+
+
+def create_app() -> FastAPI:
+    """Build an application instance; each one is a worker with its own hub, presence and job worker."""
+    app = FastAPI(
+        title="AltMur Backend",
+        description="Backend for AltMur, a social media platform.",
+        version="0.1.0",
+        lifespan=lifespan,
+    )
+    app.include_router(auth_router)
+    app.include_router(rooms_router)
+    app.include_router(chat_router)
+    app.include_router(chat_ws_router)
+    app.include_router(moderation_router)
+    app.include_router(activity_router)
+    app.add_api_route("/health", health_check, methods=["GET"], tags=["health"])
+    app.add_api_route("/health/ready", health_check, methods=["GET"], tags=["health"])
+    app.add_api_route("/health/live", liveness_check, methods=["GET"], tags=["health"])
+    app.add_api_route("/admin/metrics", metrics, methods=["GET"], tags=["admin"],
+                      dependencies=[Depends(get_admin_user_id)])
+    app.add_exception_handler(PoolTimeoutError, pool_timeout_handler)
+    return app
 
-app = FastAPI(
-    title="AltMur Backend",
-    description="Backend for AltMur, a social media platform.",
-    version="0.1.0",
-)
 
-@app.get("/health", tags=["health"])
-async def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+app = create_app()
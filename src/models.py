@@ -1,7 +1,12 @@
 from src.auth.models import User, UserSession
-from src.chat.models import Message, Attachment, PinnedMessage
-from src.rooms.models import Room, RoomMember, JoinLink
+from src.chat.models import Message, Attachment, PinnedMessage, Mention, MessageRevision
+from src.rooms.models import Room, RoomMember, JoinLink, RoomShard, DirectMessage
 from src.moderation.models import Ban
+from src.jobs.models import Job
+from src.outbox.models import OutboxEvent
+from src.notifications.models import PendingNotification, NotificationCursor
+from src.retention.models import RetentionCheckpoint
+from src.activity.models import RoomActivityHourly, RoomActivityDaily, SiteActivityDaily, UserActivityDaily, ActivityWatermark
 from src.core.database import Base
 
 __all__ = [
@@ -10,9 +15,23 @@ __all__ = [
     "Message",
     "Attachment",
     "PinnedMessage",
+    "Mention",
+    "MessageRevision",
     "Room",
     "RoomMember",
     "JoinLink",
+    "RoomShard",
+    "DirectMessage",
     "Ban",
+    "Job",
+    "OutboxEvent",
+    "PendingNotification",
+    "NotificationCursor",
+    "RetentionCheckpoint",
+    "RoomActivityHourly",
+    "RoomActivityDaily",
+    "SiteActivityDaily",
+    "UserActivityDaily",
+    "ActivityWatermark",
     "Base",
 ]
\ No newline at end of file
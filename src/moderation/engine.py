@@ -0,0 +1,268 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Optional
+import asyncio
+import heapq
+import logging
+import uuid
+
+from fastapi.requests import HTTPConnection
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.broker import Broker
+from src.core.clock import utcnow
+from src.outbox.repository import OutboxRepository
+
+from .models import Ban
+from .repository import BanRepository
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class ActiveBan:
+    ban_id: int
+    user_id: int
+    room_id: Optional[int]
+    expires_at: Optional[datetime]
+
+    @classmethod
+    def from_model(cls, ban: Ban) -> "ActiveBan":
+        return cls(ban.ban_id, ban.banned_user_id, ban.room_id, ban.expires_at)
+
+    @classmethod
+    def from_message(cls, data: dict[str, Any]) -> "ActiveBan":
+        expires_at = data.get("expires_at")
+        return cls(
+            data["ban_id"],
+            data["user_id"],
+            data.get("room_id"),
+            datetime.fromisoformat(expires_at) if expires_at else None,
+        )
+
+    def to_message(self) -> dict[str, Any]:
+        return {
+            "ban_id": self.ban_id,
+            "user_id": self.user_id,
+            "room_id": self.room_id,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+        }
+
+
+class BanEngine:
+    """In-memory index of active bans.
+
+    Global bans and per-room bans are kept in separate dictionaries so that a
+    check is two dict lookups and never touches the database. Bans with an
+    ``expires_at`` are put on a heap; a single timer task sleeps until the
+    earliest deadline and flips ``is_active`` off in one UPDATE per batch.
+    Changes are written to the outbox with the ban rows and relayed on the
+    broker, so every worker keeps the same view.
+    """
+
+    CHANNEL = "moderation.bans"
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        broker: Broker,
+        clock: Callable[[], datetime] = utcnow,
+    ):
+        self.session_maker = session_maker
+        self.broker = broker
+        self.clock = clock
+        self.origin = uuid.uuid4().hex
+        self._by_id: dict[int, ActiveBan] = {}
+        self._global: dict[int, set[int]] = {}
+        self._rooms: dict[int, dict[int, set[int]]] = {}
+        self._heap: list[tuple[datetime, int]] = []
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._subscription = None
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def is_banned(self, user_id: int, room_id: Optional[int] = None) -> bool:
+        """Check whether a user is banned globally or from the given room."""
+        ban_ids = self._global.get(user_id)
+        if ban_ids and self._any_live(ban_ids):
+            return True
+        if room_id is None:
+            return False
+        room = self._rooms.get(room_id)
+        if not room:
+            return False
+        ban_ids = room.get(user_id)
+        return bool(ban_ids) and self._any_live(ban_ids)
+
+    def can_send(self, user_id: int, room_id: int) -> bool:
+        """Ban check for the message send path."""
+        return not self.is_banned(user_id, room_id)
+
+    def _any_live(self, ban_ids: set[int]) -> bool:
+        # The timer may run slightly late; never report a ban past its deadline.
+        now = None
+        for ban_id in ban_ids:
+            expires_at = self._by_id[ban_id].expires_at
+            if expires_at is None:
+                return True
+            if now is None:
+                now = self.clock()
+            if expires_at > now:
+                return True
+        return False
+
+    def apply(self, ban: ActiveBan) -> None:
+        """Add a ban to the local index and schedule its expiry."""
+        if ban.ban_id in self._by_id:
+            return
+        if ban.expires_at is not None and ban.expires_at <= self.clock():
+            return
+        self._by_id[ban.ban_id] = ban
+        if ban.room_id is None:
+            self._global.setdefault(ban.user_id, set()).add(ban.ban_id)
+        else:
+            self._rooms.setdefault(ban.room_id, {}).setdefault(ban.user_id, set()).add(ban.ban_id)
+        if ban.expires_at is not None:
+            if not self._heap or ban.expires_at < self._heap[0][0]:
+                self._wakeup.set()
+            heapq.heappush(self._heap, (ban.expires_at, ban.ban_id))
+
+    def discard(self, ban_id: int) -> Optional[ActiveBan]:
+        """Remove a ban from the local index; stale heap entries are skipped lazily."""
+        ban = self._by_id.pop(ban_id, None)
+        if ban is None:
+            return None
+        if ban.room_id is None:
+            users = self._global
+        else:
+            users = self._rooms.get(ban.room_id, {})
+        ban_ids = users.get(ban.user_id)
+        if ban_ids is not None:
+            ban_ids.discard(ban_id)
+            if not ban_ids:
+                del users[ban.user_id]
+        if ban.room_id is not None and not users:
+            self._rooms.pop(ban.room_id, None)
+        return ban
+
+    async def load(self) -> None:
+        """Load all currently active bans from the database.
+
+        Bans that expired while no worker was running are deactivated first;
+        no worker holds them, so there is nobody to tell.
+        """
+        now = self.clock()
+        async with self.session_maker() as session:
+            repo = BanRepository(session)
+            expired = await repo.deactivate_expired(now)
+            bans = await repo.get_active(now)
+        for ban in bans:
+            self.apply(ActiveBan.from_model(ban))
+        logger.info(f"Ban engine loaded {len(self._by_id)} active bans, deactivated {expired} expired")
+
+    async def start(self) -> None:
+        # Subscribe first, so a ban issued while loading is queued rather than missed.
+        self._subscription = self.broker.subscribe(self.CHANNEL)
+        await self.load()
+        self._tasks = [
+            asyncio.create_task(self._expiry_loop(), name="ban-expiry"),
+            asyncio.create_task(self._listen(), name="ban-listener"),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._subscription is not None:
+            self._subscription.close()
+            self._subscription = None
+
+    async def issue(
+        self,
+        banned_user_id: int,
+        banned_by_user_id: int,
+        room_id: Optional[int] = None,
+        reason: Optional[str] = None,
+        expires_at: Optional[datetime] = None,
+    ) -> Ban:
+        """Persist a new ban, index it and tell the other workers."""
+        async with self.session_maker() as session:
+            ban = await BanRepository(session).add(
+                banned_user_id=banned_user_id,
+                banned_by_user_id=banned_by_user_id,
+                room_id=room_id,
+                reason=reason,
+                expires_at=expires_at,
+            )
+            active = ActiveBan.from_model(ban)
+            self._announce(session, "ban", ban=active.to_message())
+            await session.commit()
+        self.apply(active)
+        return ban
+
+    async def lift(self, ban_id: int) -> bool:
+        """Deactivate a ban before its expiry."""
+        async with self.session_maker() as session:
+            changed = await BanRepository(session).deactivate([ban_id], commit=False)
+            self._announce(session, "lift", ban_ids=[ban_id])
+            await session.commit()
+        self.discard(ban_id)
+        return changed > 0
+
+    async def expire_due(self) -> list[int]:
+        """Deactivate every ban whose deadline has passed; returns their ids."""
+        now = self.clock()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, ban_id = heapq.heappop(self._heap)
+            if self.discard(ban_id) is not None:
+                due.append(ban_id)
+        if due:
+            async with self.session_maker() as session:
+                # Every worker expires the same bans; the first one to do it tells the others.
+                if await BanRepository(session).deactivate(due, commit=False):
+                    self._announce(session, "lift", ban_ids=due)
+                await session.commit()
+        return due
+
+    async def _expiry_loop(self) -> None:
+        while True:
+            self._wakeup.clear()
+            timeout = None
+            if self._heap:
+                timeout = max((self._heap[0][0] - self.clock()).total_seconds(), 0)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+                continue
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.expire_due()
+            except Exception as e:
+                logger.error(f"Error expiring bans: {e}")
+                await asyncio.sleep(1)
+
+    async def _listen(self) -> None:
+        async for message in self._subscription:
+            if message.get("origin") == self.origin:
+                continue
+            self.handle_message(message)
+
+    def handle_message(self, message: dict[str, Any]) -> None:
+        """Apply a ban change published by another worker."""
+        if message["event"] == "ban":
+            self.apply(ActiveBan.from_message(message["ban"]))
+        elif message["event"] == "lift":
+            for ban_id in message["ban_ids"]:
+                self.discard(ban_id)
+
+    def _announce(self, session: AsyncSession, event: str, **payload: Any) -> None:
+        OutboxRepository(session).add(self.CHANNEL, {"event": event, "origin": self.origin, **payload})
+
+
+def get_ban_engine(request: HTTPConnection) -> BanEngine:
+    """FastAPI dependency returning the engine started in the app lifespan."""
+    return request.app.state.ban_engine
@@ -0,0 +1,179 @@
+from datetime import datetime
+from typing import Any, Iterable, Optional, Sequence
+import logging
+
+from sqlalchemy import Row, delete, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.auth.models import UserSession
+from src.chat.models import Message
+from src.chat.repository import MessageRepository
+from src.core.repository import BaseRepository
+from src.rooms.models import RoomMember
+
+from .models import Ban
+
+logger = logging.getLogger(__name__)
+
+
+class BanRepository(BaseRepository[Ban]):
+    """Repository for Ban model operations."""
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, Ban)
+
+    async def add(self, **ban_data: Any) -> Ban:
+        """Insert a ban without committing, so that its id is known within the transaction."""
+        try:
+            ban = Ban(**ban_data)
+            self.session.add(ban)
+            await self.session.flush()
+            await self.session.refresh(ban)
+            return ban
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error adding ban: {e}")
+            raise
+
+    async def get_active(self, now: datetime) -> list[Ban]:
+        """Fetch every ban that is active and not yet expired."""
+        try:
+            result = await self.session.execute(
+                select(Ban).where(
+                    Ban.is_active.is_(True),
+                    or_(Ban.expires_at.is_(None), Ban.expires_at > now),
+                )
+            )
+            return list(result.scalars().all())
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching active bans: {e}")
+            raise
+
+    async def deactivate(self, ban_ids: Iterable[int], commit: bool = True) -> int:
+        """Flip ``is_active`` off for the given bans; already inactive ones are skipped."""
+        ban_ids = list(ban_ids)
+        if not ban_ids:
+            return 0
+        try:
+            result = await self.session.execute(
+                update(Ban)
+                .where(Ban.ban_id.in_(ban_ids), Ban.is_active.is_(True))
+                .values(is_active=False)
+            )
+            if commit:
+                await self.session.commit()
+            return result.rowcount
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error deactivating bans {ban_ids}: {e}")
+            raise
+
+    async def deactivate_expired(self, now: datetime) -> int:
+        """Flip ``is_active`` off for every active ban past its deadline, in one statement; commits."""
+        try:
+            result = await self.session.execute(
+                update(Ban)
+                .where(Ban.is_active.is_(True), Ban.expires_at.is_not(None), Ban.expires_at <= now)
+                .values(is_active=False)
+            )
+            await self.session.commit()
+            return result.rowcount
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error deactivating expired bans: {e}")
+            raise
+
+
+class ModerationRepository(BaseRepository[Message]):
+    """Set-based bulk operations on a user's content; none of them loads the rows it changes.
+
+    Message and membership writes take ``limit`` rows at a time and do not
+    commit, so that the caller commits each batch with its outbox events.
+    """
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, Message)
+
+    async def revoke_sessions(self, user_id: int, now: datetime) -> int:
+        """End every active session of a user; returns how many there were."""
+        try:
+            result = await self.session.execute(
+                update(UserSession)
+                .where(UserSession.user_id == user_id, UserSession.is_active.is_(True))
+                .values(is_active=False, expired_at=now)
+            )
+            await self.session.commit()
+            return result.rowcount
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error revoking the sessions of user {user_id}: {e}")
+            raise
+
+    async def get_rooms(self, user_id: int) -> set[int]:
+        """Ids of the rooms where a user has live messages or a membership."""
+        try:
+            result = await self.session.execute(
+                select(Message.room_id).where(Message.user_id == user_id, Message.is_deleted.is_(False))
+                .union(select(RoomMember.room_id).where(RoomMember.user_id == user_id))
+            )
+            return set(result.scalars().all())
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching the rooms of user {user_id}: {e}")
+            raise
+
+    async def soft_delete_messages(self, user_id: int, after_id: int, limit: int,
+                                   room_id: Optional[int] = None) -> list[tuple[int, int, list[int]]]:
+        """Mark the user's next ``limit`` live messages after ``after_id`` deleted, in every room or only ``room_id``.
+
+        The batch is read over a keyset range of the ``(user_id,
+        message_id)`` index, so it never scans the messages of earlier
+        batches. Then, room by room in id order, the room takes a sequence
+        number for its "messages_deleted" event, stored as ``changed_seq``
+        of its messages, and one UPDATE marks them; rooms are locked before
+        messages, as sends lock them. Returns ``(room_id, seq, message_ids)``
+        per room, where ``message_ids`` leaves out messages deleted
+        meanwhile and may be empty.
+        """
+        batch = (
+            select(Message.message_id, Message.room_id)
+            .where(Message.user_id == user_id, Message.message_id > after_id, Message.is_deleted.is_(False))
+            .order_by(Message.message_id)
+            .limit(limit)
+        )
+        if room_id is not None:
+            batch = batch.where(Message.room_id == room_id)
+        try:
+            rooms: dict[int, list[int]] = {}
+            for message_id, room_id in (await self.session.execute(batch)).all():
+                rooms.setdefault(room_id, []).append(message_id)
+            deleted = []
+            for room_id in sorted(rooms):
+                seq = await MessageRepository(self.session).next_seq(room_id)
+                result = await self.session.execute(
+                    update(Message)
+                    .where(Message.message_id.in_(rooms[room_id]), Message.is_deleted.is_(False))
+                    .values(is_deleted=True, changed_seq=seq)
+                    .returning(Message.message_id),
+                    execution_options={"synchronize_session": False},
+                )
+                deleted.append((room_id, seq, sorted(result.scalars().all())))
+            return deleted
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error deleting messages of user {user_id} after {after_id}: {e}")
+            raise
+
+    async def remove_memberships(self, user_id: int, limit: int, room_id: Optional[int] = None) -> list[int]:
+        """Delete up to ``limit`` room memberships of a user, or only that of ``room_id``; returns the ids of the rooms left."""
+        batch = select(RoomMember.member_id).where(RoomMember.user_id == user_id).limit(limit)
+        if room_id is not None:
+            batch = batch.where(RoomMember.room_id == room_id)
+        try:
+            result = await self.session.execute(
+                delete(RoomMember).where(RoomMember.member_id.in_(batch)).returning(RoomMember.room_id),
+                execution_options={"synchronize_session": False},
+            )
+            return list(result.scalars().all())
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error removing memberships of user {user_id}: {e}")
+            raise
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.auth.dependencies import get_admin_user_id
+from src.auth.repository import UserRepository
+from src.core.admission import Priority, admit
+from src.core.database import get_db
+from src.jobs.queue import JobQueue, get_job_queue
+
+from .engine import BanEngine, get_ban_engine
+from .schemas import BanIn, BanOut
+from .service import PURGE_USER
+
+router = APIRouter(prefix="/moderation", tags=["moderation"], dependencies=[Depends(admit(Priority.NORMAL))])
+
+
+@router.post("/users/{user_id}/ban", response_model=BanOut, status_code=status.HTTP_202_ACCEPTED)
+async def ban_user(
+    user_id: int,
+    ban: BanIn,
+    admin_id: int = Depends(get_admin_user_id),
+    db: AsyncSession = Depends(get_db),
+    engine: BanEngine = Depends(get_ban_engine),
+    job_queue: JobQueue = Depends(get_job_queue),
+):
+    """Ban a user everywhere; admins only. With ``purge`` their content is removed by a background job."""
+    if user_id == admin_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot ban yourself")
+    if await UserRepository(db).get_by_id(user_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    record = await engine.issue(user_id, admin_id, reason=ban.reason, expires_at=ban.expires_at)
+    purge_queued = ban.purge and await job_queue.enqueue(
+        PURGE_USER, {"user_id": user_id}, dedup_key=f"{PURGE_USER}:{record.ban_id}"
+    )
+    return BanOut(ban_id=record.ban_id, purge_queued=purge_queued)
@@ -0,0 +1,17 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class BanIn(BaseModel):
+    reason: Optional[str] = Field(default=None, max_length=255)
+    # None bans for good.
+    expires_at: Optional[datetime] = None
+    # Also delete the user's messages, sessions and memberships, in the background.
+    purge: bool = False
+
+
+class BanOut(BaseModel):
+    ban_id: int
+    purge_queued: bool
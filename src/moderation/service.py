@@ -0,0 +1,130 @@
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+from typing import Any, AsyncContextManager, Callable, Optional
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.chat.repository import EVENTS_CHANNEL
+from src.chat.schemas import deleted_event
+from src.core.clock import utcnow
+from src.core.sharding import ShardMap
+from src.jobs.worker import Handler, RunInPool
+from src.outbox.repository import OutboxRepository
+from src.rooms.repository import MEMBERS_CHANNEL
+
+from .repository import ModerationRepository
+
+logger = logging.getLogger(__name__)
+
+# Job kind of a user purge, with payload ``{"user_id": ...}``.
+PURGE_USER = "moderation.purge_user"
+
+
+@dataclass
+class PurgeResult:
+    sessions: int = 0
+    messages: int = 0
+    memberships: int = 0
+    batches: int = 0
+
+
+class ModerationService:
+    """Removes everything a user put in the chat, e.g. after a ban for spam.
+
+    Sessions are revoked first, in one statement. Messages are then
+    soft-deleted ``batch_size`` at a time along the ``(user_id,
+    message_id)`` index. Each batch commits together with one
+    "messages_deleted" event per room, sequenced like new messages and
+    relayed through the outbox, so that connected clients drop the
+    messages and reconnecting ones sync the deletion. Memberships are deleted
+    the same way, with a "left" event per room that takes the room off the
+    user's open connections.
+
+    Memory is bounded by the batch, and locks are held only for one batch
+    at a time; ``pause`` seconds between batches leave room for other
+    writers. A purge can be interrupted at any point and run again: it goes
+    on with whatever is left.
+
+    With a ``shard_map``, sessions are revoked in ``session_maker`` and
+    the rest is done room by room, each batch on the shard that owns the
+    room and under its write guard, so that no batch lands on the old
+    shard of a room being moved.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        batch_size: int = 1000,
+        pause: float = 0.01,
+        clock: Callable[[], datetime] = utcnow,
+        shard_map: Optional[ShardMap] = None,
+    ):
+        self.session_maker = session_maker
+        self.batch_size = batch_size
+        self.pause = pause
+        self.clock = clock
+        self.shard_map = shard_map
+
+    async def purge_user(self, user_id: int) -> PurgeResult:
+        result = PurgeResult()
+        async with self.session_maker() as session:
+            result.sessions = await ModerationRepository(session).revoke_sessions(user_id, self.clock())
+
+        if self.shard_map is None:
+            await self._purge_rooms(self.session_maker, user_id, None, result)
+        else:
+            found = await self.shard_map.scatter(lambda session: ModerationRepository(session).get_rooms(user_id))
+            for room_id in sorted(set().union(*found.values())):
+                await self._purge_rooms(partial(self.shard_map.room_session, room_id, write=True), user_id, room_id,
+                                        result)
+
+        logger.info(f"Purged user {user_id}: {result.messages} messages, {result.memberships} memberships, "
+                    f"{result.sessions} sessions")
+        return result
+
+    async def _purge_rooms(self, open_session: Callable[[], AsyncContextManager[AsyncSession]], user_id: int,
+                           in_room: Optional[int], result: PurgeResult) -> None:
+        """Delete the user's messages, then memberships, in every room or only ``in_room``."""
+        after_id = 0
+        while True:
+            async with open_session() as session:
+                deleted = await ModerationRepository(session).soft_delete_messages(
+                    user_id, after_id, self.batch_size, in_room
+                )
+                if not deleted:
+                    break
+                outbox = OutboxRepository(session)
+                # Also for rooms whose messages were all deleted meanwhile, so the sequence has no hole.
+                for room_id, seq, message_ids in deleted:
+                    outbox.add(EVENTS_CHANNEL, {"room_id": room_id, "event": deleted_event(room_id, seq, message_ids)})
+                await session.commit()
+            message_ids = [message_id for _, _, ids in deleted for message_id in ids]
+            after_id = max(message_ids, default=after_id)
+            result.messages += len(message_ids)
+            result.batches += 1
+            await asyncio.sleep(self.pause)
+
+        while True:
+            async with open_session() as session:
+                room_ids = await ModerationRepository(session).remove_memberships(user_id, self.batch_size, in_room)
+                if not room_ids:
+                    break
+                outbox = OutboxRepository(session)
+                for room_id in room_ids:
+                    outbox.add(MEMBERS_CHANNEL, {"event": "left", "room_id": room_id, "user_id": user_id})
+                await session.commit()
+            result.memberships += len(room_ids)
+            result.batches += 1
+            await asyncio.sleep(self.pause)
+
+
+def make_purge_handler(service: ModerationService) -> Handler:
+    """Build the job handler of ``PURGE_USER`` jobs."""
+
+    async def handle(payload: dict[str, Any], run_in_pool: RunInPool) -> None:
+        await service.purge_user(payload["user_id"])
+
+    return handle
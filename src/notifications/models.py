@@ -0,0 +1,33 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from src.core.database import Base
+
+
+class PendingNotification(Base):
+    """What a user missed in one room since their last digest.
+
+    Bursts are coalesced into one row per user and room: fan-out adds to
+    the counters, and ``created_at`` keeps the time of the first event, so
+    the digest goes out one window after it however busy the room is.
+    """
+    __tablename__ = "pending_notifications"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.user_id"), primary_key=True)
+    room_id: Mapped[int] = mapped_column(ForeignKey("rooms.room_id"), primary_key=True)
+    messages: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    mentions: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    replies: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    first_message_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    last_message_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False, index=True)
+
+
+class NotificationCursor(Base):
+    """The last message id a fan-out has processed; one row per ``name``."""
+    __tablename__ = "notification_cursors"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    message_id: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0", nullable=False)
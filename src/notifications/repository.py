@@ -0,0 +1,164 @@
+from datetime import datetime
+from typing import Any, AsyncIterator, Iterable, Sequence
+import logging
+
+from sqlalchemy import Row, delete, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.chat.models import Mention, Message
+from src.core.repository import BaseRepository
+from src.rooms.models import RoomMember
+
+from .models import NotificationCursor, PendingNotification
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationRepository(BaseRepository[PendingNotification]):
+    """Repository for PendingNotification model operations."""
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, PendingNotification, primary_key_field="user_id")
+
+    async def lock_cursor(self, name: str, start: int = 0) -> int:
+        """Return the cursor's message id, creating it at ``start``, and keep its row locked until the commit.
+
+        Concurrent fan-outs on other workers wait here instead of processing
+        the same messages; on SQLite the write takes the database lock.
+        """
+        try:
+            stmt = self._insert(NotificationCursor).values(name=name, message_id=start)
+            result = await self.session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[NotificationCursor.name],
+                    set_={"message_id": NotificationCursor.message_id},
+                ).returning(NotificationCursor.message_id)
+            )
+            return result.scalar_one()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error locking notification cursor {name}: {e}")
+            raise
+
+    async def move_cursor(self, name: str, message_id: int) -> None:
+        await self.session.execute(
+            update(NotificationCursor).where(NotificationCursor.name == name).values(message_id=message_id)
+        )
+
+    async def get_new_messages(self, after_id: int, before_id: int, limit: int) -> Sequence[Row]:
+        """``(message_id, user_id, room_id, reply_to, message, created_at)`` of live messages in ``(after_id, before_id)``, by id."""
+        try:
+            result = await self.session.execute(
+                select(Message.message_id, Message.user_id, Message.room_id, Message.reply_to, Message.message,
+                       Message.created_at)
+                .where(Message.message_id > after_id, Message.message_id < before_id, Message.is_deleted.is_(False))
+                .order_by(Message.message_id)
+                .limit(limit)
+            )
+            return result.all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching messages after {after_id}: {e}")
+            raise
+
+    async def get_authors(self, message_ids: Iterable[int]) -> dict[int, int]:
+        """``{message_id: user_id}`` of the given messages, in one query."""
+        message_ids = list(message_ids)
+        if not message_ids:
+            return {}
+        try:
+            result = await self.session.execute(
+                select(Message.message_id, Message.user_id).where(Message.message_id.in_(message_ids))
+            )
+            return dict(result.all())
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching the authors of {len(message_ids)} messages: {e}")
+            raise
+
+    async def get_mentioned(self, message_ids: Iterable[int]) -> list[tuple[int, int]]:
+        """``(room_id, user_id)`` of every mention in the given messages, from the mention index."""
+        message_ids = list(message_ids)
+        if not message_ids:
+            return []
+        try:
+            result = await self.session.execute(
+                select(Mention.room_id, Mention.user_id).where(Mention.message_id.in_(message_ids))
+            )
+            return [tuple(row) for row in result.all()]
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching the mentions of {len(message_ids)} messages: {e}")
+            raise
+
+    async def iter_members(self, room_id: int, batch_size: int) -> AsyncIterator[list[int]]:
+        """User ids of a room's members, ``batch_size`` at a time, by keyset on the unique (room_id, user_id) index."""
+        after = 0
+        while True:
+            try:
+                result = await self.session.execute(
+                    select(RoomMember.user_id)
+                    .where(RoomMember.room_id == room_id, RoomMember.user_id > after)
+                    .order_by(RoomMember.user_id)
+                    .limit(batch_size)
+                )
+            except SQLAlchemyError as e:
+                logger.error(f"Error fetching members of room {room_id}: {e}")
+                raise
+            user_ids = list(result.scalars())
+            if user_ids:
+                yield user_ids
+            if len(user_ids) < batch_size:
+                return
+            after = user_ids[-1]
+
+    async def add(self, rows: list[dict[str, Any]]) -> None:
+        """Add to the pending counters of ``(user_id, room_id)`` pairs in one statement, without committing.
+
+        A pair already pending keeps its ``created_at`` and
+        ``first_message_id``; everything else accumulates.
+        """
+        if not rows:
+            return
+        try:
+            stmt = self._insert()
+            pending = PendingNotification
+            await self.session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[pending.user_id, pending.room_id],
+                    set_={
+                        "messages": pending.messages + stmt.excluded.messages,
+                        "mentions": pending.mentions + stmt.excluded.mentions,
+                        "replies": pending.replies + stmt.excluded.replies,
+                        # Fan-outs run in message id order, so the newest row wins.
+                        "last_message_id": stmt.excluded.last_message_id,
+                    },
+                ),
+                rows,
+            )
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error adding {len(rows)} pending notifications: {e}")
+            raise
+
+    async def claim_due(self, before: datetime, limit: int) -> list[PendingNotification]:
+        """Delete and return every pending row of up to ``limit`` users with a row due, without committing.
+
+        The caller delivers the digests and then commits; rolling back
+        keeps them pending.
+        """
+        users = (
+            select(PendingNotification.user_id)
+            .where(PendingNotification.created_at <= before)
+            .distinct()
+            .limit(limit)
+        )
+        try:
+            result = await self.session.execute(
+                delete(PendingNotification)
+                .where(PendingNotification.user_id.in_(users))
+                .returning(PendingNotification)
+                .execution_options(synchronize_session=False)
+            )
+            return sorted(result.scalars().all(), key=lambda row: (row.user_id, row.room_id))
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error claiming due notifications: {e}")
+            raise
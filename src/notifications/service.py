@@ -0,0 +1,244 @@
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional, Sequence
+import asyncio
+import logging
+import time
+
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.clock import utcnow
+from src.core.ids import min_id_at
+from src.core.sharding import ShardMap
+from src.presence.service import PresenceService
+
+from .repository import NotificationRepository
+from .sinks import Digest, NotificationSink, RoomDigest
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class NotificationMetrics:
+    messages: int = 0
+    recipients: int = 0
+    skipped_online: int = 0
+    digests: int = 0
+    dropped_online: int = 0
+    failures: int = 0
+    fan_out_seconds: float = 0.0
+
+    def snapshot(self) -> dict[str, float]:
+        return {
+            "messages": self.messages,
+            "recipients": self.recipients,
+            "skipped_online": self.skipped_online,
+            "digests": self.digests,
+            "dropped_online": self.dropped_online,
+            "failures": self.failures,
+            "fan_out_seconds": round(self.fan_out_seconds, 3),
+        }
+
+
+class NotificationService:
+    """Turns new messages into per-user digests for members who are offline.
+
+    Fan-out follows a cursor over message ids rather than the broker, so
+    that each message is processed once however many workers run it: the
+    cursor row is locked for the whole transaction and moves in the same
+    commit as the notifications it produced. Messages younger than
+    ``settle`` seconds are left for the next pass, so that a send still
+    committing with a smaller id is not skipped.
+
+    Recipients are read ``batch_size`` members at a time and written with
+    one upsert per batch, so a message to a room of 100k members costs a
+    few hundred statements, not 100k. Members who are online, or who
+    posted in the batch, are skipped. Everything a user misses in a room
+    is coalesced into one pending row, and the digest goes out
+    ``digest_window`` seconds after the first of them, unless the user has
+    come online meanwhile. Delivery is at least once: a batch is deleted
+    only after every sink took it.
+
+    With a ``shard_map``, rooms live on the shards: each shard's messages
+    and members are read there, after a cursor of its own, and the pending
+    notifications kept in ``session_maker``, so a user still gets one
+    digest. Messages a move copied onto a shard are skipped there, as the
+    shard they came from notified them (ShardMap.owns).
+    """
+
+    CURSOR = "messages"
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        sinks: Iterable[NotificationSink],
+        presence: Optional[PresenceService] = None,
+        batch_size: int = 1000,
+        message_batch: int = 500,
+        digest_window: float = 300.0,
+        settle: float = 5.0,
+        interval: float = 1.0,
+        clock: Callable[[], datetime] = utcnow,
+        shard_map: Optional[ShardMap] = None,
+    ):
+        self.session_maker = session_maker
+        self.shard_map = shard_map
+        self.sinks = list(sinks)
+        self.presence = presence
+        self.batch_size = batch_size
+        self.message_batch = message_batch
+        self.digest_window = digest_window
+        self.settle = settle
+        self.interval = interval
+        self.clock = clock
+        self.metrics = NotificationMetrics()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def _online(self, user_ids: Iterable[int]) -> set[int]:
+        return self.presence.filter_online(user_ids) if self.presence is not None else set()
+
+    async def fan_out_once(self) -> int:
+        """Add the next batch of settled messages to the pending notifications; returns the number of messages read.
+
+        With a shard map, the next batch of each shard; returns the most read from one shard.
+        """
+        if self.shard_map is None:
+            return await self._fan_out(None)
+        return max([await self._fan_out(shard) for shard in self.shard_map.names])
+
+    async def _fan_out(self, shard: Optional[str]) -> int:
+        started = time.perf_counter()
+        now = self.clock()
+        name = self.CURSOR if shard is None else f"{self.CURSOR}:{shard}"
+        async with AsyncExitStack() as stack:
+            session = await stack.enter_async_context(self.session_maker())
+            source = session if shard is None else await stack.enter_async_context(self.shard_map.session(shard))
+            repo = NotificationRepository(session)
+            rooms_repo = NotificationRepository(source)
+            settled = min_id_at(now - timedelta(seconds=self.settle))
+            # A new cursor starts from now rather than notifying the whole history.
+            cursor = await repo.lock_cursor(name, start=settled - 1)
+            batch = await rooms_repo.get_new_messages(cursor, settled, self.message_batch)
+            if not batch:
+                await session.commit()
+                return 0
+            messages = batch
+            if shard is not None:
+                messages = [m for m in batch if self.shard_map.owns(shard, m.room_id, m.created_at)]
+            rooms: dict[int, list[Row]] = {}
+            for message in messages:
+                rooms.setdefault(message.room_id, []).append(message)
+            mentions = await self._count_mentions(rooms_repo, messages)
+            replies = await self._count_replies(rooms_repo, messages)
+            for room_id, room_messages in rooms.items():
+                await self._fan_out_room(repo, rooms_repo, room_id, room_messages, mentions, replies, now)
+            await repo.move_cursor(name, batch[-1].message_id)
+            await session.commit()
+        self.metrics.messages += len(messages)
+        self.metrics.fan_out_seconds += time.perf_counter() - started
+        return len(batch)
+
+    async def _count_mentions(self, repo: NotificationRepository,
+                              messages: Sequence[Row]) -> dict[tuple[int, int], int]:
+        """Mentioning messages per ``(room_id, user_id)``."""
+        counts: dict[tuple[int, int], int] = {}
+        for key in await repo.get_mentioned(message.message_id for message in messages):
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    async def _count_replies(self, repo: NotificationRepository,
+                             messages: Sequence[Row]) -> dict[tuple[int, int], int]:
+        """Replies per ``(room_id, user_id)`` of the replied-to author."""
+        authors = await repo.get_authors({m.reply_to for m in messages if m.reply_to is not None})
+        counts: dict[tuple[int, int], int] = {}
+        for message in messages:
+            user_id = authors.get(message.reply_to)
+            if user_id is not None:
+                counts[message.room_id, user_id] = counts.get((message.room_id, user_id), 0) + 1
+        return counts
+
+    async def _fan_out_room(self, repo: NotificationRepository, rooms_repo: NotificationRepository, room_id: int,
+                            messages: list[Row], mentions: dict[tuple[int, int], int],
+                            replies: dict[tuple[int, int], int], now: datetime) -> None:
+        authors = {message.user_id for message in messages}
+        first, last = messages[0].message_id, messages[-1].message_id
+        async for user_ids in rooms_repo.iter_members(room_id, self.batch_size):
+            online = self._online(user_ids)
+            self.metrics.skipped_online += len(online)
+            rows = [
+                {
+                    "user_id": user_id,
+                    "room_id": room_id,
+                    "messages": len(messages),
+                    "mentions": mentions.get((room_id, user_id), 0),
+                    "replies": replies.get((room_id, user_id), 0),
+                    "first_message_id": first,
+                    "last_message_id": last,
+                    "created_at": now,
+                }
+                for user_id in user_ids
+                if user_id not in online and user_id not in authors
+            ]
+            await repo.add(rows)
+            self.metrics.recipients += len(rows)
+
+    async def deliver_due(self) -> int:
+        """Send the digests of up to ``batch_size`` users who have waited ``digest_window``; returns how many were sent."""
+        before = self.clock() - timedelta(seconds=self.digest_window)
+        async with self.session_maker() as session:
+            pending = await NotificationRepository(session).claim_due(before, self.batch_size)
+            if not pending:
+                return 0
+            rooms: dict[int, list[RoomDigest]] = {}
+            for row in pending:
+                rooms.setdefault(row.user_id, []).append(RoomDigest(
+                    row.room_id, row.messages, row.mentions, row.replies, row.first_message_id, row.last_message_id,
+                ))
+            # Users who came back online have seen the rooms themselves.
+            online = self._online(rooms)
+            digests = [Digest(user_id, tuple(user_rooms)) for user_id, user_rooms in rooms.items()
+                       if user_id not in online]
+            if digests:
+                for sink in self.sinks:
+                    await sink.send(digests)
+            await session.commit()
+        self.metrics.digests += len(digests)
+        self.metrics.dropped_online += len(online)
+        return len(digests)
+
+    async def run(self) -> None:
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                while await self.fan_out_once() == self.message_batch and not self._stopping:
+                    pass
+                await self.deliver_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics.failures += 1
+                logger.error(f"Notification fan-out error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        self._stopping = False
+        self._task = asyncio.create_task(self.run(), name="notifications")
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Finish the pass in hand, then stop; a pass cancelled after ``timeout`` is rolled back and redone."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Notification service did not stop within {timeout} s")
+                self._task.cancel()
+                await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,61 @@
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from src.core.broker import Broker
+from src.core.serialization import json_id
+
+
+@dataclass(frozen=True, slots=True)
+class RoomDigest:
+    room_id: int
+    messages: int
+    mentions: int
+    replies: int
+    first_message_id: int
+    last_message_id: int
+
+
+@dataclass(frozen=True, slots=True)
+class Digest:
+    """Everything one user missed since their last digest, per room."""
+    user_id: int
+    rooms: tuple[RoomDigest, ...]
+
+    def to_message(self) -> dict[str, Any]:
+        rooms = [
+            {**asdict(room), "first_message_id": json_id(room.first_message_id),
+             "last_message_id": json_id(room.last_message_id)}
+            for room in self.rooms
+        ]
+        return {"user_id": self.user_id, "rooms": rooms}
+
+
+class NotificationSink(ABC):
+    """Where digests go: push gateways, e-mail, a broker channel."""
+
+    @abstractmethod
+    async def send(self, digests: list[Digest]) -> None:
+        """Deliver a batch of digests; raising keeps the whole batch pending for the next attempt."""
+
+
+class InMemorySink(NotificationSink):
+    """Keeps every digest it receives; the stand-in for real sinks in tests."""
+
+    def __init__(self):
+        self.digests: list[Digest] = []
+
+    async def send(self, digests: list[Digest]) -> None:
+        self.digests.extend(digests)
+
+
+class BrokerSink(NotificationSink):
+    """Publishes each batch of digests on a broker channel, for push and e-mail gateways to consume."""
+
+    CHANNEL = "notifications.digests"
+
+    def __init__(self, broker: Broker):
+        self.broker = broker
+
+    async def send(self, digests: list[Digest]) -> None:
+        await self.broker.publish(self.CHANNEL, {"digests": [digest.to_message() for digest in digests]})
@@ -0,0 +1,19 @@
+from typing import Any
+from sqlalchemy import BigInteger, JSON, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.core.database import Base
+from src.core.ids import next_id
+
+
+class OutboxEvent(Base):
+    """A broker message written in the same transaction as the change it announces.
+
+    The id is a snowflake, so it also records when the event was written;
+    rows are deleted once the relay has published them.
+    """
+    __tablename__ = "outbox"
+
+    event_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False, default=next_id)
+    channel: Mapped[str] = mapped_column(String(100), nullable=False)
+    payload: Mapped[dict[str, Any]] = mapped_column(JSON, nullable=False)
@@ -0,0 +1,172 @@
+from dataclasses import dataclass, field
+from typing import Any, Optional
+import asyncio
+import logging
+import time
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from src.core.broker import Broker
+from src.core.clock import utcnow
+from src.core.ids import timestamp_of
+
+from .repository import NOTIFY_CHANNEL, OutboxRepository, on_commit
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RelayMetrics:
+    batches: int = 0
+    relayed: int = 0
+    failures: int = 0
+    lag_seconds: float = 0.0
+    max_lag_seconds: float = 0.0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def throughput(self) -> float:
+        """Published events per second since the relay started."""
+        elapsed = time.monotonic() - self.started_at
+        return self.relayed / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self) -> dict[str, float]:
+        return {
+            "batches": self.batches,
+            "relayed": self.relayed,
+            "failures": self.failures,
+            "lag_seconds": round(self.lag_seconds, 3),
+            "max_lag_seconds": round(self.max_lag_seconds, 3),
+            "throughput": round(self.throughput, 3),
+        }
+
+
+class OutboxRelay:
+    """Publishes committed outbox events on the broker, oldest first.
+
+    Delivery is at least once: events are deleted in the transaction that
+    claimed them, which only commits after every event of the batch was
+    published, so a crash or a broker error republishes the batch. Each
+    message carries its ``event_id`` as an idempotency key.
+
+    The relay wakes up when a session of this process commits events and,
+    on PostgreSQL, on NOTIFY from other processes; otherwise it polls every
+    ``poll_interval`` seconds. ``lag_seconds`` is the age of the oldest
+    event of the last batch when it was published.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        broker: Broker,
+        engine: Optional[AsyncEngine] = None,
+        batch_size: int = 500,
+        poll_interval: float = 1.0,
+        lag_warning: float = 5.0,
+    ):
+        self.session_maker = session_maker
+        self.broker = broker
+        self.engine = engine
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lag_warning = lag_warning
+        self.metrics = RelayMetrics()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._remove_listener = None
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    async def relay_once(self) -> int:
+        """Publish one batch; returns the number of events published."""
+        async with self.session_maker() as session:
+            events = await OutboxRepository(session).claim(self.batch_size)
+            if not events:
+                return 0
+            for claimed in events:
+                await self.broker.publish(claimed.channel, {**claimed.payload, "event_id": claimed.event_id})
+            await session.commit()
+        lag = (utcnow() - timestamp_of(events[0].event_id)).total_seconds()
+        metrics = self.metrics
+        metrics.batches += 1
+        metrics.relayed += len(events)
+        metrics.lag_seconds = lag
+        metrics.max_lag_seconds = max(metrics.max_lag_seconds, lag)
+        if lag > self.lag_warning:
+            logger.warning(f"Outbox relay is {lag:.1f} s behind")
+        return len(events)
+
+    async def backlog(self) -> dict[str, Any]:
+        """Events waiting to be published and the age of the oldest, in seconds."""
+        async with self.session_maker() as session:
+            count, oldest = await OutboxRepository(session).backlog()
+        age = (utcnow() - timestamp_of(oldest)).total_seconds() if oldest is not None else 0.0
+        return {"pending": count, "oldest_seconds": round(age, 3)}
+
+    async def run(self) -> None:
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                if await self.relay_once() == self.batch_size:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics.failures += 1
+                logger.error(f"Outbox relay error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _listen(self) -> None:
+        """Wake on NOTIFY; reconnects after errors, while polling keeps events flowing."""
+        while True:
+            try:
+                async with self.engine.connect() as conn:
+                    driver = (await conn.get_raw_connection()).driver_connection
+                    notified = lambda *args: self.wake()
+                    await driver.add_listener(NOTIFY_CHANNEL, notified)
+                    try:
+                        await asyncio.Future()
+                    finally:
+                        await driver.remove_listener(NOTIFY_CHANNEL, notified)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox listener error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        self._stopping = False
+        self._remove_listener = on_commit(self.wake)
+        self._task = asyncio.create_task(self.run(), name="outbox-relay")
+        if self.engine is not None and self.engine.dialect.name == "postgresql":
+            self._listener = asyncio.create_task(self._listen(), name="outbox-listener")
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Finish the batch in hand, then stop.
+
+        A batch still in flight after ``timeout`` is cancelled; its
+        transaction is rolled back and the next relay publishes it again.
+        """
+        self._stopping = True
+        self.wake()
+        if self._remove_listener is not None:
+            self._remove_listener()
+            self._remove_listener = None
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Outbox relay did not stop within {timeout} s")
+                self._task.cancel()
+                await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
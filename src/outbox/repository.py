@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+import logging
+
+from sqlalchemy import delete, event, func, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.core.repository import BaseRepository
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL NOTIFY channel that wakes relays in other processes.
+NOTIFY_CHANNEL = "outbox"
+# Key of the transaction-scoped advisory lock held by the relay publishing a batch.
+RELAY_LOCK_KEY = 0x6F7574626F78
+
+_PENDING = "outbox_pending"
+_commit_listeners: list[Callable[[], None]] = []
+
+
+def on_commit(listener: Callable[[], None]) -> Callable[[], None]:
+    """Call ``listener`` after any session of this process commits outbox events; returns a remover."""
+    _commit_listeners.append(listener)
+    return lambda: _commit_listeners.remove(listener)
+
+
+@event.listens_for(Session, "before_commit")
+def _notify(session: Session) -> None:
+    if session.info.get(_PENDING) and session.connection().dialect.name == "postgresql":
+        # Delivered at commit, and only once per transaction.
+        session.execute(text(f"NOTIFY {NOTIFY_CHANNEL}"))
+
+
+@event.listens_for(Session, "after_commit")
+def _wake(session: Session) -> None:
+    if session.info.pop(_PENDING, False):
+        for listener in tuple(_commit_listeners):
+            listener()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget(session: Session) -> None:
+    session.info.pop(_PENDING, None)
+
+
+@dataclass(frozen=True, slots=True)
+class ClaimedEvent:
+    event_id: int
+    channel: str
+    payload: dict[str, Any]
+
+
+class OutboxRepository(BaseRepository[OutboxEvent]):
+    """Repository for OutboxEvent model operations."""
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, OutboxEvent)
+
+    def add(self, channel: str, payload: dict[str, Any]) -> OutboxEvent:
+        """Stage an event in the session's transaction; nothing is published unless it commits."""
+        outbox_event = OutboxEvent(channel=channel, payload=payload)
+        self.session.add(outbox_event)
+        self.session.info[_PENDING] = True
+        return outbox_event
+
+    async def claim(self, limit: int) -> list[ClaimedEvent]:
+        """Delete and return the oldest ``limit`` events, in order, without committing.
+
+        The caller publishes them and then commits; rolling back puts them
+        back. On PostgreSQL a relay only claims while holding an advisory
+        lock for the rest of its transaction, so batches are published one
+        at a time and in order; elsewhere the delete takes the database
+        write lock, which has the same effect.
+        """
+        try:
+            if self.session.get_bind().dialect.name == "postgresql":
+                locked = await self.session.execute(text("SELECT pg_try_advisory_xact_lock(:key)"),
+                                                    {"key": RELAY_LOCK_KEY})
+                if not locked.scalar():
+                    return []
+            oldest = select(OutboxEvent.event_id).order_by(OutboxEvent.event_id).limit(limit)
+            result = await self.session.execute(
+                delete(OutboxEvent)
+                .where(OutboxEvent.event_id.in_(oldest))
+                .returning(OutboxEvent.event_id, OutboxEvent.channel, OutboxEvent.payload)
+            )
+            return sorted((ClaimedEvent(*row) for row in result.all()), key=lambda claimed: claimed.event_id)
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error claiming outbox events: {e}")
+            raise
+
+    async def backlog(self) -> tuple[int, Optional[int]]:
+        """``(count, oldest_event_id)`` of the events waiting to be published."""
+        try:
+            result = await self.session.execute(select(func.count(), func.min(OutboxEvent.event_id)))
+            count, oldest = result.one()
+            return count, oldest
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching the outbox backlog: {e}")
+            raise
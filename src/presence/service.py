@@ -0,0 +1,302 @@
+from typing import Any, Awaitable, Callable, Iterable, Optional
+import asyncio
+import logging
+import time
+import uuid
+
+from fastapi.requests import HTTPConnection
+
+from src.core.broker import Broker
+from src.core.timing_wheel import TimingWheel
+
+logger = logging.getLogger(__name__)
+
+Broadcast = Callable[[int, dict[str, Any]], Awaitable[None]]
+
+
+async def _no_broadcast(room_id: int, event: dict[str, Any]) -> None:
+    return None
+
+
+class PresenceService:
+    """Online and typing state kept entirely in memory.
+
+    Heartbeats renew a per-user deadline in one of ``shards`` dictionaries;
+    each online user sits in exactly one timing-wheel bucket and is re-filed
+    lazily when its bucket comes due, so a heartbeat is two dict writes.
+
+    Typing notifications are buffered per room and flushed at most once per
+    ``typing_interval``. Each worker publishes only its own typists, so a
+    room's typing event merges the latest set of every worker. Online/offline
+    transitions of this worker are published on the broker in batches,
+    together with a liveness beacon, so other workers know who is connected
+    elsewhere; a worker seen for the first time is sent a full snapshot.
+    """
+
+    PRESENCE_CHANNEL = "presence.users"
+    TYPING_CHANNEL = "presence.typing"
+
+    def __init__(
+        self,
+        broker: Broker,
+        ttl: float = 60.0,
+        typing_ttl: float = 5.0,
+        typing_interval: float = 1.0,
+        shards: int = 64,
+        broadcast: Broadcast = _no_broadcast,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if shards & (shards - 1):
+            raise ValueError("shards must be a power of two")
+        self.broker = broker
+        self.ttl = ttl
+        self.typing_ttl = typing_ttl
+        self.typing_interval = typing_interval
+        self.broadcast = broadcast
+        self.clock = clock
+        self.origin = uuid.uuid4().hex
+        self._mask = shards - 1
+        self._shards: list[dict[int, float]] = [{} for _ in range(shards)]
+        self._wheel = TimingWheel(tick=1.0, slots=max(int(ttl) * 2, 8), start=clock())
+        self._filed: dict[int, float] = {}
+        self._sockets: dict[int, int] = {}
+        self._went_online: set[int] = set()
+        self._went_offline: set[int] = set()
+        self._remote: dict[str, set[int]] = {}
+        self._remote_seen: dict[str, float] = {}
+        self._remote_count: dict[int, int] = {}
+        self._snapshot_due = False
+        self._typing: dict[int, dict[int, float]] = {}
+        self._dirty_rooms: set[int] = set()
+        self._room_typists: dict[int, dict[str, list[int]]] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._subscriptions = []
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    # Presence
+
+    def heartbeat(self, user_id: int) -> None:
+        """Mark a locally connected user as online for another ``ttl`` seconds."""
+        shard = self._shards[user_id & self._mask]
+        deadline = self.clock() + self.ttl
+        if user_id not in shard:
+            self._went_online.add(user_id)
+            self._went_offline.discard(user_id)
+            self._wheel.schedule(user_id, deadline)
+            self._filed[user_id] = deadline
+        shard[user_id] = deadline
+
+    def connect(self, user_id: int) -> None:
+        """Count a newly opened socket of the user and mark them online."""
+        self._sockets[user_id] = self._sockets.get(user_id, 0) + 1
+        self.heartbeat(user_id)
+
+    def disconnect(self, user_id: int) -> None:
+        """Count a closed socket; the user goes offline immediately with the last one."""
+        sockets = self._sockets.pop(user_id, 0) - 1
+        if sockets > 0:
+            self._sockets[user_id] = sockets
+            return
+        shard = self._shards[user_id & self._mask]
+        if shard.pop(user_id, None) is not None:
+            self._wheel.cancel(user_id, self._filed.pop(user_id))
+            self._went_offline.add(user_id)
+            self._went_online.discard(user_id)
+
+    def is_online(self, user_id: int) -> bool:
+        return user_id in self._shards[user_id & self._mask] or user_id in self._remote_count
+
+    def filter_online(self, user_ids: Iterable[int]) -> set[int]:
+        """Return the subset of ``user_ids`` connected to any worker."""
+        return {user_id for user_id in user_ids if self.is_online(user_id)}
+
+    def expire(self) -> list[int]:
+        """Drop users whose heartbeat is older than ``ttl``; returns them."""
+        now = self.clock()
+        offline = []
+        for user_id in self._wheel.advance(now):
+            shard = self._shards[user_id & self._mask]
+            deadline = shard.get(user_id)
+            if deadline is None:
+                continue
+            if deadline > now:
+                self._wheel.schedule(user_id, deadline)
+                self._filed[user_id] = deadline
+                continue
+            del shard[user_id]
+            del self._filed[user_id]
+            offline.append(user_id)
+        self._went_offline.update(offline)
+        self._went_online.difference_update(offline)
+        self._expire_remote(now)
+        return offline
+
+    # Typing
+
+    def typing(self, room_id: int, user_id: int) -> None:
+        """Record a typing notification; it is broadcast on the next flush."""
+        room = self._typing.setdefault(room_id, {})
+        if user_id not in room:
+            self._dirty_rooms.add(room_id)
+        room[user_id] = self.clock() + self.typing_ttl
+
+    def stop_typing(self, room_id: int, user_id: int) -> None:
+        room = self._typing.get(room_id)
+        if room and room.pop(user_id, None) is not None:
+            self._dirty_rooms.add(room_id)
+
+    def typing_users(self, room_id: int) -> list[int]:
+        return sorted(self._typing.get(room_id, ()))
+
+    async def flush_typing(self) -> int:
+        """Publish one typing event per changed room; returns the number of rooms."""
+        now = self.clock()
+        for room_id, users in list(self._typing.items()):
+            stale = [user_id for user_id, deadline in users.items() if deadline <= now]
+            for user_id in stale:
+                del users[user_id]
+            if stale:
+                self._dirty_rooms.add(room_id)
+            if not users:
+                del self._typing[room_id]
+        dirty, self._dirty_rooms = self._dirty_rooms, set()
+        for room_id in dirty:
+            await self.broker.publish(self.TYPING_CHANNEL, {
+                "origin": self.origin,
+                "room_id": room_id,
+                "typing": self.typing_users(room_id),
+            })
+        return len(dirty)
+
+    # Cross-worker sync
+
+    async def flush_presence(self) -> None:
+        """Publish this worker's transitions since the last flush, plus a beacon.
+
+        A snapshot is published instead when a new worker has appeared since.
+        """
+        online, self._went_online = self._went_online, set()
+        offline, self._went_offline = self._went_offline, set()
+        if self._snapshot_due:
+            await self.publish_snapshot()
+            return
+        await self.broker.publish(self.PRESENCE_CHANNEL, {
+            "origin": self.origin,
+            "online": sorted(online),
+            "offline": sorted(offline),
+        })
+
+    async def publish_snapshot(self) -> None:
+        """Publish the full local online set, e.g. after a worker (re)starts."""
+        self._snapshot_due = False
+        users = [user_id for shard in self._shards for user_id in shard]
+        await self.broker.publish(self.PRESENCE_CHANNEL, {
+            "origin": self.origin,
+            "snapshot": users,
+        })
+
+    def handle_presence(self, message: dict[str, Any]) -> None:
+        origin = message["origin"]
+        if origin == self.origin:
+            return
+        if origin not in self._remote_seen:
+            # It knows nothing of the users connected here yet.
+            self._snapshot_due = True
+        self._remote_seen[origin] = self.clock()
+        users = self._remote.setdefault(origin, set())
+        if "snapshot" in message:
+            self._forget_remote(origin)
+            users = self._remote.setdefault(origin, set())
+            online, offline = message["snapshot"], ()
+        else:
+            online, offline = message["online"], message["offline"]
+        for user_id in online:
+            if user_id not in users:
+                users.add(user_id)
+                self._remote_count[user_id] = self._remote_count.get(user_id, 0) + 1
+        for user_id in offline:
+            if user_id in users:
+                users.remove(user_id)
+                self._decrement_remote(user_id)
+
+    def _forget_remote(self, origin: str) -> None:
+        for user_id in self._remote.pop(origin, ()):
+            self._decrement_remote(user_id)
+        self._remote_seen.pop(origin, None)
+        for room_id, typists in list(self._room_typists.items()):
+            if typists.pop(origin, None) is not None and not typists:
+                del self._room_typists[room_id]
+
+    def _decrement_remote(self, user_id: int) -> None:
+        count = self._remote_count[user_id] - 1
+        if count:
+            self._remote_count[user_id] = count
+        else:
+            del self._remote_count[user_id]
+
+    def _expire_remote(self, now: float) -> None:
+        # A worker that stopped sending beacons is assumed dead.
+        for origin, seen in list(self._remote_seen.items()):
+            if seen + self.ttl < now:
+                logger.info(f"Presence: dropping users of silent worker {origin}")
+                self._forget_remote(origin)
+
+    # Lifecycle
+
+    async def start(self) -> None:
+        presence = self.broker.subscribe(self.PRESENCE_CHANNEL)
+        typing = self.broker.subscribe(self.TYPING_CHANNEL)
+        self._subscriptions = [presence, typing]
+        self._tasks = [
+            asyncio.create_task(self._listen(presence, self.handle_presence), name="presence-listener"),
+            asyncio.create_task(self._listen(typing, self._deliver_typing), name="typing-listener"),
+            asyncio.create_task(self._tick(), name="presence-tick"),
+        ]
+        await self.publish_snapshot()
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for subscription in self._subscriptions:
+            subscription.close()
+        self._subscriptions = []
+
+    async def _deliver_typing(self, message: dict[str, Any]) -> None:
+        room_id = message["room_id"]
+        typists = self._room_typists.setdefault(room_id, {})
+        if message["typing"]:
+            typists[message["origin"]] = message["typing"]
+        else:
+            typists.pop(message["origin"], None)
+        typing = sorted({user_id for users in typists.values() for user_id in users})
+        if not typists:
+            del self._room_typists[room_id]
+        await self.broadcast(room_id, {"type": "typing", "room_id": room_id, "typing": typing})
+
+    async def _listen(self, subscription, handler: Callable[[dict[str, Any]], Optional[Awaitable[None]]]) -> None:
+        async for message in subscription:
+            try:
+                result = handler(message)
+                if result is not None:
+                    await result
+            except Exception as e:
+                logger.error(f"Error handling presence message: {e}")
+
+    async def _tick(self) -> None:
+        while True:
+            await asyncio.sleep(self.typing_interval)
+            try:
+                self.expire()
+                await self.flush_presence()
+                await self.flush_typing()
+            except Exception as e:
+                logger.error(f"Presence tick failed: {e}")
+
+
+def get_presence(request: HTTPConnection) -> PresenceService:
+    """FastAPI dependency returning the service started in the app lifespan."""
+    return request.app.state.presence
@@ -0,0 +1,22 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from src.core.database import Base
+
+
+class RetentionCheckpoint(Base):
+    """How far the retention purge of a room has got.
+
+    Purges walk a room's messages in id order, so everything up to
+    ``purged_through`` is gone and the next batch starts right after it,
+    without scanning the index entries of rows already deleted.
+    """
+    __tablename__ = "retention_checkpoints"
+
+    room_id: Mapped[int] = mapped_column(ForeignKey("rooms.room_id"), primary_key=True)
+    purged_through: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0", nullable=False)
+    # Messages purged from the room so far.
+    messages: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0", nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
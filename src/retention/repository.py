@@ -0,0 +1,159 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Sequence
+import logging
+
+from sqlalchemy import Row, delete, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.chat.models import Attachment, Mention, Message, MessageRevision, PinnedMessage
+from src.core.repository import BaseRepository
+from src.rooms.models import Room
+
+from .models import RetentionCheckpoint
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PurgeCounts:
+    """Rows removed by one purge batch."""
+    messages: int = 0
+    attachments: int = 0
+    pins: int = 0
+    mentions: int = 0
+    revisions: int = 0
+    detached_replies: int = 0
+
+    @property
+    def rows(self) -> int:
+        return (self.messages + self.attachments + self.pins + self.mentions + self.revisions
+                + self.detached_replies)
+
+
+class RetentionRepository(BaseRepository[RetentionCheckpoint]):
+    """Repository for RetentionCheckpoint model operations."""
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, RetentionCheckpoint)
+
+    async def get_policies(self, after_room_id: int, limit: int) -> Sequence[Row]:
+        """``(room_id, retention_days)`` of rooms with a retention policy, by room id."""
+        try:
+            result = await self.session.execute(
+                select(Room.room_id, Room.retention_days)
+                .where(Room.retention_days.is_not(None), Room.room_id > after_room_id)
+                .order_by(Room.room_id)
+                .limit(limit)
+            )
+            return result.all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching retention policies after room {after_room_id}: {e}")
+            raise
+
+    async def get_checkpoint(self, room_id: int) -> int:
+        """Id of the last message purged from a room, or 0."""
+        try:
+            result = await self.session.execute(
+                select(RetentionCheckpoint.purged_through).where(RetentionCheckpoint.room_id == room_id)
+            )
+            return result.scalar_one_or_none() or 0
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching the retention checkpoint of room {room_id}: {e}")
+            raise
+
+    async def lock_checkpoint(self, room_id: int) -> int:
+        """Like ``get_checkpoint``, keeping the row locked until the commit.
+
+        A purge of the same room on another worker waits here, then goes on
+        from wherever this one stopped.
+        """
+        try:
+            stmt = self._insert().values(room_id=room_id, purged_through=0, messages=0)
+            result = await self.session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[RetentionCheckpoint.room_id],
+                    set_={"purged_through": RetentionCheckpoint.purged_through},
+                ).returning(RetentionCheckpoint.purged_through)
+            )
+            return result.scalar_one()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error locking the retention checkpoint of room {room_id}: {e}")
+            raise
+
+    async def get_expired(self, room_id: int, after_id: int, before_id: int, cutoff: datetime,
+                          limit: int) -> list[int]:
+        """Ids of a room's messages in ``(after_id, before_id)`` created before ``cutoff``, oldest first.
+
+        Read from the ``(room_id, message_id)`` index. Ids older than
+        snowflakes (serial ids) are all below ``before_id`` whatever their
+        age, so ``created_at`` decides too, and the list stops at the first
+        message that has not expired: the checkpoint must not move past it.
+        """
+        try:
+            result = await self.session.execute(
+                select(Message.message_id, Message.created_at)
+                .where(Message.room_id == room_id, Message.message_id > after_id, Message.message_id < before_id)
+                .order_by(Message.message_id)
+                .limit(limit)
+            )
+            expired = []
+            for message_id, created_at in result:
+                if created_at >= cutoff:
+                    break
+                expired.append(message_id)
+            return expired
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching expired messages of room {room_id}: {e}")
+            raise
+
+    async def purge(self, room_id: int, message_ids: Sequence[int]) -> PurgeCounts:
+        """Delete messages, given oldest first, with their attachments, pins, mentions and edit history, one statement per table.
+
+        Replies that outlive their parent are kept and detached from it.
+        Replies are newer than what they reply to, so only messages after
+        the batch need detaching. Does not commit.
+        """
+        counts = PurgeCounts()
+        if not message_ids:
+            return counts
+        try:
+            execute = self.session.execute
+            counts.attachments = (await execute(
+                delete(Attachment).where(Attachment.message_id.in_(message_ids)),
+                execution_options={"synchronize_session": False},
+            )).rowcount
+            counts.pins = (await execute(
+                delete(PinnedMessage).where(PinnedMessage.message_id.in_(message_ids)),
+                execution_options={"synchronize_session": False},
+            )).rowcount
+            counts.mentions = (await execute(
+                delete(Mention).where(Mention.message_id.in_(message_ids)),
+                execution_options={"synchronize_session": False},
+            )).rowcount
+            counts.revisions = (await execute(
+                delete(MessageRevision).where(MessageRevision.message_id.in_(message_ids)),
+                execution_options={"synchronize_session": False},
+            )).rowcount
+            counts.detached_replies = (await execute(
+                update(Message)
+                .where(Message.reply_to.in_(message_ids), Message.message_id > message_ids[-1])
+                # Keep updated_at: it marks edits.
+                .values(reply_to=None, updated_at=Message.updated_at),
+                execution_options={"synchronize_session": False},
+            )).rowcount
+            counts.messages = (await execute(
+                delete(Message).where(Message.message_id.in_(message_ids)),
+                execution_options={"synchronize_session": False},
+            )).rowcount
+            await execute(
+                update(RetentionCheckpoint)
+                .where(RetentionCheckpoint.room_id == room_id)
+                .values(purged_through=message_ids[-1], messages=RetentionCheckpoint.messages + counts.messages)
+            )
+            return counts
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error purging {len(message_ids)} messages of room {room_id}: {e}")
+            raise
@@ -0,0 +1,185 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+import asyncio
+import logging
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.clock import utcnow
+from src.core.ids import min_id_at
+
+from .repository import PurgeCounts, RetentionRepository
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetentionMetrics:
+    ticks: int = 0
+    batches: int = 0
+    messages: int = 0
+    attachments: int = 0
+    pins: int = 0
+    mentions: int = 0
+    revisions: int = 0
+    detached_replies: int = 0
+    budget_exhausted: int = 0
+    failures: int = 0
+    busy_seconds: float = 0.0
+    # Whether the last tick got through every room with a policy.
+    caught_up: bool = False
+
+    def add(self, counts: PurgeCounts) -> None:
+        self.batches += 1
+        self.messages += counts.messages
+        self.attachments += counts.attachments
+        self.pins += counts.pins
+        self.mentions += counts.mentions
+        self.revisions += counts.revisions
+        self.detached_replies += counts.detached_replies
+
+    def snapshot(self) -> dict[str, float]:
+        return {
+            "ticks": self.ticks,
+            "batches": self.batches,
+            "messages": self.messages,
+            "attachments": self.attachments,
+            "pins": self.pins,
+            "mentions": self.mentions,
+            "revisions": self.revisions,
+            "detached_replies": self.detached_replies,
+            "budget_exhausted": self.budget_exhausted,
+            "failures": self.failures,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "caught_up": self.caught_up,
+        }
+
+
+class RetentionScheduler:
+    """Deletes messages older than their room's ``retention_days``, a little at a time.
+
+    One big ``DELETE ... WHERE created_at < ...`` would hold locks on the
+    whole range and write it to the WAL in one go. Instead each batch
+    deletes the ``batch_size`` oldest expired messages of one room, found
+    on the ``(room_id, message_id)`` index since ids are time-ordered (and
+    checked against ``created_at``, for serial ids from before snowflakes),
+    together with their attachments, pins, mentions and edit history, one
+    set-based statement per table, and commits. Attachment blobs are
+    shared by content and stay in the blob store.
+
+    Every ``interval`` seconds a tick walks the rooms with a policy, with a
+    budget of ``max_rows`` deleted rows and ``max_seconds`` spent in the
+    database, and sleeps ``pause`` seconds between batches so that other
+    writers and WAL checkpoints get their turn. A tick that runs out of
+    budget leaves the rest to the next one, starting with the room it was
+    in. Progress is checkpointed per room in the batch's own commit, so a
+    restart, or a purge of the same room on another worker, goes on from
+    the last batch.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        batch_size: int = 500,
+        max_rows: int = 20_000,
+        max_seconds: float = 2.0,
+        pause: float = 0.05,
+        interval: float = 60.0,
+        room_batch: int = 100,
+        clock: Callable[[], datetime] = utcnow,
+    ):
+        self.session_maker = session_maker
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.pause = pause
+        self.interval = interval
+        self.room_batch = room_batch
+        self.clock = clock
+        self.metrics = RetentionMetrics()
+        self._next_room = 0
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def purge_batch(self, room_id: int, cutoff: datetime) -> PurgeCounts:
+        """Delete up to ``batch_size`` of a room's oldest messages created before ``cutoff``, in one transaction."""
+        before_id = min_id_at(cutoff)
+        async with self.session_maker() as session:
+            repo = RetentionRepository(session)
+            # Rooms with nothing to purge cost one read, and no write.
+            if not await repo.get_expired(room_id, await repo.get_checkpoint(room_id), before_id, cutoff, 1):
+                return PurgeCounts()
+            after_id = await repo.lock_checkpoint(room_id)
+            message_ids = await repo.get_expired(room_id, after_id, before_id, cutoff, self.batch_size)
+            counts = await repo.purge(room_id, message_ids)
+            await session.commit()
+        self.metrics.add(counts)
+        return counts
+
+    async def tick(self) -> int:
+        """Purge within one tick's budget; returns the number of rows deleted or detached."""
+        self.metrics.ticks += 1
+        now = self.clock()
+        rows = 0
+        busy = 0.0
+        while True:
+            async with self.session_maker() as session:
+                policies = await RetentionRepository(session).get_policies(self._next_room, self.room_batch)
+            if not policies:
+                self._next_room = 0
+                self.metrics.caught_up = True
+                return rows
+            for room_id, retention_days in policies:
+                cutoff = now - timedelta(days=retention_days)
+                while True:
+                    exhausted = rows >= self.max_rows or busy >= self.max_seconds
+                    if exhausted or self._stopping:
+                        self._next_room = room_id - 1
+                        self.metrics.budget_exhausted += exhausted
+                        self.metrics.caught_up = False
+                        return rows
+                    started = time.perf_counter()
+                    counts = await self.purge_batch(room_id, cutoff)
+                    elapsed = time.perf_counter() - started
+                    busy += elapsed
+                    self.metrics.busy_seconds += elapsed
+                    rows += counts.rows
+                    if counts.messages == 0:
+                        break
+                    await asyncio.sleep(self.pause)
+                self._next_room = room_id
+
+    async def run(self) -> None:
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics.failures += 1
+                logger.error(f"Retention purge error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        self._stopping = False
+        self._task = asyncio.create_task(self.run(), name="retention")
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Finish the batch in hand, then stop; a batch cancelled after ``timeout`` is rolled back and redone."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Retention scheduler did not stop within {timeout} s")
+                self._task.cancel()
+                await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
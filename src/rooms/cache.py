@@ -0,0 +1,64 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+import time
+
+
+@dataclass(frozen=True, slots=True)
+class CachedJoinLink:
+    """The part of a JoinLink needed to redeem it."""
+    link_id: int
+    room_id: int
+    expired_at: Optional[datetime]
+
+    def is_valid(self, now: datetime) -> bool:
+        return self.expired_at is None or self.expired_at > now
+
+
+MISSING = object()
+
+
+class JoinLinkCache:
+    """Bounded LRU cache of join link codes.
+
+    Unknown codes are cached as ``None`` for a shorter time so that a flood of
+    bogus codes never reaches the database more than once per ``negative_ttl``.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 60.0, negative_ttl: float = 5.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: OrderedDict[str, tuple[float, Optional[CachedJoinLink]]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, code: str):
+        """Return the cached link, ``None`` for a known-bad code, or ``MISSING``."""
+        entry = self._entries.get(code)
+        if entry is None:
+            return MISSING
+        deadline, link = entry
+        if deadline < time.monotonic():
+            del self._entries[code]
+            return MISSING
+        self._entries.move_to_end(code)
+        return link
+
+    def put(self, code: str, link: Optional[CachedJoinLink]) -> None:
+        ttl = self.ttl if link is not None else self.negative_ttl
+        self._entries[code] = (time.monotonic() + ttl, link)
+        self._entries.move_to_end(code)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, code: str) -> None:
+        self._entries.pop(code, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+join_link_cache = JoinLinkCache()
@@ -1,9 +1,9 @@
 from typing import Optional, List
 from enum import Enum as PyEnum
 
-from sqlalchemy import String, DateTime, ForeignKey, Enum
+from sqlalchemy import BigInteger, Boolean, Integer, String, DateTime, ForeignKey, Enum, UniqueConstraint, CheckConstraint
 from sqlalchemy.orm import Mapped, mapped_column,  relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import false, func
 
 from src.core.database import Base
 # from src.auth.models import User
@@ -25,6 +25,10 @@ class Room(Base):
     description: Mapped[Optional[str]] = mapped_column(String(150), nullable=True)
     avatar_url: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     username: Mapped[Optional[str]] = mapped_column(String(50), nullable=True, unique=True)
+    # Sequence of the last message event; see MessageRepository.append.
+    last_seq: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0", nullable=False)
+    # Days of history to keep, or None to keep everything; see src.retention.
+    retention_days: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
     updated_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
 
@@ -57,6 +61,9 @@ class Room(Base):
 
 class RoomMember(Base):
     __tablename__ = "room_members"
+    __table_args__ = (
+        UniqueConstraint("room_id", "user_id", name="uq_room_members_room_id_user_id"),
+    )
 
     member_id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.user_id"), nullable=False, index=True)
@@ -100,4 +107,32 @@ class JoinLink(Base):
     room_members: Mapped[List["RoomMember"]] = relationship(
         "RoomMember",
         back_populates="link",
-    )
\ No newline at end of file
+    )
+
+
+class RoomShard(Base):
+    __tablename__ = "room_shards"
+
+    room_id: Mapped[int] = mapped_column(ForeignKey("rooms.room_id"), primary_key=True)
+    shard: Mapped[str] = mapped_column(String(50), nullable=False)
+    # Set while the rebalancer moves the room; writers wait until it clears.
+    frozen: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default=false())
+    # Since when the room has been on ``shard``; see ShardMap.owns.
+    moved_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False, server_default=func.now())
+
+
+class DirectMessage(Base):
+    """The room of a one-to-one conversation, keyed by the ordered pair of its users.
+
+    The primary key makes finding the conversation between two users a
+    single index probe, and makes creating it twice impossible.
+    """
+    __tablename__ = "direct_messages"
+    __table_args__ = (
+        CheckConstraint("user_low < user_high", name="ck_direct_messages_ordered_pair"),
+    )
+
+    user_low: Mapped[int] = mapped_column(ForeignKey("users.user_id"), primary_key=True)
+    user_high: Mapped[int] = mapped_column(ForeignKey("users.user_id"), primary_key=True, index=True)
+    room_id: Mapped[int] = mapped_column(ForeignKey("rooms.room_id"), nullable=False, unique=True)
+    created_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False, server_default=func.now())
@@ -0,0 +1,349 @@
+from dataclasses import dataclass
+from enum import Enum as PyEnum
+from typing import Optional, Sequence
+import logging
+
+from sqlalchemy import Integer, Row, exists, func, literal, or_, select, union_all, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.clock import utcnow
+from src.chat.models import Message
+from src.core.repository import BaseRepository
+from src.moderation.models import Ban
+from src.outbox.repository import OutboxRepository
+
+from .cache import MISSING, CachedJoinLink, JoinLinkCache, join_link_cache
+from .models import DirectMessage, JoinLink, Room, RoomMember, RoomRole
+
+logger = logging.getLogger(__name__)
+
+# Broker channel of membership changes, as ``{"event": "joined" | "left", "room_id": ..., "user_id": ...}``.
+MEMBERS_CHANNEL = "rooms.members"
+
+
+class RedeemStatus(str, PyEnum):
+    joined = "joined"
+    already_member = "already_member"
+    rejected = "rejected"
+
+
+@dataclass(frozen=True, slots=True)
+class RedeemResult:
+    status: RedeemStatus
+    room_id: Optional[int] = None
+    member_id: Optional[int] = None
+
+
+class RoomRepository(BaseRepository[Room]):
+    """Repository for Room model operations."""
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, Room)
+
+
+class RoomMemberRepository(BaseRepository[RoomMember]):
+    """Repository for RoomMember model operations."""
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, RoomMember)
+
+    async def get_membership(self, room_id: int, user_id: int) -> RoomMember | None:
+        """Fetch the membership of a user in a room."""
+        try:
+            result = await self.session.execute(
+                select(RoomMember).where(RoomMember.room_id == room_id, RoomMember.user_id == user_id)
+            )
+            return result.scalar_one_or_none()
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching membership of user {user_id} in room {room_id}: {e}")
+            raise
+
+
+    async def get_room_ids(self, user_id: int) -> list[int]:
+        """Ids of every room a user is a member of."""
+        try:
+            result = await self.session.execute(select(RoomMember.room_id).where(RoomMember.user_id == user_id))
+            return list(result.scalars().all())
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching rooms of user {user_id}: {e}")
+            raise
+
+
+class JoinLinkRepository(BaseRepository[JoinLink]):
+    """Repository for JoinLink model operations."""
+    def __init__(self, session: AsyncSession, cache: JoinLinkCache = join_link_cache):
+        super().__init__(session, JoinLink)
+        self.cache = cache
+
+    async def get_by_code(self, code: str) -> JoinLink | None:
+        """Fetch a join link by its code."""
+        return await super().get_by_field('code', code)
+
+    async def expire(self, code: str) -> bool:
+        """Expire a join link immediately and drop it from the cache."""
+        self.cache.invalidate(code)
+        try:
+            result = await self.session.execute(
+                update(JoinLink)
+                .where(JoinLink.code == code)
+                .values(expired_at=utcnow())
+            )
+            await self.session.commit()
+            return result.rowcount > 0
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error expiring join link {code}: {e}")
+            raise
+
+    async def _resolve(self, code: str) -> CachedJoinLink | None:
+        cached = self.cache.get(code)
+        if cached is not MISSING:
+            return cached
+        result = await self.session.execute(
+            select(JoinLink.link_id, JoinLink.room_id, JoinLink.expired_at).where(JoinLink.code == code)
+        )
+        row = result.one_or_none()
+        link = CachedJoinLink(*row) if row is not None else None
+        self.cache.put(code, link)
+        return link
+
+    async def redeem(self, code: str, user_id: int) -> RedeemResult:
+        """Join a room through a link code.
+
+        Link validity, active bans and the membership insert are checked in a
+        single INSERT ... SELECT ... ON CONFLICT DO NOTHING statement, so
+        concurrent redemptions by the same user can never create duplicates.
+        A "joined" event is written to the outbox with the new membership.
+        """
+        now = utcnow()
+        try:
+            link = await self._resolve(code)
+            if link is None or not link.is_valid(now):
+                return RedeemResult(RedeemStatus.rejected)
+
+            is_banned = exists().where(
+                Ban.banned_user_id == user_id,
+                Ban.is_active.is_(True),
+                or_(Ban.room_id == JoinLink.room_id, Ban.room_id.is_(None)),
+                or_(Ban.expires_at.is_(None), Ban.expires_at > now),
+            )
+            candidate = select(
+                literal(user_id, Integer),
+                JoinLink.room_id,
+                literal(RoomRole.member, RoomMember.__table__.c.role.type),
+                JoinLink.link_id,
+            ).where(
+                JoinLink.link_id == link.link_id,
+                or_(JoinLink.expired_at.is_(None), JoinLink.expired_at > now),
+                ~is_banned,
+            )
+            stmt = (
+                self._insert(RoomMember)
+                .from_select(["user_id", "room_id", "role", "link_id"], candidate)
+                .on_conflict_do_nothing(index_elements=["room_id", "user_id"])
+                .returning(RoomMember.member_id)
+            )
+            member_id = (await self.session.execute(stmt)).scalar_one_or_none()
+            if member_id is not None:
+                OutboxRepository(self.session).add(
+                    MEMBERS_CHANNEL, {"event": "joined", "room_id": link.room_id, "user_id": user_id}
+                )
+            await self.session.commit()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error redeeming join link {code} for user {user_id}: {e}")
+            raise
+
+        if member_id is not None:
+            return RedeemResult(RedeemStatus.joined, link.room_id, member_id)
+
+        # Slow path: only reached when nothing was inserted.
+        membership = await RoomMemberRepository(self.session).get_membership(link.room_id, user_id)
+        if membership is not None:
+            return RedeemResult(RedeemStatus.already_member, link.room_id, membership.member_id)
+        self.cache.invalidate(code)
+        return RedeemResult(RedeemStatus.rejected, link.room_id)
+
+
+# Room columns of RoomOut, in order; see DirectMessageRepository.list_for_user.
+ROOM_COLUMNS = (
+    Room.room_id,
+    Room.name,
+    Room.is_private,
+    Room.description,
+    Room.avatar_url,
+    Room.username,
+    Room.retention_days,
+    Room.created_at,
+)
+
+
+def ordered_pair(user_id: int, other_user_id: int) -> tuple[int, int]:
+    """The ``(user_low, user_high)`` key of a conversation; raises ValueError for a user and themselves."""
+    if user_id == other_user_id:
+        raise ValueError("A direct message needs two different users")
+    return (user_id, other_user_id) if user_id < other_user_id else (other_user_id, user_id)
+
+
+class DirectMessageRepository(BaseRepository[DirectMessage]):
+    """Repository for DirectMessage model operations."""
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, DirectMessage, primary_key_field="user_low")
+
+    async def get_room_id(self, user_id: int, other_user_id: int) -> Optional[int]:
+        """Room of the conversation between two users, by one probe of the pair's primary key."""
+        user_low, user_high = ordered_pair(user_id, other_user_id)
+        try:
+            result = await self.session.execute(
+                select(DirectMessage.room_id).where(
+                    DirectMessage.user_low == user_low, DirectMessage.user_high == user_high
+                )
+            )
+            return result.scalar_one_or_none()
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching the direct messages of users {user_low} and {user_high}: {e}")
+            raise
+
+    async def get_or_create(self, user_id: int, other_user_id: int, members: bool = True) -> tuple[int, bool]:
+        """``(room_id, created)`` of the conversation between two users, creating its room if needed.
+
+        The room and both memberships are staged first; the pair is then
+        claimed with a single INSERT ... ON CONFLICT DO UPDATE ... RETURNING,
+        which returns the winner's room when another request created the
+        conversation concurrently. The loser rolls its room back, so there is
+        never more than one room per pair. "joined" events for both users
+        are written to the outbox with the new room.
+
+        With sharded rooms this session is the directory: ``members=False``
+        only allocates the room id and claims the pair here, and the room's
+        shard gets the memberships from ``add_members``.
+        """
+        user_low, user_high = ordered_pair(user_id, other_user_id)
+        room_id = await self.get_room_id(user_low, user_high)
+        if room_id is not None:
+            return room_id, False
+        try:
+            room = Room(name="direct", is_private=True)
+            self.session.add(room)
+            await self.session.flush()
+            if members:
+                self.session.add_all([RoomMember(user_id=user_low, room_id=room.room_id),
+                                      RoomMember(user_id=user_high, room_id=room.room_id)])
+                await self.session.flush()
+            stmt = self._insert().values(user_low=user_low, user_high=user_high, room_id=room.room_id)
+            result = await self.session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[DirectMessage.user_low, DirectMessage.user_high],
+                    set_={"room_id": DirectMessage.room_id},
+                ).returning(DirectMessage.room_id)
+            )
+            room_id = result.scalar_one()
+            if room_id != room.room_id:
+                await self.session.rollback()
+                return room_id, False
+            if members:
+                outbox = OutboxRepository(self.session)
+                for member_id in (user_low, user_high):
+                    outbox.add(MEMBERS_CHANNEL, {"event": "joined", "room_id": room_id, "user_id": member_id})
+            await self.session.commit()
+            return room_id, True
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error creating direct messages for users {user_low} and {user_high}: {e}")
+            raise
+
+    async def add_members(self, room_id: int, user_ids: Sequence[int]) -> int:
+        """Create the conversation's room and memberships on the room's shard where missing; returns how many members were added.
+
+        Idempotent, so a request that failed between the directory and the
+        shard is repaired by the next one. Added members get "joined" events
+        in the shard's outbox.
+        """
+        try:
+            result = await self.session.execute(select(func.count(RoomMember.member_id)).where(RoomMember.room_id == room_id))
+            if result.scalar() == len(user_ids):
+                return 0
+            await self.session.execute(
+                self._insert(Room).values(room_id=room_id, name="direct", is_private=True)
+                .on_conflict_do_nothing(index_elements=[Room.room_id])
+            )
+            result = await self.session.execute(
+                self._insert(RoomMember).values([{"room_id": room_id, "user_id": member_id} for member_id in user_ids])
+                .on_conflict_do_nothing(index_elements=[RoomMember.room_id, RoomMember.user_id])
+                .returning(RoomMember.user_id)
+            )
+            added = result.scalars().all()
+            outbox = OutboxRepository(self.session)
+            for member_id in added:
+                outbox.add(MEMBERS_CHANNEL, {"event": "joined", "room_id": room_id, "user_id": member_id})
+            await self.session.commit()
+            return len(added)
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"Error adding the members of direct messages room {room_id}: {e}")
+            raise
+
+    def _pairs(self, user_id: int, other_user_id: Optional[int] = None):
+        """``(room_id, user_id)`` of a user's conversations, ``user_id`` being the other user."""
+        low = select(DirectMessage.room_id, DirectMessage.user_high.label("user_id")).where(DirectMessage.user_low == user_id)
+        high = select(DirectMessage.room_id, DirectMessage.user_low.label("user_id")).where(DirectMessage.user_high == user_id)
+        if other_user_id is not None:
+            low = low.where(DirectMessage.user_high == other_user_id)
+            high = high.where(DirectMessage.user_low == other_user_id)
+        return union_all(low, high)
+
+    def _last_message_id(self, room_id):
+        return select(func.max(Message.message_id)).where(Message.room_id == room_id).scalar_subquery().label("last_message_id")
+
+    def _summaries(self, user_id: int, other_user_id: Optional[int] = None):
+        """Conversations of a user as ``ROOM_COLUMNS`` plus the other ``user_id`` and ``last_message_id``."""
+        pairs = self._pairs(user_id, other_user_id).subquery()
+        last_message_id = self._last_message_id(pairs.c.room_id)
+        return (
+            select(*ROOM_COLUMNS, pairs.c.user_id, last_message_id)
+            .join(pairs, pairs.c.room_id == Room.room_id)
+            .order_by(last_message_id.desc().nulls_last(), Room.room_id.desc())
+        )
+
+    async def get_pairs(self, user_id: int, other_user_id: Optional[int] = None) -> Sequence[Row]:
+        """``(room_id, user_id)`` of a user's conversations, or of the one with ``other_user_id``, from the directory."""
+        try:
+            result = await self.session.execute(self._pairs(user_id, other_user_id))
+            return result.all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching the direct messages of user {user_id}: {e}")
+            raise
+
+    async def get_summaries(self, room_ids: Sequence[int]) -> Sequence[Row]:
+        """``ROOM_COLUMNS`` plus ``last_message_id`` of the given rooms, as stored on a room shard."""
+        try:
+            result = await self.session.execute(
+                select(*ROOM_COLUMNS, self._last_message_id(Room.room_id)).where(Room.room_id.in_(room_ids))
+            )
+            return result.all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching summaries of {len(room_ids)} direct messages rooms: {e}")
+            raise
+
+    async def get_for_user(self, user_id: int, other_user_id: int) -> Optional[Row]:
+        """One row of ``list_for_user``: the conversation of a user with another, if it exists."""
+        try:
+            result = await self.session.execute(self._summaries(user_id, other_user_id))
+            return result.first()
+        except SQLAlchemyError as e:
+            logger.error(f"Error fetching the direct messages of users {user_id} and {other_user_id}: {e}")
+            raise
+
+    async def list_for_user(self, user_id: int, limit: int = 100) -> Sequence[Row]:
+        """A user's conversations as ``ROOM_COLUMNS`` plus ``user_id`` (the other user) and ``last_message_id``.
+
+        Most recently active first; conversations without messages come
+        last, newest first. Each side of the pair is read from its own index,
+        and the last message of each room is one probe of the room's
+        ``(room_id, message_id)`` index.
+        """
+        try:
+            result = await self.session.execute(self._summaries(user_id).limit(limit))
+            return result.all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error listing direct messages of user {user_id}: {e}")
+            raise
@@ -0,0 +1,102 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.auth.dependencies import get_current_user_id
+from src.auth.repository import UserRepository
+from src.core.admission import Priority, admit
+from src.core.database import get_db, get_room_db, get_shard_map
+from src.core.http_cache import ResponseCache, Validators, conditional_response, get_response_cache, make_etag
+from src.core.serialization import FastJSONResponse
+
+from .models import RoomRole
+from .repository import DirectMessageRepository, RoomMemberRepository, RoomRepository
+from .schemas import DIRECT_MESSAGE, DIRECT_MESSAGE_LIST, ROOM, DirectMessageOut, RetentionIn, RoomOut
+from .sharding import ShardedRoomStore
+
+router = APIRouter(tags=["rooms"])
+
+
+@router.get("/rooms/{room_id}", response_model=RoomOut, dependencies=[Depends(admit(Priority.NORMAL))])
+async def get_room(
+    request: Request,
+    room_id: int,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_room_db),
+    cache: ResponseCache = Depends(get_response_cache),
+):
+    """Room metadata; private rooms are visible to their members only."""
+    room = await RoomRepository(db).get_by_id(room_id)
+    if room is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Room not found")
+    if room.is_private and await RoomMemberRepository(db).get_membership(room_id, user_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Room not found")
+
+    async def render() -> bytes:
+        return ROOM.encode(room)
+
+    validators = Validators(make_etag("room", room_id, room.updated_at), room.updated_at)
+    return await conditional_response(request, cache, ("room", room_id), validators, render)
+
+
+@router.put("/rooms/{room_id}/retention", response_model=RoomOut, dependencies=[Depends(admit(Priority.NORMAL))])
+async def set_room_retention(
+    room_id: int,
+    retention: RetentionIn,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_room_db),
+):
+    """Set how many days of history a room keeps; owners only. Older messages are purged in the background."""
+    membership = await RoomMemberRepository(db).get_membership(room_id, user_id)
+    if membership is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Room not found")
+    if membership.role != RoomRole.owner:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only owners can change retention")
+    room = await RoomRepository(db).update(room_id, retention_days=retention.retention_days)
+    return FastJSONResponse(ROOM.encode(room))
+
+
+@router.put("/dms/{other_user_id}", response_model=DirectMessageOut, dependencies=[Depends(admit(Priority.NORMAL))])
+async def open_direct_messages(
+    other_user_id: int,
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """The conversation with another user, created on first use (201) and returned as is afterwards (200).
+
+    With sharded rooms the pair is claimed in the main database, which
+    allocates room ids, and the room and its members live on the room's
+    shard like any other room.
+    """
+    if other_user_id == user_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot message yourself")
+    repo = DirectMessageRepository(db)
+    shard_map = get_shard_map()
+    created = False
+    room_id = await repo.get_room_id(user_id, other_user_id)
+    if room_id is None:
+        if await UserRepository(db).get_by_id(other_user_id) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+        room_id, created = await repo.get_or_create(user_id, other_user_id, members=shard_map is None)
+    if shard_map is None:
+        row = await repo.get_for_user(user_id, other_user_id)
+    else:
+        async with shard_map.room_session(room_id, write=True) as room_db:
+            await DirectMessageRepository(room_db).add_members(room_id, (user_id, other_user_id))
+        [row] = await ShardedRoomStore(shard_map).direct_messages([(room_id, other_user_id)])
+    return FastJSONResponse(DIRECT_MESSAGE.encode(row), status_code=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+@router.get("/dms", response_model=list[DirectMessageOut], dependencies=[Depends(admit(Priority.LOW))])
+async def list_direct_messages(
+    limit: int = Query(100, ge=1, le=500),
+    user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """The user's conversations, most recently active first."""
+    shard_map = get_shard_map()
+    if shard_map is None:
+        rows = await DirectMessageRepository(db).list_for_user(user_id, limit)
+    else:
+        pairs = await DirectMessageRepository(db).get_pairs(user_id)
+        rows = (await ShardedRoomStore(shard_map).direct_messages([tuple(pair) for pair in pairs]))[:limit]
+    return FastJSONResponse(DIRECT_MESSAGE_LIST.encode(rows))
@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from src.core.serialization import Encoder, JsonId
+
+
+class RoomOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    room_id: int
+    name: str
+    is_private: bool
+    description: Optional[str] = None
+    avatar_url: Optional[str] = None
+    username: Optional[str] = None
+    retention_days: Optional[int] = None
+    created_at: datetime
+
+
+ROOM = Encoder(RoomOut)
+ROOM_LIST = Encoder(list[RoomOut])
+
+
+class RetentionIn(BaseModel):
+    # Days of history to keep; None keeps everything.
+    retention_days: Optional[int] = Field(default=None, ge=1, le=36500)
+
+
+class DirectMessageOut(RoomOut):
+    """A conversation: its room, the other user and the id of its last message, if any."""
+    user_id: int
+    last_message_id: Optional[JsonId] = None
+
+
+DIRECT_MESSAGE = Encoder(DirectMessageOut)
+DIRECT_MESSAGE_LIST = Encoder(list[DirectMessageOut])
@@ -0,0 +1,350 @@
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Optional, Sequence, Type, TypeVar
+import argparse
+import asyncio
+import logging
+import time
+
+from sqlalchemy import Table, case, delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.chat.models import Attachment, Mention, Message, MessageRevision, PinnedMessage
+from src.core.clock import utcnow
+from src.core.database import get_async_session_maker, get_shard_map
+from src.core.repository import BaseRepository, insert_for
+from src.core.sharding import ShardMap
+
+from .models import JoinLink, Room, RoomMember, RoomShard
+from .repository import DirectMessageRepository
+
+logger = logging.getLogger(__name__)
+
+RepositoryType = TypeVar("RepositoryType", bound=BaseRepository)
+
+
+class ShardedRoomStore:
+    """Room-scoped repositories on the shard that owns the room."""
+
+    def __init__(self, shard_map: ShardMap):
+        self.shard_map = shard_map
+
+    @asynccontextmanager
+    async def repository(self, repository_class: Type[RepositoryType], room_id: int,
+                         write: bool = False) -> AsyncIterator[RepositoryType]:
+        async with self.shard_map.room_session(room_id, write=write) as session:
+            yield repository_class(session)
+
+    async def user_rooms(self, user_id: int, max_concurrency: int = 8) -> list[RoomMember]:
+        """Every membership of a user, gathered from all shards, newest first."""
+        async def memberships(session: AsyncSession) -> list[RoomMember]:
+            result = await session.execute(select(RoomMember).where(RoomMember.user_id == user_id))
+            return list(result.scalars().all())
+
+        per_shard = await self.shard_map.scatter(memberships, max_concurrency)
+        # A room being moved may briefly exist on two shards; trust the placement.
+        rooms = [
+            member for shard, members in per_shard.items() for member in members
+            if self.shard_map.shard_for(member.room_id) == shard
+        ]
+        return sorted(rooms, key=lambda member: member.joined_at, reverse=True)
+
+    async def direct_messages(self, pairs: Sequence[tuple[int, int]], max_concurrency: int = 8) -> list[dict[str, Any]]:
+        """Conversations as in DirectMessageRepository.list_for_user, given their ``(room_id, user_id)`` pairs.
+
+        The pairs come from the directory; room columns and the last message
+        are read from the shard of each room.
+        """
+        others = dict(pairs)
+        by_shard: dict[str, list[int]] = {}
+        for room_id in others:
+            by_shard.setdefault(self.shard_map.shard_for(room_id), []).append(room_id)
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def summaries(shard: str, room_ids: list[int]) -> Sequence[Any]:
+            async with semaphore, self.shard_map.session(shard) as session:
+                return await DirectMessageRepository(session).get_summaries(room_ids)
+
+        per_shard = await asyncio.gather(*(summaries(shard, room_ids) for shard, room_ids in by_shard.items()))
+        rows = [{**row._asdict(), "user_id": others[row.room_id]} for found in per_shard for row in found]
+        # Most recently active first, then conversations without messages, newest first.
+        rows.sort(key=lambda row: (row["last_message_id"] is not None, row["last_message_id"] or 0, row["room_id"]),
+                  reverse=True)
+        return rows
+
+
+@dataclass
+class MoveReport:
+    room_id: int
+    source: str
+    target: str
+    copied: dict[str, int] = field(default_factory=dict)
+    frozen_seconds: float = 0.0
+
+
+class RoomRebalancer:
+    """Moves a room to another shard while it stays writable.
+
+    1. The room row, then its messages with their mentions and edit
+       history, and its attachments are copied in keyset-ordered batches
+       while the room keeps accepting writes on the source shard.
+    2. The room is frozen on every worker: the freeze is recorded on its
+       placement row, for workers that start meanwhile, and published on
+       the broker; writers in flight get ``freeze_grace`` seconds to
+       finish. Rows created or updated during the copy are re-copied, and
+       the small membership/link/pin tables are copied in full.
+    3. The placement is switched and the room unfrozen; waiting writers
+       continue on the target shard.
+    4. After ``purge_delay`` seconds, the source rows are deleted in
+       batches. Rows written before the switch are notified and counted
+       from the source (see ShardMap.owns); the delay lets its
+       notification and activity passes, which wait for rows to settle,
+       reach them first.
+
+    Message and attachment ids are preserved, so they must be unique across
+    shards; members, links and pins get new ids on the target.
+    """
+
+    def __init__(self, shard_map: ShardMap, directory: Optional[async_sessionmaker[AsyncSession]] = None,
+                 batch_size: int = 1000, freeze_grace: float = 5.0, purge_delay: float = 60.0):
+        self.shard_map = shard_map
+        self.directory = directory
+        self.batch_size = batch_size
+        self.freeze_grace = freeze_grace
+        self.purge_delay = purge_delay
+
+    async def move_room(self, room_id: int, target: str) -> MoveReport:
+        if target not in self.shard_map.engines:
+            raise KeyError(f"Unknown shard {target}")
+        source = self.shard_map.shard_for(room_id)
+        report = MoveReport(room_id, source, target)
+        if source == target:
+            return report
+
+        # Clock skew margin for the updated_at comparison of the catch-up phase.
+        copy_started = utcnow() - timedelta(seconds=60)
+        async with self.shard_map.session(source) as src, self.shard_map.session(target) as dst:
+            created_at = (await src.execute(select(Room.created_at).where(Room.room_id == room_id))).scalar_one_or_none()
+            if created_at is None:
+                raise KeyError(f"Room {room_id} is not on shard {source}")
+            # The room first: the other tables reference it.
+            await self._copy_room(src, dst, room_id, report)
+            last_message = await self._copy_messages(src, dst, room_id, 0, report)
+            await self._copy_message_details(src, dst, room_id, 0, report, until=last_message)
+            last_attachment = await self._copy_attachments(src, dst, room_id, 0, report)
+
+            # A room never moved before has been on the source since it was created.
+            await self._record_placement(room_id, source, created_at, frozen=True)
+            frozen_at = time.perf_counter()
+            try:
+                await self.shard_map.freeze(room_id, self.freeze_grace)
+                # A whole second after the last write to the source, as some databases keep the timestamps
+                # that ShardMap.owns compares with it in whole seconds; the switch waits for it.
+                moved_at = (utcnow() + timedelta(seconds=1)).replace(microsecond=0)
+                await self._copy_room(src, dst, room_id, report)
+                await self._copy_messages(src, dst, room_id, last_message, report)
+                await self._copy_messages(src, dst, room_id, 0, report, updated_since=copy_started)
+                await self._copy_message_details(src, dst, room_id, last_message, report)
+                await self._copy_message_details(src, dst, room_id, 0, report, updated_since=copy_started)
+                await self._copy_attachments(src, dst, room_id, last_attachment, report)
+                await self._copy_attachments(src, dst, room_id, 0, report, updated_since=copy_started)
+                await self._replace_small_tables(src, dst, room_id, report)
+                await dst.commit()
+                await asyncio.sleep(max((moved_at - utcnow()).total_seconds(), 0))
+                await self._record_placement(room_id, target, moved_at)
+                await self.shard_map.assign(room_id, target, moved_at)
+            except BaseException:
+                await self._record_placement(room_id, source, created_at)
+                raise
+            finally:
+                report.frozen_seconds = time.perf_counter() - frozen_at
+                await self.shard_map.unfreeze(room_id)
+
+            # Rather than hold the read transaction open through the delay.
+            await src.rollback()
+            await asyncio.sleep(self.purge_delay)
+            await self._purge_source(src, room_id)
+        logger.info(f"Moved room {room_id} from {source} to {target}: {report.copied}, "
+                    f"frozen for {report.frozen_seconds * 1000:.1f} ms")
+        return report
+
+    async def _copy_table(self, src: AsyncSession, dst: AsyncSession, table: Table, where: Any,
+                          pk: Any, after: Any, report: MoveReport) -> Any:
+        """Upsert matching rows in primary key order; returns the last key copied."""
+        while True:
+            rows = (await src.execute(
+                select(table).where(where, pk > after).order_by(pk).limit(self.batch_size)
+            )).mappings().all()
+            if not rows:
+                return after
+            stmt = insert_for(dst, table)
+            columns = {column.name: stmt.excluded[column.name] for column in table.columns if not column.primary_key}
+            await dst.execute(stmt.on_conflict_do_update(index_elements=[pk.name], set_=columns), [dict(row) for row in rows])
+            await dst.commit()
+            report.copied[table.name] = report.copied.get(table.name, 0) + len(rows)
+            after = rows[-1][pk.name]
+
+    async def _copy_room(self, src, dst, room_id, report) -> None:
+        table = Room.__table__
+        await self._copy_table(src, dst, table, table.c.room_id == room_id, table.c.room_id, 0, report)
+
+    @staticmethod
+    def _room_messages(room_id: int, updated_since: Optional[datetime] = None) -> Any:
+        where = Message.room_id == room_id
+        if updated_since is not None:
+            # Reply counters move last_reply_at instead of updated_at.
+            where = where & ((Message.updated_at >= updated_since) | (Message.last_reply_at >= updated_since))
+        return where
+
+    async def _copy_messages(self, src, dst, room_id, after, report, updated_since=None) -> int:
+        table = Message.__table__
+        return await self._copy_table(src, dst, table, self._room_messages(room_id, updated_since),
+                                      table.c.message_id, after, report)
+
+    async def _copy_message_details(self, src: AsyncSession, dst: AsyncSession, room_id: int, after: int,
+                                    report: MoveReport, until: Optional[int] = None,
+                                    updated_since: Optional[datetime] = None) -> None:
+        """Replace the mentions and edit history of the room's messages after ``after``, a batch of messages at a time.
+
+        Edits rewrite both and move the message's ``updated_at``, so they
+        are re-copied along with the message.
+        """
+        where = self._room_messages(room_id, updated_since)
+        if until is not None:
+            where = where & (Message.message_id <= until)
+        while True:
+            message_ids = (await src.execute(
+                select(Message.message_id).where(where, Message.message_id > after)
+                .order_by(Message.message_id).limit(self.batch_size)
+            )).scalars().all()
+            if not message_ids:
+                return
+            for table in (Mention.__table__, MessageRevision.__table__):
+                rows = (await src.execute(select(table).where(table.c.message_id.in_(message_ids)))).mappings().all()
+                await dst.execute(delete(table).where(table.c.message_id.in_(message_ids)))
+                if rows:
+                    await dst.execute(table.insert(), [dict(row) for row in rows])
+                report.copied[table.name] = report.copied.get(table.name, 0) + len(rows)
+            await dst.commit()
+            after = message_ids[-1]
+
+    async def _copy_attachments(self, src, dst, room_id, after, report, updated_since=None) -> int:
+        table = Attachment.__table__
+        room_messages = select(Message.message_id).where(Message.room_id == room_id)
+        where = table.c.message_id.in_(room_messages)
+        if updated_since is not None:
+            where = where & (table.c.updated_at >= updated_since)
+        return await self._copy_table(src, dst, table, where, table.c.attachment_id, after, report)
+
+    async def _replace_small_tables(self, src: AsyncSession, dst: AsyncSession, room_id: int,
+                                    report: MoveReport) -> None:
+        for model in (PinnedMessage, RoomMember, JoinLink):
+            await dst.execute(delete(model).where(model.room_id == room_id))
+
+        links = (await src.execute(select(JoinLink.__table__).where(JoinLink.room_id == room_id))).mappings().all()
+        link_ids = {}
+        for link in links:
+            values = {key: value for key, value in link.items() if key != "link_id"}
+            result = await dst.execute(JoinLink.__table__.insert().values(**values).returning(JoinLink.link_id))
+            link_ids[link["link_id"]] = result.scalar_one()
+
+        members = (await src.execute(select(RoomMember.__table__).where(RoomMember.room_id == room_id))).mappings().all()
+        pins = (await src.execute(select(PinnedMessage.__table__).where(PinnedMessage.room_id == room_id))).mappings().all()
+        if members:
+            await dst.execute(RoomMember.__table__.insert(), [
+                {**{key: value for key, value in member.items() if key != "member_id"},
+                 "link_id": link_ids.get(member["link_id"])}
+                for member in members
+            ])
+        if pins:
+            await dst.execute(PinnedMessage.__table__.insert(), [
+                {key: value for key, value in pin.items() if key != "pin_id"} for pin in pins
+            ])
+        report.copied.update(join_links=len(links), room_members=len(members), pinned_messages=len(pins))
+
+    async def _record_placement(self, room_id: int, shard: str, since: datetime, frozen: bool = False) -> None:
+        """Record the room's placement; ``moved_at`` becomes ``since`` only for a new row or a new shard."""
+        if self.directory is None:
+            return
+        async with self.directory() as session:
+            stmt = insert_for(session, RoomShard).values(room_id=room_id, shard=shard, frozen=frozen, moved_at=since)
+            moved_at = case((RoomShard.shard == stmt.excluded.shard, RoomShard.moved_at), else_=stmt.excluded.moved_at)
+            await session.execute(stmt.on_conflict_do_update(
+                index_elements=["room_id"], set_={"shard": shard, "frozen": frozen, "moved_at": moved_at}
+            ))
+            await session.commit()
+
+    async def _purge_source(self, src: AsyncSession, room_id: int) -> None:
+        for model in (PinnedMessage, RoomMember, JoinLink):
+            await src.execute(delete(model).where(model.room_id == room_id))
+        await src.commit()
+        room_messages = select(Message.message_id).where(Message.room_id == room_id)
+        while True:
+            ids = (await src.execute(
+                select(Attachment.attachment_id).where(Attachment.message_id.in_(room_messages))
+                .limit(self.batch_size)
+            )).scalars().all()
+            if not ids:
+                break
+            await src.execute(delete(Attachment).where(Attachment.attachment_id.in_(ids)))
+            await src.commit()
+        while True:
+            # Newest first, so replies are removed before the messages they reference.
+            ids = (await src.execute(
+                select(Message.message_id).where(Message.room_id == room_id)
+                .order_by(Message.message_id.desc()).limit(self.batch_size)
+            )).scalars().all()
+            if not ids:
+                break
+            for model in (Mention, MessageRevision):
+                await src.execute(delete(model).where(model.message_id.in_(ids)))
+            await src.execute(delete(Message).where(Message.message_id.in_(ids)))
+            await src.commit()
+
+
+async def load_placements(directory: async_sessionmaker[AsyncSession], shard_map: ShardMap) -> None:
+    """Apply the room placements recorded by the rebalancer, freezing rooms that are being moved."""
+    async with directory() as session:
+        result = await session.execute(
+            select(RoomShard.room_id, RoomShard.shard, RoomShard.frozen, RoomShard.moved_at)
+        )
+        rows = result.all()
+    for room_id, shard, frozen, moved_at in rows:
+        shard_map.handle_message({"room_id": room_id, "shard": shard, "frozen": frozen, "moved_at": moved_at.isoformat()})
+
+
+
+async def rebalance(argv: Optional[Sequence[str]] = None) -> MoveReport:
+    """Move a room to another shard: ``python -m src.rooms.sharding ROOM_ID SHARD``.
+
+    Run it from a host with the workers' settings: the freeze is published
+    on their broker and the placement recorded in their main database.
+    """
+    parser = argparse.ArgumentParser(description="Move a room to another shard.")
+    parser.add_argument("room_id", type=int)
+    parser.add_argument("shard")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--freeze-grace", type=float, default=5.0,
+                        help="seconds that writers of other workers get to finish once the room is frozen")
+    parser.add_argument("--purge-delay", type=float, default=60.0,
+                        help="seconds before the source rows are deleted")
+    args = parser.parse_args(argv)
+    shard_map = get_shard_map()
+    if shard_map is None:
+        raise SystemExit("DATABASE_SHARD_URLS is not configured")
+    directory = get_async_session_maker()
+    try:
+        await load_placements(directory, shard_map)
+        rebalancer = RoomRebalancer(shard_map, directory, batch_size=args.batch_size,
+                                    freeze_grace=args.freeze_grace, purge_delay=args.purge_delay)
+        report = await rebalancer.move_room(args.room_id, args.shard)
+    finally:
+        await shard_map.dispose()
+    print(f"room {report.room_id}: {report.source} -> {report.target}, copied {report.copied}, "
+          f"frozen {report.frozen_seconds * 1000:.1f} ms")
+    return report
+
+
+if __name__ == "__main__":
+    asyncio.run(rebalance())
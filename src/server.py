@@ -0,0 +1,45 @@
+"""Production entry point: uvicorn with graceful draining.
+
+Plain uvicorn closes every WebSocket with 1012 on SIGTERM before the app
+lifespan shuts down, so all clients reconnect at the same moment. This
+server drains the app first: clients are told when to reconnect, spread
+over ``DRAIN_RECONNECT_WINDOW``, while the health check already reports the
+worker as draining. A second Ctrl+C skips the drain.
+
+Run with ``python -m src.server [--host HOST] [--port PORT]``.
+"""
+import argparse
+import asyncio
+import logging
+import socket
+from typing import Optional
+
+import uvicorn
+
+from src.main import app, drain
+
+logger = logging.getLogger(__name__)
+
+
+class DrainingServer(uvicorn.Server):
+    async def shutdown(self, sockets: Optional[list[socket.socket]] = None) -> None:
+        logger.info("Draining connections")
+        draining = asyncio.ensure_future(drain(app))
+        while not draining.done() and not self.force_exit:
+            await asyncio.sleep(0.1)
+        if not draining.done():
+            draining.cancel()
+        await super().shutdown(sockets)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    config = uvicorn.Config(app, host=args.host, port=args.port, proxy_headers=True)
+    DrainingServer(config).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+import os
+
+# Snowflake ids need a worker id; the tests run in one process.
+os.environ.setdefault("WORKER_ID", "0")
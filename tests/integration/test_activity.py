@@ -0,0 +1,176 @@
+from datetime import timedelta
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+
+from src.activity.service import ActivityAggregator
+from src.core.broker import InMemoryBroker
+from src.core.clock import utcnow
+from src.core.database import Base, get_db
+from src.core.ids import min_id_at
+from src.main import app
+from src.outbox.relay import OutboxRelay
+from src.models import (
+    User, UserSession, Room, RoomMember, Message, RoomActivityDaily, RoomActivityHourly, SiteActivityDaily,
+    UserActivityDaily,
+)
+
+NOW = utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+LATER = NOW + timedelta(minutes=1)
+
+
+def _message(minutes_ago: int, i: int, **columns) -> Message:
+    created_at = NOW - timedelta(minutes=minutes_ago)
+    return Message(message_id=min_id_at(created_at) + i, created_at=created_at, **columns)
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'activity.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def session_maker(engine):
+    maker = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    async with maker() as session:
+        session.add_all([User(user_id=i, username=f"user{i}", first_name="U", hashed_password="x",
+                              is_admin=i == 1) for i in range(1, 6)])
+        session.add_all([Room(room_id=1, name="public"), Room(room_id=2, name="private", is_private=True)])
+        await session.flush()
+        session.add_all([RoomMember(user_id=user_id, room_id=1, joined_at=NOW - timedelta(hours=2))
+                         for user_id in (2, 3, 4)])
+        session.add(RoomMember(user_id=5, room_id=2, joined_at=NOW - timedelta(hours=2)))
+        # Room 1: three authors across two hours; room 2: one author.
+        session.add_all([_message(90, i, user_id=2 + i % 3, room_id=1, message=str(i))
+                         for i in range(6)])
+        session.add_all([_message(30, i, user_id=2, room_id=1, message=str(i))
+                         for i in range(2)])
+        session.add(_message(30, 5, user_id=5, room_id=2, message="hi"))
+        session.add_all([UserSession(user_id=1, refresh_token="admin-token"),
+                         UserSession(user_id=3, refresh_token="member-token")])
+        await session.commit()
+    yield maker
+
+
+async def _all(maker, model):
+    async with maker() as session:
+        return (await session.execute(select(model))).scalars().all()
+
+
+@pytest.mark.asyncio
+async def test_aggregation_counts_each_row_once_in_a_few_statements(engine, session_maker):
+    aggregator = ActivityAggregator(session_maker, clock=lambda: LATER)
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    assert await aggregator.aggregate_once() == 9 + 4
+    event.remove(engine.sync_engine, "before_cursor_execute", count)
+    # Two watermark locks and reads, two sketch reads, four upserts, two watermark moves.
+    assert len(statements) == 4 + 2 + 4 + 2
+
+    daily = {row.room_id: row for row in await _all(session_maker, RoomActivityDaily)}
+    assert (daily[1].messages, daily[1].joins, daily[1].active_users) == (8, 3, 3)
+    assert (daily[2].messages, daily[2].joins, daily[2].active_users) == (1, 1, 1)
+    [site] = await _all(session_maker, SiteActivityDaily)
+    assert (site.messages, site.joins, site.active_users) == (9, 4, 4)
+    hourly = sorted((row.room_id, row.messages) for row in await _all(session_maker, RoomActivityHourly))
+    assert hourly == [(1, 2), (1, 6), (2, 1)]
+    users = {row.user_id: row.messages for row in await _all(session_maker, UserActivityDaily)}
+    assert users == {2: 4, 3: 2, 4: 2, 5: 1}
+
+    # Nothing new: counting again changes nothing.
+    assert await aggregator.aggregate_once() == 0
+    [site] = await _all(session_maker, SiteActivityDaily)
+    assert site.messages == 9
+
+
+@pytest.mark.asyncio
+async def test_serial_ids_are_counted_when_they_were_created(session_maker):
+    created_at = NOW - timedelta(minutes=30)
+    async with session_maker() as session:
+        session.add(Message(message_id=3, created_at=created_at, user_id=5, room_id=2, message="old id"))
+        await session.commit()
+
+    aggregator = ActivityAggregator(session_maker, clock=lambda: LATER)
+    while await aggregator.aggregate_once():
+        pass
+    hourly = {(row.room_id, row.hour): row.messages for row in await _all(session_maker, RoomActivityHourly)}
+    assert hourly[2, created_at.replace(minute=0)] == 2
+    assert {hour for _, hour in hourly} == {NOW.replace(hour=10), NOW.replace(hour=11)}
+
+@pytest.mark.asyncio
+async def test_later_batches_merge_into_the_rollups(session_maker):
+    aggregator = ActivityAggregator(session_maker, batch_size=4, settle=5, clock=lambda: LATER)
+    async with session_maker() as session:
+        # Too young to count until the next minute.
+        created_at = LATER - timedelta(seconds=1)
+        session.add(Message(message_id=min_id_at(created_at), created_at=created_at, user_id=1, room_id=1,
+                            message="new"))
+        await session.commit()
+
+    while await aggregator.aggregate_once():
+        pass
+    daily = {row.room_id: row for row in await _all(session_maker, RoomActivityDaily)}
+    assert (daily[1].messages, daily[1].active_users) == (8, 3)
+    assert aggregator.metrics.snapshot()["messages"] == 9
+
+    aggregator.clock = lambda: LATER + timedelta(minutes=1)
+    assert await aggregator.aggregate_once() == 1
+    daily = {row.room_id: row for row in await _all(session_maker, RoomActivityDaily)}
+    assert (daily[1].messages, daily[1].active_users) == (9, 4)
+
+
+@pytest.mark.asyncio
+async def test_activity_endpoints(session_maker):
+    await ActivityAggregator(session_maker, clock=lambda: LATER).aggregate_once()
+
+    async def override_db():
+        async with session_maker() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_db
+    transport = httpx.ASGITransport(app=app)
+    member = {"Authorization": "Bearer member-token"}
+    admin = {"Authorization": "Bearer admin-token"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        daily = (await client.get("/rooms/1/activity", headers=member)).json()
+        assert [p["messages"] for p in daily["points"]] == [8] and daily["active_users"] == 3
+        hours = {"bucket": "hour", "start": (NOW - timedelta(days=1)).isoformat(), "end": LATER.isoformat()}
+        hourly = (await client.get("/rooms/1/activity", params=hours, headers=member)).json()
+        assert [p["messages"] for p in hourly["points"]] == [6, 2]
+        assert (await client.get("/rooms/2/activity", headers=member)).status_code == 404
+        too_long = {"bucket": "hour", "start": (NOW - timedelta(days=30)).isoformat(), "end": NOW.isoformat()}
+        assert (await client.get("/rooms/1/activity", params=too_long, headers=member)).status_code == 400
+
+        assert (await client.get("/activity/daily", headers=member)).status_code == 403
+        site = (await client.get("/activity/daily", headers=admin)).json()
+        assert site["points"][0]["joins"] == 4 and site["active_users"] == 4
+        ranks = (await client.get("/activity/rooms", params={"day": NOW.date().isoformat()}, headers=admin)).json()
+        assert [r["room_id"] for r in ranks] == [1, 2]
+        user = (await client.get("/activity/users/2", headers=admin)).json()
+        assert [p["messages"] for p in user["points"]] == [4]
+
+        app.state.activity = ActivityAggregator(session_maker)
+        app.state.outbox_relay = OutboxRelay(session_maker, InMemoryBroker())
+        app.state.shard_relays = {"a": OutboxRelay(session_maker, InMemoryBroker())}
+        try:
+            assert (await client.get("/admin/metrics", headers=member)).status_code == 403
+            metrics = (await client.get("/admin/metrics", headers=admin)).json()
+        finally:
+            del app.state.activity, app.state.outbox_relay, app.state.shard_relays
+        assert metrics["activity"] == {"batches": 0, "messages": 0, "joins": 0, "failures": 0,
+                                       "aggregate_seconds": 0.0, "lag_seconds": None}
+        assert metrics["outbox_backlog"] == {"pending": 0, "oldest_seconds": 0.0}
+        assert metrics["shards"]["a"]["outbox_backlog"] == {"pending": 0, "oldest_seconds": 0.0}
+        assert "limit" in metrics["admission"] and "notifications" not in metrics
+    app.dependency_overrides.clear()
@@ -0,0 +1,179 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from src.chat.processing import ATTACHMENT_METADATA, make_attachment_handler
+from src.chat.storage import BlobTooLarge, LocalBlobStore, get_blob_store
+from src.core.database import Base, get_db
+from src.core.ratelimit import AUTH_PER_IP, LocalRateLimitBackend, RateLimiter, set_rate_limiter
+from src.jobs.queue import InMemoryJobQueue, get_job_queue
+from src.jobs.worker import JobWorker
+from src.main import app
+from src.models import User, UserSession, Room, RoomMember, Message, Attachment
+
+DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+
+async def _chunks(data: bytes, size: int = 1000):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+@pytest_asyncio.fixture
+async def test_session():
+    engine = create_async_engine(DATABASE_URL, echo=False, poolclass=NullPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        async_session = async_sessionmaker(bind=conn, expire_on_commit=False, class_=AsyncSession)
+        async with async_session() as session:
+            yield session
+
+
+@pytest_asyncio.fixture
+async def client(test_session, tmp_path):
+    author = User(username="author", first_name="A", hashed_password="x")
+    other = User(username="other", first_name="O", hashed_password="x")
+    room = Room(name="files")
+    test_session.add_all([author, other, room])
+    await test_session.flush()
+    test_session.add_all([
+        UserSession(user_id=author.user_id, refresh_token="author-token"),
+        UserSession(user_id=other.user_id, refresh_token="other-token"),
+        RoomMember(user_id=author.user_id, room_id=room.room_id),
+        Message(message_id=1, user_id=author.user_id, room_id=room.room_id, message="see attached"),
+    ])
+    await test_session.commit()
+
+    async def override_db():
+        yield test_session
+
+    store = LocalBlobStore(tmp_path / "blobs", chunk_size=4096)
+    job_queue = InMemoryJobQueue()
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_blob_store] = lambda: store
+    app.dependency_overrides[get_job_queue] = lambda: job_queue
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        client.store = store
+        client.job_queue = job_queue
+        yield client
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_store_deduplicates_by_content(tmp_path):
+    store = LocalBlobStore(tmp_path)
+    data = os.urandom(10_000)
+
+    first = await store.write_stream(_chunks(data))
+    second = await store.write_stream(_chunks(data, 333))
+
+    assert first.digest == second.digest == hashlib.sha256(data).hexdigest()
+    assert (first.created, second.created) == (True, False)
+    assert await store.size(first.digest) == 10_000
+    assert list((tmp_path / "tmp").iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_store_rejects_oversized_stream(tmp_path):
+    store = LocalBlobStore(tmp_path)
+    with pytest.raises(BlobTooLarge):
+        await store.write_stream(_chunks(b"x" * 5000), max_size=4096)
+    assert list((tmp_path / "tmp").iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_store_range_reads(tmp_path):
+    store = LocalBlobStore(tmp_path, chunk_size=7)
+    blob = await store.write_stream(_chunks(bytes(range(100))))
+
+    parts = [chunk async for chunk in store.read_range(blob.digest, 10, 29)]
+    assert b"".join(parts) == bytes(range(10, 30))
+    assert max(len(part) for part in parts) == 7
+
+
+@pytest.mark.asyncio
+async def test_upload_and_download(client):
+    data = os.urandom(50_000)
+    headers = {"Authorization": "Bearer author-token", "Content-Type": "image/png"}
+
+    response = await client.post("/messages/1/attachments?file_name=cat.png", content=data, headers=headers)
+    assert response.status_code == 201
+    body = response.json()
+    assert body["file_size"] == 50_000 and body["mime_type"] == "image/png"
+    assert body["sha256"] == hashlib.sha256(data).hexdigest()
+
+    again = await client.post("/messages/1/attachments", content=data, headers=headers)
+    assert again.json()["sha256"] == body["sha256"]
+    assert len(client.job_queue.jobs) == 1
+
+    auth = {"Authorization": "Bearer author-token"}
+    full = await client.get(body["url"], headers=auth)
+    assert full.status_code == 200 and full.content == data
+
+    partial = await client.get(body["url"], headers={**auth, "Range": "bytes=100-199"})
+    assert partial.status_code == 206
+    assert partial.headers["Content-Range"] == "bytes 100-199/50000"
+    assert partial.content == data[100:200]
+
+    suffix = await client.get(body["url"], headers={**auth, "Range": "bytes=-10"})
+    assert suffix.content == data[-10:]
+
+    invalid = await client.get(body["url"], headers={**auth, "Range": "bytes=60000-"})
+    assert invalid.status_code == 416
+
+
+@pytest.mark.asyncio
+async def test_upload_permissions(client):
+    assert (await client.post("/messages/1/attachments", content=b"x")).status_code == 401
+    other = {"Authorization": "Bearer other-token"}
+    assert (await client.post("/messages/1/attachments", content=b"x", headers=other)).status_code == 403
+    author = {"Authorization": "Bearer author-token"}
+    assert (await client.post("/messages/99/attachments", content=b"x", headers=author)).status_code == 404
+    malformed = await client.post("/messages/1/attachments", content=b"x",
+                                  headers={**author, "Content-Length": "1, 1"})
+    assert malformed.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_rejected_tokens_are_rate_limited_per_ip(client):
+    set_rate_limiter(RateLimiter(LocalRateLimitBackend()))
+    try:
+        wrong = {"Authorization": "Bearer wrong-token"}
+        statuses = [
+            (await client.get("/messages/1/thread", headers=wrong)).status_code
+            for _ in range(AUTH_PER_IP.limit + 1)
+        ]
+        assert statuses == [401] * AUTH_PER_IP.limit + [429]
+        limited = await client.get("/messages/1/thread", headers={"Authorization": "Bearer author-token"})
+        assert limited.status_code == 429
+        assert int(limited.headers["Retry-After"]) >= 1
+        # Requests without a token are not counted.
+        assert (await client.get("/messages/1/thread")).status_code == 401
+    finally:
+        set_rate_limiter(None)
+
+
+@pytest.mark.asyncio
+async def test_same_content_uploaded_again_is_sniffed_again(client, test_session):
+    maker = async_sessionmaker(bind=test_session.bind, expire_on_commit=False, class_=AsyncSession)
+    author = {"Authorization": "Bearer author-token"}
+    data = b"\x00\x00\x00\x18ftypmp42" + os.urandom(1000)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        worker = JobWorker(client.job_queue, {ATTACHMENT_METADATA: make_attachment_handler(maker, client.store)},
+                           executor=pool)
+        for content_type in ("text/plain", "application/pdf"):
+            response = await client.post("/messages/1/attachments", content=data,
+                                         headers={**author, "Content-Type": content_type})
+            assert response.status_code == 201
+            assert await worker.run_once() == 1
+
+    result = await test_session.execute(select(Attachment.mime_type))
+    assert result.scalars().all() == ["video/mp4", "video/mp4"]
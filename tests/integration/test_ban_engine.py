@@ -0,0 +1,136 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+
+from src.core.broker import InMemoryBroker
+from src.core.clock import utcnow
+from src.core.database import Base
+from src.models import User, Room, Ban
+from src.moderation.engine import BanEngine
+from src.outbox.relay import OutboxRelay
+
+
+@pytest_asyncio.fixture
+async def session_maker(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'bans.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    maker = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    async with maker() as session:
+        session.add_all([
+            User(username="admin", first_name="Admin", hashed_password="x"),
+            User(username="spammer", first_name="Spam", hashed_password="x"),
+            Room(name="general"),
+            Room(name="random"),
+        ])
+        await session.commit()
+    yield maker
+    await engine.dispose()
+
+
+async def _is_active(maker, ban_id):
+    async with maker() as session:
+        return (await session.execute(select(Ban.is_active).where(Ban.ban_id == ban_id))).scalar()
+
+
+@pytest.mark.asyncio
+async def test_room_and_global_bans(session_maker):
+    engine = BanEngine(session_maker, InMemoryBroker())
+    await engine.issue(banned_user_id=2, banned_by_user_id=1, room_id=1)
+
+    assert engine.is_banned(2, 1) is True
+    assert engine.is_banned(2, 2) is False
+    assert engine.can_send(1, 1) is True
+
+    ban = await engine.issue(banned_user_id=2, banned_by_user_id=1)
+    assert engine.is_banned(2, 2) is True
+
+    assert await engine.lift(ban.ban_id) is True
+    assert engine.is_banned(2, 2) is False
+    assert await _is_active(session_maker, ban.ban_id) is False
+
+
+@pytest.mark.asyncio
+async def test_load_skips_inactive_and_expired(session_maker):
+    async with session_maker() as session:
+        session.add_all([
+            Ban(banned_user_id=2, banned_by_user_id=1, room_id=1),
+            Ban(banned_user_id=2, banned_by_user_id=1, room_id=2, is_active=False),
+            Ban(banned_user_id=1, banned_by_user_id=1, expires_at=utcnow() - timedelta(seconds=1)),
+        ])
+        await session.commit()
+
+    engine = BanEngine(session_maker, InMemoryBroker())
+    await engine.load()
+
+    assert len(engine) == 1
+    assert engine.is_banned(2, 1) and not engine.is_banned(2, 2) and not engine.is_banned(1)
+    async with session_maker() as session:
+        active = (await session.execute(select(Ban.banned_user_id).where(Ban.is_active.is_(True)))).scalars().all()
+    assert active == [2]
+
+
+@pytest.mark.asyncio
+async def test_expiry_timer_flips_is_active(session_maker):
+    engine = BanEngine(session_maker, InMemoryBroker())
+    await engine.start()
+    try:
+        ban = await engine.issue(banned_user_id=2, banned_by_user_id=1, expires_at=utcnow() + timedelta(milliseconds=100))
+        assert engine.is_banned(2, 1) is True
+
+        for _ in range(50):
+            if len(engine) == 0:
+                break
+            await asyncio.sleep(0.02)
+
+        assert engine.is_banned(2, 1) is False
+        assert await _is_active(session_maker, ban.ban_id) is False
+    finally:
+        await engine.stop()
+
+
+@pytest.mark.asyncio
+async def test_changes_propagate_between_workers(session_maker):
+    broker = InMemoryBroker()
+    first, second = BanEngine(session_maker, broker), BanEngine(session_maker, broker)
+    relay = OutboxRelay(session_maker, broker)
+    await first.start()
+    await second.start()
+    try:
+        ban = await first.issue(banned_user_id=2, banned_by_user_id=1, room_id=2)
+        assert await relay.relay_once() == 1
+        await asyncio.sleep(0)
+        assert second.is_banned(2, 2) is True
+
+        await first.lift(ban.ban_id)
+        assert await relay.relay_once() == 1
+        await asyncio.sleep(0)
+        assert second.is_banned(2, 2) is False
+    finally:
+        await first.stop()
+        await second.stop()
+
+
+@pytest.mark.asyncio
+async def test_ban_issued_while_loading_is_applied(session_maker):
+    broker = InMemoryBroker()
+    first, second = BanEngine(session_maker, broker), BanEngine(session_maker, broker)
+    relay = OutboxRelay(session_maker, broker)
+    load = second.load
+
+    async def load_then_ban():
+        await load()
+        await first.issue(banned_user_id=2, banned_by_user_id=1, room_id=1)
+        assert await relay.relay_once() == 1
+
+    second.load = load_then_ban
+    await second.start()
+    try:
+        await asyncio.sleep(0)
+        assert second.is_banned(2, 1) is True
+    finally:
+        await second.stop()
@@ -0,0 +1,228 @@
+import asyncio
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from src.chat.edits import EditBatcher, get_edit_batcher
+from src.chat.framing import CODECS, JSON
+from src.chat.hub import ConnectionHub, get_chat_hub
+from src.chat.sync import SyncService
+from src.core.broker import InMemoryBroker
+from src.core.database import Base, get_session_maker
+from src.core.ratelimit import AUTH_PER_IP, set_rate_limiter
+from src.main import app
+from src.moderation.engine import BanEngine, get_ban_engine
+from src.outbox.relay import OutboxRelay
+from src.models import User, UserSession, Room, RoomMember, Message
+from src.presence.service import PresenceService, get_presence
+
+msgpack = pytest.importorskip("msgpack")
+
+DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+
+class WebSocketClient:
+    """Drives the ASGI app in the test's event loop, without a server."""
+
+    def __init__(self, path: str, subprotocols=(), query: str = ""):
+        self.scope = {
+            "type": "websocket", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+            "headers": [], "subprotocols": list(subprotocols), "scheme": "ws", "server": ("test", 80),
+            "client": ("127.0.0.1", 1234),
+        }
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        self.outgoing: asyncio.Queue = asyncio.Queue()
+
+    async def __aenter__(self):
+        self.task = asyncio.create_task(app(self.scope, self.incoming.get, self.outgoing.put))
+        await self.incoming.put({"type": "websocket.connect"})
+        self.handshake = await asyncio.wait_for(self.outgoing.get(), 5)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.incoming.put({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.wait_for(self.task, 5)
+
+    async def send(self, data):
+        key = "bytes" if isinstance(data, bytes) else "text"
+        await self.incoming.put({"type": "websocket.receive", key: data})
+
+    async def receive(self):
+        return await asyncio.wait_for(self.outgoing.get(), 5)
+
+
+@pytest_asyncio.fixture
+async def services():
+    engine = create_async_engine(DATABASE_URL, echo=False, poolclass=NullPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        maker = async_sessionmaker(bind=conn, expire_on_commit=False, class_=AsyncSession)
+        async with maker() as session:
+            session.add_all([
+                User(user_id=1, username="alice", first_name="A", hashed_password="x"),
+                User(user_id=2, username="bob", first_name="B", hashed_password="x"),
+                Room(room_id=1, name="general"),
+                Room(room_id=2, name="private"),
+            ])
+            await session.flush()
+            session.add_all([
+                UserSession(user_id=1, refresh_token="alice-token"),
+                UserSession(user_id=2, refresh_token="bob-token"),
+                RoomMember(user_id=1, room_id=1),
+                RoomMember(user_id=2, room_id=1),
+                RoomMember(user_id=2, room_id=2),
+            ])
+            await session.commit()
+
+        broker = InMemoryBroker()
+        hub = ConnectionHub(broker, sync=SyncService(maker, capacity=2))
+        presence = PresenceService(broker, broadcast=hub.deliver)
+        ban_engine = BanEngine(maker, broker)
+        relay = OutboxRelay(maker, broker)
+        edits = EditBatcher(maker, delay=0)
+        await hub.start()
+        await presence.start()
+        relay.start()
+        set_rate_limiter(None)
+        app.dependency_overrides[get_session_maker] = lambda: maker
+        app.dependency_overrides[get_chat_hub] = lambda: hub
+        app.dependency_overrides[get_presence] = lambda: presence
+        app.dependency_overrides[get_ban_engine] = lambda: ban_engine
+        app.dependency_overrides[get_edit_batcher] = lambda: edits
+        yield maker, hub, presence
+        app.dependency_overrides.clear()
+        await relay.stop()
+        await presence.stop()
+        await hub.stop()
+
+
+@pytest.mark.asyncio
+async def test_messages_are_broadcast_in_each_connections_format(services):
+    maker, hub, presence = services
+    deflate = CODECS["murmur.v1.json.deflate"]
+    binary = CODECS["murmur.v1.msgpack"]
+    async with WebSocketClient("/ws", ["murmur.v1.json.deflate"], "token=alice-token") as alice, \
+            WebSocketClient("/ws", ["murmur.v1.msgpack"], "token=bob-token") as bob:
+        assert alice.handshake == {"type": "websocket.accept", "subprotocol": "murmur.v1.json.deflate", "headers": []}
+        assert bob.handshake["subprotocol"] == "murmur.v1.msgpack"
+
+        await bob.send(msgpack.packb({"type": "send", "room_id": 1, "message": "hi alice"}))
+        to_alice = deflate.decode((await alice.receive())["bytes"])
+        to_bob = binary.decode((await bob.receive())["bytes"])
+        assert to_alice == to_bob
+        assert to_alice["type"] == "message" and to_alice["message"] == "hi alice" and to_alice["user_id"] == 2
+        assert hub.metrics.encodings == 2
+
+        await alice.send(deflate.encode({"type": "send", "room_id": 2, "message": "not a member"}))
+        assert deflate.decode((await alice.receive())["bytes"])["detail"] == "Cannot send to this room"
+        await alice.send(b"garbage")
+        assert deflate.decode((await alice.receive())["bytes"]) == {"type": "error", "detail": "Invalid event"}
+
+        await alice.send(deflate.encode({"type": "typing", "room_id": 1}))
+        await asyncio.sleep(0)
+        await presence.flush_typing()
+        assert binary.decode((await bob.receive())["bytes"])["type"] == "typing"
+
+    async with maker() as session:
+        stored = await session.get(Message, to_alice["message_id"])
+        assert stored.message == "hi alice"
+    assert hub.connection_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_plain_json_and_rejected_token(services):
+    async with WebSocketClient("/ws", query="token=wrong") as rejected:
+        assert rejected.handshake["type"] == "websocket.close"
+        assert rejected.handshake["code"] == 1008
+
+    async with WebSocketClient("/ws", query="token=alice-token") as alice:
+        assert alice.handshake.get("subprotocol") is None
+        await alice.send('{"type": "send", "room_id": 1, "message": "plain"}')
+        frame = await alice.receive()
+        assert '"message":"plain"' in frame["text"]
+
+
+@pytest.mark.asyncio
+async def test_handshakes_with_rejected_tokens_are_rate_limited(services):
+    for _ in range(AUTH_PER_IP.limit):
+        async with WebSocketClient("/ws", query="token=wrong") as rejected:
+            assert rejected.handshake["code"] == 1008
+
+    async with WebSocketClient("/ws", query="token=alice-token") as limited:
+        assert limited.handshake["type"] == "websocket.close"
+        assert limited.handshake["reason"] == "Too many requests"
+
+
+@pytest.mark.asyncio
+async def test_reconnecting_client_receives_only_the_gap(services):
+    maker, hub, presence = services
+    async with WebSocketClient("/ws", query="token=bob-token") as bob:
+        await bob.send('{"type": "send", "room_id": 1, "message": "before"}')
+        seen = JSON.decode((await bob.receive())["text"].encode())["seq"]
+
+    async with WebSocketClient("/ws", query="token=alice-token") as alice:
+        for text in ("one", "two", "three"):
+            await alice.send(f'{{"type": "send", "room_id": 1, "message": "{text}"}}')
+            await alice.receive()
+
+    async with WebSocketClient("/ws", query="token=bob-token") as bob:
+        await bob.send(f'{{"type": "sync", "rooms": {{"1": {seen}, "2": 0, "3": 0}}}}')
+        events = [JSON.decode((await bob.receive())["text"].encode()) for _ in range(5)]
+    assert [event.get("message") for event in events[:3]] == ["one", "two", "three"]
+    assert events[3] == {"type": "synced", "room_id": 1, "seq": seen + 3}
+    assert events[4] == {"type": "synced", "room_id": 2, "seq": 0}
+    # The log holds two events, so the third came from the database.
+    assert hub.sync.metrics.database == 1
+
+
+@pytest.mark.asyncio
+async def test_reconnecting_client_receives_missed_edits(services):
+    maker, hub, presence = services
+    async with WebSocketClient("/ws", query="token=bob-token") as bob:
+        await bob.send('{"type": "send", "room_id": 1, "message": "before"}')
+        seen = JSON.decode((await bob.receive())["text"].encode())["seq"]
+
+    async with WebSocketClient("/ws", query="token=alice-token") as alice:
+        await alice.send('{"type": "send", "room_id": 1, "message": "draft"}')
+        message_id = JSON.decode((await alice.receive())["text"].encode())["message_id"]
+        await alice.send(f'{{"type": "edit", "room_id": 1, "message_id": {message_id}, "message": "final"}}')
+        edited = JSON.decode((await alice.receive())["text"].encode())
+    assert (edited["type"], edited["seq"], edited["message"]) == ("message_edited", seen + 2, "final")
+
+    async with WebSocketClient("/ws", query="token=bob-token") as bob:
+        await bob.send(f'{{"type": "sync", "rooms": {{"1": {seen}}}}}')
+        events = [JSON.decode((await bob.receive())["text"].encode()) for _ in range(3)]
+    assert [(event["type"], event["seq"]) for event in events] == [
+        ("message", seen + 1), ("message_edited", seen + 2), ("synced", seen + 2),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_draining_hands_clients_off_with_reconnect_hints(services):
+    maker, hub, presence = services
+    async with WebSocketClient("/ws", query="token=alice-token") as alice, \
+            WebSocketClient("/ws", query="token=bob-token") as bob:
+        drained = asyncio.create_task(hub.drain(window=2.0, timeout=5))
+        for client in (alice, bob):
+            hint = JSON.decode((await client.receive())["text"].encode())
+            assert hint["type"] == "reconnect" and 0 <= hint["after"] <= 2.0
+            assert await client.receive() == {"type": "websocket.close", "code": 1012, "reason": ""}
+
+        async with WebSocketClient("/ws", query="token=alice-token") as refused:
+            assert refused.handshake["type"] == "websocket.close"
+            assert refused.handshake["code"] == 1012
+    assert await drained is True
+    assert hub.connection_count() == 0
+
+    app.state.draining = True
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/health")
+        assert response.status_code == 503
+        assert response.json() == {"status": "draining"}
+    finally:
+        app.state.draining = False
@@ -0,0 +1,112 @@
+import asyncio
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+
+from src.chat.repository import MessageRepository
+from src.core.database import Base, get_db
+from src.main import app
+from src.models import User, UserSession, Room, RoomMember, DirectMessage, OutboxEvent
+from src.rooms.repository import DirectMessageRepository
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    # A file database so that concurrent sessions use separate connections.
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'dms.db'}", connect_args={"timeout": 30})
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def session_maker(engine):
+    maker = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    async with maker() as session:
+        session.add_all([User(user_id=i, username=f"user{i}", first_name="U", hashed_password="x") for i in range(1, 6)])
+        await session.flush()
+        session.add(UserSession(user_id=1, refresh_token="user1-token"))
+        await session.commit()
+    yield maker
+
+
+async def _get_or_create(maker, user_id, other_user_id):
+    async with maker() as session:
+        return await DirectMessageRepository(session).get_or_create(user_id, other_user_id)
+
+
+async def _count(maker, column):
+    async with maker() as session:
+        return (await session.execute(select(func.count(column)))).scalar()
+
+
+@pytest.mark.asyncio
+async def test_get_or_create_makes_one_room_per_pair(engine, session_maker):
+    results = await asyncio.gather(*[_get_or_create(session_maker, *pair) for pair in [(1, 2), (2, 1)] * 5])
+
+    assert len({room_id for room_id, _ in results}) == 1
+    assert [created for _, created in results].count(True) == 1
+    assert await _count(session_maker, DirectMessage.room_id) == 1
+    assert await _count(session_maker, Room.room_id) == 1
+    assert await _count(session_maker, RoomMember.member_id) == 2
+    assert await _count(session_maker, OutboxEvent.event_id) == 2
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    assert await _get_or_create(session_maker, 2, 1) == (results[0][0], False)
+    event.remove(engine.sync_engine, "before_cursor_execute", count)
+    assert len(statements) == 1
+
+    async with session_maker() as session:
+        with pytest.raises(ValueError):
+            await DirectMessageRepository(session).get_or_create(3, 3)
+
+
+@pytest.mark.asyncio
+async def test_listing_is_ordered_by_last_message(session_maker):
+    rooms = {other: (await _get_or_create(session_maker, 1, other))[0] for other in (2, 3, 4)}
+    await _get_or_create(session_maker, 4, 5)
+    async with session_maker() as session:
+        repo = MessageRepository(session)
+        await repo.append(user_id=3, room_id=rooms[3], message="first")
+        last = await repo.append(user_id=1, room_id=rooms[2], message="latest")
+
+    async with session_maker() as session:
+        rows = await DirectMessageRepository(session).list_for_user(1)
+        assert [(row.user_id, row.room_id) for row in rows] == [(2, rooms[2]), (3, rooms[3]), (4, rooms[4])]
+        assert rows[0].last_message_id == last.message_id and rows[2].last_message_id is None
+        assert [row.user_id for row in await DirectMessageRepository(session).list_for_user(4)] == [5, 1]
+        assert len(await DirectMessageRepository(session).list_for_user(1, limit=2)) == 2
+
+
+@pytest.mark.asyncio
+async def test_direct_message_endpoints(session_maker):
+    async def override_db():
+        async with session_maker() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_db
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": "Bearer user1-token"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+        created = await client.put("/dms/2")
+        again = await client.put("/dms/2")
+        assert created.status_code == 201 and again.status_code == 200
+        assert created.json()["room_id"] == again.json()["room_id"]
+        assert created.json()["user_id"] == 2 and created.json()["is_private"] is True
+
+        assert (await client.put("/dms/1")).status_code == 400
+        assert (await client.put("/dms/99")).status_code == 404
+
+        listing = await client.get("/dms")
+        assert listing.status_code == 200
+        assert [(dm["user_id"], dm["last_message_id"]) for dm in listing.json()] == [(2, None)]
+    app.dependency_overrides.clear()
@@ -0,0 +1,113 @@
+from datetime import datetime
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from src.chat.repository import MessageRepository
+from src.core.database import Base, get_db
+from src.core.http_cache import ResponseCache, get_response_cache
+from src.main import app
+from src.models import User, UserSession, Room, RoomMember
+from src.rooms.repository import RoomRepository
+
+DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+
+@pytest_asyncio.fixture
+async def test_session():
+    engine = create_async_engine(DATABASE_URL, echo=False, poolclass=NullPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        async_session = async_sessionmaker(bind=conn, expire_on_commit=False, class_=AsyncSession)
+        async with async_session() as session:
+            yield session
+
+
+@pytest_asyncio.fixture
+async def client(test_session):
+    test_session.add_all([
+        User(user_id=1, username="reader", first_name="R", hashed_password="x"),
+        User(user_id=2, username="outsider", first_name="O", hashed_password="x"),
+        Room(room_id=1, name="cached", is_private=True),
+    ])
+    await test_session.flush()
+    test_session.add_all([
+        UserSession(user_id=1, refresh_token="reader-token"),
+        UserSession(user_id=2, refresh_token="outsider-token"),
+        RoomMember(user_id=1, room_id=1),
+    ])
+    await test_session.commit()
+
+    async def override_db():
+        yield test_session
+
+    cache = ResponseCache()
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_response_cache] = lambda: cache
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": "Bearer reader-token"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+        client.cache = cache
+        yield client
+    app.dependency_overrides.clear()
+
+
+async def _revalidate(client, url, response):
+    return await client.get(url, headers={"If-None-Match": response.headers["etag"]})
+
+
+@pytest.mark.asyncio
+async def test_room_and_profile_revalidation(client, test_session):
+    first = await client.get("/rooms/1")
+    assert first.status_code == 200
+    assert first.json()["name"] == "cached"
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert "last-modified" in first.headers
+
+    again = await _revalidate(client, "/rooms/1", first)
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == first.headers["etag"]
+
+    await RoomRepository(test_session).update(1, name="renamed", updated_at=datetime(2030, 1, 1))
+    changed = await _revalidate(client, "/rooms/1", first)
+    assert changed.status_code == 200
+    assert changed.json()["name"] == "renamed"
+    assert changed.headers["last-modified"] == "Tue, 01 Jan 2030 00:00:00 GMT"
+
+    outsider = await client.get("/rooms/1", headers={"Authorization": "Bearer outsider-token"})
+    assert outsider.status_code == 404
+
+    profile = await client.get("/users/2")
+    assert profile.json() == {"user_id": 2, "username": "outsider", "first_name": "O",
+                              "family_name": None, "avatar_url": None}
+    assert (await _revalidate(client, "/users/2", profile)).status_code == 304
+    assert (await client.get("/users/3")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_history_pages_are_cached_by_version(client, test_session):
+    repo = MessageRepository(test_session)
+    messages = [await repo.create(user_id=1, room_id=1, message=str(i)) for i in range(6)]
+
+    url = f"/rooms/1/messages?before={messages[3].message_id}&limit=2"
+    page = await client.get(url)
+    assert [m["message"] for m in page.json()] == ["2", "1"]
+    hits = client.cache.hits
+    assert (await client.get(url)).content == page.content
+    assert client.cache.hits == hits + 1
+    assert (await _revalidate(client, url, page)).status_code == 304
+
+    # A new message does not touch a closed page, but it does change the newest page.
+    latest = await client.get("/rooms/1/messages?limit=2")
+    await repo.create(user_id=1, room_id=1, message="new")
+    assert (await _revalidate(client, url, page)).status_code == 304
+    assert (await _revalidate(client, "/rooms/1/messages?limit=2", latest)).status_code == 200
+
+    await repo.update(messages[1].message_id, message="edited", updated_at=datetime(2030, 1, 1))
+    edited = await _revalidate(client, url, page)
+    assert edited.status_code == 200
+    assert [m["message"] for m in edited.json()] == ["2", "edited"]
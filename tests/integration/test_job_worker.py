@@ -0,0 +1,202 @@
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+
+from src.chat.processing import ATTACHMENT_METADATA, Image, make_attachment_handler, sniff_mime
+from src.chat.storage import LocalBlobStore
+from src.core.clock import utcnow
+from src.core.database import Base
+from src.jobs.models import Job, JobStatus
+from src.jobs.queue import DatabaseJobQueue, InMemoryJobQueue
+from src.jobs.worker import JobWorker
+from src.models import User, Room, Message, Attachment
+
+
+@pytest_asyncio.fixture
+async def session_maker(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'jobs.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def process_pool():
+    executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    yield executor
+    executor.shutdown()
+
+
+async def _chunks(data: bytes):
+    yield data
+
+
+@pytest.mark.asyncio
+async def test_database_queue_dedup_claim_and_retry(session_maker):
+    queue = DatabaseJobQueue(session_maker)
+    assert await queue.enqueue("demo", {"n": 1}, dedup_key="demo:1") is True
+    assert await queue.enqueue("demo", {"n": 1}, dedup_key="demo:1") is False
+    assert await queue.enqueue("demo", {"n": 2}) is True
+    assert await queue.enqueue("demo", {"n": 3}, run_after=utcnow() + timedelta(hours=1)) is True
+
+    claimed = await queue.claim(10)
+    assert [job.payload["n"] for job in claimed] == [1, 2]
+    assert all(job.attempts == 1 for job in claimed)
+    assert await queue.claim(10) == []
+
+    await queue.complete(claimed[0].job_id)
+    await queue.fail(claimed[1].job_id, "boom", retry_in=0)
+    retried = await queue.claim(10)
+    assert [(job.job_id, job.attempts) for job in retried] == [(claimed[1].job_id, 2)]
+    await queue.fail(retried[0].job_id, "boom again", retry_in=None)
+
+    async with session_maker() as session:
+        rows = (await session.execute(select(Job.status, Job.last_error).order_by(Job.job_id))).all()
+    assert rows[0] == (JobStatus.done, None)
+    assert rows[1] == (JobStatus.failed, "boom again")
+    assert rows[2][0] == JobStatus.pending
+
+
+@pytest.mark.asyncio
+async def test_finished_job_releases_dedup_key(session_maker):
+    for queue in (DatabaseJobQueue(session_maker), InMemoryJobQueue()):
+        assert await queue.enqueue("demo", {}, dedup_key="demo:1") is True
+        [job] = await queue.claim(1)
+        assert await queue.enqueue("demo", {}, dedup_key="demo:1") is False
+        await queue.fail(job.job_id, "boom", retry_in=None)
+        assert await queue.enqueue("demo", {}, dedup_key="demo:1") is True
+        assert await queue.enqueue("demo", {}, dedup_key="demo:1") is False
+        [job] = await queue.claim(1)
+        await queue.complete(job.job_id)
+        assert await queue.enqueue("demo", {}, dedup_key="demo:1") is True
+
+
+@pytest.mark.asyncio
+async def test_database_queue_reclaims_stuck_jobs(session_maker):
+    queue = DatabaseJobQueue(session_maker, visibility_timeout=0)
+    await queue.enqueue("demo", {})
+    first = await queue.claim(1)
+    again = await queue.claim(1)
+    assert [job.job_id for job in again] == [first[0].job_id]
+    assert again[0].attempts == 2
+
+
+@pytest.mark.asyncio
+async def test_memory_queue_reclaims_stuck_jobs():
+    now = utcnow()
+    queue = InMemoryJobQueue(visibility_timeout=60, clock=lambda: now)
+    await queue.enqueue("demo", {})
+    first = await queue.claim(1)
+    assert await queue.claim(1) == []
+
+    now += timedelta(seconds=61)
+    again = await queue.claim(1)
+    assert [job.job_id for job in again] == [first[0].job_id]
+    assert again[0].attempts == 2
+    await queue.complete(again[0].job_id)
+    now += timedelta(seconds=61)
+    assert await queue.claim(1) == []
+
+
+@pytest.mark.asyncio
+async def test_worker_retries_then_gives_up():
+    queue = InMemoryJobQueue(max_attempts=2)
+    calls = []
+
+    async def flaky(payload, run_in_pool):
+        calls.append(payload)
+        raise RuntimeError("nope")
+
+    worker = JobWorker(queue, {"flaky": flaky}, retry_base=0)
+    await queue.enqueue("flaky", {"n": 1})
+    await queue.enqueue("unknown", {})
+
+    assert await worker.run_once() == 2
+    assert await worker.run_once() == 1
+    assert await worker.run_once() == 0
+
+    assert len(calls) == 2
+    assert worker.metrics.snapshot()["failed"] == 2
+    assert worker.metrics.retried == 1
+    assert {entry.status for entry in queue.jobs.values()} == {JobStatus.failed}
+
+
+@pytest.mark.asyncio
+async def test_attachment_metadata_job(session_maker, tmp_path, process_pool):
+    store = LocalBlobStore(tmp_path / "blobs")
+    if Image is not None:
+        buffer = io.BytesIO()
+        Image.new("RGB", (800, 600), "red").save(buffer, "PNG")
+        data = buffer.getvalue()
+    else:
+        data = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+    blob = await store.write_stream(_chunks(data))
+
+    async with session_maker() as session:
+        session.add_all([User(username="u", first_name="U", hashed_password="x"), Room(name="r")])
+        await session.flush()
+        session.add(Message(message_id=1, user_id=1, room_id=1))
+        await session.flush()
+        session.add_all([
+            Attachment(message_id=1, url="/a/1", sha256=blob.digest, mime_type="application/octet-stream"),
+            Attachment(message_id=1, url="/a/2", sha256=blob.digest),
+        ])
+        await session.commit()
+
+    queue = InMemoryJobQueue()
+    worker = JobWorker(
+        queue,
+        {ATTACHMENT_METADATA: make_attachment_handler(session_maker, store)},
+        executor=process_pool,
+    )
+    await queue.enqueue(ATTACHMENT_METADATA, {"sha256": blob.digest}, dedup_key=blob.digest)
+    await queue.enqueue(ATTACHMENT_METADATA, {"sha256": blob.digest}, dedup_key=blob.digest)
+    assert await worker.run_once() == 1
+    assert worker.metrics.completed == 1
+
+    async with session_maker() as session:
+        rows = (await session.execute(select(Attachment.mime_type, Attachment.file_size, Attachment.thumbnail_sha256))).all()
+    assert [row[:2] for row in rows] == [("image/png", len(data))] * 2
+    if Image is not None:
+        assert rows[0][2] is not None and await store.size(rows[0][2]) > 0
+
+
+def test_sniff_mime():
+    assert sniff_mime(b"\xff\xd8\xff\xe0rest") == "image/jpeg"
+    assert sniff_mime(b"RIFF\x00\x00\x00\x00WEBPVP8") == "image/webp"
+    assert sniff_mime(b"\x00\x00\x00\x18ftypmp42") == "video/mp4"
+    assert sniff_mime(b"hello") is None
+
+
+@pytest.mark.asyncio
+async def test_worker_drain_finishes_jobs_in_hand():
+    queue = InMemoryJobQueue()
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow(payload, run_in_pool):
+        started.set()
+        await release.wait()
+
+    worker = JobWorker(queue, {"slow": slow}, poll_interval=0.01)
+    await queue.enqueue("slow", {"n": 1})
+    worker.start()
+    await started.wait()
+    await queue.enqueue("slow", {"n": 2})
+
+    draining = asyncio.create_task(worker.drain(timeout=5))
+    await asyncio.sleep(0.05)
+    assert not draining.done()
+    release.set()
+    await draining
+
+    assert worker.metrics.completed == 1
+    assert [entry.status for entry in queue.jobs.values()] == [JobStatus.done, JobStatus.pending]
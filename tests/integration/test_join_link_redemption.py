@@ -0,0 +1,117 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+
+from src.core.clock import utcnow
+from src.core.database import Base
+from src.models import User, Room, RoomMember, JoinLink, Ban
+from src.rooms.cache import JoinLinkCache
+from src.rooms.repository import JoinLinkRepository, RedeemStatus
+
+
+@pytest_asyncio.fixture
+async def session_maker(tmp_path):
+    # A file database so that concurrent sessions use separate connections.
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'rooms.db'}",
+        connect_args={"timeout": 30},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    maker = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    async with maker() as session:
+        owner = User(username="owner", first_name="Owner", hashed_password="x")
+        users = [User(username=f"user{i}", first_name="User", hashed_password="x") for i in range(50)]
+        room = Room(name="viral")
+        session.add_all([owner, room, *users])
+        await session.flush()
+        session.add_all([
+            JoinLink(code="VIRAL", room_id=room.room_id, user_id=owner.user_id),
+            JoinLink(code="OLD", room_id=room.room_id, user_id=owner.user_id, expired_at=utcnow() - timedelta(days=1)),
+        ])
+        await session.commit()
+    yield maker
+    await engine.dispose()
+
+
+async def _redeem(maker, cache, code, user_id):
+    async with maker() as session:
+        return await JoinLinkRepository(session, cache=cache).redeem(code, user_id)
+
+
+async def _member_count(maker, **filters):
+    async with maker() as session:
+        query = select(func.count(RoomMember.member_id)).filter_by(**filters)
+        return (await session.execute(query)).scalar()
+
+
+@pytest.mark.asyncio
+async def test_redeem_joins_and_is_idempotent(session_maker):
+    cache = JoinLinkCache()
+    first = await _redeem(session_maker, cache, "VIRAL", 2)
+    second = await _redeem(session_maker, cache, "VIRAL", 2)
+
+    assert first.status == RedeemStatus.joined
+    assert second.status == RedeemStatus.already_member
+    assert second.member_id == first.member_id
+    assert await _member_count(session_maker, user_id=2) == 1
+
+
+@pytest.mark.asyncio
+async def test_redeem_rejects_unknown_expired_and_banned(session_maker):
+    cache = JoinLinkCache()
+    async with session_maker() as session:
+        session.add(Ban(banned_user_id=3, banned_by_user_id=1, room_id=None))
+        await session.commit()
+
+    assert (await _redeem(session_maker, cache, "NOPE", 2)).status == RedeemStatus.rejected
+    assert (await _redeem(session_maker, cache, "OLD", 2)).status == RedeemStatus.rejected
+    assert (await _redeem(session_maker, cache, "VIRAL", 3)).status == RedeemStatus.rejected
+    assert await _member_count(session_maker) == 0
+
+
+@pytest.mark.asyncio
+async def test_expired_ban_does_not_block(session_maker):
+    async with session_maker() as session:
+        session.add(Ban(banned_user_id=2, banned_by_user_id=1, room_id=1, expires_at=utcnow() - timedelta(minutes=1)))
+        await session.commit()
+
+    result = await _redeem(session_maker, JoinLinkCache(), "VIRAL", 2)
+    assert result.status == RedeemStatus.joined
+
+
+@pytest.mark.asyncio
+async def test_expire_invalidates_cached_code(session_maker):
+    cache = JoinLinkCache()
+    assert (await _redeem(session_maker, cache, "VIRAL", 2)).status == RedeemStatus.joined
+    async with session_maker() as session:
+        assert await JoinLinkRepository(session, cache=cache).expire("VIRAL") is True
+
+    assert (await _redeem(session_maker, cache, "VIRAL", 3)).status == RedeemStatus.rejected
+
+
+@pytest.mark.asyncio
+async def test_concurrent_redemptions_never_duplicate(session_maker):
+    cache = JoinLinkCache()
+    same_user = [_redeem(session_maker, cache, "VIRAL", 2) for _ in range(20)]
+    many_users = [_redeem(session_maker, cache, "VIRAL", user_id) for user_id in range(3, 52)]
+
+    results = await asyncio.gather(*same_user, *many_users)
+
+    same_user_statuses = [r.status for r in results[:20]]
+    assert same_user_statuses.count(RedeemStatus.joined) == 1
+    assert same_user_statuses.count(RedeemStatus.already_member) == 19
+    assert all(r.status == RedeemStatus.joined for r in results[20:])
+    assert await _member_count(session_maker, user_id=2) == 1
+    assert await _member_count(session_maker) == 50
+
+
+def test_join_link_cache_is_bounded():
+    cache = JoinLinkCache(maxsize=3)
+    for i in range(10):
+        cache.put(f"code{i}", None)
+    assert len(cache) == 3
@@ -0,0 +1,156 @@
+import asyncio
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+
+from src.chat.edits import EditBatcher
+from src.chat.repository import EVENTS_CHANNEL, MessageRepository
+from src.chat.revisions import SNAPSHOT_EVERY
+from src.core.database import Base, get_db
+from src.main import app
+from src.models import User, UserSession, Room, RoomMember, MessageRevision, Mention, OutboxEvent
+
+MESSAGE_ID = 1000
+EDITS = 2 * SNAPSHOT_EVERY + 5
+BASE = "A long message about the release plan. " * 50
+
+
+def _version(i: int) -> str:
+    return BASE + f"(edit {i})" if i else BASE
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'edits.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def session_maker(engine):
+    maker = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    async with maker() as session:
+        session.add_all([User(user_id=i, username=f"user{i}", first_name="U", hashed_password="x") for i in (1, 2, 3)])
+        session.add(Room(room_id=1, name="room", last_seq=0))
+        await session.flush()
+        session.add_all([RoomMember(user_id=user_id, room_id=1) for user_id in (1, 2)])
+        session.add_all([UserSession(user_id=2, refresh_token="member-token"),
+                         UserSession(user_id=3, refresh_token="outsider-token")])
+        await session.commit()
+        await MessageRepository(session).append(message_id=MESSAGE_ID, user_id=1, room_id=1, message=_version(0))
+        await session.execute(OutboxEvent.__table__.delete())
+        await session.commit()
+    yield maker
+
+
+@pytest.mark.asyncio
+async def test_edits_store_compact_deltas_and_rebuild_every_version(engine, session_maker):
+    async with session_maker() as session:
+        repo = MessageRepository(session)
+        for i in range(1, EDITS + 1):
+            await repo.edit(1, MESSAGE_ID, 1, _version(i))
+        assert await repo.edit(1, MESSAGE_ID, 2, "not mine") is None
+        unchanged = await repo.edit(1, MESSAGE_ID, 1, _version(EDITS))
+        assert unchanged.revision == EDITS
+
+    async with session_maker() as session:
+        rows = (await session.execute(select(MessageRevision).order_by(MessageRevision.revision))).scalars().all()
+        events = (await session.execute(select(OutboxEvent))).scalars().all()
+    assert [row.revision for row in rows] == list(range(EDITS))
+    assert [row.revision for row in rows if row.is_snapshot] == [SNAPSHOT_EVERY - 1, 2 * SNAPSHOT_EVERY - 1]
+    assert all(len(row.content) < 32 for row in rows if not row.is_snapshot)
+    assert len(events) == EDITS and all(e.channel == EVENTS_CHANNEL for e in events)
+    last = events[-1].payload["event"]
+    # The message took seq 1; every edit takes the next one.
+    assert last["type"] == "message_edited" and last["revision"] == EDITS and last["seq"] == EDITS + 1
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, *args):
+        if "message_revisions" in statement:
+            statements.append(parameters)
+
+    async with session_maker() as session:
+        repo = MessageRepository(session)
+        message = await repo.get_by_id(MESSAGE_ID)
+        assert message.message == _version(EDITS)
+        versions = await repo.get_revisions(message, EDITS, EDITS)
+        assert [v["message"] for v in versions] == [_version(i) for i in reversed(range(EDITS))]
+
+        event.listen(engine.sync_engine, "before_cursor_execute", count)
+        [oldest] = await repo.get_revisions(message, 1, 1)
+        event.remove(engine.sync_engine, "before_cursor_execute", count)
+        assert oldest["revision"] == 0 and oldest["message"] == _version(0)
+    # Revision 0 is rebuilt from the first snapshot, not from the current text.
+    assert len(statements) == 1
+
+
+@pytest.mark.asyncio
+async def test_edit_indexes_new_mentions_and_drops_removed_ones(session_maker):
+    async def count_mentions():
+        async with session_maker() as session:
+            return (await session.execute(select(func.count()).select_from(Mention))).scalar()
+
+    async with session_maker() as session:
+        await MessageRepository(session).edit(1, MESSAGE_ID, 1, "ping @user2 and @user2")
+        await MessageRepository(session).edit(1, MESSAGE_ID, 1, "ping @user2 again")
+    assert await count_mentions() == 1
+    async with session_maker() as session:
+        await MessageRepository(session).edit(1, MESSAGE_ID, 1, "never mind")
+    assert await count_mentions() == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_edits_are_written_in_one_batch(engine, session_maker):
+    async with session_maker() as session:
+        repo = MessageRepository(session)
+        for message_id in (1001, 1002):
+            await repo.append(message_id=message_id, user_id=1, room_id=1, message="draft")
+    commits = []
+
+    def count(conn):
+        commits.append(conn)
+
+    event.listen(engine.sync_engine, "commit", count)
+    batcher = EditBatcher(session_maker, delay=0.01)
+    edited = await asyncio.gather(
+        batcher.edit(1, 1001, 1, "first"),
+        batcher.edit(1, 1002, 1, "second"),
+        batcher.edit(1, 1002, 2, "not mine"),
+    )
+    event.remove(engine.sync_engine, "commit", count)
+    assert [message and message.message for message in edited] == ["first", "second", None]
+    assert [message.changed_seq for message in edited[:2]] == [4, 5]
+    assert len(commits) == 1
+    assert batcher.metrics.snapshot()["edits_per_batch"] == 3
+
+
+@pytest.mark.asyncio
+async def test_revisions_endpoint(session_maker):
+    async with session_maker() as session:
+        for i in range(1, 4):
+            await MessageRepository(session).edit(1, MESSAGE_ID, 1, _version(i))
+
+    async def override_db():
+        async with session_maker() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_db
+    transport = httpx.ASGITransport(app=app)
+    url = f"/messages/{MESSAGE_ID}/revisions"
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        page = (await client.get(url, params={"limit": 2}, headers={"Authorization": "Bearer member-token"})).json()
+        assert page["revision"] == 3
+        assert [(v["revision"], v["message"]) for v in page["revisions"]] == [(2, _version(2)), (1, _version(1))]
+        rest = (await client.get(url, params={"before": 1}, headers={"Authorization": "Bearer member-token"})).json()
+        assert [v["revision"] for v in rest["revisions"]] == [0]
+        outsider = await client.get(url, headers={"Authorization": "Bearer outsider-token"})
+        assert outsider.status_code == 403
+        missing = await client.get("/messages/1/revisions", headers={"Authorization": "Bearer member-token"})
+        assert missing.status_code == 404
+    app.dependency_overrides.clear()
@@ -0,0 +1,267 @@
+from datetime import datetime
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from src.chat.mentions import UsernameCache
+from src.chat.models import Mention
+from src.chat.repository import MessageRepository
+from src.core.database import Base, get_db
+from src.core.ids import EPOCH_MS, SnowflakeGenerator
+from src.main import app
+from src.models import User, UserSession, Room, RoomMember, Message
+
+DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest_asyncio.fixture
+async def test_session():
+    engine = create_async_engine(DATABASE_URL, echo=False, poolclass=NullPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        async_session = async_sessionmaker(bind=conn, expire_on_commit=False, class_=AsyncSession)
+        async with async_session() as session:
+            yield session
+
+
+@pytest_asyncio.fixture
+async def room(test_session):
+    user = User(user_id=1, username="author", first_name="A", hashed_password="x")
+    room = Room(name="history")
+    test_session.add_all([user, room])
+    await test_session.commit()
+    return room
+
+
+@pytest.mark.asyncio
+async def test_ids_are_assigned_without_a_sequence(test_session, room):
+    repo = MessageRepository(test_session)
+    first = await repo.create(user_id=1, room_id=room.room_id, message="one")
+    second = await repo.create(user_id=1, room_id=room.room_id, message="two", reply_to=first.message_id)
+
+    assert first.message_id > 2**32
+    assert second.message_id > first.message_id
+    assert second.reply_to == first.message_id
+
+
+@pytest.mark.asyncio
+async def test_history_pages_and_time_range(test_session, room):
+    clock = FakeClock(EPOCH_MS)
+    generator = SnowflakeGenerator(3, clock=clock)
+    for minute in range(10):
+        clock.now = EPOCH_MS + minute * 60_000
+        test_session.add(Message(message_id=generator.next_id(), user_id=1, room_id=room.room_id, message=str(minute)))
+    await test_session.commit()
+    repo = MessageRepository(test_session)
+
+    page = await repo.get_history(room.room_id, limit=4)
+    assert [m.message for m in page] == ["9", "8", "7", "6"]
+    page = await repo.get_history(room.room_id, before_id=page[-1].message_id, limit=4)
+    assert [m.message for m in page] == ["5", "4", "3", "2"]
+
+    since = await repo.get_since(room.room_id, datetime(2025, 1, 1, 0, 7))
+    assert [m.message for m in since] == ["7", "8", "9"]
+    assert await repo.get_since(room.room_id + 1, datetime(2025, 1, 1)) == []
+
+
+@pytest.mark.asyncio
+async def test_history_endpoint_encodes_rows(test_session, room):
+    test_session.add_all([
+        UserSession(user_id=1, refresh_token="author-token"),
+        RoomMember(user_id=1, room_id=room.room_id),
+    ])
+    repo = MessageRepository(test_session)
+    first = await repo.create(user_id=1, room_id=room.room_id, message='say "hi"')
+    second = await repo.create(user_id=1, room_id=room.room_id, message=None, reply_to=first.message_id)
+
+    async def override_db():
+        yield test_session
+
+    app.dependency_overrides[get_db] = override_db
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": "Bearer author-token"}
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+            response = await client.get(f"/rooms/{room.room_id}/messages")
+            assert response.status_code == 200
+            assert response.headers["content-type"] == "application/json"
+            body = response.json()
+            # Ids are above 2**53, so they are sent as strings.
+            assert [m["message_id"] for m in body] == [str(second.message_id), str(first.message_id)]
+            assert body[1]["message"] == 'say "hi"'
+            assert body[0]["reply_to"] == str(first.message_id)
+            assert body[0]["created_at"] == second.created_at.isoformat()
+
+            response = await client.get(f"/rooms/{room.room_id}/messages",
+                                        params={"before": second.message_id, "compact": True})
+            body = response.json()
+            assert body["fields"][:3] == ["message_id", "user_id", "room_id"]
+            assert [row[0] for row in body["rows"]] == [str(first.message_id)]
+
+            response = await client.get(f"/rooms/{room.room_id + 1}/messages")
+            assert response.status_code == 403
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_replies_maintain_counters_and_threads(test_session, room):
+    other = Room(name="other")
+    test_session.add(other)
+    await test_session.commit()
+    repo = MessageRepository(test_session)
+    root = await repo.append(user_id=1, room_id=room.room_id, message="root")
+    first = await repo.append(user_id=1, room_id=room.room_id, message="first", reply_to=root.message_id)
+    second = await repo.append(user_id=1, room_id=room.room_id, message="second", reply_to=root.message_id)
+    nested = await repo.append(user_id=1, room_id=room.room_id, message="nested", reply_to=first.message_id)
+
+    await test_session.refresh(root)
+    assert root.reply_count == 2
+    assert root.last_reply_at is not None
+    assert root.updated_at == root.created_at
+
+    thread = await repo.get_thread(root.message_id)
+    assert [(row.message, row.depth) for row in thread] == [("root", 0), ("first", 1), ("second", 1), ("nested", 2)]
+    assert [row.message for row in await repo.get_thread(root.message_id, max_depth=1)] == ["root", "first", "second"]
+    assert len(await repo.get_thread(root.message_id, limit=2)) == 2
+    assert await repo.get_thread(nested.message_id + 1) == []
+    # The walk stops at the limit, keeping the shallowest replies rather than the oldest.
+    await repo.append(user_id=1, room_id=room.room_id, message="third", reply_to=root.message_id)
+    thread = await repo.get_thread(root.message_id, limit=4)
+    assert [row.message for row in thread] == ["root", "first", "second", "third"]
+
+    chain = await repo.get_ancestors(nested.message_id)
+    assert [(row.message, row.depth) for row in chain] == [("root", 2), ("first", 1), ("nested", 0)]
+    assert [row.message for row in await repo.get_ancestors(nested.message_id, max_depth=1)] == ["first", "nested"]
+
+    await repo.update(first.message_id, is_deleted=True)
+    previews = await repo.get_previews([root.message_id, first.message_id, root.message_id])
+    assert previews[root.message_id]["message"] == "root"
+    assert previews[first.message_id] == {"message_id": first.message_id, "user_id": 1, "message": None,
+                                          "is_deleted": True}
+    assert await repo.get_previews([]) == {}
+    assert second.reply_to == root.message_id
+
+    # Replies must stay in the room of their parent; the failed append is rolled back.
+    with pytest.raises(ValueError):
+        await repo.append(user_id=1, room_id=other.room_id, message="elsewhere", reply_to=root.message_id)
+
+
+@pytest.mark.asyncio
+async def test_thread_endpoints_and_parent_previews(test_session, room):
+    test_session.add_all([
+        UserSession(user_id=1, refresh_token="author-token"),
+        RoomMember(user_id=1, room_id=room.room_id),
+        User(user_id=2, username="outsider", first_name="O", hashed_password="x"),
+        UserSession(user_id=2, refresh_token="outsider-token"),
+    ])
+    await test_session.commit()
+    repo = MessageRepository(test_session)
+    root = await repo.append(user_id=1, room_id=room.room_id, message="root")
+    reply = await repo.append(user_id=1, room_id=room.room_id, message="reply", reply_to=root.message_id)
+    nested = await repo.append(user_id=1, room_id=room.room_id, message="nested", reply_to=reply.message_id)
+
+    async def override_db():
+        yield test_session
+
+    app.dependency_overrides[get_db] = override_db
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": "Bearer author-token"}
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+            body = (await client.get(f"/messages/{root.message_id}/thread")).json()
+            assert [(m["message"], m["depth"]) for m in body["messages"]] == [("root", 0), ("reply", 1), ("nested", 2)]
+            assert body["messages"][1]["reply_to"] == str(root.message_id)
+            assert body["messages"][0]["reply_count"] == 1
+            assert body["truncated"] is False
+            body = (await client.get(f"/messages/{root.message_id}/thread", params={"depth": 1})).json()
+            assert [m["message"] for m in body["messages"]] == ["root", "reply"]
+            assert body["truncated"] is True
+            body = (await client.get(f"/messages/{root.message_id}/thread", params={"limit": 2})).json()
+            assert len(body["messages"]) == 2 and body["truncated"] is True
+
+            body = (await client.get(f"/messages/{nested.message_id}/ancestors", params={"depth": 1})).json()
+            assert [m["message"] for m in body["messages"]] == ["reply", "nested"]
+            assert body["truncated"] is True
+            assert (await client.get(f"/messages/{nested.message_id + 1}/thread")).status_code == 404
+            response = await client.get(f"/messages/{root.message_id}/thread",
+                                        headers={"Authorization": "Bearer outsider-token"})
+            assert response.status_code == 403
+
+            response = await client.get(f"/rooms/{room.room_id}/messages", params={"parents": True})
+            body = response.json()
+            assert [m["parent"] and m["parent"]["message"] for m in body] == ["reply", "root", None]
+            etag = response.headers["etag"]
+
+            response = await client.get(f"/rooms/{room.room_id}/messages", params={"parents": True, "compact": True})
+            body = response.json()
+            assert body["parents"] == {
+                str(root.message_id): {"message_id": str(root.message_id), "user_id": 1, "message": "root",
+                                       "is_deleted": False},
+                str(reply.message_id): {"message_id": str(reply.message_id), "user_id": 1, "message": "reply",
+                                        "is_deleted": False},
+            }
+
+            # A new reply changes the counters of a message on the page, so the page is re-rendered.
+            await repo.append(user_id=1, room_id=room.room_id, message="late", reply_to=root.message_id)
+            response = await client.get(f"/rooms/{room.room_id}/messages",
+                                        params={"parents": True, "before": nested.message_id + 1},
+                                        headers={"If-None-Match": etag})
+            assert response.status_code == 200
+            assert response.json()[-1]["reply_count"] == 2
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_mentions_are_indexed_and_paged(test_session, room):
+    test_session.add_all([
+        User(user_id=2, username="bob", first_name="B", hashed_password="x"),
+        User(user_id=3, username="carol", first_name="C", hashed_password="x"),
+        UserSession(user_id=2, refresh_token="bob-token"),
+        RoomMember(user_id=1, room_id=room.room_id),
+        RoomMember(user_id=2, room_id=room.room_id),
+    ])
+    await test_session.commit()
+    usernames = UsernameCache()
+    repo = MessageRepository(test_session, usernames=usernames)
+    first = await repo.append(user_id=1, room_id=room.room_id, message="@bob hi")
+    second = await repo.append(user_id=1, room_id=room.room_id, message="@bob @bob @carol @ghost @author")
+    deleted = await repo.append(user_id=1, room_id=room.room_id, message="@bob oops")
+    await repo.update(deleted.message_id, is_deleted=True)
+    assert usernames.lookup(["bob", "ghost"]) == ({"bob": 2, "ghost": None}, [])
+
+    pairs = (await test_session.execute(select(Mention.user_id, Mention.message_id))).all()
+    assert sorted(pairs) == [(2, first.message_id), (2, second.message_id), (2, deleted.message_id),
+                             (3, second.message_id)]
+    assert [row.message_id for row in await repo.get_mentions(2)] == [second.message_id, first.message_id]
+    assert await repo.get_mentions(3) == [], "carol is not a member of the room"
+
+    async def override_db():
+        yield test_session
+
+    app.dependency_overrides[get_db] = override_db
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test",
+                                     headers={"Authorization": "Bearer bob-token"}) as client:
+            body = (await client.get("/mentions", params={"limit": 1})).json()
+            assert [m["message_id"] for m in body] == [str(second.message_id)]
+            body = (await client.get("/mentions", params={"limit": 1, "before": second.message_id})).json()
+            assert [m["message"] for m in body] == ["@bob hi"]
+            body = (await client.get("/mentions", params={"before": first.message_id, "compact": True})).json()
+            assert body["rows"] == []
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,168 @@
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+
+from src.chat.hub import Connection, ConnectionHub
+from src.chat.repository import EVENTS_CHANNEL, MessageRepository
+from src.chat.sync import SyncService
+from src.core.broker import InMemoryBroker
+from src.core.database import Base, get_db
+from src.jobs.queue import InMemoryJobQueue, get_job_queue
+from src.main import app
+from src.models import User, UserSession, Room, RoomMember, Message, OutboxEvent
+from src.moderation.engine import BanEngine, get_ban_engine
+from src.moderation.service import PURGE_USER, ModerationService
+from src.rooms.repository import MEMBERS_CHANNEL
+
+SPAMMER = 2
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'moderation.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def session_maker(engine):
+    maker = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    async with maker() as session:
+        session.add_all([
+            User(user_id=1, username="admin", first_name="A", hashed_password="x", is_admin=True),
+            User(user_id=SPAMMER, username="spammer", first_name="S", hashed_password="x"),
+            User(user_id=3, username="member", first_name="M", hashed_password="x"),
+        ])
+        session.add_all([Room(room_id=1, name="one", last_seq=0), Room(room_id=2, name="two", last_seq=0)])
+        await session.flush()
+        session.add_all([RoomMember(user_id=user_id, room_id=room_id) for user_id in (SPAMMER, 3) for room_id in (1, 2)])
+        session.add_all([
+            UserSession(user_id=1, refresh_token="admin-token"),
+            UserSession(user_id=3, refresh_token="member-token"),
+            UserSession(user_id=SPAMMER, refresh_token="spam-1"),
+            UserSession(user_id=SPAMMER, refresh_token="spam-2"),
+        ])
+        await session.commit()
+        repo = MessageRepository(session)
+        for i in range(7):
+            await repo.append(user_id=SPAMMER, room_id=1 + i % 2, message=f"buy now {i}")
+        await repo.append(user_id=3, room_id=1, message="hello")
+        await session.execute(OutboxEvent.__table__.delete())
+        await session.commit()
+    yield maker
+
+
+async def _scalar(maker, query):
+    async with maker() as session:
+        return (await session.execute(query)).scalar()
+
+
+@pytest.mark.asyncio
+async def test_purge_user_is_batched_and_announced(engine, session_maker):
+    service = ModerationService(session_maker, batch_size=3, pause=0)
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    result = await service.purge_user(SPAMMER)
+    event.remove(engine.sync_engine, "before_cursor_execute", count)
+
+    assert (result.sessions, result.messages, result.memberships) == (2, 7, 2)
+    # 3 message batches and 1 membership batch, then the empty reads that end each loop.
+    assert result.batches == 4
+    # A message batch reads, then per room takes a seq and updates, then writes the events.
+    assert len(statements) <= 1 + (1 + 2 * 2 + 1) * 3 + 1 + 2 * 1 + 1 + 2
+    assert await _scalar(session_maker, select(func.count()).select_from(Message)
+                         .where(Message.user_id == SPAMMER, Message.is_deleted.is_(False))) == 0
+    assert await _scalar(session_maker, select(func.count()).select_from(Message)
+                         .where(Message.is_deleted.is_(True))) == 7
+    assert await _scalar(session_maker, select(func.count()).select_from(RoomMember)
+                         .where(RoomMember.user_id == SPAMMER)) == 0
+    assert await _scalar(session_maker, select(func.count()).select_from(UserSession)
+                         .where(UserSession.is_active.is_(True))) == 2
+
+    async with session_maker() as session:
+        events = (await session.execute(select(OutboxEvent).order_by(OutboxEvent.event_id))).scalars().all()
+    deleted = [e.payload["event"] for e in events if e.channel == EVENTS_CHANNEL]
+    assert {e["type"] for e in deleted} == {"messages_deleted"}
+    assert sum(len(e["message_ids"]) for e in deleted) == 7
+    assert all(e["message_ids"] == sorted(e["message_ids"]) for e in deleted)
+    # Sequenced after the messages of each room: 5 in room 1, 3 in room 2.
+    assert sorted(e["seq"] for e in deleted if e["room_id"] == 1) == [6, 7, 8]
+    assert sorted(e["seq"] for e in deleted if e["room_id"] == 2) == [4, 5]
+    left = [(e.payload["event"], e.payload["room_id"]) for e in events if e.channel == MEMBERS_CHANNEL]
+    assert sorted(left) == [("left", 1), ("left", 2)]
+
+    again = await service.purge_user(SPAMMER)
+    assert (again.sessions, again.messages, again.memberships) == (0, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_deleted_messages_are_read_without_their_text(session_maker):
+    async with session_maker() as session:
+        spam = await MessageRepository(session).get_history(1)
+        root = min(message.message_id for message in spam if message.user_id == SPAMMER)
+        await MessageRepository(session).append(user_id=3, room_id=1, message="reply", reply_to=root)
+    await ModerationService(session_maker, pause=0).purge_user(SPAMMER)
+
+    async with session_maker() as session:
+        repo = MessageRepository(session)
+        rows = await repo.get_history_rows(1)
+        thread = await repo.get_thread(root)
+    replay = await SyncService(session_maker).replay(1, 0)
+    events = [encoded.event for encoded in replay.events if encoded.event["type"] == "message"]
+    for texts in ([(row.is_deleted, row.message) for row in rows], [(row.is_deleted, row.message) for row in thread],
+                  [(event["is_deleted"], event["message"]) for event in events]):
+        assert {message for deleted, message in texts if deleted} == {None}
+        assert {message for deleted, message in texts if not deleted} <= {"hello", "reply"}
+    assert [row.message for row in thread] == [None, "reply"]
+
+
+@pytest.mark.asyncio
+async def test_left_event_stops_delivery():
+    hub = ConnectionHub(InMemoryBroker())
+    spammer, member = Connection(None, SPAMMER), Connection(None, 3)
+    hub.register(spammer, [1, 2])
+    hub.register(member, [1])
+
+    await hub.handle_membership({"event": "left", "room_id": 1, "user_id": SPAMMER})
+    assert spammer.rooms == {2} and hub.connection_count(1) == 1
+    await hub.handle_membership({"event": "left", "room_id": 2, "user_id": SPAMMER})
+    assert hub.connection_count(2) == 0
+
+
+@pytest.mark.asyncio
+async def test_admin_ban_queues_purge(session_maker):
+    async def override_db():
+        async with session_maker() as session:
+            yield session
+
+    bans = BanEngine(session_maker, InMemoryBroker())
+    queue = InMemoryJobQueue()
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_ban_engine] = lambda: bans
+    app.dependency_overrides[get_job_queue] = lambda: queue
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        forbidden = await client.post(f"/moderation/users/{SPAMMER}/ban", json={"purge": True},
+                                      headers={"Authorization": "Bearer member-token"})
+        assert forbidden.status_code == 403
+
+        response = await client.post(f"/moderation/users/{SPAMMER}/ban", json={"reason": "spam", "purge": True},
+                                     headers={"Authorization": "Bearer admin-token"})
+        assert response.status_code == 202 and response.json()["purge_queued"] is True
+        assert (await client.post("/moderation/users/99/ban", json={},
+                                  headers={"Authorization": "Bearer admin-token"})).status_code == 404
+        assert (await client.post("/moderation/users/1/ban", json={},
+                                  headers={"Authorization": "Bearer admin-token"})).status_code == 400
+    app.dependency_overrides.clear()
+
+    assert bans.is_banned(SPAMMER, 1)
+    [job] = await queue.claim(10)
+    assert (job.kind, job.payload) == (PURGE_USER, {"user_id": SPAMMER})
@@ -0,0 +1,135 @@
+from datetime import timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+
+from src.chat.repository import MessageRepository
+from src.core.broker import InMemoryBroker
+from src.core.clock import utcnow
+from src.core.database import Base
+from src.models import User, Room, RoomMember, PendingNotification
+from src.notifications.service import NotificationService
+from src.notifications.sinks import InMemorySink, NotificationSink
+from src.presence.service import PresenceService
+
+MEMBERS = 50
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'notifications.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def session_maker(engine):
+    maker = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    async with maker() as session:
+        session.add_all([User(user_id=i, username=f"user{i}", first_name="U", hashed_password="x")
+                         for i in range(1, MEMBERS + 2)])
+        session.add_all([Room(room_id=1, name="general", last_seq=0), Room(room_id=2, name="random", last_seq=0)])
+        await session.flush()
+        session.add_all([RoomMember(user_id=i, room_id=1) for i in range(1, MEMBERS + 1)])
+        session.add_all([RoomMember(user_id=i, room_id=2) for i in (1, 2, MEMBERS + 1)])
+        await session.commit()
+    yield maker
+
+
+class Clock:
+    def __init__(self):
+        self.now = utcnow()
+
+    def __call__(self):
+        return self.now
+
+
+class FailingSink(NotificationSink):
+    async def send(self, digests):
+        raise ConnectionError("push gateway unavailable")
+
+
+async def _pending(maker):
+    async with maker() as session:
+        return (await session.execute(select(func.count()).select_from(PendingNotification))).scalar()
+
+
+@pytest.mark.asyncio
+async def test_fan_out_is_batched_and_skips_online_members_and_authors(engine, session_maker):
+    clock = Clock()
+    presence = PresenceService(InMemoryBroker())
+    presence.heartbeat(3)
+    service = NotificationService(session_maker, [InMemorySink()], presence=presence, batch_size=20, clock=clock)
+    assert await service.fan_out_once() == 0
+
+    async with session_maker() as session:
+        repo = MessageRepository(session)
+        root = await repo.append(user_id=4, room_id=1, message="question")
+        await repo.append(user_id=1, room_id=1, message="@user5 @user3 @user51 look", reply_to=root.message_id)
+        await repo.append(user_id=2, room_id=2, message="elsewhere")
+    assert await service.fan_out_once() == 0, "messages wait until they settle"
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    clock.now += timedelta(seconds=10)
+    assert await service.fan_out_once() == 3
+    event.remove(engine.sync_engine, "before_cursor_execute", count)
+    # Cursor, messages, mentions, replies, then per room one read and one upsert per 20 members.
+    assert len(statements) <= 4 + 2 * (MEMBERS // 20 + 1) + 2 + 2
+
+    async with session_maker() as session:
+        rows = {(row.user_id, row.room_id): row for row in (await session.execute(select(PendingNotification))).scalars()}
+    assert (1, 1) not in rows and (4, 1) not in rows and (3, 1) not in rows
+    assert len([key for key in rows if key[1] == 1]) == MEMBERS - 3
+    assert (rows[5, 1].messages, rows[5, 1].mentions, rows[5, 1].replies) == (2, 1, 0)
+    assert rows[6, 1].mentions == 0
+    assert set(key for key in rows if key[1] == 2) == {(1, 2), (MEMBERS + 1, 2)}
+    assert service.metrics.skipped_online == 1
+    assert await service.fan_out_once() == 0
+
+
+@pytest.mark.asyncio
+async def test_bursts_are_coalesced_into_one_digest_per_user(session_maker):
+    clock = Clock()
+    sink = InMemorySink()
+    presence = PresenceService(InMemoryBroker())
+    service = NotificationService(session_maker, [sink], presence=presence, digest_window=60, clock=clock)
+    await service.fan_out_once()
+
+    async with session_maker() as session:
+        repo = MessageRepository(session)
+        root = await repo.append(user_id=5, room_id=1, message="first")
+        clock.now += timedelta(seconds=10)
+        await service.fan_out_once()
+        for i in range(3):
+            await repo.append(user_id=1, room_id=1, message=str(i), reply_to=root.message_id)
+        await repo.append(user_id=MEMBERS + 1, room_id=2, message="other room")
+    clock.now += timedelta(seconds=10)
+    await service.fan_out_once()
+
+    assert await service.deliver_due() == 0, "the window has not passed yet"
+    presence.heartbeat(2)
+    clock.now += timedelta(seconds=60)
+    failing = NotificationService(session_maker, [FailingSink()], clock=clock, digest_window=60)
+    with pytest.raises(ConnectionError):
+        await failing.deliver_due()
+    pending = await _pending(session_maker)
+
+    assert await service.deliver_due() == MEMBERS - 1
+    assert await _pending(session_maker) == 0 and pending == MEMBERS + 2
+    digests = {digest.user_id: digest for digest in sink.digests}
+    assert 2 not in digests and service.metrics.dropped_online == 1
+    author = digests[5].rooms
+    assert [(room.room_id, room.messages, room.replies) for room in author] == [(1, 3, 3)]
+    both = digests[1].rooms
+    assert [(room.room_id, room.messages) for room in both] == [(1, 1), (2, 1)]
+    assert digests[6].rooms[0].messages == 4
+    assert digests[6].rooms[0].first_message_id == root.message_id
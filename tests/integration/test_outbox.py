@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+
+from src.chat.hub import Connection, ConnectionHub
+from src.chat.repository import EVENTS_CHANNEL, MessageRepository
+from src.core.broker import InMemoryBroker
+from src.core.database import Base
+from src.models import User, Room, JoinLink, OutboxEvent
+from src.outbox.relay import OutboxRelay
+from src.outbox.repository import OutboxRepository
+from src.rooms.cache import JoinLinkCache
+from src.rooms.repository import MEMBERS_CHANNEL, JoinLinkRepository
+
+
+@pytest_asyncio.fixture
+async def session_maker(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'outbox.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    maker = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    async with maker() as session:
+        session.add_all([
+            User(user_id=1, username="alice", first_name="A", hashed_password="x"),
+            User(user_id=2, username="bob", first_name="B", hashed_password="x"),
+            Room(room_id=1, name="general", last_seq=0),
+        ])
+        await session.flush()
+        session.add(JoinLink(code="JOIN", room_id=1, user_id=1))
+        await session.commit()
+    yield maker
+    await engine.dispose()
+
+
+async def _pending(maker):
+    async with maker() as session:
+        return (await session.execute(select(func.count()).select_from(OutboxEvent))).scalar()
+
+
+class FlakyBroker(InMemoryBroker):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    async def publish(self, channel, message):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("broker unavailable")
+        await super().publish(channel, message)
+
+
+@pytest.mark.asyncio
+async def test_only_committed_events_are_relayed_in_order(session_maker):
+    broker = InMemoryBroker()
+    subscription = broker.subscribe(EVENTS_CHANNEL)
+    relay = OutboxRelay(session_maker, broker, batch_size=2)
+
+    async with session_maker() as session:
+        OutboxRepository(session).add(EVENTS_CHANNEL, {"room_id": 1, "event": {"type": "ping"}})
+        await session.rollback()
+    async with session_maker() as session:
+        repo = MessageRepository(session)
+        messages = [await repo.append(user_id=1, room_id=1, message=str(i)) for i in range(3)]
+
+    assert await _pending(session_maker) == 3
+    assert await relay.relay_once() == 2
+    assert await relay.relay_once() == 1
+    assert await relay.relay_once() == 0
+    relayed = [subscription.queue.get_nowait() for _ in range(3)]
+    assert subscription.queue.empty()
+    assert [m["event"]["seq"] for m in relayed] == [m.seq for m in messages]
+    assert len({m["event_id"] for m in relayed}) == 3
+    assert relay.metrics.relayed == 3 and relay.metrics.batches == 2
+    assert await relay.backlog() == {"pending": 0, "oldest_seconds": 0.0}
+
+
+@pytest.mark.asyncio
+async def test_failed_batches_are_published_again(session_maker):
+    broker = FlakyBroker(failures=1)
+    subscription = broker.subscribe(EVENTS_CHANNEL)
+    relay = OutboxRelay(session_maker, broker)
+    async with session_maker() as session:
+        await MessageRepository(session).append(user_id=1, room_id=1, message="hi")
+
+    with pytest.raises(ConnectionError):
+        await relay.relay_once()
+    assert (await relay.backlog())["pending"] == 1
+    assert await relay.relay_once() == 1
+    assert subscription.queue.get_nowait()["event"]["message"] == "hi"
+
+
+@pytest.mark.asyncio
+async def test_relay_wakes_on_commit_and_joins_live_connections(session_maker):
+    broker = InMemoryBroker()
+    hub = ConnectionHub(broker)
+    relay = OutboxRelay(session_maker, broker, poll_interval=60)
+    connection = Connection(None, 2)
+    hub.register(connection, [])
+    await hub.start()
+    relay.start()
+    members = broker.subscribe(MEMBERS_CHANNEL)
+    try:
+        await asyncio.sleep(0)
+        async with session_maker() as session:
+            await JoinLinkRepository(session, cache=JoinLinkCache()).redeem("JOIN", 2)
+        joined = await asyncio.wait_for(members.get(), 5)
+        assert (joined["event"], joined["room_id"], joined["user_id"]) == ("joined", 1, 2)
+        await asyncio.sleep(0)
+        assert connection.rooms == {1}
+        assert hub.connection_count(1) == 1
+    finally:
+        await relay.stop()
+        await hub.stop()
@@ -0,0 +1,84 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.auth.repository import UserRepository
+from src.core.database import Base, make_routing_session_maker
+from src.core.replicas import ReplicaRouter
+from src.models import User
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def _engine_with_user(path, username):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(User.__table__.insert().values(user_id=1, username=username, first_name="x", hashed_password="x"))
+    return engine
+
+
+@pytest_asyncio.fixture
+async def router(tmp_path):
+    # The replica deliberately holds different data so the tests can tell where a read went.
+    primary = await _engine_with_user(tmp_path / "primary.db", "on-primary")
+    replica = await _engine_with_user(tmp_path / "replica.db", "on-replica")
+    router = ReplicaRouter(primary, [replica], sticky_window=5.0, clock=FakeClock())
+    yield router
+    await router.dispose()
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replica_and_writes_to_primary(router):
+    maker = make_routing_session_maker(router)
+    async with maker() as session:
+        repo = UserRepository(session)
+        assert (await repo.get_by_id(1)).username == "on-replica"
+        assert await repo.count() == 1
+        assert await repo.exists(1)
+        assert [user.username async for user in repo.stream_all()] == ["on-replica"]
+
+        created = await repo.create(username="new", first_name="x", hashed_password="x")
+        # After a write the session stays on the primary.
+        assert (await repo.get_by_id(created.user_id)).username == "new"
+        assert (await repo.get_by_id(1)).username == "on-primary"
+
+    async with maker() as session:
+        assert await UserRepository(session).count() == 1
+
+
+@pytest.mark.asyncio
+async def test_read_your_writes_window(router):
+    maker = make_routing_session_maker(router)
+    async with maker(sticky_key=lambda: 42) as session:
+        await UserRepository(session).update(1, first_name="changed")
+
+    async with maker(sticky_key=lambda: 42) as session:
+        assert (await UserRepository(session).get_by_id(1)).username == "on-primary"
+    async with maker(sticky_key=lambda: 7) as session:
+        assert (await UserRepository(session).get_by_id(1)).username == "on-replica"
+
+    router.clock.now += 6.0
+    async with maker(sticky_key=lambda: 42) as session:
+        assert (await UserRepository(session).get_by_id(1)).username == "on-replica"
+
+
+@pytest.mark.asyncio
+async def test_unhealthy_replica_fails_over_to_primary(router, tmp_path):
+    broken = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    router.replicas.append(broken)
+
+    healthy = await router.check_health()
+    assert broken not in healthy and len(healthy) == 1
+
+    router.healthy = []
+    maker = make_routing_session_maker(router)
+    async with maker() as session:
+        assert (await UserRepository(session).get_by_id(1)).username == "on-primary"
+    await broken.dispose()
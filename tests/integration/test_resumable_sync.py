@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from src.chat.framing import EncodedEvent
+from src.chat.repository import MessageRepository
+from src.chat.sync import SyncService, message_event
+from src.core.database import Base
+from src.models import User, Room
+from src.moderation.repository import ModerationRepository
+
+DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+
+@pytest_asyncio.fixture
+async def maker():
+    engine = create_async_engine(DATABASE_URL, echo=False, poolclass=NullPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        maker = async_sessionmaker(bind=conn, expire_on_commit=False, class_=AsyncSession)
+        async with maker() as session:
+            session.add_all([User(user_id=1, username="u", first_name="U", hashed_password="x"),
+                             Room(room_id=1, name="a"), Room(room_id=2, name="b")])
+            await session.commit()
+        yield maker
+
+
+async def _append(maker, count, room_id=1):
+    async with maker() as session:
+        repo = MessageRepository(session)
+        return [await repo.append(user_id=1, room_id=room_id, message=str(i)) for i in range(count)]
+
+
+def _seqs(replay):
+    return [event.event["seq"] for event in replay.events]
+
+
+@pytest.mark.asyncio
+async def test_append_assigns_gapless_per_room_sequences(maker):
+    first = await _append(maker, 3, room_id=1)
+    second = await _append(maker, 2, room_id=2)
+    assert [m.seq for m in first] == [1, 2, 3]
+    assert [m.seq for m in second] == [1, 2]
+    async with maker() as session:
+        room = await session.get(Room, 1)
+        assert room.last_seq == 3
+        assert [m.seq for m in await MessageRepository(session).get_after_seq(1, 1)] == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reconnects_share_one_seed(maker, monkeypatch):
+    await _append(maker, 10)
+    sync = SyncService(maker, capacity=8, max_replay=5)
+    loads = 0
+    original = sync._load
+
+    async def counting_load(room_id, log):
+        nonlocal loads
+        loads += 1
+        await original(room_id, log)
+
+    monkeypatch.setattr(sync, "_load", counting_load)
+    replays = await asyncio.gather(*(sync.replay(1, 7) for _ in range(50)))
+    assert loads == 1
+    assert all(_seqs(replay) == [8, 9, 10] and replay.source == "memory" for replay in replays)
+
+    # Behind the seeded window: served from the database, or reset if too far behind.
+    replay = await sync.replay(1, 1)
+    assert replay.source == "reset"
+    sync.max_replay = 20
+    replay = await sync.replay(1, 1)
+    assert (replay.source, _seqs(replay)) == ("database", list(range(2, 11)))
+    assert loads == 1
+    assert (sync.metrics.memory, sync.metrics.database, sync.metrics.resets) == (50, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_live_events_are_served_from_memory(maker):
+    sync = SyncService(maker, capacity=8)
+    for message in await _append(maker, 3):
+        sync.record(1, message.seq, EncodedEvent(message_event(message)))
+    replay = await sync.replay(1, 0)
+    assert (replay.source, _seqs(replay)) == ("memory", [1, 2, 3])
+    assert sync.metrics.seeds == 0
+
+    empty = await sync.replay(2, 0)
+    assert (empty.source, empty.events) == ("memory", [])
+    assert sync.metrics.seeds == 1
+
+
+@pytest.mark.asyncio
+async def test_edits_and_deletions_are_replayed(maker):
+    messages = await _append(maker, 3)
+    async with maker() as session:
+        repo = MessageRepository(session)
+        await repo.edit(1, messages[0].message_id, 1, "first edit")
+        await repo.edit(1, messages[1].message_id, 1, "edited")
+        await repo.edit(1, messages[0].message_id, 1, "second edit")
+
+    # Seq 4, the first edit, was superseded by seq 6; the seeded log knows the hole is no gap.
+    sync = SyncService(maker, capacity=8)
+    replay = await sync.replay(1, 3)
+    assert replay.source == "memory"
+    assert [(event.event["type"], event.event["seq"]) for event in replay.events] == [
+        ("message_edited", 5), ("message_edited", 6),
+    ]
+    assert replay.events[-1].event["message"] == "second edit"
+
+    async with maker() as session:
+        deleted = await ModerationRepository(session).soft_delete_messages(1, 0, 10)
+        await session.commit()
+    assert deleted == [(1, 7, sorted(message.message_id for message in messages))]
+    sync = SyncService(maker, capacity=1)
+    replay = await sync.replay(1, 3)
+    assert replay.source == "database"
+    assert [event.event for event in replay.events] == [
+        {"type": "messages_deleted", "seq": 7, "room_id": 1, "message_ids": [str(i) for i in deleted[0][2]]},
+    ]
@@ -0,0 +1,154 @@
+from datetime import timedelta
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+
+from src.core.clock import utcnow
+from src.core.database import Base, get_db
+from src.core.ids import min_id_at
+from src.main import app
+from src.models import (
+    User, UserSession, Room, RoomMember, Message, Attachment, PinnedMessage, Mention, RetentionCheckpoint,
+)
+from src.rooms.models import RoomRole
+from src.retention.service import RetentionScheduler
+
+NOW = utcnow()
+OLD = 40
+
+
+def _message_id(days_ago: int, i: int, room_id: int = 1) -> int:
+    return min_id_at(NOW - timedelta(days=days_ago)) + 100 * room_id + i
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'retention.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def session_maker(engine):
+    maker = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    async with maker() as session:
+        session.add_all([User(user_id=i, username=f"user{i}", first_name="U", hashed_password="x") for i in (1, 2)])
+        session.add_all([Room(room_id=1, name="kept 30 days", retention_days=30), Room(room_id=2, name="forever")])
+        await session.flush()
+        for room_id in (1, 2):
+            session.add_all([Message(message_id=_message_id(OLD, i, room_id), user_id=1, room_id=room_id,
+                                     message=str(i), created_at=NOW - timedelta(days=OLD)) for i in range(10)])
+            session.add(Message(message_id=_message_id(1, 0, room_id), user_id=2, room_id=room_id, message="recent",
+                                reply_to=_message_id(OLD, 0, room_id), created_at=NOW - timedelta(days=1),
+                                updated_at=NOW - timedelta(days=1)))
+        await session.flush()
+        session.add_all([Attachment(message_id=_message_id(OLD, i), url=f"/a/{i}") for i in range(4)])
+        session.add(PinnedMessage(message_id=_message_id(OLD, 1), room_id=1))
+        session.add(Mention(user_id=2, message_id=_message_id(OLD, 2), room_id=1))
+        session.add(UserSession(user_id=1, refresh_token="owner-token"))
+        session.add(RoomMember(user_id=1, room_id=2, role=RoomRole.owner))
+        await session.commit()
+    yield maker
+
+
+async def _count(maker, column, *where):
+    async with maker() as session:
+        return (await session.execute(select(func.count(column)).where(*where))).scalar()
+
+
+@pytest.mark.asyncio
+async def test_purge_is_batched_set_based_and_checkpointed(engine, session_maker):
+    scheduler = RetentionScheduler(session_maker, batch_size=3, pause=0, clock=lambda: NOW)
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    counts = await scheduler.purge_batch(1, NOW - timedelta(days=30))
+    event.remove(engine.sync_engine, "before_cursor_execute", count)
+    # Probe, lock, select, then one statement per table and the checkpoint.
+    assert counts.messages == 3 and counts.attachments == 3 and counts.pins == 1 and counts.mentions == 1
+    assert counts.detached_replies == 1
+    assert len(statements) == 4 + 7
+
+    await scheduler.tick()
+    assert await _count(session_maker, Message.message_id, Message.room_id == 1) == 1
+    assert await _count(session_maker, Message.message_id, Message.room_id == 2) == 11
+    assert await _count(session_maker, Attachment.attachment_id, Attachment.message_id < _message_id(30, 0)) == 0
+    assert await _count(session_maker, PinnedMessage.pin_id) == 0
+    assert await _count(session_maker, Mention.message_id) == 0
+    async with session_maker() as session:
+        recent = (await session.execute(select(Message).where(Message.room_id == 1))).scalar_one()
+        checkpoint = await session.get(RetentionCheckpoint, 1)
+    # Detaching is not an edit.
+    assert recent.reply_to is None and recent.updated_at == NOW - timedelta(days=1)
+    assert (checkpoint.purged_through, checkpoint.messages) == (_message_id(OLD, 9), 10)
+    assert scheduler.metrics.messages == 10 and scheduler.metrics.batches == 4
+    assert scheduler.metrics.caught_up
+
+    assert await scheduler.tick() == 0
+    assert scheduler.metrics.batches == 4
+
+
+@pytest.mark.asyncio
+async def test_serial_ids_expire_by_creation_time(session_maker):
+    async with session_maker() as session:
+        session.add_all([
+            Message(message_id=1, user_id=1, room_id=1, message="old serial", created_at=NOW - timedelta(days=OLD)),
+            Message(message_id=2, user_id=1, room_id=1, message="new serial", created_at=NOW - timedelta(days=1)),
+            Message(message_id=3, user_id=1, room_id=1, message="old again", created_at=NOW - timedelta(days=OLD)),
+        ])
+        await session.commit()
+    scheduler = RetentionScheduler(session_maker, pause=0, clock=lambda: NOW)
+    await scheduler.tick()
+
+    async with session_maker() as session:
+        kept = (await session.execute(select(Message.message).where(Message.message_id < 100)
+                                      .order_by(Message.message_id))).scalars().all()
+        checkpoint = await session.get(RetentionCheckpoint, 1)
+    # The purge stops at the first message that has not expired, and takes it up once it has.
+    assert kept == ["new serial", "old again"]
+    assert checkpoint.purged_through == 1
+
+
+@pytest.mark.asyncio
+async def test_tick_budget_resumes_where_it_stopped(session_maker):
+    async with session_maker() as session:
+        (await session.get(Room, 2)).retention_days = 30
+        await session.commit()
+    scheduler = RetentionScheduler(session_maker, batch_size=4, max_rows=6, pause=0, clock=lambda: NOW)
+
+    await scheduler.tick()
+    assert scheduler.metrics.budget_exhausted == 1 and not scheduler.metrics.caught_up
+    # Attachments, pins and mentions count too: the first batch takes the whole budget.
+    assert await _count(session_maker, Message.message_id) == 22 - 4
+
+    # A new scheduler, as after a restart, goes on from the checkpoints.
+    scheduler = RetentionScheduler(session_maker, batch_size=4, max_rows=1000, pause=0, clock=lambda: NOW)
+    await scheduler.tick()
+    assert scheduler.metrics.caught_up
+    assert await _count(session_maker, Message.message_id) == 2
+
+
+@pytest.mark.asyncio
+async def test_owners_set_retention(session_maker):
+    async def override_db():
+        async with session_maker() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_db
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": "Bearer owner-token"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+        response = await client.put("/rooms/2/retention", json={"retention_days": 7})
+        assert response.status_code == 200 and response.json()["retention_days"] == 7
+        assert (await client.put("/rooms/2/retention", json={"retention_days": 0})).status_code == 422
+        assert (await client.put("/rooms/1/retention", json={"retention_days": 7})).status_code == 404
+        assert (await client.put("/rooms/2/retention", json={})).json()["retention_days"] is None
+    app.dependency_overrides.clear()
@@ -0,0 +1,321 @@
+from datetime import timedelta
+import asyncio
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.activity.service import ActivityAggregator
+from src.chat.repository import MessageRepository
+from src.core.broker import InMemoryBroker
+from src.core.clock import utcnow
+from src.core.database import Base, get_db
+from src.core.sharding import ShardMap, jump_hash
+from src.main import app
+from src.moderation.service import ModerationService
+from src.models import (
+    User, UserSession, Room, RoomMember, RoomShard, JoinLink, Message, Attachment, PinnedMessage, Mention,
+    MessageRevision, PendingNotification, SiteActivityDaily,
+)
+from src.notifications.service import NotificationService
+from src.notifications.sinks import InMemorySink
+from src.rooms import router as rooms_router
+from src.rooms import sharding
+from src.rooms.sharding import RoomRebalancer, ShardedRoomStore, load_placements
+
+
+@pytest_asyncio.fixture
+async def shard_map(tmp_path):
+    engines = {}
+    for name in ("a", "b", "c"):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / name}.db", connect_args={"timeout": 30})
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(User.__table__.insert(), [
+                {"user_id": 1, "username": "alice", "first_name": "A", "hashed_password": "x"},
+                {"user_id": 2, "username": "bob", "first_name": "B", "hashed_password": "x"},
+            ])
+        engines[name] = engine
+    shard_map = ShardMap(engines, broker=InMemoryBroker())
+    yield shard_map
+    await shard_map.dispose()
+
+
+@pytest_asyncio.fixture
+async def directory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'directory'}.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    await engine.dispose()
+
+
+async def _create_room(shard_map, room_id, messages=0):
+    async with shard_map.room_session(room_id, write=True) as session:
+        session.add(Room(room_id=room_id, name=f"room{room_id}"))
+        session.add(JoinLink(link_id=room_id, code=f"code{room_id}", room_id=room_id, user_id=1))
+        session.add(RoomMember(room_id=room_id, user_id=1, link_id=room_id))
+        session.add_all([
+            Message(message_id=room_id * 10_000 + i, room_id=room_id, user_id=1, message=f"m{i}")
+            for i in range(messages)
+        ])
+        await session.flush()
+        if messages:
+            first = room_id * 10_000
+            session.add(Attachment(message_id=first, url="/a"))
+            session.add(PinnedMessage(message_id=first, room_id=room_id))
+            session.add(Mention(user_id=2, message_id=first, room_id=room_id))
+            session.add(MessageRevision(message_id=first, revision=0, content=b"m", created_at=utcnow()))
+        await session.commit()
+
+
+async def _count(shard_map, shard, model, **filters):
+    async with shard_map.session(shard) as session:
+        pk = model.__mapper__.primary_key[0]
+        return (await session.execute(select(func.count(pk)).filter_by(**filters))).scalar()
+
+
+def test_jump_hash_is_stable_and_balanced():
+    counts = [0] * 3
+    for key in range(3000):
+        counts[jump_hash(key, 3)] += 1
+    assert all(900 < count < 1100 for count in counts)
+    moved = sum(jump_hash(key, 3) != jump_hash(key, 4) for key in range(3000))
+    assert moved < 3000 * 0.35
+
+
+@pytest.mark.asyncio
+async def test_room_data_lives_on_one_shard_and_user_rooms_scatter(shard_map):
+    for room_id in range(1, 10):
+        await _create_room(shard_map, room_id, messages=2)
+
+    for room_id in range(1, 10):
+        shard = shard_map.shard_for(room_id)
+        assert await _count(shard_map, shard, Message, room_id=room_id) == 2
+        assert await _count(shard_map, shard, RoomMember, room_id=room_id) == 1
+    assert len({shard_map.shard_for(room_id) for room_id in range(1, 10)}) > 1
+
+    store = ShardedRoomStore(shard_map)
+    rooms = await store.user_rooms(1, max_concurrency=2)
+    assert sorted(member.room_id for member in rooms) == list(range(1, 10))
+
+    async with store.repository(MessageRepository, 3) as repo:
+        assert await repo.count(room_id=3) == 2
+
+
+@pytest.mark.asyncio
+async def test_move_room_while_writing(shard_map):
+    room_id = 1
+    await _create_room(shard_map, room_id, messages=500)
+    source = shard_map.shard_for(room_id)
+    target = next(name for name in shard_map.names if name != source)
+    rebalancer = RoomRebalancer(shard_map, batch_size=50, freeze_grace=0, purge_delay=0)
+
+    written = []
+
+    async def writer():
+        for i in range(500, 600):
+            async with shard_map.room_session(room_id, write=True) as session:
+                session.add(Message(message_id=room_id * 10_000 + i, room_id=room_id, user_id=2, message="live"))
+                await session.commit()
+            written.append(i)
+            await asyncio.sleep(0)
+
+    report, _ = await asyncio.gather(rebalancer.move_room(room_id, target), writer())
+
+    assert shard_map.shard_for(room_id) == target
+    assert len(written) == 100
+    assert await _count(shard_map, target, Message, room_id=room_id) == 600
+    assert await _count(shard_map, target, Attachment) == 1
+    assert await _count(shard_map, target, PinnedMessage, room_id=room_id) == 1
+    assert await _count(shard_map, target, RoomMember, room_id=room_id) == 1
+    assert await _count(shard_map, target, JoinLink, room_id=room_id) == 1
+    assert await _count(shard_map, target, Mention, room_id=room_id) == 1
+    assert await _count(shard_map, target, MessageRevision) == 1
+    assert await _count(shard_map, source, Message, room_id=room_id) == 0
+    assert await _count(shard_map, source, Mention) == 0
+    assert await _count(shard_map, source, MessageRevision) == 0
+    assert await _count(shard_map, source, RoomMember, room_id=room_id) == 0
+    assert report.copied["messages"] >= 500
+
+    async with shard_map.session(target) as session:
+        member = (await session.execute(select(RoomMember))).scalar_one()
+        link = (await session.execute(select(JoinLink))).scalar_one()
+    assert member.link_id == link.link_id
+
+
+@pytest.mark.asyncio
+async def test_move_room_freezes_writers_of_other_workers(shard_map, directory):
+    room_id = 1
+    await _create_room(shard_map, room_id, messages=100)
+    source = shard_map.shard_for(room_id)
+    target = next(name for name in shard_map.names if name != source)
+    # A second worker: same shards and broker, its own in-process state.
+    other = ShardMap(shard_map.engines, broker=shard_map.broker)
+    await shard_map.start()
+    await other.start()
+    rebalancer = RoomRebalancer(shard_map, directory, batch_size=20, freeze_grace=0.05, purge_delay=0)
+
+    written = []
+
+    async def writer():
+        for i in range(100, 150):
+            async with other.room_session(room_id, write=True) as session:
+                session.add(Message(message_id=room_id * 10_000 + i, room_id=room_id, user_id=2, message="live"))
+                await session.commit()
+            written.append(i)
+            await asyncio.sleep(0)
+
+    try:
+        await asyncio.gather(rebalancer.move_room(room_id, target), writer())
+    finally:
+        await other.dispose()
+
+    assert other.shard_for(room_id) == target
+    assert len(written) == 50
+    assert await _count(shard_map, target, Message, room_id=room_id) == 150
+    assert await _count(shard_map, source, Message, room_id=room_id) == 0
+
+    async with directory() as session:
+        placement = (await session.execute(select(RoomShard))).scalar_one()
+    assert (placement.shard, placement.frozen) == (target, False)
+
+
+@pytest.mark.asyncio
+async def test_worker_starting_during_a_move_honours_the_freeze(shard_map, directory):
+    async with directory() as session:
+        session.add(RoomShard(room_id=1, shard="b", frozen=True))
+        await session.commit()
+    await load_placements(directory, shard_map)
+    assert shard_map.shard_for(1) == "b"
+
+    async def write():
+        async with shard_map.room_session(1, write=True):
+            pass
+
+    blocked = asyncio.create_task(write())
+    await asyncio.sleep(0.05)
+    assert not blocked.done()
+
+    shard_map.handle_message({"room_id": 1, "shard": "c", "frozen": False})
+    await asyncio.wait_for(blocked, 1)
+    assert shard_map.shard_for(1) == "c"
+
+
+@pytest.mark.asyncio
+async def test_direct_messages_live_on_the_room_shard(shard_map, directory, monkeypatch):
+    async with directory() as session:
+        session.add_all([User(user_id=1, username="alice", first_name="A", hashed_password="x"),
+                         User(user_id=2, username="bob", first_name="B", hashed_password="x")])
+        await session.flush()
+        session.add(UserSession(user_id=1, refresh_token="alice-token"))
+        await session.commit()
+
+    async def override_db():
+        async with directory() as session:
+            yield session
+
+    monkeypatch.setattr(rooms_router, "get_shard_map", lambda: shard_map)
+    app.dependency_overrides[get_db] = override_db
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test",
+                                     headers={"Authorization": "Bearer alice-token"}) as client:
+            created = await client.put("/dms/2")
+            assert created.status_code == 201
+            room_id = created.json()["room_id"]
+            shard = shard_map.shard_for(room_id)
+            assert await _count(shard_map, shard, RoomMember, room_id=room_id) == 2
+            async with directory() as session:
+                assert (await session.execute(select(func.count(RoomMember.member_id)))).scalar() == 0
+            # What the WebSocket subscribes the users to.
+            rooms = await ShardedRoomStore(shard_map).user_rooms(2)
+            assert [member.room_id for member in rooms] == [room_id]
+
+            async with shard_map.room_session(room_id, write=True) as session:
+                message = await MessageRepository(session).append(user_id=2, room_id=room_id, message="hi")
+            again = await client.put("/dms/2")
+            assert again.status_code == 200
+            assert again.json()["last_message_id"] == str(message.message_id)
+            listing = (await client.get("/dms")).json()
+            assert [(dm["room_id"], dm["user_id"], dm["last_message_id"]) for dm in listing] == [
+                (room_id, 2, str(message.message_id)),
+            ]
+            assert await _count(shard_map, shard, RoomMember, room_id=room_id) == 2
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_rebalance_command_moves_a_room(shard_map, directory, monkeypatch, capsys):
+    await _create_room(shard_map, 1, messages=10)
+    source = shard_map.shard_for(1)
+    target = next(name for name in shard_map.names if name != source)
+    monkeypatch.setattr(sharding, "get_shard_map", lambda: shard_map)
+    monkeypatch.setattr(sharding, "get_async_session_maker", lambda: directory)
+
+    report = await sharding.rebalance(["1", target, "--freeze-grace", "0", "--purge-delay", "0"])
+
+    assert (report.source, report.target) == (source, target)
+    assert f"room 1: {source} -> {target}" in capsys.readouterr().out
+    assert await _count(shard_map, target, Message, room_id=1) == 10
+    assert await _count(shard_map, source, Message, room_id=1) == 0
+    async with directory() as session:
+        assert (await session.execute(select(RoomShard.shard))).scalar_one() == target
+
+
+@pytest.mark.asyncio
+async def test_background_services_skip_the_copies_a_move_leaves(shard_map, directory):
+    room_id = 1
+    source = shard_map.shard_for(room_id)
+    target = next(name for name in shard_map.names if name != source)
+    now = [utcnow()]
+    activity = ActivityAggregator(directory, clock=lambda: now[0], shard_map=shard_map)
+    notifications = NotificationService(directory, [InMemorySink()], clock=lambda: now[0], shard_map=shard_map)
+    # Notification cursors start at the current time.
+    assert await notifications.fan_out_once() == 0
+
+    await _create_room(shard_map, room_id)
+    async with shard_map.room_session(room_id, write=True) as session:
+        session.add(RoomMember(room_id=room_id, user_id=2))
+        await session.commit()
+
+    async def send(text):
+        async with shard_map.room_session(room_id, write=True) as session:
+            await MessageRepository(session).append(user_id=1, room_id=room_id, message=text)
+
+    async def counted():
+        now[0] = utcnow() + timedelta(minutes=1)
+        await activity.aggregate_once()
+        await notifications.fan_out_once()
+        async with directory() as session:
+            site = (await session.execute(select(SiteActivityDaily))).scalar_one()
+            pending = (await session.execute(select(PendingNotification))).scalar_one()
+        return site.messages, site.joins, pending.messages
+
+    await send("before")
+    await send("the move")
+    assert await counted() == (2, 2, 2)
+
+    await RoomRebalancer(shard_map, directory, freeze_grace=0, purge_delay=0).move_room(room_id, target)
+    assert await counted() == (2, 2, 2)
+
+    await send("after")
+    assert await counted() == (3, 2, 3)
+
+
+@pytest.mark.asyncio
+async def test_user_purge_reaches_every_shard(shard_map, directory):
+    rooms = range(1, 7)
+    for room_id in rooms:
+        await _create_room(shard_map, room_id, messages=3)
+    assert len({shard_map.shard_for(room_id) for room_id in rooms}) > 1
+
+    result = await ModerationService(directory, pause=0, shard_map=shard_map).purge_user(1)
+
+    assert (result.messages, result.memberships) == (18, 6)
+    for shard in shard_map.names:
+        assert await _count(shard_map, shard, Message, is_deleted=False) == 0
+        assert await _count(shard_map, shard, RoomMember, user_id=1) == 0
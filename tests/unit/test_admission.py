@@ -0,0 +1,106 @@
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+
+from src.core.admission import AdmissionController, CheckoutTimer, Overloaded, Priority, admit, set_admission
+from src.main import app as main_app
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_low_priority_is_shed_first_as_pressure_rises():
+    controller = AdmissionController(initial_limit=10, loop_lag_target=0.05, pool_wait_target=0.1)
+    assert [controller.try_acquire(Priority.LOW) for _ in range(6)] == [0] * 5 + [1]
+    assert [controller.try_acquire(Priority.NORMAL) for _ in range(4)] == [0, 0, 0, 1]
+    assert [controller.try_acquire(Priority.HIGH) for _ in range(3)] == [0, 0, 1]
+    for _ in range(controller.in_flight):
+        controller.release()
+
+    controller.tick(loop_lag=0.075)
+    assert controller.try_acquire(Priority.LOW) > 0
+    assert controller.try_acquire(Priority.NORMAL) == 0
+    controller.checkouts._total, controller.checkouts._count = 0.5, 1
+    controller.tick(loop_lag=0.0)
+    assert controller.pressure == pytest.approx(5.0)
+    assert controller.try_acquire(Priority.NORMAL) > 0
+    assert controller.try_acquire(Priority.HIGH) == 0
+    assert controller.metrics.shed == {"low": 2, "normal": 2, "high": 1}
+
+
+def test_limit_shrinks_under_pressure_and_grows_back_when_used():
+    controller = AdmissionController(initial_limit=64, min_limit=8, max_limit=80, increase=8)
+    controller.tick(loop_lag=0.15)
+    assert controller.limit == 32
+    controller.tick(loop_lag=1.0)
+    controller.tick(loop_lag=1.0)
+    assert controller.limit == 8
+
+    controller.tick(loop_lag=0.0)
+    assert controller.limit == 8
+    for _ in range(4):
+        controller.try_acquire(Priority.LOW)
+    controller.tick(loop_lag=0.0)
+    assert controller.limit == 16
+    assert controller.metrics.decreases == 3 and controller.metrics.increases == 1
+
+
+def test_checkout_timer_counts_waits_still_in_progress():
+    clock = FakeClock()
+    timer = CheckoutTimer(clock)
+    token = timer.begin()
+    clock.now += 0.2
+    timer.end(token)
+    assert timer.sample() == pytest.approx(0.2)
+    assert timer.sample() == 0.0
+    timer.begin()
+    clock.now += 3.0
+    assert timer.sample() == pytest.approx(3.0)
+
+
+@pytest.mark.asyncio
+async def test_slot_and_dependency_refuse_with_retry_after():
+    controller = AdmissionController(initial_limit=2)
+    async with controller.slot(Priority.HIGH):
+        async with controller.slot(Priority.HIGH):
+            with pytest.raises(Overloaded):
+                async with controller.slot(Priority.HIGH):
+                    pass
+    assert controller.in_flight == 0
+
+    set_admission(controller)
+    app = FastAPI()
+
+    @app.get("/history", dependencies=[Depends(admit(Priority.LOW))])
+    async def history():
+        return {"in_flight": controller.in_flight}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        assert (await client.get("/history")).json() == {"in_flight": 1}
+        controller.tick(loop_lag=0.2)
+        response = await client.get("/history")
+        assert response.status_code == 503 and response.headers["Retry-After"] == "2"
+
+        transport = httpx.ASGITransport(app=main_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as probe:
+            live = await probe.get("/health/live")
+            assert live.status_code == 200 and live.json()["loop_lag_seconds"] == 0.2
+            # One slow sample does not take the worker out of rotation, sustained overload does.
+            assert (await probe.get("/health/ready")).status_code == 200
+            for _ in range(5):
+                controller.tick(loop_lag=0.2)
+            ready = await probe.get("/health/ready")
+            assert ready.status_code == 503 and ready.json()["status"] == "overloaded"
+            assert ready.json()["shed_low"] == 1
+            controller.tick(loop_lag=0.06)
+            assert (await probe.get("/health/ready")).status_code == 503
+            controller.tick(loop_lag=0.0)
+            assert (await probe.get("/health/ready")).status_code == 200
+    assert controller.in_flight == 0
+    set_admission(None)
@@ -0,0 +1,28 @@
+from benchmarks.compare import compare, mismatch
+from benchmarks.results import Measurement, Results
+
+
+def _results(database="sqlite", **p50s):
+    results = Results(database=database, scale="tiny")
+    for name, p50 in p50s.items():
+        results.measurements[name] = Measurement.from_samples([p50 / 1000] * 10)
+    return results.to_dict()
+
+
+def test_measurement_percentiles_and_throughput():
+    measurement = Measurement.from_samples([i / 1000 for i in range(1, 101)], elapsed=0.5, errors=2)
+    assert measurement.count == 100
+    assert measurement.p50_ms == 51 and measurement.p99_ms == 99
+    assert measurement.ops_per_sec == 200
+    assert measurement.extra == {"errors": 2}
+    assert Measurement.from_samples([]).count == 0
+
+
+def test_compare_flags_only_changes_beyond_threshold():
+    base = _results(fast=1.0, steady=2.0, gone=1.0)
+    head = _results(fast=1.5, steady=2.1, new=1.0)
+    changes = {change.name: change for change in compare(base, head, threshold=0.1)}
+    assert set(changes) == {"fast", "steady"}
+    assert changes["fast"].regressed and not changes["steady"].regressed
+    assert mismatch(base, head) is None
+    assert "database" in mismatch(base, _results(database="postgresql", fast=1.0))
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from src.chat.framing import CODECS, JSON, SAMPLE_EVENT, DeflateCodec, EncodedEvent, negotiate
+from src.chat.hub import Connection, ConnectionHub
+from src.core.broker import InMemoryBroker
+
+EVENT = {**SAMPLE_EVENT, "message_id": 123456789012345, "message": "hello there", "user_id": 7}
+
+
+def test_codecs_round_trip_and_shrink_frames():
+    sizes = {}
+    for subprotocol, codec in CODECS.items():
+        frame = codec.frame(EVENT)
+        data = frame["bytes"] if codec.binary else frame["text"].encode()
+        assert codec.decode(data) == EVENT
+        sizes[subprotocol] = len(data)
+    assert sizes["murmur.v1.json.deflate"] < sizes["murmur.v1.json"] / 2
+    if "murmur.v1.msgpack" in CODECS:
+        assert sizes["murmur.v1.msgpack"] < sizes["murmur.v1.json"]
+
+    with pytest.raises(ValueError):
+        CODECS["murmur.v1.json.deflate"].decode(b"not deflate")
+
+
+def test_negotiate_prefers_client_order():
+    assert negotiate(["chat", "murmur.v1.json.deflate", "murmur.v1.json"]) == (
+        CODECS["murmur.v1.json.deflate"], "murmur.v1.json.deflate")
+    assert negotiate([]) == (JSON, None)
+    assert isinstance(CODECS["murmur.v1.json.deflate"], DeflateCodec)
+
+
+def test_encoded_event_encodes_once_per_codec():
+    encoded = EncodedEvent(EVENT)
+    assert encoded.frame(JSON) is encoded.frame(JSON)
+    assert encoded.encodings == 1
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed = None
+
+    async def send(self, frame):
+        self.sent.append(frame)
+
+    async def close(self, code):
+        self.closed = code
+
+
+@pytest.mark.asyncio
+async def test_hub_fans_out_shared_frames_and_drops_slow_connections():
+    hub = ConnectionHub(InMemoryBroker())
+    deflate = CODECS["murmur.v1.json.deflate"]
+    connections = [Connection(FakeWebSocket(), i, JSON if i % 2 else deflate, max_queue=2) for i in range(10)]
+    for connection in connections:
+        hub.register(connection, [1])
+    slow = Connection(FakeWebSocket(), 99, JSON, max_queue=1)
+    hub.register(slow, [1, 2])
+
+    assert await hub.deliver(1, EVENT) == 11
+    assert await hub.deliver(1, EVENT) == 10
+    assert hub.metrics.encodings == 4
+    assert hub.metrics.dropped == 1
+    assert hub.connection_count(1) == 10 and hub.connection_count(2) == 0
+    assert connections[1].queue.get_nowait() is connections[3].queue.get_nowait()
+
+    await slow.writer()
+    # The close sentinel displaced the queued frame of the full queue.
+    assert slow.websocket.closed == 1013
+    assert slow.websocket.sent == []
+
+    await hub.start()
+    await hub.publish(1, {"type": "ping"})
+    await asyncio.sleep(0)
+    await hub.stop()
+    assert hub.metrics.broadcasts == 3
@@ -0,0 +1,31 @@
+import pytest
+
+from src.activity.hll import HyperLogLog
+
+
+@pytest.mark.parametrize("n", [10, 1_000, 50_000])
+def test_count_is_within_a_few_percent(n):
+    sketch = HyperLogLog()
+    sketch.update(range(n))
+    sketch.update(range(n))
+    assert abs(sketch.count() - n) <= max(1, 0.1 * n)
+
+
+def test_merge_counts_the_union_once():
+    monday, tuesday = HyperLogLog(), HyperLogLog()
+    monday.update(range(0, 3000))
+    tuesday.update(range(2000, 5000))
+    merged = HyperLogLog.union([monday.to_bytes(), None, tuesday.to_bytes()])
+    assert abs(merged.count() - 5000) <= 500
+
+    with pytest.raises(ValueError):
+        monday.merge(HyperLogLog(precision=12))
+
+
+def test_serialization_round_trips_and_is_small_when_sparse():
+    sketch = HyperLogLog()
+    sketch.update([1, 2, 3])
+    data = sketch.to_bytes()
+    assert len(data) < 64
+    assert HyperLogLog.from_bytes(data).registers == sketch.registers
+    assert HyperLogLog.from_bytes(data).count() == 3
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from starlette.requests import Request
+
+from src.core.http_cache import ResponseCache, Validators, http_date, is_not_modified, make_etag
+
+
+def _request(**headers):
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "headers": raw})
+
+
+def test_conditional_headers():
+    modified = datetime(2025, 3, 1, 10, 0, 0, 500_000)
+    validators = Validators(make_etag("room", 1, modified), modified)
+    assert validators.etag == make_etag("room", 1, modified) != make_etag("room", 1, datetime(2025, 3, 1))
+    assert validators.headers()["Last-Modified"] == "Sat, 01 Mar 2025 10:00:00 GMT"
+
+    assert is_not_modified(_request(if_none_match=validators.etag), validators)
+    assert is_not_modified(_request(if_none_match=f'"other", {validators.etag[2:]}'), validators)
+    assert is_not_modified(_request(if_none_match="*"), validators)
+    assert not is_not_modified(_request(if_none_match='W/"other"'), validators)
+    assert not is_not_modified(_request(), validators)
+
+    assert is_not_modified(_request(if_modified_since=http_date(modified)), validators)
+    assert not is_not_modified(_request(if_modified_since="Sat, 01 Mar 2025 09:59:59 GMT"), validators)
+    assert not is_not_modified(_request(if_modified_since="garbage"), validators)
+    # If-None-Match takes precedence over If-Modified-Since.
+    assert not is_not_modified(_request(if_none_match='W/"x"', if_modified_since=http_date(modified)), validators)
+
+
+def test_response_cache_is_bounded_by_size_and_keeps_latest_version():
+    cache = ResponseCache(max_bytes=100, max_entry_bytes=60)
+    cache.put("a", "v1", b"x" * 40)
+    assert cache.get("a", "v1") == b"x" * 40
+    assert cache.get("a", "v0") is None
+
+    cache.put("a", "v2", b"y" * 40)
+    assert cache.get("a", "v1") is None
+    assert cache.size == 40
+
+    cache.put("b", "v1", b"z" * 40)
+    cache.get("a", "v2")
+    cache.put("c", "v1", b"w" * 40)
+    assert cache.get("b", "v1") is None
+    assert cache.get("a", "v2") is not None
+    assert cache.size == 80 and len(cache) == 2
+
+    cache.put("big", "v1", b"x" * 61)
+    assert cache.get("big", "v1") is None
+    assert (cache.hits, cache.misses) == (3, 4)
@@ -0,0 +1,27 @@
+import time
+
+from src.chat.mentions import MAX_MENTIONS, UsernameCache, parse_mentions
+
+
+def test_parse_mentions():
+    assert parse_mentions("hi @alice and @bob_2, @alice again, mail x@example.com, @@no") == ["alice", "bob_2"]
+    assert parse_mentions("no mentions here") == []
+    assert parse_mentions(None) == []
+    assert len(parse_mentions(" ".join(f"@user{i}" for i in range(200)))) == MAX_MENTIONS
+
+
+def test_username_cache_expiry_and_eviction(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = UsernameCache(maxsize=2, ttl=60, negative_ttl=5)
+    cache.put("alice", 1)
+    cache.put("ghost", None)
+    assert cache.lookup(["alice", "ghost", "bob"]) == ({"alice": 1, "ghost": None}, ["bob"])
+
+    now[0] += 10
+    assert cache.lookup(["alice", "ghost"]) == ({"alice": 1}, ["ghost"])
+
+    cache.put("bob", 2)
+    cache.put("carol", 3)
+    assert len(cache) == 2
+    assert cache.lookup(["alice", "bob", "carol"]) == ({"bob": 2, "carol": 3}, ["alice"])
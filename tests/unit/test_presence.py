@@ -0,0 +1,178 @@
+import asyncio
+
+import pytest
+
+from src.core.broker import InMemoryBroker
+from src.core.timing_wheel import TimingWheel
+from src.presence.service import PresenceService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_timing_wheel_expires_in_order():
+    wheel = TimingWheel(tick=1.0, slots=8, start=0.0)
+    wheel.schedule("a", 2.5)
+    wheel.schedule("b", 5.0)
+    wheel.schedule("far", 20.0)
+
+    assert wheel.advance(1.0) == []
+    assert wheel.advance(3.0) == ["a"]
+    assert wheel.advance(6.0) == ["b"]
+    assert len(wheel) == 1
+    assert wheel.advance(100.0) == ["far"]
+    assert len(wheel) == 0
+
+
+def test_heartbeat_renews_and_expires():
+    clock = FakeClock()
+    presence = PresenceService(InMemoryBroker(), ttl=10.0, clock=clock)
+    presence.heartbeat(1)
+    presence.heartbeat(2)
+
+    clock.now += 8
+    presence.heartbeat(1)
+    clock.now += 4
+    assert presence.expire() == [2]
+    assert presence.is_online(1) and not presence.is_online(2)
+
+    clock.now += 10
+    assert presence.expire() == [1]
+    assert len(presence) == 0
+
+
+@pytest.mark.asyncio
+async def test_typing_is_coalesced_per_room():
+    clock = FakeClock()
+    broker = InMemoryBroker()
+    subscription = broker.subscribe(PresenceService.TYPING_CHANNEL)
+    presence = PresenceService(broker, typing_ttl=3.0, clock=clock)
+
+    for _ in range(100):
+        presence.typing(1, 10)
+        presence.typing(1, 11)
+    presence.typing(2, 10)
+    assert await presence.flush_typing() == 2
+    assert await presence.flush_typing() == 0
+
+    events = [subscription.queue.get_nowait() for _ in range(2)]
+    assert sorted(events, key=lambda e: e["room_id"]) == [
+        {"origin": presence.origin, "room_id": 1, "typing": [10, 11]},
+        {"origin": presence.origin, "room_id": 2, "typing": [10]},
+    ]
+
+    clock.now += 5
+    assert await presence.flush_typing() == 2
+    assert subscription.queue.get_nowait()["typing"] == []
+
+
+@pytest.mark.asyncio
+async def test_presence_syncs_between_workers():
+    broker = InMemoryBroker()
+    clock = FakeClock()
+    first = PresenceService(broker, ttl=10.0, typing_interval=3600, clock=clock)
+    second = PresenceService(broker, ttl=10.0, typing_interval=3600, clock=clock)
+    delivered = []
+
+    async def broadcast(room_id, event):
+        delivered.append((room_id, event["typing"]))
+
+    second.broadcast = broadcast
+    await first.start()
+    await second.start()
+    try:
+        first.heartbeat(7)
+        first.typing(3, 7)
+        await first.flush_presence()
+        await first.flush_typing()
+        await asyncio.sleep(0)
+        assert second.is_online(7)
+        assert second.filter_online([7, 8]) == {7}
+        assert delivered == [(3, [7])]
+
+        first.disconnect(7)
+        await first.flush_presence()
+        await asyncio.sleep(0)
+        assert not second.is_online(7)
+
+        first.heartbeat(9)
+        await first.flush_presence()
+        await asyncio.sleep(0)
+        clock.now += 11
+        second.expire()
+        assert not second.is_online(9)
+    finally:
+        await first.stop()
+        await second.stop()
+
+
+@pytest.mark.asyncio
+async def test_new_worker_is_sent_a_snapshot():
+    broker = InMemoryBroker()
+    clock = FakeClock()
+    first = PresenceService(broker, ttl=10.0, typing_interval=3600, clock=clock)
+    second = PresenceService(broker, ttl=10.0, typing_interval=3600, clock=clock)
+    await first.start()
+    try:
+        first.heartbeat(7)
+        await first.flush_presence()
+        await second.start()
+        await asyncio.sleep(0)
+        assert not second.is_online(7)
+
+        await first.flush_presence()
+        await asyncio.sleep(0)
+        assert second.is_online(7)
+    finally:
+        await first.stop()
+        await second.stop()
+
+
+@pytest.mark.asyncio
+async def test_typing_is_merged_across_workers():
+    broker = InMemoryBroker()
+    clock = FakeClock()
+    first = PresenceService(broker, typing_interval=3600, clock=clock)
+    second = PresenceService(broker, typing_interval=3600, clock=clock)
+    delivered = []
+
+    async def broadcast(room_id, event):
+        delivered.append((room_id, event["typing"]))
+
+    first.broadcast = broadcast
+    await first.start()
+    await second.start()
+    try:
+        first.typing(3, 7)
+        second.typing(3, 8)
+        await first.flush_typing()
+        await second.flush_typing()
+        await asyncio.sleep(0)
+        assert delivered == [(3, [7]), (3, [7, 8])]
+
+        second.stop_typing(3, 8)
+        await second.flush_typing()
+        await asyncio.sleep(0)
+        assert delivered[-1] == (3, [7])
+    finally:
+        await first.stop()
+        await second.stop()
+
+
+def test_user_stays_online_until_the_last_socket_closes():
+    presence = PresenceService(InMemoryBroker(), clock=FakeClock())
+    presence.connect(1)
+    presence.connect(1)
+    presence.disconnect(1)
+    assert presence.is_online(1)
+    presence.disconnect(1)
+    assert not presence.is_online(1)
+
+    presence.connect(1)
+    presence.disconnect(1)
+    assert not presence.is_online(1)
@@ -0,0 +1,92 @@
+import pytest
+import httpx
+from fastapi import Depends, FastAPI
+
+from src.core.ratelimit import (
+    InMemorySharedBackend,
+    LocalRateLimitBackend,
+    RateLimit,
+    RateLimiter,
+    rate_limit,
+    set_rate_limiter,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+POLICY = RateLimit("test", limit=5, period=10.0)
+
+
+@pytest.mark.parametrize("backend_class", [LocalRateLimitBackend, InMemorySharedBackend])
+@pytest.mark.asyncio
+async def test_burst_then_refill(backend_class):
+    clock = FakeClock()
+    backend = backend_class(clock=clock)
+
+    assert [await backend.hit("k", POLICY) for _ in range(5)] == [0.0] * 5
+    retry_after = await backend.hit("k", POLICY)
+    assert retry_after == pytest.approx(2.0)
+    assert await backend.hit("other", POLICY) == 0.0
+
+    clock.now += 2.0
+    assert await backend.hit("k", POLICY) == 0.0
+    assert await backend.hit("k", POLICY) > 0
+
+
+@pytest.mark.parametrize("backend_class", [LocalRateLimitBackend, InMemorySharedBackend])
+@pytest.mark.asyncio
+async def test_peek_does_not_take_a_cell(backend_class):
+    clock = FakeClock()
+    backend = backend_class(clock=clock)
+
+    assert await backend.peek("k", POLICY) == 0.0
+    for _ in range(5):
+        assert await backend.peek("k", POLICY) == 0.0
+        await backend.hit("k", POLICY)
+    assert await backend.peek("k", POLICY) == pytest.approx(2.0)
+    assert await backend.hit("k", POLICY) == pytest.approx(2.0)
+
+
+def test_idle_keys_are_evicted():
+    clock = FakeClock()
+    backend = LocalRateLimitBackend(shards=4, max_keys_per_shard=100, sweep_every=10, clock=clock)
+    for i in range(1000):
+        backend.check(i, POLICY)
+    assert len(backend) <= 400
+
+    clock.now += POLICY.period
+    for i in range(1000, 1100):
+        backend.check(i, POLICY)
+    assert len(backend) <= 100
+
+
+def test_shards_must_be_power_of_two():
+    with pytest.raises(ValueError):
+        LocalRateLimitBackend(shards=3)
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_dependency_returns_429():
+    set_rate_limiter(RateLimiter(LocalRateLimitBackend()))
+    app = FastAPI()
+
+    @app.get("/rooms/{room_id}/ping", dependencies=[Depends(rate_limit(RateLimit("ping", 2, 60.0), key="room"))])
+    async def ping(room_id: int):
+        return {"ok": True}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        statuses = [(await client.get("/rooms/1/ping")).status_code for _ in range(3)]
+        other_room = await client.get("/rooms/2/ping")
+        limited = await client.get("/rooms/1/ping")
+
+    assert statuses == [200, 200, 429]
+    assert other_room.status_code == 200
+    assert int(limited.headers["Retry-After"]) >= 1
+    set_rate_limiter(None)
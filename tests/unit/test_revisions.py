@@ -0,0 +1,29 @@
+import json
+
+from src.chat.revisions import SNAPSHOT_EVERY, apply_delta, encode, is_snapshot, make_delta, rebuild
+
+
+def test_delta_round_trips_and_is_compact():
+    base = "The quick brown fox jumps over the lazy dog. " * 80
+    target = base.replace("lazy", "sleepy", 1) + "!"
+    delta = make_delta(base, target)
+    assert apply_delta(base, delta) == target
+    content, snapshot = encode(base, target)
+    assert not snapshot and len(content) < 32
+    assert apply_delta(target, make_delta(target, "")) == ""
+    assert apply_delta("", make_delta("", "new")) == "new"
+
+
+def test_rewrites_and_snapshots_store_the_full_text():
+    content, snapshot = encode("hello there", "something else entirely")
+    assert snapshot and json.loads(content) == "something else entirely"
+    assert encode("a" * 100, "a" * 101, snapshot=True)[1]
+    assert [r for r in range(3 * SNAPSHOT_EVERY) if is_snapshot(r)] == [
+        SNAPSHOT_EVERY - 1, 2 * SNAPSHOT_EVERY - 1, 3 * SNAPSHOT_EVERY - 1,
+    ]
+
+
+def test_rebuild_walks_back_from_the_current_text():
+    versions = ["v0 text", "v1 text!", "v1 text! more"]
+    stored = [encode(versions[r + 1], versions[r]) for r in range(2)]
+    assert rebuild(versions[2], reversed(stored)) == ["v1 text!", "v0 text"]
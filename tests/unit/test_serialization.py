@@ -0,0 +1,65 @@
+import json
+from datetime import datetime
+
+from src.auth.schemas import USER_LIST
+from src.chat.schemas import MESSAGE_LIST, message_event
+from src.core.serialization import FastJSONResponse, RowEncoder
+from src.models import Message, User
+
+
+def test_encoders_match_schema_from_orm_objects():
+    user = User(user_id=1, username="u", first_name="U", hashed_password="secret", email="u@example.com")
+    assert json.loads(USER_LIST.encode([user])) == [
+        {"user_id": 1, "username": "u", "first_name": "U", "family_name": None, "avatar_url": None}
+    ]
+
+    created = datetime(2025, 5, 1, 12, 30)
+    message = Message(message_id=7, user_id=1, room_id=2, message="hi", is_deleted=False,
+                      created_at=created, updated_at=created, reply_count=0)
+    assert json.loads(MESSAGE_LIST.encode([message]))[0] == {
+        "message_id": "7", "user_id": 1, "room_id": 2, "reply_to": None, "seq": None, "message": "hi",
+        "is_deleted": False, "created_at": "2025-05-01T12:30:00", "updated_at": "2025-05-01T12:30:00",
+        "reply_count": 0, "last_reply_at": None,
+    }
+
+
+def test_row_encoder_and_response():
+    encoder = RowEncoder(["id", "text", "at"])
+    rows = [(1, 'a "quoted" é', datetime(2025, 1, 1)), (2, None, datetime(2025, 1, 2))]
+
+    assert json.loads(encoder.encode(rows)) == [
+        {"id": 1, "text": 'a "quoted" é', "at": "2025-01-01T00:00:00"},
+        {"id": 2, "text": None, "at": "2025-01-02T00:00:00"},
+    ]
+    assert json.loads(encoder.encode_compact(rows)) == {
+        "fields": ["id", "text", "at"],
+        "rows": [[1, 'a "quoted" é', "2025-01-01T00:00:00"], [2, None, "2025-01-02T00:00:00"]],
+    }
+    assert encoder.encode([]) == b"[]"
+    assert json.loads(encoder.encode(rows, extra=["x", None]))[1] == {
+        "id": 2, "text": None, "at": "2025-01-02T00:00:00", "extra": None,
+    }
+    assert json.loads(encoder.encode_compact(rows[:1], parents={1: {"id": 0}}))["parents"] == {"1": {"id": 0}}
+
+    assert FastJSONResponse(b"[1]").body == b"[1]"
+    assert FastJSONResponse({"a": 1}).body == b'{"a":1}'
+
+
+def test_snowflake_ids_survive_javascript_numbers():
+    message_id = 2**53 + 1
+    created = datetime(2025, 5, 1, 12, 30)
+    message = Message(message_id=message_id, user_id=1, room_id=2, reply_to=message_id - 2, message="hi",
+                      is_deleted=False, created_at=created, updated_at=created, reply_count=0)
+    # float() is what a JavaScript client would read a JSON number as.
+    assert float(message_id) != message_id
+
+    [encoded] = json.loads(MESSAGE_LIST.encode([message]))
+    event = json.loads(json.dumps(message_event(message)))
+    for body in (encoded, event):
+        assert (body["message_id"], body["reply_to"]) == (str(message_id), str(message_id - 2))
+
+    encoder = RowEncoder(["message_id", "reply_to", "user_id"], ids=("message_id", "reply_to"))
+    assert json.loads(encoder.encode([(message_id, None, 1)])) == [
+        {"message_id": str(message_id), "reply_to": None, "user_id": 1}
+    ]
+    assert json.loads(encoder.encode_compact([(message_id, None, 1)]))["rows"] == [[str(message_id), None, 1]]
@@ -0,0 +1,74 @@
+from datetime import datetime
+
+import pytest
+
+from src.core import ids
+from src.core.ids import EPOCH_MS, SEQUENCE_MASK, SnowflakeGenerator, min_id_at, timestamp_of
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_ids_are_increasing_and_encode_worker_and_time():
+    clock = FakeClock(EPOCH_MS + 5_000)
+    generator = SnowflakeGenerator(7, clock=clock)
+    first, second = generator.next_id(), generator.next_id()
+    assert second == first + 1
+    assert (first >> 12) & 1023 == 7
+    assert timestamp_of(first) == datetime(2025, 1, 1, 0, 0, 5)
+
+    clock.now += 1
+    third = generator.next_id()
+    assert third > second
+    assert third & SEQUENCE_MASK == 0
+
+
+def test_clock_going_backwards_keeps_ids_monotonic():
+    clock = FakeClock(EPOCH_MS + 10_000)
+    generator = SnowflakeGenerator(1, clock=clock)
+    ids = [generator.next_id()]
+    clock.now -= 5_000
+    ids += [generator.next_id() for _ in range(3)]
+    clock.now += 10_000
+    ids.append(generator.next_id())
+    assert ids == sorted(set(ids))
+
+
+def test_sequence_overflow_borrows_next_millisecond():
+    clock = FakeClock(EPOCH_MS)
+    generator = SnowflakeGenerator(0, clock=clock)
+    ids = [generator.next_id() for _ in range(SEQUENCE_MASK + 2)]
+    assert ids == sorted(set(ids))
+    assert ids[-1] >> 22 == 1
+
+    batch = generator.next_ids(SEQUENCE_MASK * 2)
+    assert batch[0] > ids[-1]
+    assert batch == sorted(set(batch))
+    assert generator.next_id() > batch[-1]
+
+
+def test_min_id_at_bounds_ids_generated_afterwards():
+    clock = FakeClock(EPOCH_MS + 60_000)
+    generator = SnowflakeGenerator(1023, clock=clock)
+    generated = generator.next_id()
+    assert min_id_at(datetime(2025, 1, 1, 0, 1)) <= generated < min_id_at(datetime(2025, 1, 1, 0, 1, 0, 1000))
+    assert min_id_at(datetime(2024, 1, 1)) == 0
+    assert (generated >> 12) & 1023 == 1023
+
+
+def test_worker_id_out_of_range():
+    with pytest.raises(ValueError):
+        SnowflakeGenerator(1024)
+
+
+@pytest.mark.parametrize("worker_id", [None, -1, 1024])
+def test_process_generator_requires_a_valid_worker_id(monkeypatch, worker_id):
+    monkeypatch.setattr(ids, "_generator", None)
+    monkeypatch.setattr(ids.settings, "WORKER_ID", worker_id)
+    with pytest.raises(RuntimeError, match="WORKER_ID"):
+        ids.get_id_generator()
@@ -0,0 +1,45 @@
+from src.chat.framing import EncodedEvent
+from src.chat.sync import RoomLog
+
+
+def _event(seq):
+    return EncodedEvent({"type": "message", "seq": seq})
+
+
+def _seqs(events):
+    return [event.event["seq"] for event in events]
+
+
+def test_log_replays_contiguous_ranges_only():
+    log = RoomLog(capacity=4)
+    assert log.since(0) is None
+
+    log.add(5, _event(5))
+    log.add(7, _event(7))
+    assert log.since(4) is None  # 6 has not arrived yet
+    assert log.since(7) == []
+    assert log.since(3) is None  # 4 predates the log
+
+    log.add(6, _event(6))
+    assert _seqs(log.since(4)) == [5, 6, 7]
+    assert log.since(7) == []
+
+    log.add(8, _event(8))
+    log.add(9, _event(9))
+    assert len(log) == 4 and log.start == 6
+    assert log.since(4) is None
+    assert _seqs(log.since(5)) == [6, 7, 8, 9]
+    log.add(5, _event(5))
+    assert len(log) == 4
+
+
+def test_seed_extends_coverage_backwards():
+    log = RoomLog(capacity=10)
+    log.add(11, _event(11))
+    log.seed(8, [(8, _event(8)), (9, _event(9)), (10, _event(10)), (11, _event(11))])
+    assert log.seeded
+    assert _seqs(log.since(7)) == [8, 9, 10, 11]
+
+    empty = RoomLog(capacity=10)
+    empty.seed(1, [])
+    assert empty.since(0) == []